@@ -5,27 +5,81 @@ from typing import Any
 
 from homeassistant.components.binary_sensor import BinarySensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN, NAME
+from .const import DOMAIN, NAME, SIGNAL_RULES_UPDATED
 from .coordinator import EmergencyStopCoordinator, RuleConfig
+from .engine import RuleSetChanges
 
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities
 ) -> None:
     coordinator: EmergencyStopCoordinator = hass.data[DOMAIN][entry.entry_id]
+    rule_entities: dict[str, EmergencyStopRuleBinarySensor] = {
+        rule.rule_id: EmergencyStopRuleBinarySensor(coordinator, rule)
+        for rule in coordinator.rules
+    }
     entities: list[BinarySensorEntity] = [
         EmergencyStopActiveBinarySensor(coordinator),
+        EmergencyStopEvaluatorHealthyBinarySensor(coordinator),
     ]
-    entities.extend(
-        EmergencyStopRuleBinarySensor(coordinator, rule)
-        for rule in coordinator.rules
-    )
+    entities.extend(rule_entities.values())
     async_add_entities(entities)
 
+    async def _async_rules_updated(changes: RuleSetChanges) -> None:
+        await _async_apply_rule_entity_changes(
+            hass, coordinator, rule_entities, changes, async_add_entities
+        )
+
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_RULES_UPDATED.format(entry.entry_id), _async_rules_updated
+        )
+    )
+
+
+async def _async_apply_rule_entity_changes(
+    hass: HomeAssistant,
+    coordinator: EmergencyStopCoordinator,
+    rule_entities: dict[str, EmergencyStopRuleBinarySensor],
+    changes: RuleSetChanges,
+    async_add_entities,
+) -> None:
+    """Add, re-create, or remove per-rule sensors without reloading the entry."""
+    registry = er.async_get(hass)
+    removed = set(changes.removed)
+    for rule_id in [*changes.removed, *(rule.rule_id for rule in changes.changed)]:
+        entity = rule_entities.pop(rule_id, None)
+        if entity is None:
+            continue
+        await entity.async_remove()
+        if (
+            rule_id in removed
+            and entity.entity_id
+            and registry.async_get(entity.entity_id) is not None
+        ):
+            registry.async_remove(entity.entity_id)
+
+    for rule in changes.members:
+        entity = rule_entities.get(rule.rule_id)
+        if entity is not None:
+            entity.async_update_rule(rule)
+
+    new_entities = [
+        EmergencyStopRuleBinarySensor(coordinator, rule)
+        for rule in [*changes.changed, *changes.added]
+    ]
+    for entity in new_entities:
+        rule_entities[entity.rule_id] = entity
+    if new_entities:
+        async_add_entities(new_entities)
+
 
 class EmergencyStopActiveBinarySensor(
     CoordinatorEntity[EmergencyStopCoordinator], BinarySensorEntity
@@ -52,6 +106,41 @@ class EmergencyStopActiveBinarySensor(
         return self.coordinator.stop_state.to_attributes()
 
 
+class EmergencyStopEvaluatorHealthyBinarySensor(
+    CoordinatorEntity[EmergencyStopCoordinator], BinarySensorEntity
+):
+    """Binary sensor that turns off when rule evaluation runs late or stalls."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:heart-pulse"
+
+    def __init__(self, coordinator: EmergencyStopCoordinator) -> None:
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{DOMAIN}_evaluator_healthy"
+        self._attr_name = "Evaluator Healthy"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, "emergency_stop")},
+            name=NAME,
+        )
+
+    @property
+    def is_on(self) -> bool:
+        return self.coordinator.heartbeat.healthy
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        heartbeat = self.coordinator.heartbeat
+        return {
+            "loop_lag_ms": round(heartbeat.lag * 1000, 1),
+            "tick_jitter_ms": round(heartbeat.jitter * 1000, 1),
+            "lag_threshold_ms": round(heartbeat.threshold * 1000),
+            "stalled": heartbeat.stalled,
+            "stall_after_seconds": heartbeat.stall_after,
+            "escalation_level": self.coordinator.watchdog_level,
+        }
+
+
 class EmergencyStopRuleBinarySensor(
     CoordinatorEntity[EmergencyStopCoordinator], BinarySensorEntity
 ):
@@ -69,6 +158,17 @@ class EmergencyStopRuleBinarySensor(
             name=NAME,
         )
 
+    @property
+    def rule_id(self) -> str:
+        return self._rule.rule_id
+
+    @callback
+    def async_update_rule(self, rule: RuleConfig) -> None:
+        """Take over a rule whose selectors resolved to other entities."""
+        self._rule = rule
+        if self.hass is not None:
+            self.async_write_ha_state()
+
     @property
     def is_on(self) -> bool:
         state = self.coordinator.rule_states.get(self._rule.rule_id)
@@ -100,6 +200,11 @@ class EmergencyStopRuleBinarySensor(
             "data_type": self._rule.data_type,
             "entities": list(self._rule.entities),
             "aggregate": self._rule.aggregate,
+            "aggregate_parameter": self._rule.aggregate_parameter,
+            "window_function": self._rule.window_function,
+            "window_seconds": self._rule.window_seconds,
+            "input_mode": self._rule.input_mode,
+            "rate_smoothing_seconds": self._rule.rate_smoothing_seconds,
             "condition": self._rule.condition,
             "thresholds": list(self._rule.thresholds),
             "severity_mode": self._rule.severity_mode,
@@ -107,22 +212,48 @@ class EmergencyStopRuleBinarySensor(
             "levels": dict(self._rule.levels),
             "duration_seconds": self._rule.duration_seconds,
             "interval_seconds": self._rule.interval_seconds,
+            "lane": self.coordinator.rule_lane(self._rule.rule_id),
+            "max_interval_seconds": self._rule.max_interval_seconds,
             "level": self._rule.level,
             "latched": self._rule.latched,
+            "freeze_latched": self._rule.freeze_latched,
             "notify_email": self._rule.notify_email,
             "notify_mobile": self._rule.notify_mobile,
             "unknown_handling": self._rule.unknown_handling,
+            "stale_seconds": self._rule.stale_seconds,
+            "hysteresis": self._rule.hysteresis,
+            "clear_threshold": self._rule.clear_threshold,
+            "clear_duration_seconds": self._rule.clear_duration_seconds,
             "text_case_sensitive": self._rule.text_case_sensitive,
             "text_trim": self._rule.text_trim,
+            "text_patterns": list(self._rule.text_patterns),
+            "precondition_entities": list(self._rule.precondition_entities),
+            "precondition_rules": list(self._rule.precondition_rules),
+            "source_rules": list(self._rule.source_rules),
+            "coincidence_seconds": self._rule.coincidence_seconds,
+            "expression": self._rule.expression,
+            "attribute": self._rule.attribute,
+            "selectors": list(self._rule.selectors),
+            "group_by": self._rule.group_by,
+            "groups": [self._rule.group_name(key) for key, _ in self._rule.groups],
             "active_since": state.active_since if state else None,
             "last_match": state.last_match if state else None,
             "last_aggregate": state.last_aggregate if state else None,
             "last_entity": state.last_entity if state else None,
+            "last_entity_low": state.last_entity_low if state else None,
+            "last_pack": state.last_pack if state else None,
+            "last_cell": state.last_cell if state else None,
             "last_detail": state.last_detail if state else None,
+            "last_group": state.last_group if state else None,
+            "group_states": state.groups if state else {},
             "last_update": state.last_update if state else None,
+            "eval_interval": state.eval_interval if state else None,
+            "inhibited_by": state.inhibited_by if state else None,
             "last_invalid_reason": state.last_invalid_reason if state else None,
             "current_level": state.current_level if state else None,
+            "stop_level": self._rule.stop_level(state.current_level) if state else None,
             "latched_level": state.latched_level if state else None,
+            "frozen": state.frozen if state else False,
             "active_levels": list(state.active_levels) if state else [],
             "evaluation": evaluation,
         }
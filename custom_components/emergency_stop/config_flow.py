@@ -12,6 +12,13 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers import selector
 from homeassistant.util import slugify
 
+from .engine import normalize_aggregate
+from .engine.attributes import parse_path
+from .engine.expression import ExpressionError, compile_expression, input_names
+from .engine.graph import CycleError, topological_order
+from .engine.ladder import build_ladder, stop_level_of
+from .engine.selectors import parse_selector
+from .engine.textmatch import compile_needles
 from .version import async_get_version_label
 from .const import (
     CONF_BREVO_API_KEY,
@@ -21,6 +28,11 @@ from .const import (
     CONF_BREVO_RECIPIENT_SHUTDOWN,
     CONF_BREVO_SENDER,
     CONF_EMAIL_LEVELS,
+    CONF_EVAL_SLICE_MS,
+    CONF_INPUT_BATCH_MAX_CHANGES,
+    CONF_INPUT_BATCH_MAX_LATENCY_MS,
+    CONF_INPUT_BATCH_MS,
+    CONF_INPUT_BATCH_SHUTDOWN_MS,
     CONF_REPORT_DOMAINS,
     CONF_REPORT_ENTITY_IDS,
     CONF_REPORT_MODE,
@@ -28,23 +40,41 @@ from .const import (
     CONF_REPORT_RETENTION_MAX_FILES,
     CONF_RULES,
     CONF_RULE_AGGREGATE,
+    CONF_RULE_AGGREGATE_PARAMETER,
+    CONF_RULE_ATTRIBUTE,
+    CONF_RULE_CLEAR_DURATION,
+    CONF_RULE_CLEAR_THRESHOLD,
+    CONF_RULE_COINCIDENCE,
     CONF_RULE_CONDITION,
     CONF_RULE_DATA_TYPE,
     CONF_RULE_DURATION,
     CONF_RULE_ENTITIES,
+    CONF_RULE_EXPRESSION,
+    CONF_RULE_FREEZE_LATCHED,
+    CONF_RULE_HYSTERESIS,
     CONF_RULE_ID,
+    CONF_RULE_INPUT_MODE,
     CONF_RULE_INTERVAL,
     CONF_RULE_LATCHED,
     CONF_RULE_LEVEL,
     CONF_RULE_NAME,
+    CONF_RULE_SELECTORS,
+    CONF_RULE_GROUP_BY,
     CONF_RULE_SEVERITY_MODE,
+    CONF_RULE_SOURCE_RULES,
+    CONF_RULE_STALE_SECONDS,
     CONF_RULE_DIRECTION,
     CONF_RULE_LEVELS,
+    CONF_RULE_MAX_INTERVAL,
     CONF_RULE_TEXT_CASE_SENSITIVE,
     CONF_RULE_TEXT_MATCH,
+    CONF_RULE_TEXT_PATTERNS,
     CONF_RULE_TEXT_TRIM,
     CONF_RULE_NOTIFY_EMAIL,
     CONF_RULE_NOTIFY_MOBILE,
+    CONF_RULE_PRECONDITION_ENTITIES,
+    CONF_RULE_PRECONDITION_RULES,
+    CONF_RULE_RATE_SMOOTHING,
     CONF_RULE_THRESHOLD,
     CONF_RULE_THRESHOLD_HIGH,
     CONF_RULE_THRESHOLD_LOW,
@@ -57,29 +87,49 @@ from .const import (
     CONF_MOBILE_NOTIFY_URGENT_SHUTDOWN,
     CONF_RULE_NOTIFY_THRESHOLD,
     CONF_RULE_NOTIFY_DURATION,
+    CONF_RULE_NOTIFY_CLEAR_THRESHOLD,
     CONF_RULE_LIMIT_THRESHOLD,
     CONF_RULE_LIMIT_DURATION,
+    CONF_RULE_LIMIT_CLEAR_THRESHOLD,
     CONF_RULE_SHUTDOWN_THRESHOLD,
     CONF_RULE_SHUTDOWN_DURATION,
+    CONF_RULE_SHUTDOWN_CLEAR_THRESHOLD,
     CONF_RULE_UNKNOWN_HANDLING,
+    CONF_RULE_WINDOW_FUNCTION,
+    CONF_RULE_WINDOW_SECONDS,
     CONF_RULE_THRESHOLDS,
     CONF_IMPORT_MODE,
     CONF_IMPORT_RULES_JSON,
     CONF_IMPORT_SETTINGS_JSON,
+    CONF_WATCHDOG_LAG_MS,
+    CONF_WATCHDOG_LEVEL,
     IMPORT_MODE_MERGE,
     IMPORT_MODE_OPTIONS,
     IMPORT_MODE_REPLACE,
     DATA_TYPE_BINARY,
+    DATA_TYPE_COMPOSITE,
+    DATA_TYPE_EXPRESSION,
     DATA_TYPE_NUMERIC,
     DATA_TYPE_OPTIONS,
     DATA_TYPE_TEXT,
+    DEFAULT_RULE_CLEAR_DURATION,
+    DEFAULT_RULE_COINCIDENCE,
     DEFAULT_RULE_DURATION,
+    DEFAULT_RULE_FREEZE_LATCHED,
+    DEFAULT_RULE_HYSTERESIS,
+    DEFAULT_RULE_GROUP_BY,
+    DEFAULT_RULE_INPUT_MODE,
     DEFAULT_RULE_INTERVAL,
     DEFAULT_RULE_LATCHED,
     DEFAULT_RULE_LEVEL,
+    DEFAULT_RULE_MAX_INTERVAL,
     DEFAULT_RULE_UNKNOWN_HANDLING,
     DEFAULT_RULE_NOTIFY_EMAIL,
     DEFAULT_RULE_NOTIFY_MOBILE,
+    DEFAULT_RULE_RATE_SMOOTHING,
+    DEFAULT_RULE_STALE_SECONDS,
+    DEFAULT_RULE_WINDOW_FUNCTION,
+    DEFAULT_RULE_WINDOW_SECONDS,
     DEFAULT_TEXT_CASE_SENSITIVE,
     DEFAULT_TEXT_TRIM,
     DEFAULT_MOBILE_NOTIFY_ENABLED,
@@ -87,18 +137,34 @@ from .const import (
     DEFAULT_MOBILE_NOTIFY_URGENT_LIMIT,
     DEFAULT_MOBILE_NOTIFY_URGENT_SHUTDOWN,
     DEFAULT_EMAIL_LEVELS,
+    DEFAULT_EVAL_SLICE_MS,
+    DEFAULT_INPUT_BATCH_MAX_CHANGES,
+    DEFAULT_INPUT_BATCH_MAX_LATENCY_MS,
+    DEFAULT_INPUT_BATCH_MS,
+    DEFAULT_INPUT_BATCH_SHUTDOWN_MS,
     DEFAULT_REPORT_RETENTION_MAX_AGE_DAYS,
     DEFAULT_REPORT_RETENTION_MAX_FILES,
+    DEFAULT_WATCHDOG_LAG_MS,
+    DEFAULT_WATCHDOG_LEVEL,
     DIRECTION_OPTIONS,
-    DIRECTION_HIGHER_IS_WORSE,
     DIRECTION_LOWER_IS_WORSE,
+    INPUT_MODE_VALUE,
+    GROUP_BY_CAPTURE,
+    GROUP_BY_OPTIONS,
+    INPUT_MODES,
+    LEVEL_NORMAL,
     LEVEL_OPTIONS,
     LEVEL_ORDER,
     NAME,
     NUMERIC_AGGREGATES,
+    PARAMETRIC_AGGREGATES,
+    PRECONDITION_DOMAINS,
+    WINDOW_FUNCTIONS,
+    WINDOW_NONE,
     BINARY_AGGREGATES,
     TEXT_AGGREGATES,
     NUMERIC_CONDITIONS,
+    NUMERIC_DATA_TYPES,
     BINARY_STATE_CONDITIONS,
     TEXT_CONDITIONS,
     REPORT_MODE_BASIC,
@@ -108,7 +174,13 @@ from .const import (
     SEVERITY_MODE_SIMPLE,
     UNKNOWN_HANDLING_OPTIONS,
     COND_BETWEEN,
+    COND_EQUALS,
+    COND_GT,
+    COND_GTE,
+    COND_LT,
+    COND_LTE,
     AGGREGATE_COUNT,
+    AGGREGATE_PERCENTILE,
     DOMAIN,
 )
 
@@ -125,6 +197,13 @@ _SETTINGS_KEYS = (
     CONF_REPORT_ENTITY_IDS,
     CONF_REPORT_RETENTION_MAX_FILES,
     CONF_REPORT_RETENTION_MAX_AGE_DAYS,
+    CONF_EVAL_SLICE_MS,
+    CONF_INPUT_BATCH_MS,
+    CONF_INPUT_BATCH_MAX_LATENCY_MS,
+    CONF_INPUT_BATCH_MAX_CHANGES,
+    CONF_INPUT_BATCH_SHUTDOWN_MS,
+    CONF_WATCHDOG_LAG_MS,
+    CONF_WATCHDOG_LEVEL,
     CONF_BREVO_API_KEY,
     CONF_BREVO_SENDER,
     CONF_BREVO_RECIPIENT,
@@ -301,6 +380,18 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors[CONF_RULE_NAME] = "required"
             if data_type not in DATA_TYPE_OPTIONS:
                 errors[CONF_RULE_DATA_TYPE] = "invalid_data_type"
+            precondition_rules = list(user_input.get(CONF_RULE_PRECONDITION_RULES) or [])
+            source_rules = (
+                list(self._rule_context.get(CONF_RULE_SOURCE_RULES) or [])
+                if data_type == DATA_TYPE_COMPOSITE
+                else []
+            )
+            if _has_rule_cycle(
+                _rules_excluding_index(self._rules, self._edit_index),
+                self._rule_context.get(CONF_RULE_ID),
+                [*precondition_rules, *source_rules],
+            ):
+                errors[CONF_RULE_PRECONDITION_RULES] = "precondition_cycle"
             if not errors:
                 if self._rule_context:
                     self._rule_context[CONF_RULE_NAME] = rule_name
@@ -310,13 +401,24 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         CONF_RULE_NAME: rule_name,
                         CONF_RULE_DATA_TYPE: data_type,
                     }
+                self._rule_context[CONF_RULE_PRECONDITION_ENTITIES] = list(
+                    user_input.get(CONF_RULE_PRECONDITION_ENTITIES) or []
+                )
+                self._rule_context[CONF_RULE_PRECONDITION_RULES] = precondition_rules
                 if data_type == DATA_TYPE_NUMERIC:
                     return await self.async_step_rule_numeric()
                 if data_type == DATA_TYPE_BINARY:
                     return await self.async_step_rule_binary()
+                if data_type == DATA_TYPE_COMPOSITE:
+                    return await self.async_step_rule_composite()
+                if data_type == DATA_TYPE_EXPRESSION:
+                    return await self.async_step_rule_expression()
                 return await self.async_step_rule_text()
 
-        schema = _rule_schema(self._rule_context)
+        schema = _rule_schema(
+            self._rule_context,
+            _rule_select_options(_rules_excluding_index(self._rules, self._edit_index)),
+        )
         return self.async_show_form(step_id="rule", data_schema=schema, errors=errors)
 
     async def async_step_rule_numeric(self, user_input: dict[str, Any] | None = None):
@@ -330,14 +432,43 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             severity_mode = user_input.get(CONF_RULE_SEVERITY_MODE, SEVERITY_MODE_SIMPLE)
             if severity_mode not in SEVERITY_MODE_OPTIONS:
                 errors[CONF_RULE_SEVERITY_MODE] = "invalid_severity_mode"
+            errors.update(_validate_window(user_input))
+            errors.update(_validate_rate(user_input))
+            errors.update(_validate_aggregate_parameter(user_input))
+            errors.update(_validate_attribute(user_input))
             if not errors:
                 self._rule_context.update(
                     {
                         CONF_RULE_ENTITIES: user_input.get(CONF_RULE_ENTITIES, []),
                         CONF_RULE_AGGREGATE: user_input.get(CONF_RULE_AGGREGATE),
                         CONF_RULE_SEVERITY_MODE: severity_mode,
+                        CONF_RULE_WINDOW_FUNCTION: user_input.get(
+                            CONF_RULE_WINDOW_FUNCTION, DEFAULT_RULE_WINDOW_FUNCTION
+                        ),
+                        CONF_RULE_WINDOW_SECONDS: int(
+                            user_input.get(
+                                CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS
+                            )
+                        ),
+                        CONF_RULE_INPUT_MODE: user_input.get(
+                            CONF_RULE_INPUT_MODE, DEFAULT_RULE_INPUT_MODE
+                        ),
+                        CONF_RULE_RATE_SMOOTHING: int(
+                            user_input.get(
+                                CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING
+                            )
+                        ),
                     }
                 )
+                parameter = user_input.get(CONF_RULE_AGGREGATE_PARAMETER)
+                self._rule_context.pop(CONF_RULE_AGGREGATE_PARAMETER, None)
+                if parameter is not None:
+                    self._rule_context[CONF_RULE_AGGREGATE_PARAMETER] = float(parameter)
+                attribute = _normalize_optional_str(user_input.get(CONF_RULE_ATTRIBUTE))
+                self._rule_context.pop(CONF_RULE_ATTRIBUTE, None)
+                if attribute:
+                    self._rule_context[CONF_RULE_ATTRIBUTE] = attribute
+                _store_members(self._rule_context, user_input)
                 if severity_mode == SEVERITY_MODE_SEMAFOR:
                     return await self.async_step_rule_numeric_semafor()
                 return await self.async_step_rule_numeric_simple()
@@ -358,8 +489,7 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             merged_input = {**self._rule_context, **user_input}
             errors.update(_validate_numeric_rule(merged_input))
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 rule = _build_rule_config(
                     merged,
                     {},
@@ -379,10 +509,11 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     ):
         errors: dict[str, str] = {}
         if user_input is not None:
-            errors = _validate_semafor_rule(user_input, numeric=True)
+            errors = _validate_semafor_rule(
+                user_input, numeric=True, custom=_custom_levels(self._rule_context)
+            )
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_SEVERITY_MODE] = SEVERITY_MODE_SEMAFOR
                 rule = _build_rule_config(merged, {}, self._rules)
                 self._rules.append(rule)
@@ -410,6 +541,7 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                         CONF_RULE_AGGREGATE: aggregate,
                     }
                 )
+                _store_members(self._rule_context, user_input)
                 if aggregate == AGGREGATE_COUNT:
                     return await self.async_step_rule_binary_count()
                 return await self.async_step_rule_binary_state()
@@ -421,6 +553,105 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_rule_composite(
+        self, user_input: dict[str, Any] | None = None
+    ):
+        """Configure a composite rule over other rules."""
+        errors: dict[str, str] = {}
+        other_rules = _rules_excluding_index(self._rules, self._edit_index)
+        if user_input is not None:
+            errors.update(_validate_coincidence(user_input))
+            source_rules = list(user_input.get(CONF_RULE_SOURCE_RULES) or [])
+            aggregate = user_input.get(CONF_RULE_AGGREGATE)
+            if not source_rules:
+                errors[CONF_RULE_SOURCE_RULES] = "source_rules_required"
+            elif _has_rule_cycle(
+                other_rules,
+                self._rule_context.get(CONF_RULE_ID),
+                [
+                    *self._rule_context.get(CONF_RULE_PRECONDITION_RULES, []),
+                    *source_rules,
+                ],
+            ):
+                errors[CONF_RULE_SOURCE_RULES] = "composite_cycle"
+            if aggregate not in BINARY_AGGREGATES:
+                errors[CONF_RULE_AGGREGATE] = "invalid_aggregate"
+            if not errors:
+                self._rule_context.update(
+                    {
+                        CONF_RULE_ENTITIES: [],
+                        CONF_RULE_SOURCE_RULES: source_rules,
+                        CONF_RULE_AGGREGATE: aggregate,
+                        CONF_RULE_COINCIDENCE: int(
+                            user_input.get(
+                                CONF_RULE_COINCIDENCE, DEFAULT_RULE_COINCIDENCE
+                            )
+                        ),
+                    }
+                )
+                if aggregate == AGGREGATE_COUNT:
+                    return await self.async_step_rule_binary_count()
+                return await self.async_step_rule_binary_state()
+
+        schema = _composite_rule_select_schema(
+            self._rule_context, _rule_select_options(other_rules)
+        )
+        return self.async_show_form(
+            step_id="rule_composite",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_rule_expression(
+        self, user_input: dict[str, Any] | None = None
+    ):
+        """Configure an expression rule over named entities."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            errors.update(_validate_entities(user_input))
+            errors.update(_validate_expression(user_input))
+            severity_mode = user_input.get(CONF_RULE_SEVERITY_MODE, SEVERITY_MODE_SIMPLE)
+            if severity_mode not in SEVERITY_MODE_OPTIONS:
+                errors[CONF_RULE_SEVERITY_MODE] = "invalid_severity_mode"
+            errors.update(_validate_window(user_input))
+            errors.update(_validate_rate(user_input))
+            if not errors:
+                self._rule_context.update(
+                    {
+                        CONF_RULE_ENTITIES: user_input.get(CONF_RULE_ENTITIES, []),
+                        CONF_RULE_EXPRESSION: user_input[CONF_RULE_EXPRESSION].strip(),
+                        CONF_RULE_AGGREGATE: None,
+                        CONF_RULE_SEVERITY_MODE: severity_mode,
+                        CONF_RULE_WINDOW_FUNCTION: user_input.get(
+                            CONF_RULE_WINDOW_FUNCTION, DEFAULT_RULE_WINDOW_FUNCTION
+                        ),
+                        CONF_RULE_WINDOW_SECONDS: int(
+                            user_input.get(
+                                CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS
+                            )
+                        ),
+                        CONF_RULE_INPUT_MODE: user_input.get(
+                            CONF_RULE_INPUT_MODE, DEFAULT_RULE_INPUT_MODE
+                        ),
+                        CONF_RULE_RATE_SMOOTHING: int(
+                            user_input.get(
+                                CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING
+                            )
+                        ),
+                    }
+                )
+                self._rule_context.pop(CONF_RULE_AGGREGATE_PARAMETER, None)
+                if severity_mode == SEVERITY_MODE_SEMAFOR:
+                    return await self.async_step_rule_numeric_semafor()
+                return await self.async_step_rule_numeric_simple()
+
+        schema = _expression_rule_select_schema(self._rule_context)
+        return self.async_show_form(
+            step_id="rule_expression",
+            data_schema=schema,
+            errors=errors,
+        )
+
     async def async_step_rule_binary_state(
         self, user_input: dict[str, Any] | None = None
     ):
@@ -432,8 +663,7 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             if condition not in BINARY_STATE_CONDITIONS:
                 errors[CONF_RULE_CONDITION] = "invalid_condition"
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_THRESHOLDS] = []
                 rule = _build_rule_config(merged, {}, self._rules)
                 self._rules.append(rule)
@@ -479,8 +709,7 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             if condition not in NUMERIC_CONDITIONS:
                 errors[CONF_RULE_CONDITION] = "invalid_condition"
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_THRESHOLDS] = _extract_thresholds(user_input)
                 rule = _build_rule_config(merged, {}, self._rules)
                 self._rules.append(rule)
@@ -498,10 +727,11 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     ):
         errors: dict[str, str] = {}
         if user_input is not None:
-            errors = _validate_semafor_rule(user_input, numeric=False)
+            errors = _validate_semafor_rule(
+                user_input, numeric=False, custom=_custom_levels(self._rule_context)
+            )
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_SEVERITY_MODE] = SEVERITY_MODE_SEMAFOR
                 rule = _build_rule_config(merged, {}, self._rules)
                 self._rules.append(rule)
@@ -525,20 +755,26 @@ class EmergencyStopConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors[CONF_RULE_CONDITION] = "invalid_condition"
             raw_match = user_input.get(CONF_RULE_TEXT_MATCH)
             text_trim = bool(user_input.get(CONF_RULE_TEXT_TRIM, DEFAULT_TEXT_TRIM))
-            if raw_match is None:
-                errors[CONF_RULE_TEXT_MATCH] = "required"
-                match = None
-            else:
+            patterns = _text_pattern_list(
+                user_input.get(CONF_RULE_TEXT_PATTERNS), text_trim
+            )
+            match = None
+            if raw_match is not None:
                 match_value = str(raw_match)
                 normalized = match_value.strip() if text_trim else match_value
-                if not normalized:
-                    errors[CONF_RULE_TEXT_MATCH] = "required"
-                    match = None
-                else:
+                if normalized:
                     match = normalized if text_trim else match_value
+            if match is None and not patterns:
+                # One text match, a list of patterns, or both.
+                errors[CONF_RULE_TEXT_MATCH] = "required"
+            errors.update(_validate_text_patterns(patterns, user_input))
             if not errors:
                 merged = dict(user_input)
+                merged.setdefault(CONF_RULE_ENTITIES, [])
+                merged.setdefault(CONF_RULE_SELECTORS, "")
+                merged.setdefault(CONF_RULE_GROUP_BY, DEFAULT_RULE_GROUP_BY)
                 merged[CONF_RULE_TEXT_MATCH] = match
+                merged[CONF_RULE_TEXT_PATTERNS] = patterns
                 merged[CONF_RULE_SEVERITY_MODE] = SEVERITY_MODE_SIMPLE
                 rule = _build_rule_config(self._rule_context, merged, self._rules)
                 self._rules.append(rule)
@@ -919,6 +1155,18 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
                 errors[CONF_RULE_NAME] = "required"
             if data_type not in DATA_TYPE_OPTIONS:
                 errors[CONF_RULE_DATA_TYPE] = "invalid_data_type"
+            precondition_rules = list(user_input.get(CONF_RULE_PRECONDITION_RULES) or [])
+            source_rules = (
+                list(self._rule_context.get(CONF_RULE_SOURCE_RULES) or [])
+                if data_type == DATA_TYPE_COMPOSITE
+                else []
+            )
+            if _has_rule_cycle(
+                _rules_excluding_index(self._rules, self._edit_index),
+                self._rule_context.get(CONF_RULE_ID),
+                [*precondition_rules, *source_rules],
+            ):
+                errors[CONF_RULE_PRECONDITION_RULES] = "precondition_cycle"
             if not errors:
                 if self._rule_context:
                     self._rule_context[CONF_RULE_NAME] = rule_name
@@ -928,13 +1176,24 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
                         CONF_RULE_NAME: rule_name,
                         CONF_RULE_DATA_TYPE: data_type,
                     }
+                self._rule_context[CONF_RULE_PRECONDITION_ENTITIES] = list(
+                    user_input.get(CONF_RULE_PRECONDITION_ENTITIES) or []
+                )
+                self._rule_context[CONF_RULE_PRECONDITION_RULES] = precondition_rules
                 if data_type == DATA_TYPE_NUMERIC:
                     return await self.async_step_rule_numeric()
                 if data_type == DATA_TYPE_BINARY:
                     return await self.async_step_rule_binary()
+                if data_type == DATA_TYPE_COMPOSITE:
+                    return await self.async_step_rule_composite()
+                if data_type == DATA_TYPE_EXPRESSION:
+                    return await self.async_step_rule_expression()
                 return await self.async_step_rule_text()
 
-        schema = _rule_schema(self._rule_context)
+        schema = _rule_schema(
+            self._rule_context,
+            _rule_select_options(_rules_excluding_index(self._rules, self._edit_index)),
+        )
         return self.async_show_form(step_id="rule", data_schema=schema, errors=errors)
 
     async def async_step_rule_numeric(self, user_input: dict[str, Any] | None = None):
@@ -947,14 +1206,43 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
             severity_mode = user_input.get(CONF_RULE_SEVERITY_MODE, SEVERITY_MODE_SIMPLE)
             if severity_mode not in SEVERITY_MODE_OPTIONS:
                 errors[CONF_RULE_SEVERITY_MODE] = "invalid_severity_mode"
+            errors.update(_validate_window(user_input))
+            errors.update(_validate_rate(user_input))
+            errors.update(_validate_aggregate_parameter(user_input))
+            errors.update(_validate_attribute(user_input))
             if not errors:
                 self._rule_context.update(
                     {
                         CONF_RULE_ENTITIES: user_input.get(CONF_RULE_ENTITIES, []),
                         CONF_RULE_AGGREGATE: user_input.get(CONF_RULE_AGGREGATE),
                         CONF_RULE_SEVERITY_MODE: severity_mode,
+                        CONF_RULE_WINDOW_FUNCTION: user_input.get(
+                            CONF_RULE_WINDOW_FUNCTION, DEFAULT_RULE_WINDOW_FUNCTION
+                        ),
+                        CONF_RULE_WINDOW_SECONDS: int(
+                            user_input.get(
+                                CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS
+                            )
+                        ),
+                        CONF_RULE_INPUT_MODE: user_input.get(
+                            CONF_RULE_INPUT_MODE, DEFAULT_RULE_INPUT_MODE
+                        ),
+                        CONF_RULE_RATE_SMOOTHING: int(
+                            user_input.get(
+                                CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING
+                            )
+                        ),
                     }
                 )
+                parameter = user_input.get(CONF_RULE_AGGREGATE_PARAMETER)
+                self._rule_context.pop(CONF_RULE_AGGREGATE_PARAMETER, None)
+                if parameter is not None:
+                    self._rule_context[CONF_RULE_AGGREGATE_PARAMETER] = float(parameter)
+                attribute = _normalize_optional_str(user_input.get(CONF_RULE_ATTRIBUTE))
+                self._rule_context.pop(CONF_RULE_ATTRIBUTE, None)
+                if attribute:
+                    self._rule_context[CONF_RULE_ATTRIBUTE] = attribute
+                _store_members(self._rule_context, user_input)
                 if severity_mode == SEVERITY_MODE_SEMAFOR:
                     return await self.async_step_rule_numeric_semafor()
                 return await self.async_step_rule_numeric_simple()
@@ -975,8 +1263,7 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
             merged_input = {**self._rule_context, **user_input}
             errors.update(_validate_numeric_rule(merged_input))
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 existing_rules = _rules_excluding_index(self._rules, self._edit_index)
                 rule = _build_rule_config(merged, {}, existing_rules)
                 _store_rule(self._rules, rule, self._edit_index)
@@ -997,10 +1284,11 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
     ):
         errors: dict[str, str] = {}
         if user_input is not None:
-            errors = _validate_semafor_rule(user_input, numeric=True)
+            errors = _validate_semafor_rule(
+                user_input, numeric=True, custom=_custom_levels(self._rule_context)
+            )
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_SEVERITY_MODE] = SEVERITY_MODE_SEMAFOR
                 existing_rules = _rules_excluding_index(self._rules, self._edit_index)
                 rule = _build_rule_config(merged, {}, existing_rules)
@@ -1032,6 +1320,7 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
                         CONF_RULE_AGGREGATE: aggregate,
                     }
                 )
+                _store_members(self._rule_context, user_input)
                 if aggregate == AGGREGATE_COUNT:
                     return await self.async_step_rule_binary_count()
                 return await self.async_step_rule_binary_state()
@@ -1043,6 +1332,104 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
             errors=errors,
         )
 
+    async def async_step_rule_composite(
+        self, user_input: dict[str, Any] | None = None
+    ):
+        """Configure a composite rule over other rules."""
+        errors: dict[str, str] = {}
+        other_rules = _rules_excluding_index(self._rules, self._edit_index)
+        if user_input is not None:
+            errors.update(_validate_coincidence(user_input))
+            source_rules = list(user_input.get(CONF_RULE_SOURCE_RULES) or [])
+            aggregate = user_input.get(CONF_RULE_AGGREGATE)
+            if not source_rules:
+                errors[CONF_RULE_SOURCE_RULES] = "source_rules_required"
+            elif _has_rule_cycle(
+                other_rules,
+                self._rule_context.get(CONF_RULE_ID),
+                [
+                    *self._rule_context.get(CONF_RULE_PRECONDITION_RULES, []),
+                    *source_rules,
+                ],
+            ):
+                errors[CONF_RULE_SOURCE_RULES] = "composite_cycle"
+            if aggregate not in BINARY_AGGREGATES:
+                errors[CONF_RULE_AGGREGATE] = "invalid_aggregate"
+            if not errors:
+                self._rule_context.update(
+                    {
+                        CONF_RULE_ENTITIES: [],
+                        CONF_RULE_SOURCE_RULES: source_rules,
+                        CONF_RULE_AGGREGATE: aggregate,
+                        CONF_RULE_COINCIDENCE: int(
+                            user_input.get(
+                                CONF_RULE_COINCIDENCE, DEFAULT_RULE_COINCIDENCE
+                            )
+                        ),
+                    }
+                )
+                if aggregate == AGGREGATE_COUNT:
+                    return await self.async_step_rule_binary_count()
+                return await self.async_step_rule_binary_state()
+
+        schema = _composite_rule_select_schema(
+            self._rule_context, _rule_select_options(other_rules)
+        )
+        return self.async_show_form(
+            step_id="rule_composite",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_rule_expression(
+        self, user_input: dict[str, Any] | None = None
+    ):
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            errors.update(_validate_entities(user_input))
+            errors.update(_validate_expression(user_input))
+            severity_mode = user_input.get(CONF_RULE_SEVERITY_MODE, SEVERITY_MODE_SIMPLE)
+            if severity_mode not in SEVERITY_MODE_OPTIONS:
+                errors[CONF_RULE_SEVERITY_MODE] = "invalid_severity_mode"
+            errors.update(_validate_window(user_input))
+            errors.update(_validate_rate(user_input))
+            if not errors:
+                self._rule_context.update(
+                    {
+                        CONF_RULE_ENTITIES: user_input.get(CONF_RULE_ENTITIES, []),
+                        CONF_RULE_EXPRESSION: user_input[CONF_RULE_EXPRESSION].strip(),
+                        CONF_RULE_AGGREGATE: None,
+                        CONF_RULE_SEVERITY_MODE: severity_mode,
+                        CONF_RULE_WINDOW_FUNCTION: user_input.get(
+                            CONF_RULE_WINDOW_FUNCTION, DEFAULT_RULE_WINDOW_FUNCTION
+                        ),
+                        CONF_RULE_WINDOW_SECONDS: int(
+                            user_input.get(
+                                CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS
+                            )
+                        ),
+                        CONF_RULE_INPUT_MODE: user_input.get(
+                            CONF_RULE_INPUT_MODE, DEFAULT_RULE_INPUT_MODE
+                        ),
+                        CONF_RULE_RATE_SMOOTHING: int(
+                            user_input.get(
+                                CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING
+                            )
+                        ),
+                    }
+                )
+                self._rule_context.pop(CONF_RULE_AGGREGATE_PARAMETER, None)
+                if severity_mode == SEVERITY_MODE_SEMAFOR:
+                    return await self.async_step_rule_numeric_semafor()
+                return await self.async_step_rule_numeric_simple()
+
+        schema = _expression_rule_select_schema(self._rule_context)
+        return self.async_show_form(
+            step_id="rule_expression",
+            data_schema=schema,
+            errors=errors,
+        )
+
     async def async_step_rule_binary_state(
         self, user_input: dict[str, Any] | None = None
     ):
@@ -1053,8 +1440,7 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
             if condition not in BINARY_STATE_CONDITIONS:
                 errors[CONF_RULE_CONDITION] = "invalid_condition"
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_THRESHOLDS] = []
                 existing_rules = _rules_excluding_index(self._rules, self._edit_index)
                 rule = _build_rule_config(merged, {}, existing_rules)
@@ -1104,8 +1490,7 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
             if condition not in NUMERIC_CONDITIONS:
                 errors[CONF_RULE_CONDITION] = "invalid_condition"
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_THRESHOLDS] = _extract_thresholds(user_input)
                 existing_rules = _rules_excluding_index(self._rules, self._edit_index)
                 rule = _build_rule_config(merged, {}, existing_rules)
@@ -1128,10 +1513,11 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
     ):
         errors: dict[str, str] = {}
         if user_input is not None:
-            errors = _validate_semafor_rule(user_input, numeric=False)
+            errors = _validate_semafor_rule(
+                user_input, numeric=False, custom=_custom_levels(self._rule_context)
+            )
             if not errors:
-                merged = dict(self._rule_context)
-                merged.update(user_input)
+                merged = _merge_rule_input(self._rule_context, user_input)
                 merged[CONF_RULE_SEVERITY_MODE] = SEVERITY_MODE_SEMAFOR
                 existing_rules = _rules_excluding_index(self._rules, self._edit_index)
                 rule = _build_rule_config(merged, {}, existing_rules)
@@ -1159,20 +1545,25 @@ class EmergencyStopOptionsFlow(config_entries.OptionsFlow):
                 errors[CONF_RULE_CONDITION] = "invalid_condition"
             raw_match = user_input.get(CONF_RULE_TEXT_MATCH)
             text_trim = bool(user_input.get(CONF_RULE_TEXT_TRIM, DEFAULT_TEXT_TRIM))
-            if raw_match is None:
-                errors[CONF_RULE_TEXT_MATCH] = "required"
-                match = None
-            else:
+            patterns = _text_pattern_list(
+                user_input.get(CONF_RULE_TEXT_PATTERNS), text_trim
+            )
+            match = None
+            if raw_match is not None:
                 match_value = str(raw_match)
                 normalized = match_value.strip() if text_trim else match_value
-                if not normalized:
-                    errors[CONF_RULE_TEXT_MATCH] = "required"
-                    match = None
-                else:
+                if normalized:
                     match = normalized if text_trim else match_value
+            if match is None and not patterns:
+                # One text match, a list of patterns, or both.
+                errors[CONF_RULE_TEXT_MATCH] = "required"
+            errors.update(_validate_text_patterns(patterns, user_input))
             if not errors:
                 merged = dict(user_input)
+                merged.setdefault(CONF_RULE_ENTITIES, [])
+                merged.setdefault(CONF_RULE_SELECTORS, "")
                 merged[CONF_RULE_TEXT_MATCH] = match
+                merged[CONF_RULE_TEXT_PATTERNS] = patterns
                 merged[CONF_RULE_SEVERITY_MODE] = SEVERITY_MODE_SIMPLE
                 existing_rules = _rules_excluding_index(self._rules, self._edit_index)
                 rule = _build_rule_config(self._rule_context, merged, existing_rules)
@@ -1274,6 +1665,80 @@ def _global_schema(
             ),
         }
     )
+    schema_fields.update(_section_label("Evaluation"))
+    schema_fields.update(
+        {
+            vol.Optional(
+                CONF_EVAL_SLICE_MS,
+                default=defaults.get(CONF_EVAL_SLICE_MS, DEFAULT_EVAL_SLICE_MS),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=1
+                )
+            ),
+            vol.Optional(
+                CONF_INPUT_BATCH_MS,
+                default=defaults.get(CONF_INPUT_BATCH_MS, DEFAULT_INPUT_BATCH_MS),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=1
+                )
+            ),
+            vol.Optional(
+                CONF_INPUT_BATCH_MAX_LATENCY_MS,
+                default=defaults.get(
+                    CONF_INPUT_BATCH_MAX_LATENCY_MS,
+                    DEFAULT_INPUT_BATCH_MAX_LATENCY_MS,
+                ),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=1
+                )
+            ),
+            vol.Optional(
+                CONF_INPUT_BATCH_MAX_CHANGES,
+                default=defaults.get(
+                    CONF_INPUT_BATCH_MAX_CHANGES,
+                    DEFAULT_INPUT_BATCH_MAX_CHANGES,
+                ),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=1
+                )
+            ),
+            vol.Optional(
+                CONF_INPUT_BATCH_SHUTDOWN_MS,
+                default=defaults.get(
+                    CONF_INPUT_BATCH_SHUTDOWN_MS, DEFAULT_INPUT_BATCH_SHUTDOWN_MS
+                ),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=1
+                )
+            ),
+            vol.Optional(
+                CONF_WATCHDOG_LAG_MS,
+                default=defaults.get(CONF_WATCHDOG_LAG_MS, DEFAULT_WATCHDOG_LAG_MS),
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=1
+                )
+            ),
+            vol.Optional(
+                CONF_WATCHDOG_LEVEL,
+                default=defaults.get(CONF_WATCHDOG_LEVEL, DEFAULT_WATCHDOG_LEVEL),
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=[
+                        selector.SelectOptionDict(
+                            value=LEVEL_NORMAL, label="None (sensor only)"
+                        ),
+                        *_level_options(),
+                    ],
+                )
+            ),
+        }
+    )
     schema_fields.update(_section_label("Email provider (Brevo)"))
     schema_fields.update(
         {
@@ -1374,13 +1839,28 @@ def _global_schema(
     return vol.Schema(schema_fields)
 
 
-def _rule_schema(defaults: dict[str, Any] | None = None) -> vol.Schema:
+def _rule_schema(
+    defaults: dict[str, Any] | None = None,
+    rule_options: list[selector.SelectOptionDict] | None = None,
+) -> vol.Schema:
     return vol.Schema(
         {
             _required_key(CONF_RULE_NAME, defaults): selector.TextSelector(),
             _required_key(CONF_RULE_DATA_TYPE, defaults): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_data_type_options())
             ),
+            _optional_key(
+                CONF_RULE_PRECONDITION_ENTITIES, defaults
+            ): selector.EntitySelector(
+                selector.EntitySelectorConfig(
+                    domain=PRECONDITION_DOMAINS, multiple=True
+                )
+            ),
+            _optional_key(CONF_RULE_PRECONDITION_RULES, defaults): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=rule_options or [], multiple=True
+                )
+            ),
         }
     )
 
@@ -1402,6 +1882,10 @@ def _rule_notification_schema(
     }
 
 
+def _selectors_selector() -> selector.TextSelector:
+    return selector.TextSelector(selector.TextSelectorConfig(multiline=True))
+
+
 def _numeric_rule_select_schema(
     defaults: dict[str, Any] | None = None,
 ) -> vol.Schema:
@@ -1410,10 +1894,22 @@ def _numeric_rule_select_schema(
     )
     return vol.Schema(
         {
-            _required_key(CONF_RULE_ENTITIES, defaults): entity_selector,
+            _optional_key(CONF_RULE_ENTITIES, defaults): entity_selector,
+            _optional_key(CONF_RULE_SELECTORS, defaults): _selectors_selector(),
+            _required_key(
+                CONF_RULE_GROUP_BY, defaults, fallback=DEFAULT_RULE_GROUP_BY
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_group_by_options())
+            ),
+            _optional_key(CONF_RULE_ATTRIBUTE, defaults): selector.TextSelector(),
             _required_key(CONF_RULE_AGGREGATE, defaults): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_aggregate_options(NUMERIC_AGGREGATES))
             ),
+            _optional_key(CONF_RULE_AGGREGATE_PARAMETER, defaults): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, step=0.001
+                )
+            ),
             _required_key(
                 CONF_RULE_SEVERITY_MODE,
                 defaults,
@@ -1421,6 +1917,30 @@ def _numeric_rule_select_schema(
             ): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_severity_mode_options())
             ),
+            _required_key(
+                CONF_RULE_WINDOW_FUNCTION,
+                defaults,
+                fallback=DEFAULT_RULE_WINDOW_FUNCTION,
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_window_function_options())
+            ),
+            _required_key(
+                CONF_RULE_WINDOW_SECONDS,
+                defaults,
+                fallback=DEFAULT_RULE_WINDOW_SECONDS,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_INPUT_MODE,
+                defaults,
+                fallback=DEFAULT_RULE_INPUT_MODE,
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_input_mode_options())
+            ),
+            _required_key(
+                CONF_RULE_RATE_SMOOTHING,
+                defaults,
+                fallback=DEFAULT_RULE_RATE_SMOOTHING,
+            ): vol.Coerce(int),
         }
     )
 
@@ -1458,6 +1978,11 @@ def _numeric_rule_simple_schema(
                 defaults,
                 fallback=DEFAULT_RULE_INTERVAL,
             ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_MAX_INTERVAL,
+                defaults,
+                fallback=DEFAULT_RULE_MAX_INTERVAL,
+            ): vol.Coerce(int),
             _required_key(
                 CONF_RULE_LEVEL,
                 defaults,
@@ -1470,6 +1995,11 @@ def _numeric_rule_simple_schema(
                 defaults,
                 fallback=DEFAULT_RULE_LATCHED,
             ): selector.BooleanSelector(),
+            _required_key(
+                CONF_RULE_FREEZE_LATCHED,
+                defaults,
+                fallback=DEFAULT_RULE_FREEZE_LATCHED,
+            ): selector.BooleanSelector(),
             _required_key(
                 CONF_RULE_UNKNOWN_HANDLING,
                 defaults,
@@ -1477,6 +2007,30 @@ def _numeric_rule_simple_schema(
             ): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_unknown_options())
             ),
+            _required_key(
+                CONF_RULE_STALE_SECONDS,
+                defaults,
+                fallback=DEFAULT_RULE_STALE_SECONDS,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_HYSTERESIS,
+                defaults,
+                fallback=DEFAULT_RULE_HYSTERESIS,
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=0.001
+                )
+            ),
+            _optional_key(CONF_RULE_CLEAR_THRESHOLD, defaults): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, step=0.001
+                )
+            ),
+            _required_key(
+                CONF_RULE_CLEAR_DURATION,
+                defaults,
+                fallback=DEFAULT_RULE_CLEAR_DURATION,
+            ): vol.Coerce(int),
             **_rule_notification_schema(defaults),
         }
     )
@@ -1490,7 +2044,13 @@ def _binary_rule_select_schema(
     )
     return vol.Schema(
         {
-            _required_key(CONF_RULE_ENTITIES, defaults): entity_selector,
+            _optional_key(CONF_RULE_ENTITIES, defaults): entity_selector,
+            _optional_key(CONF_RULE_SELECTORS, defaults): _selectors_selector(),
+            _required_key(
+                CONF_RULE_GROUP_BY, defaults, fallback=DEFAULT_RULE_GROUP_BY
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_group_by_options())
+            ),
             _required_key(CONF_RULE_AGGREGATE, defaults): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_aggregate_options(BINARY_AGGREGATES))
             ),
@@ -1498,36 +2058,111 @@ def _binary_rule_select_schema(
     )
 
 
-def _binary_rule_state_schema(
+def _composite_rule_select_schema(
     defaults: dict[str, Any] | None = None,
+    rule_options: list[selector.SelectOptionDict] | None = None,
 ) -> vol.Schema:
     return vol.Schema(
         {
-            _required_key(CONF_RULE_CONDITION, defaults): selector.SelectSelector(
-                selector.SelectSelectorConfig(options=_binary_state_condition_options())
+            _required_key(CONF_RULE_SOURCE_RULES, defaults): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=rule_options or [], multiple=True
+                )
+            ),
+            _required_key(CONF_RULE_AGGREGATE, defaults): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_aggregate_options(BINARY_AGGREGATES))
             ),
             _required_key(
-                CONF_RULE_DURATION,
+                CONF_RULE_COINCIDENCE,
                 defaults,
-                fallback=DEFAULT_RULE_DURATION,
+                fallback=DEFAULT_RULE_COINCIDENCE,
             ): vol.Coerce(int),
+        }
+    )
+
+
+def _expression_rule_select_schema(
+    defaults: dict[str, Any] | None = None,
+) -> vol.Schema:
+    entity_selector = selector.EntitySelector(
+        selector.EntitySelectorConfig(multiple=True)
+    )
+    return vol.Schema(
+        {
+            _required_key(CONF_RULE_ENTITIES, defaults): entity_selector,
+            _required_key(CONF_RULE_EXPRESSION, defaults): selector.TextSelector(
+                selector.TextSelectorConfig(multiline=True)
+            ),
             _required_key(
-                CONF_RULE_INTERVAL,
+                CONF_RULE_SEVERITY_MODE,
                 defaults,
-                fallback=DEFAULT_RULE_INTERVAL,
-            ): vol.Coerce(int),
+                fallback=SEVERITY_MODE_SIMPLE,
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_severity_mode_options())
+            ),
             _required_key(
-                CONF_RULE_LEVEL,
+                CONF_RULE_WINDOW_FUNCTION,
                 defaults,
-                fallback=DEFAULT_RULE_LEVEL,
+                fallback=DEFAULT_RULE_WINDOW_FUNCTION,
             ): selector.SelectSelector(
-                selector.SelectSelectorConfig(options=_level_options())
+                selector.SelectSelectorConfig(options=_window_function_options())
+            ),
+            _required_key(
+                CONF_RULE_WINDOW_SECONDS,
+                defaults,
+                fallback=DEFAULT_RULE_WINDOW_SECONDS,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_INPUT_MODE,
+                defaults,
+                fallback=DEFAULT_RULE_INPUT_MODE,
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_input_mode_options())
+            ),
+            _required_key(
+                CONF_RULE_RATE_SMOOTHING,
+                defaults,
+                fallback=DEFAULT_RULE_RATE_SMOOTHING,
+            ): vol.Coerce(int),
+        }
+    )
+
+
+def _binary_rule_state_schema(
+    defaults: dict[str, Any] | None = None,
+) -> vol.Schema:
+    return vol.Schema(
+        {
+            _required_key(CONF_RULE_CONDITION, defaults): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_binary_state_condition_options())
+            ),
+            _required_key(
+                CONF_RULE_DURATION,
+                defaults,
+                fallback=DEFAULT_RULE_DURATION,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_INTERVAL,
+                defaults,
+                fallback=DEFAULT_RULE_INTERVAL,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_LEVEL,
+                defaults,
+                fallback=DEFAULT_RULE_LEVEL,
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_level_options())
             ),
             _required_key(
                 CONF_RULE_LATCHED,
                 defaults,
                 fallback=DEFAULT_RULE_LATCHED,
             ): selector.BooleanSelector(),
+            _required_key(
+                CONF_RULE_FREEZE_LATCHED,
+                defaults,
+                fallback=DEFAULT_RULE_FREEZE_LATCHED,
+            ): selector.BooleanSelector(),
             _required_key(
                 CONF_RULE_UNKNOWN_HANDLING,
                 defaults,
@@ -1535,6 +2170,16 @@ def _binary_rule_state_schema(
             ): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_unknown_options())
             ),
+            _required_key(
+                CONF_RULE_STALE_SECONDS,
+                defaults,
+                fallback=DEFAULT_RULE_STALE_SECONDS,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_CLEAR_DURATION,
+                defaults,
+                fallback=DEFAULT_RULE_CLEAR_DURATION,
+            ): vol.Coerce(int),
             **_rule_notification_schema(defaults),
         }
     )
@@ -1589,6 +2234,11 @@ def _binary_rule_count_simple_schema(
                 defaults,
                 fallback=DEFAULT_RULE_INTERVAL,
             ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_MAX_INTERVAL,
+                defaults,
+                fallback=DEFAULT_RULE_MAX_INTERVAL,
+            ): vol.Coerce(int),
             _required_key(
                 CONF_RULE_LEVEL,
                 defaults,
@@ -1601,6 +2251,11 @@ def _binary_rule_count_simple_schema(
                 defaults,
                 fallback=DEFAULT_RULE_LATCHED,
             ): selector.BooleanSelector(),
+            _required_key(
+                CONF_RULE_FREEZE_LATCHED,
+                defaults,
+                fallback=DEFAULT_RULE_FREEZE_LATCHED,
+            ): selector.BooleanSelector(),
             _required_key(
                 CONF_RULE_UNKNOWN_HANDLING,
                 defaults,
@@ -1608,6 +2263,30 @@ def _binary_rule_count_simple_schema(
             ): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_unknown_options())
             ),
+            _required_key(
+                CONF_RULE_STALE_SECONDS,
+                defaults,
+                fallback=DEFAULT_RULE_STALE_SECONDS,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_HYSTERESIS,
+                defaults,
+                fallback=DEFAULT_RULE_HYSTERESIS,
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=1
+                )
+            ),
+            _optional_key(CONF_RULE_CLEAR_THRESHOLD, defaults): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, step=1
+                )
+            ),
+            _required_key(
+                CONF_RULE_CLEAR_DURATION,
+                defaults,
+                fallback=DEFAULT_RULE_CLEAR_DURATION,
+            ): vol.Coerce(int),
             **_rule_notification_schema(defaults),
         }
     )
@@ -1626,24 +2305,49 @@ def _semafor_rule_schema(
                 selector.NumberSelectorConfig(mode=selector.NumberSelectorMode.BOX, step=step)
             ),
             _optional_key(CONF_RULE_NOTIFY_DURATION, defaults): vol.Coerce(int),
+            _optional_key(
+                CONF_RULE_NOTIFY_CLEAR_THRESHOLD, defaults
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(mode=selector.NumberSelectorMode.BOX, step=step)
+            ),
             _optional_key(CONF_RULE_LIMIT_THRESHOLD, defaults): selector.NumberSelector(
                 selector.NumberSelectorConfig(mode=selector.NumberSelectorMode.BOX, step=step)
             ),
             _optional_key(CONF_RULE_LIMIT_DURATION, defaults): vol.Coerce(int),
+            _optional_key(
+                CONF_RULE_LIMIT_CLEAR_THRESHOLD, defaults
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(mode=selector.NumberSelectorMode.BOX, step=step)
+            ),
             _optional_key(CONF_RULE_SHUTDOWN_THRESHOLD, defaults): selector.NumberSelector(
                 selector.NumberSelectorConfig(mode=selector.NumberSelectorMode.BOX, step=step)
             ),
             _optional_key(CONF_RULE_SHUTDOWN_DURATION, defaults): vol.Coerce(int),
+            _optional_key(
+                CONF_RULE_SHUTDOWN_CLEAR_THRESHOLD, defaults
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(mode=selector.NumberSelectorMode.BOX, step=step)
+            ),
             _required_key(
                 CONF_RULE_INTERVAL,
                 defaults,
                 fallback=DEFAULT_RULE_INTERVAL,
             ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_MAX_INTERVAL,
+                defaults,
+                fallback=DEFAULT_RULE_MAX_INTERVAL,
+            ): vol.Coerce(int),
             _required_key(
                 CONF_RULE_LATCHED,
                 defaults,
                 fallback=DEFAULT_RULE_LATCHED,
             ): selector.BooleanSelector(),
+            _required_key(
+                CONF_RULE_FREEZE_LATCHED,
+                defaults,
+                fallback=DEFAULT_RULE_FREEZE_LATCHED,
+            ): selector.BooleanSelector(),
             _required_key(
                 CONF_RULE_UNKNOWN_HANDLING,
                 defaults,
@@ -1651,6 +2355,25 @@ def _semafor_rule_schema(
             ): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_unknown_options())
             ),
+            _required_key(
+                CONF_RULE_STALE_SECONDS,
+                defaults,
+                fallback=DEFAULT_RULE_STALE_SECONDS,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_HYSTERESIS,
+                defaults,
+                fallback=DEFAULT_RULE_HYSTERESIS,
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    mode=selector.NumberSelectorMode.BOX, min=0, step=step
+                )
+            ),
+            _required_key(
+                CONF_RULE_CLEAR_DURATION,
+                defaults,
+                fallback=DEFAULT_RULE_CLEAR_DURATION,
+            ): vol.Coerce(int),
             **_rule_notification_schema(defaults),
         }
     )
@@ -1662,14 +2385,23 @@ def _text_rule_schema(defaults: dict[str, Any] | None = None) -> vol.Schema:
     )
     return vol.Schema(
         {
-            _required_key(CONF_RULE_ENTITIES, defaults): entity_selector,
+            _optional_key(CONF_RULE_ENTITIES, defaults): entity_selector,
+            _optional_key(CONF_RULE_SELECTORS, defaults): _selectors_selector(),
+            _required_key(
+                CONF_RULE_GROUP_BY, defaults, fallback=DEFAULT_RULE_GROUP_BY
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(options=_group_by_options())
+            ),
             _required_key(CONF_RULE_AGGREGATE, defaults): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_aggregate_options(TEXT_AGGREGATES))
             ),
             _required_key(CONF_RULE_CONDITION, defaults): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_text_condition_options())
             ),
-            _required_key(CONF_RULE_TEXT_MATCH, defaults): selector.TextSelector(),
+            _optional_key(CONF_RULE_TEXT_MATCH, defaults): selector.TextSelector(),
+            _optional_key(CONF_RULE_TEXT_PATTERNS, defaults): selector.TextSelector(
+                selector.TextSelectorConfig(multiline=True)
+            ),
             _required_key(
                 CONF_RULE_DURATION,
                 defaults,
@@ -1692,6 +2424,11 @@ def _text_rule_schema(defaults: dict[str, Any] | None = None) -> vol.Schema:
                 defaults,
                 fallback=DEFAULT_RULE_LATCHED,
             ): selector.BooleanSelector(),
+            _required_key(
+                CONF_RULE_FREEZE_LATCHED,
+                defaults,
+                fallback=DEFAULT_RULE_FREEZE_LATCHED,
+            ): selector.BooleanSelector(),
             _required_key(
                 CONF_RULE_UNKNOWN_HANDLING,
                 defaults,
@@ -1699,6 +2436,16 @@ def _text_rule_schema(defaults: dict[str, Any] | None = None) -> vol.Schema:
             ): selector.SelectSelector(
                 selector.SelectSelectorConfig(options=_unknown_options())
             ),
+            _required_key(
+                CONF_RULE_STALE_SECONDS,
+                defaults,
+                fallback=DEFAULT_RULE_STALE_SECONDS,
+            ): vol.Coerce(int),
+            _required_key(
+                CONF_RULE_CLEAR_DURATION,
+                defaults,
+                fallback=DEFAULT_RULE_CLEAR_DURATION,
+            ): vol.Coerce(int),
             _required_key(
                 CONF_RULE_TEXT_CASE_SENSITIVE,
                 defaults,
@@ -1724,10 +2471,19 @@ def _validate_globals(data: dict[str, Any]) -> dict[str, str]:
         errors[CONF_EMAIL_LEVELS] = "invalid_email_levels"
     elif any(level not in LEVEL_OPTIONS for level in levels):
         errors[CONF_EMAIL_LEVELS] = "invalid_email_levels"
+    watchdog_level = data.get(CONF_WATCHDOG_LEVEL, DEFAULT_WATCHDOG_LEVEL)
+    if watchdog_level != LEVEL_NORMAL and watchdog_level not in LEVEL_OPTIONS:
+        errors[CONF_WATCHDOG_LEVEL] = "invalid_watchdog_level"
 
     for key in (
         CONF_REPORT_RETENTION_MAX_FILES,
         CONF_REPORT_RETENTION_MAX_AGE_DAYS,
+        CONF_EVAL_SLICE_MS,
+        CONF_INPUT_BATCH_MS,
+        CONF_INPUT_BATCH_MAX_LATENCY_MS,
+        CONF_INPUT_BATCH_MAX_CHANGES,
+        CONF_INPUT_BATCH_SHUTDOWN_MS,
+        CONF_WATCHDOG_LAG_MS,
     ):
         raw = data.get(key, 0)
         try:
@@ -1754,6 +2510,7 @@ def _validate_rule_common(data: dict[str, Any]) -> dict[str, str]:
         errors[CONF_RULE_INTERVAL] = "min_1"
     if interval > duration:
         errors[CONF_RULE_INTERVAL] = "interval_gt_duration"
+    errors.update(_validate_max_interval(data, interval))
 
     level = data.get(CONF_RULE_LEVEL)
     if level not in LEVEL_OPTIONS:
@@ -1762,14 +2519,153 @@ def _validate_rule_common(data: dict[str, Any]) -> dict[str, str]:
     unknown_handling = data.get(CONF_RULE_UNKNOWN_HANDLING)
     if unknown_handling not in UNKNOWN_HANDLING_OPTIONS:
         errors[CONF_RULE_UNKNOWN_HANDLING] = "invalid_unknown"
+    errors.update(_validate_stale_seconds(data))
+    errors.update(_validate_clearing(data))
 
     return errors
 
 
+def _validate_stale_seconds(data: dict[str, Any]) -> dict[str, str]:
+    try:
+        stale_seconds = int(data.get(CONF_RULE_STALE_SECONDS, DEFAULT_RULE_STALE_SECONDS))
+    except (TypeError, ValueError):
+        return {CONF_RULE_STALE_SECONDS: "invalid_number"}
+    if stale_seconds < 0:
+        return {CONF_RULE_STALE_SECONDS: "min_0"}
+    return {}
+
+
+def _validate_coincidence(data: dict[str, Any]) -> dict[str, str]:
+    try:
+        coincidence = int(data.get(CONF_RULE_COINCIDENCE, DEFAULT_RULE_COINCIDENCE))
+    except (TypeError, ValueError):
+        return {CONF_RULE_COINCIDENCE: "invalid_number"}
+    if coincidence < 0:
+        return {CONF_RULE_COINCIDENCE: "min_0"}
+    return {}
+
+
+def _validate_max_interval(data: dict[str, Any], interval: int) -> dict[str, str]:
+    try:
+        max_interval = int(data.get(CONF_RULE_MAX_INTERVAL, DEFAULT_RULE_MAX_INTERVAL))
+    except (TypeError, ValueError):
+        return {CONF_RULE_MAX_INTERVAL: "invalid_number"}
+    if max_interval < 0:
+        return {CONF_RULE_MAX_INTERVAL: "min_0"}
+    if max_interval and max_interval < interval:
+        return {CONF_RULE_MAX_INTERVAL: "max_interval_lt_interval"}
+    return {}
+
+
+def _validate_clearing(data: dict[str, Any]) -> dict[str, str]:
+    errors: dict[str, str] = {}
+    try:
+        hysteresis = float(data.get(CONF_RULE_HYSTERESIS, DEFAULT_RULE_HYSTERESIS))
+    except (TypeError, ValueError):
+        errors[CONF_RULE_HYSTERESIS] = "invalid_number"
+    else:
+        if hysteresis < 0:
+            errors[CONF_RULE_HYSTERESIS] = "min_0"
+    try:
+        clear_duration = int(
+            data.get(CONF_RULE_CLEAR_DURATION, DEFAULT_RULE_CLEAR_DURATION)
+        )
+    except (TypeError, ValueError):
+        errors[CONF_RULE_CLEAR_DURATION] = "invalid_number"
+    else:
+        if clear_duration < 0:
+            errors[CONF_RULE_CLEAR_DURATION] = "min_0"
+
+    clear = data.get(CONF_RULE_CLEAR_THRESHOLD)
+    if clear is None:
+        return errors
+    condition = data.get(CONF_RULE_CONDITION)
+    if condition not in (COND_GT, COND_GTE, COND_LT, COND_LTE):
+        errors[CONF_RULE_CLEAR_THRESHOLD] = "clear_threshold_condition"
+        return errors
+    threshold = data.get(CONF_RULE_THRESHOLD)
+    try:
+        clear = float(clear)
+        threshold = float(threshold) if threshold is not None else None
+    except (TypeError, ValueError):
+        errors[CONF_RULE_CLEAR_THRESHOLD] = "invalid_number"
+        return errors
+    if threshold is None:
+        return errors
+    # The clear point has to sit on the safe side of the trip threshold.
+    if condition in (COND_GT, COND_GTE) and clear > threshold:
+        errors[CONF_RULE_CLEAR_THRESHOLD] = "invalid_clear_threshold"
+    if condition in (COND_LT, COND_LTE) and clear < threshold:
+        errors[CONF_RULE_CLEAR_THRESHOLD] = "invalid_clear_threshold"
+    return errors
+
+
 def _validate_entities(data: dict[str, Any]) -> dict[str, str]:
+    """Entities, selectors (one per line) or both; selectors must parse."""
+    selectors = _selector_list(data.get(CONF_RULE_SELECTORS))
+    try:
+        parsed = [parse_selector(text) for text in selectors]
+    except ValueError:
+        return {CONF_RULE_SELECTORS: "invalid_selector"}
     entities = data.get(CONF_RULE_ENTITIES) or []
-    if not entities:
+    if not entities and not selectors:
         return {CONF_RULE_ENTITIES: "entities_required"}
+    group_by = data.get(CONF_RULE_GROUP_BY) or DEFAULT_RULE_GROUP_BY
+    if group_by not in GROUP_BY_OPTIONS or (
+        group_by == GROUP_BY_CAPTURE
+        and not any(item.pattern is not None for item in parsed)
+    ):
+        # Grouping by capture needs a glob selector to capture from.
+        return {CONF_RULE_GROUP_BY: "invalid_group_by"}
+    return {}
+
+
+def _selector_list(value: Any) -> list[str]:
+    if isinstance(value, str):
+        value = value.splitlines()
+    return [" ".join(str(text).split()) for text in value or [] if str(text).strip()]
+
+
+def _store_members(context: dict[str, Any], user_input: dict[str, Any]) -> None:
+    context.pop(CONF_RULE_SELECTORS, None)
+    selectors = _selector_list(user_input.get(CONF_RULE_SELECTORS))
+    if selectors:
+        context[CONF_RULE_SELECTORS] = "\n".join(selectors)
+    context[CONF_RULE_GROUP_BY] = user_input.get(
+        CONF_RULE_GROUP_BY, DEFAULT_RULE_GROUP_BY
+    )
+
+
+def _text_pattern_list(value: Any, trim: bool) -> list[str]:
+    """Non-blank patterns, one per line; ``/.../`` marks a regex."""
+    if isinstance(value, str):
+        value = value.splitlines()
+    patterns = [str(item).strip() if trim else str(item) for item in value or []]
+    return [pattern for pattern in patterns if pattern.strip()]
+
+
+def _validate_text_patterns(patterns: list[str], data: dict[str, Any]) -> dict[str, str]:
+    try:
+        compile_needles(
+            tuple(patterns),
+            data.get(CONF_RULE_CONDITION) == COND_EQUALS,
+            bool(data.get(CONF_RULE_TEXT_CASE_SENSITIVE, DEFAULT_TEXT_CASE_SENSITIVE)),
+            bool(data.get(CONF_RULE_TEXT_TRIM, DEFAULT_TEXT_TRIM)),
+        )
+    except ValueError:
+        return {CONF_RULE_TEXT_PATTERNS: "invalid_text_pattern"}
+    return {}
+
+
+def _validate_expression(data: dict[str, Any]) -> dict[str, str]:
+    """Compile the expression against the names of the selected entities."""
+    try:
+        compile_expression(
+            str(data.get(CONF_RULE_EXPRESSION) or ""),
+            frozenset(input_names(data.get(CONF_RULE_ENTITIES) or [])),
+        )
+    except ExpressionError:
+        return {CONF_RULE_EXPRESSION: "invalid_expression"}
     return {}
 
 
@@ -1778,7 +2674,8 @@ def _validate_numeric_rule(data: dict[str, Any]) -> dict[str, str]:
     if data.get(CONF_RULE_SEVERITY_MODE) == SEVERITY_MODE_SEMAFOR:
         return errors
     aggregate = data.get(CONF_RULE_AGGREGATE)
-    if aggregate not in NUMERIC_AGGREGATES:
+    expression = data.get(CONF_RULE_DATA_TYPE) == DATA_TYPE_EXPRESSION
+    if not expression and aggregate not in NUMERIC_AGGREGATES:
         errors[CONF_RULE_AGGREGATE] = "invalid_aggregate"
     condition = data.get(CONF_RULE_CONDITION)
     if condition not in NUMERIC_CONDITIONS:
@@ -1787,6 +2684,65 @@ def _validate_numeric_rule(data: dict[str, Any]) -> dict[str, str]:
     return errors
 
 
+def _validate_window(data: dict[str, Any]) -> dict[str, str]:
+    errors: dict[str, str] = {}
+    function = data.get(CONF_RULE_WINDOW_FUNCTION, DEFAULT_RULE_WINDOW_FUNCTION)
+    if function not in WINDOW_FUNCTIONS:
+        errors[CONF_RULE_WINDOW_FUNCTION] = "invalid_window_function"
+    try:
+        seconds = int(data.get(CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS))
+    except (TypeError, ValueError):
+        errors[CONF_RULE_WINDOW_SECONDS] = "invalid_number"
+    else:
+        if seconds < 1:
+            errors[CONF_RULE_WINDOW_SECONDS] = "min_1"
+    return errors
+
+
+def _validate_aggregate_parameter(data: dict[str, Any]) -> dict[str, str]:
+    errors: dict[str, str] = {}
+    aggregate = data.get(CONF_RULE_AGGREGATE)
+    parameter = data.get(CONF_RULE_AGGREGATE_PARAMETER)
+    if aggregate not in PARAMETRIC_AGGREGATES:
+        return errors
+    if parameter is None or parameter == "":
+        errors[CONF_RULE_AGGREGATE_PARAMETER] = "aggregate_parameter_required"
+        return errors
+    try:
+        parameter = float(parameter)
+    except (TypeError, ValueError):
+        errors[CONF_RULE_AGGREGATE_PARAMETER] = "invalid_number"
+        return errors
+    if aggregate == AGGREGATE_PERCENTILE and not 0 < parameter <= 100:
+        errors[CONF_RULE_AGGREGATE_PARAMETER] = "invalid_percentile"
+    return errors
+
+
+def _validate_attribute(data: dict[str, Any]) -> dict[str, str]:
+    attribute = _normalize_optional_str(data.get(CONF_RULE_ATTRIBUTE))
+    if attribute is None:
+        return {}
+    try:
+        parse_path(attribute)
+    except ValueError:
+        return {CONF_RULE_ATTRIBUTE: "invalid_attribute"}
+    return {}
+
+
+def _validate_rate(data: dict[str, Any]) -> dict[str, str]:
+    errors: dict[str, str] = {}
+    if data.get(CONF_RULE_INPUT_MODE, DEFAULT_RULE_INPUT_MODE) not in INPUT_MODES:
+        errors[CONF_RULE_INPUT_MODE] = "invalid_input_mode"
+    try:
+        smoothing = int(data.get(CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING))
+    except (TypeError, ValueError):
+        errors[CONF_RULE_RATE_SMOOTHING] = "invalid_number"
+    else:
+        if smoothing < 0:
+            errors[CONF_RULE_RATE_SMOOTHING] = "min_0"
+    return errors
+
+
 def _validate_numeric_thresholds(data: dict[str, Any]) -> dict[str, str]:
     errors: dict[str, str] = {}
     if data.get(CONF_RULE_SEVERITY_MODE) == SEVERITY_MODE_SEMAFOR:
@@ -1820,7 +2776,11 @@ def _validate_numeric_thresholds(data: dict[str, Any]) -> dict[str, str]:
     return errors
 
 
-def _validate_semafor_rule(data: dict[str, Any], numeric: bool) -> dict[str, str]:
+def _validate_semafor_rule(
+    data: dict[str, Any],
+    numeric: bool,
+    custom: dict[str, dict[str, Any]] | None = None,
+) -> dict[str, str]:
     errors: dict[str, str] = {}
     direction = data.get(CONF_RULE_DIRECTION)
     if direction not in DIRECTION_OPTIONS:
@@ -1835,10 +2795,13 @@ def _validate_semafor_rule(data: dict[str, Any], numeric: bool) -> dict[str, str
     else:
         if interval < 1:
             errors[CONF_RULE_INTERVAL] = "min_1"
+        errors.update(_validate_max_interval(data, interval))
 
     unknown_handling = data.get(CONF_RULE_UNKNOWN_HANDLING)
     if unknown_handling not in UNKNOWN_HANDLING_OPTIONS:
         errors[CONF_RULE_UNKNOWN_HANDLING] = "invalid_unknown"
+    errors.update(_validate_stale_seconds(data))
+    errors.update(_validate_clearing(data))
 
     for level in LEVEL_ORDER:
         threshold_key = _threshold_key(level)
@@ -1866,11 +2829,14 @@ def _validate_semafor_rule(data: dict[str, Any], numeric: bool) -> dict[str, str
         if interval is not None and duration is not None and interval > duration:
             errors[CONF_RULE_INTERVAL] = "interval_gt_duration"
 
-    thresholds = [cfg["threshold"] for cfg in levels.values()]
-    if direction == "higher_is_worse" and thresholds != sorted(thresholds):
-        errors["base"] = "semafor_order"
-    if direction == "lower_is_worse" and thresholds != sorted(thresholds, reverse=True):
+    # Custom levels of an imported rule are kept and must still fit in.
+    if direction in DIRECTION_OPTIONS and not _levels_in_order(
+        direction, {**levels, **(custom or {})}
+    ):
         errors["base"] = "semafor_order"
+    for level, cfg in levels.items():
+        if not _clear_threshold_in_order(direction, cfg):
+            errors[_clear_threshold_key(level)] = "invalid_clear_threshold"
     return errors
 
 
@@ -1891,6 +2857,12 @@ def _extract_semafor_levels(data: dict[str, Any], numeric: bool) -> dict[str, di
             "threshold": value,
             "duration_seconds": int(duration) if duration is not None else None,
         }
+        clear = data.get(_clear_threshold_key(level))
+        if clear is not None:
+            try:
+                levels[level]["clear_threshold"] = float(clear) if numeric else int(clear)
+            except (TypeError, ValueError):
+                continue
     return levels
 
 
@@ -1910,6 +2882,23 @@ def _duration_key(level: str) -> str:
     return CONF_RULE_SHUTDOWN_DURATION
 
 
+def _clear_threshold_key(level: str) -> str:
+    if level == "notify":
+        return CONF_RULE_NOTIFY_CLEAR_THRESHOLD
+    if level == "limit":
+        return CONF_RULE_LIMIT_CLEAR_THRESHOLD
+    return CONF_RULE_SHUTDOWN_CLEAR_THRESHOLD
+
+
+def _clear_threshold_in_order(direction: str | None, cfg: dict[str, Any]) -> bool:
+    clear = cfg.get("clear_threshold")
+    if clear is None:
+        return True
+    if direction == DIRECTION_LOWER_IS_WORSE:
+        return clear >= cfg["threshold"]
+    return clear <= cfg["threshold"]
+
+
 def _extract_thresholds(data: dict[str, Any]) -> list[float]:
     condition = data.get(CONF_RULE_CONDITION)
     if condition == COND_BETWEEN:
@@ -1966,14 +2955,89 @@ def _build_rule_config(
             merged.get(CONF_RULE_NOTIFY_MOBILE, DEFAULT_RULE_NOTIFY_MOBILE)
         ),
     }
+    stale_seconds = int(merged.get(CONF_RULE_STALE_SECONDS, DEFAULT_RULE_STALE_SECONDS))
+    composite = rule[CONF_RULE_DATA_TYPE] == DATA_TYPE_COMPOSITE
+    if composite:
+        # Source rules are read from memory; there is nothing to go stale.
+        rule[CONF_RULE_ENTITIES] = []
+        rule[CONF_RULE_SOURCE_RULES] = list(merged.get(CONF_RULE_SOURCE_RULES) or [])
+        coincidence = int(merged.get(CONF_RULE_COINCIDENCE, DEFAULT_RULE_COINCIDENCE))
+        if coincidence:
+            rule[CONF_RULE_COINCIDENCE] = coincidence
+    elif stale_seconds:
+        rule[CONF_RULE_STALE_SECONDS] = stale_seconds
+    clear_duration = int(
+        merged.get(CONF_RULE_CLEAR_DURATION, DEFAULT_RULE_CLEAR_DURATION)
+    )
+    if clear_duration:
+        rule[CONF_RULE_CLEAR_DURATION] = clear_duration
+    for key in (CONF_RULE_PRECONDITION_ENTITIES, CONF_RULE_PRECONDITION_RULES):
+        if merged.get(key):
+            rule[key] = list(merged[key])
+    if rule[CONF_RULE_LATCHED] and merged.get(CONF_RULE_FREEZE_LATCHED):
+        rule[CONF_RULE_FREEZE_LATCHED] = True
+    if (
+        rule[CONF_RULE_DATA_TYPE] in NUMERIC_DATA_TYPES
+        or rule[CONF_RULE_AGGREGATE] == AGGREGATE_COUNT
+    ):
+        hysteresis = float(merged.get(CONF_RULE_HYSTERESIS, DEFAULT_RULE_HYSTERESIS))
+        if hysteresis:
+            rule[CONF_RULE_HYSTERESIS] = hysteresis
+        max_interval = int(merged.get(CONF_RULE_MAX_INTERVAL, DEFAULT_RULE_MAX_INTERVAL))
+        if max_interval and not composite:
+            rule[CONF_RULE_MAX_INTERVAL] = max_interval
+        if (
+            rule[CONF_RULE_SEVERITY_MODE] != SEVERITY_MODE_SEMAFOR
+            and merged.get(CONF_RULE_CLEAR_THRESHOLD) is not None
+        ):
+            rule[CONF_RULE_CLEAR_THRESHOLD] = float(merged[CONF_RULE_CLEAR_THRESHOLD])
+    if rule[CONF_RULE_DATA_TYPE] == DATA_TYPE_EXPRESSION:
+        rule[CONF_RULE_EXPRESSION] = str(merged.get(CONF_RULE_EXPRESSION) or "")
+    elif rule[CONF_RULE_DATA_TYPE] == DATA_TYPE_NUMERIC and merged.get(CONF_RULE_ATTRIBUTE):
+        rule[CONF_RULE_ATTRIBUTE] = merged[CONF_RULE_ATTRIBUTE]
+    if rule[CONF_RULE_DATA_TYPE] not in (DATA_TYPE_COMPOSITE, DATA_TYPE_EXPRESSION):
+        selectors = _selector_list(merged.get(CONF_RULE_SELECTORS))
+        if selectors:
+            rule[CONF_RULE_SELECTORS] = selectors
+        group_by = merged.get(CONF_RULE_GROUP_BY, DEFAULT_RULE_GROUP_BY)
+        if group_by != DEFAULT_RULE_GROUP_BY:
+            rule[CONF_RULE_GROUP_BY] = group_by
+    if rule[CONF_RULE_DATA_TYPE] in NUMERIC_DATA_TYPES:
+        if rule[CONF_RULE_AGGREGATE] in PARAMETRIC_AGGREGATES:
+            rule[CONF_RULE_AGGREGATE_PARAMETER] = float(
+                merged[CONF_RULE_AGGREGATE_PARAMETER]
+            )
+        window_function = merged.get(
+            CONF_RULE_WINDOW_FUNCTION, DEFAULT_RULE_WINDOW_FUNCTION
+        )
+        if window_function != WINDOW_NONE:
+            rule[CONF_RULE_WINDOW_FUNCTION] = window_function
+            rule[CONF_RULE_WINDOW_SECONDS] = int(
+                merged.get(CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS)
+            )
+        input_mode = merged.get(CONF_RULE_INPUT_MODE, DEFAULT_RULE_INPUT_MODE)
+        if input_mode != INPUT_MODE_VALUE:
+            rule[CONF_RULE_INPUT_MODE] = input_mode
+            rule[CONF_RULE_RATE_SMOOTHING] = int(
+                merged.get(CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING)
+            )
     if rule[CONF_RULE_SEVERITY_MODE] == SEVERITY_MODE_SEMAFOR:
-        numeric = rule.get(CONF_RULE_DATA_TYPE) == DATA_TYPE_NUMERIC
-        rule[CONF_RULE_LEVELS] = _extract_semafor_levels(merged, numeric)
+        numeric = rule.get(CONF_RULE_DATA_TYPE) in NUMERIC_DATA_TYPES
+        rule[CONF_RULE_LEVELS] = {
+            **_extract_semafor_levels(merged, numeric),
+            **_custom_levels(merged),
+        }
     else:
         if CONF_RULE_THRESHOLDS in merged:
             rule[CONF_RULE_THRESHOLDS] = list(merged[CONF_RULE_THRESHOLDS])
-        elif merged.get(CONF_RULE_TEXT_MATCH) is not None:
-            rule[CONF_RULE_THRESHOLDS] = [merged[CONF_RULE_TEXT_MATCH]]
+        elif rule[CONF_RULE_DATA_TYPE] == DATA_TYPE_TEXT:
+            match = merged.get(CONF_RULE_TEXT_MATCH)
+            rule[CONF_RULE_THRESHOLDS] = [match] if match is not None else []
+            patterns = _text_pattern_list(
+                merged.get(CONF_RULE_TEXT_PATTERNS), rule[CONF_RULE_TEXT_TRIM]
+            )
+            if patterns:
+                rule[CONF_RULE_TEXT_PATTERNS] = patterns
         else:
             rule[CONF_RULE_THRESHOLDS] = _extract_thresholds(merged)
     return rule
@@ -2245,9 +3309,38 @@ def _normalize_import_rules(
             return None, "import_duplicate_rule_id"
         seen.add(rule_id)
         normalized.append(rule)
+    for rule in normalized:
+        if not set(_rule_dependencies(rule)) <= seen:
+            return None, "import_invalid_rule"
+    if _has_rule_cycle(normalized, None, []):
+        return None, "import_invalid_rule"
     return normalized, None
 
 
+def _rule_dependencies(rule: dict[str, Any]) -> list[str]:
+    """Precondition and source rule ids of a stored rule."""
+    return [
+        *(rule.get(CONF_RULE_PRECONDITION_RULES) or []),
+        *(rule.get(CONF_RULE_SOURCE_RULES) or []),
+    ]
+
+
+def _has_rule_cycle(
+    rules: list[dict[str, Any]], rule_id: str | None, depends_on: list[str]
+) -> bool:
+    """Whether ``rules`` plus ``rule_id`` depending on ``depends_on`` loop."""
+    dependencies = {
+        str(rule.get(CONF_RULE_ID)): set(_rule_dependencies(rule)) for rule in rules
+    }
+    if rule_id is not None:
+        dependencies[rule_id] = set(depends_on)
+    try:
+        topological_order(dependencies)
+    except CycleError:
+        return True
+    return False
+
+
 def _normalize_import_rule(raw: Any) -> tuple[dict[str, Any] | None, str | None]:
     if not isinstance(raw, dict):
         return None, "import_invalid_rules"
@@ -2259,7 +3352,31 @@ def _normalize_import_rule(raw: Any) -> tuple[dict[str, Any] | None, str | None]
     if data_type not in DATA_TYPE_OPTIONS:
         return None, "import_invalid_rule"
     entities = list(raw.get(CONF_RULE_ENTITIES, []))
-    if not entities:
+    selectors = raw.get(CONF_RULE_SELECTORS) or []
+    group_by = raw.get(CONF_RULE_GROUP_BY) or DEFAULT_RULE_GROUP_BY
+    if not isinstance(selectors, list) or _validate_entities(
+        {
+            CONF_RULE_ENTITIES: entities,
+            CONF_RULE_SELECTORS: selectors,
+            CONF_RULE_GROUP_BY: group_by,
+        }
+    ):
+        selectors = None
+    else:
+        selectors = _selector_list(selectors)
+    source_rules = raw.get(CONF_RULE_SOURCE_RULES) or []
+    coincidence = raw.get(CONF_RULE_COINCIDENCE, DEFAULT_RULE_COINCIDENCE)
+    if data_type == DATA_TYPE_COMPOSITE:
+        if not isinstance(source_rules, list) or not source_rules:
+            return None, "import_invalid_rule"
+        if rule_id in source_rules or _validate_coincidence(
+            {CONF_RULE_COINCIDENCE: coincidence}
+        ):
+            return None, "import_invalid_rule"
+        entities = []
+    elif selectors is None:
+        return None, "import_invalid_rule"
+    elif data_type == DATA_TYPE_EXPRESSION and not entities:
         return None, "import_invalid_rule"
     aggregate = raw.get(CONF_RULE_AGGREGATE)
     severity_mode = raw.get(CONF_RULE_SEVERITY_MODE, SEVERITY_MODE_SIMPLE)
@@ -2273,6 +3390,9 @@ def _normalize_import_rule(raw: Any) -> tuple[dict[str, Any] | None, str | None]
         return None, "import_invalid_rule"
     if duration < 1 or interval < 1:
         return None, "import_invalid_rule"
+    max_interval = raw.get(CONF_RULE_MAX_INTERVAL, DEFAULT_RULE_MAX_INTERVAL)
+    if _validate_max_interval({CONF_RULE_MAX_INTERVAL: max_interval}, interval):
+        return None, "import_invalid_rule"
     if severity_mode == SEVERITY_MODE_SIMPLE and interval > duration:
         return None, "import_invalid_rule"
 
@@ -2283,21 +3403,92 @@ def _normalize_import_rule(raw: Any) -> tuple[dict[str, Any] | None, str | None]
     if unknown_handling not in UNKNOWN_HANDLING_OPTIONS:
         return None, "import_invalid_rule"
     latched = bool(raw.get(CONF_RULE_LATCHED, DEFAULT_RULE_LATCHED))
+    freeze_latched = latched and bool(
+        raw.get(CONF_RULE_FREEZE_LATCHED, DEFAULT_RULE_FREEZE_LATCHED)
+    )
     text_case_sensitive = bool(
         raw.get(CONF_RULE_TEXT_CASE_SENSITIVE, DEFAULT_TEXT_CASE_SENSITIVE)
     )
     text_trim = bool(raw.get(CONF_RULE_TEXT_TRIM, DEFAULT_TEXT_TRIM))
     notify_email = bool(raw.get(CONF_RULE_NOTIFY_EMAIL, DEFAULT_RULE_NOTIFY_EMAIL))
     notify_mobile = bool(raw.get(CONF_RULE_NOTIFY_MOBILE, DEFAULT_RULE_NOTIFY_MOBILE))
+    precondition_entities = raw.get(CONF_RULE_PRECONDITION_ENTITIES) or []
+    precondition_rules = raw.get(CONF_RULE_PRECONDITION_RULES) or []
+    if not isinstance(precondition_entities, list) or not isinstance(
+        precondition_rules, list
+    ):
+        return None, "import_invalid_rule"
+    if rule_id in precondition_rules:
+        return None, "import_invalid_rule"
+    stale_seconds = raw.get(CONF_RULE_STALE_SECONDS, DEFAULT_RULE_STALE_SECONDS)
+    if _validate_stale_seconds({CONF_RULE_STALE_SECONDS: stale_seconds}):
+        return None, "import_invalid_rule"
 
     condition = raw.get(CONF_RULE_CONDITION)
     thresholds = list(raw.get(CONF_RULE_THRESHOLDS, []))
+    hysteresis = raw.get(CONF_RULE_HYSTERESIS, DEFAULT_RULE_HYSTERESIS)
+    clear_threshold = raw.get(CONF_RULE_CLEAR_THRESHOLD)
+    clear_duration = raw.get(CONF_RULE_CLEAR_DURATION, DEFAULT_RULE_CLEAR_DURATION)
+    clearing = {
+        CONF_RULE_HYSTERESIS: hysteresis,
+        CONF_RULE_CLEAR_DURATION: clear_duration,
+        CONF_RULE_CLEAR_THRESHOLD: clear_threshold,
+        CONF_RULE_CONDITION: condition,
+    }
+    if thresholds:
+        clearing[CONF_RULE_THRESHOLD] = thresholds[0]
+    if _validate_clearing(clearing):
+        return None, "import_invalid_rule"
     direction = raw.get(CONF_RULE_DIRECTION)
     levels: dict[str, dict[str, Any]] = {}
 
-    if data_type == DATA_TYPE_NUMERIC:
+    window_function = raw.get(CONF_RULE_WINDOW_FUNCTION) or WINDOW_NONE
+    window_seconds = raw.get(CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS)
+    input_mode = raw.get(CONF_RULE_INPUT_MODE) or INPUT_MODE_VALUE
+    rate_smoothing = raw.get(CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING)
+    aggregate_parameter = None
+    expression = raw.get(CONF_RULE_EXPRESSION)
+    attribute = _normalize_optional_str(raw.get(CONF_RULE_ATTRIBUTE))
+
+    if data_type == DATA_TYPE_EXPRESSION:
+        if _validate_expression(
+            {CONF_RULE_EXPRESSION: expression, CONF_RULE_ENTITIES: entities}
+        ):
+            return None, "import_invalid_rule"
+        aggregate = None
+    elif data_type == DATA_TYPE_NUMERIC:
+        try:
+            aggregate, aggregate_parameter = normalize_aggregate(
+                aggregate, raw.get(CONF_RULE_AGGREGATE_PARAMETER)
+            )
+        except (TypeError, ValueError):
+            return None, "import_invalid_rule"
         if aggregate not in NUMERIC_AGGREGATES:
             return None, "import_invalid_rule"
+        if _validate_attribute({CONF_RULE_ATTRIBUTE: attribute}):
+            return None, "import_invalid_rule"
+        if _validate_aggregate_parameter(
+            {
+                CONF_RULE_AGGREGATE: aggregate,
+                CONF_RULE_AGGREGATE_PARAMETER: aggregate_parameter,
+            }
+        ):
+            return None, "import_invalid_rule"
+    if data_type in NUMERIC_DATA_TYPES:
+        if _validate_window(
+            {
+                CONF_RULE_WINDOW_FUNCTION: window_function,
+                CONF_RULE_WINDOW_SECONDS: window_seconds,
+            }
+        ):
+            return None, "import_invalid_rule"
+        if _validate_rate(
+            {
+                CONF_RULE_INPUT_MODE: input_mode,
+                CONF_RULE_RATE_SMOOTHING: rate_smoothing,
+            }
+        ):
+            return None, "import_invalid_rule"
         if severity_mode == SEVERITY_MODE_SIMPLE:
             if condition not in NUMERIC_CONDITIONS:
                 return None, "import_invalid_rule"
@@ -2316,7 +3507,7 @@ def _normalize_import_rule(raw: Any) -> tuple[dict[str, Any] | None, str | None]
                 return None, "import_invalid_rule"
             if not _validate_semafor_order(direction, levels):
                 return None, "import_invalid_rule"
-    elif data_type == DATA_TYPE_BINARY:
+    elif data_type in (DATA_TYPE_BINARY, DATA_TYPE_COMPOSITE):
         if aggregate not in BINARY_AGGREGATES:
             return None, "import_invalid_rule"
         if aggregate == AGGREGATE_COUNT:
@@ -2353,14 +3544,18 @@ def _normalize_import_rule(raw: Any) -> tuple[dict[str, Any] | None, str | None]
             return None, "import_invalid_rule"
         if condition not in TEXT_CONDITIONS:
             return None, "import_invalid_rule"
-        if not thresholds:
+        patterns = raw.get(CONF_RULE_TEXT_PATTERNS) or []
+        if not isinstance(patterns, list):
             return None, "import_invalid_rule"
-        match_value = str(thresholds[0])
+        patterns = _text_pattern_list(patterns, text_trim)
+        match_value = str(thresholds[0]) if thresholds else ""
         if text_trim:
             match_value = match_value.strip()
-        if not match_value:
+        if not match_value and not patterns:
+            return None, "import_invalid_rule"
+        if _validate_text_patterns(patterns, raw):
             return None, "import_invalid_rule"
-        thresholds = [match_value]
+        thresholds = [match_value] if match_value else []
 
     rule = {
         CONF_RULE_ID: rule_id,
@@ -2381,6 +3576,46 @@ def _normalize_import_rule(raw: Any) -> tuple[dict[str, Any] | None, str | None]
         CONF_RULE_NOTIFY_EMAIL: notify_email,
         CONF_RULE_NOTIFY_MOBILE: notify_mobile,
     }
+    if data_type == DATA_TYPE_COMPOSITE:
+        rule[CONF_RULE_SOURCE_RULES] = [str(item) for item in source_rules]
+        if int(coincidence):
+            rule[CONF_RULE_COINCIDENCE] = int(coincidence)
+    elif int(stale_seconds):
+        rule[CONF_RULE_STALE_SECONDS] = int(stale_seconds)
+    if int(clear_duration):
+        rule[CONF_RULE_CLEAR_DURATION] = int(clear_duration)
+    if freeze_latched:
+        rule[CONF_RULE_FREEZE_LATCHED] = True
+    if precondition_entities:
+        rule[CONF_RULE_PRECONDITION_ENTITIES] = [str(item) for item in precondition_entities]
+    if precondition_rules:
+        rule[CONF_RULE_PRECONDITION_RULES] = [str(item) for item in precondition_rules]
+    if data_type in NUMERIC_DATA_TYPES or aggregate == AGGREGATE_COUNT:
+        if float(hysteresis):
+            rule[CONF_RULE_HYSTERESIS] = float(hysteresis)
+        if int(max_interval) and data_type != DATA_TYPE_COMPOSITE:
+            rule[CONF_RULE_MAX_INTERVAL] = int(max_interval)
+        if severity_mode == SEVERITY_MODE_SIMPLE and clear_threshold is not None:
+            rule[CONF_RULE_CLEAR_THRESHOLD] = float(clear_threshold)
+    if data_type == DATA_TYPE_EXPRESSION:
+        rule[CONF_RULE_EXPRESSION] = str(expression).strip()
+    if data_type == DATA_TYPE_NUMERIC and attribute:
+        rule[CONF_RULE_ATTRIBUTE] = attribute
+    if data_type == DATA_TYPE_TEXT and patterns:
+        rule[CONF_RULE_TEXT_PATTERNS] = patterns
+    if data_type not in (DATA_TYPE_COMPOSITE, DATA_TYPE_EXPRESSION):
+        if selectors:
+            rule[CONF_RULE_SELECTORS] = selectors
+        if group_by != DEFAULT_RULE_GROUP_BY:
+            rule[CONF_RULE_GROUP_BY] = group_by
+    if data_type == DATA_TYPE_NUMERIC and aggregate in PARAMETRIC_AGGREGATES:
+        rule[CONF_RULE_AGGREGATE_PARAMETER] = aggregate_parameter
+    if data_type in NUMERIC_DATA_TYPES and window_function != WINDOW_NONE:
+        rule[CONF_RULE_WINDOW_FUNCTION] = window_function
+        rule[CONF_RULE_WINDOW_SECONDS] = int(window_seconds)
+    if data_type in NUMERIC_DATA_TYPES and input_mode != INPUT_MODE_VALUE:
+        rule[CONF_RULE_INPUT_MODE] = input_mode
+        rule[CONF_RULE_RATE_SMOOTHING] = int(rate_smoothing)
     if severity_mode == SEVERITY_MODE_SEMAFOR:
         rule[CONF_RULE_LEVELS] = levels
     else:
@@ -2423,10 +3658,12 @@ def _normalize_semafor_levels(
     if not isinstance(raw_levels, dict):
         return {}, "invalid"
     levels: dict[str, dict[str, Any]] = {}
-    for level in LEVEL_ORDER:
-        cfg = raw_levels.get(level)
+    for level, cfg in raw_levels.items():
         if not isinstance(cfg, dict):
             continue
+        stop_level = stop_level_of(level, cfg)
+        if stop_level is None:
+            return {}, "invalid"
         threshold = cfg.get("threshold")
         duration = cfg.get("duration_seconds")
         if threshold is None or duration is None:
@@ -2443,20 +3680,63 @@ def _normalize_semafor_levels(
         if interval > dur_val:
             return {}, "invalid"
         levels[level] = {"threshold": value, "duration_seconds": dur_val}
+        if stop_level != level:
+            levels[level]["stop_level"] = stop_level
+        clear = cfg.get("clear_threshold")
+        if clear is not None:
+            try:
+                clear = float(clear)
+            except (TypeError, ValueError):
+                return {}, "invalid"
+            levels[level]["clear_threshold"] = clear if numeric else int(clear)
     if not levels:
         return {}, "invalid"
     return levels, None
 
 
 def _validate_semafor_order(direction: str, levels: dict[str, dict[str, Any]]) -> bool:
-    thresholds = [cfg["threshold"] for cfg in levels.values()]
-    if not thresholds:
+    if not levels or direction not in DIRECTION_OPTIONS:
         return False
-    if direction == DIRECTION_HIGHER_IS_WORSE:
-        return thresholds == sorted(thresholds)
-    if direction == DIRECTION_LOWER_IS_WORSE:
-        return thresholds == sorted(thresholds, reverse=True)
-    return False
+    if not all(_clear_threshold_in_order(direction, cfg) for cfg in levels.values()):
+        return False
+    return _levels_in_order(direction, levels)
+
+
+def _levels_in_order(direction: str, levels: dict[str, dict[str, Any]]) -> bool:
+    # Ordered by threshold, the levels must not lower the stop level they raise.
+    ladder = build_ladder(levels, direction == DIRECTION_LOWER_IS_WORSE)
+    ranks = [
+        LEVEL_ORDER.index(levels[level].get("stop_level", level))
+        for level in ladder.levels
+    ]
+    return ranks == sorted(ranks)
+
+
+def _custom_levels(data: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Levels beyond notify / limit / shutdown; set by import, kept by the UI."""
+    return {
+        level: cfg
+        for level, cfg in (data.get(CONF_RULE_LEVELS) or {}).items()
+        if level not in LEVEL_ORDER
+    }
+
+
+# Optional final-step fields; clearing one in the form must drop the value
+# seeded from the edited rule instead of keeping it.
+_CLEARABLE_KEYS = (
+    CONF_RULE_CLEAR_THRESHOLD,
+    CONF_RULE_NOTIFY_CLEAR_THRESHOLD,
+    CONF_RULE_LIMIT_CLEAR_THRESHOLD,
+    CONF_RULE_SHUTDOWN_CLEAR_THRESHOLD,
+)
+
+
+def _merge_rule_input(
+    context: dict[str, Any], user_input: dict[str, Any]
+) -> dict[str, Any]:
+    merged = {key: value for key, value in context.items() if key not in _CLEARABLE_KEYS}
+    merged.update(user_input)
+    return merged
 
 
 def _rules_excluding_index(
@@ -2485,8 +3765,14 @@ def _seed_rule_context(rule: dict[str, Any]) -> dict[str, Any]:
         CONF_RULE_AGGREGATE: rule.get(CONF_RULE_AGGREGATE),
         CONF_RULE_DURATION: rule.get(CONF_RULE_DURATION, DEFAULT_RULE_DURATION),
         CONF_RULE_INTERVAL: rule.get(CONF_RULE_INTERVAL, DEFAULT_RULE_INTERVAL),
+        CONF_RULE_MAX_INTERVAL: rule.get(
+            CONF_RULE_MAX_INTERVAL, DEFAULT_RULE_MAX_INTERVAL
+        ),
         CONF_RULE_LEVEL: rule.get(CONF_RULE_LEVEL, DEFAULT_RULE_LEVEL),
         CONF_RULE_LATCHED: rule.get(CONF_RULE_LATCHED, DEFAULT_RULE_LATCHED),
+        CONF_RULE_FREEZE_LATCHED: rule.get(
+            CONF_RULE_FREEZE_LATCHED, DEFAULT_RULE_FREEZE_LATCHED
+        ),
         CONF_RULE_UNKNOWN_HANDLING: rule.get(
             CONF_RULE_UNKNOWN_HANDLING, DEFAULT_RULE_UNKNOWN_HANDLING
         ),
@@ -2497,7 +3783,41 @@ def _seed_rule_context(rule: dict[str, Any]) -> dict[str, Any]:
             CONF_RULE_TEXT_CASE_SENSITIVE, DEFAULT_TEXT_CASE_SENSITIVE
         ),
         CONF_RULE_TEXT_TRIM: rule.get(CONF_RULE_TEXT_TRIM, DEFAULT_TEXT_TRIM),
+        CONF_RULE_WINDOW_FUNCTION: rule.get(
+            CONF_RULE_WINDOW_FUNCTION, DEFAULT_RULE_WINDOW_FUNCTION
+        ),
+        CONF_RULE_WINDOW_SECONDS: rule.get(
+            CONF_RULE_WINDOW_SECONDS, DEFAULT_RULE_WINDOW_SECONDS
+        ),
+        CONF_RULE_INPUT_MODE: rule.get(CONF_RULE_INPUT_MODE, DEFAULT_RULE_INPUT_MODE),
+        CONF_RULE_STALE_SECONDS: rule.get(
+            CONF_RULE_STALE_SECONDS, DEFAULT_RULE_STALE_SECONDS
+        ),
+        CONF_RULE_HYSTERESIS: rule.get(CONF_RULE_HYSTERESIS, DEFAULT_RULE_HYSTERESIS),
+        CONF_RULE_PRECONDITION_ENTITIES: list(
+            rule.get(CONF_RULE_PRECONDITION_ENTITIES) or []
+        ),
+        CONF_RULE_PRECONDITION_RULES: list(rule.get(CONF_RULE_PRECONDITION_RULES) or []),
+        CONF_RULE_SOURCE_RULES: list(rule.get(CONF_RULE_SOURCE_RULES) or []),
+        CONF_RULE_COINCIDENCE: rule.get(CONF_RULE_COINCIDENCE, DEFAULT_RULE_COINCIDENCE),
+        CONF_RULE_CLEAR_DURATION: rule.get(
+            CONF_RULE_CLEAR_DURATION, DEFAULT_RULE_CLEAR_DURATION
+        ),
+        CONF_RULE_RATE_SMOOTHING: rule.get(
+            CONF_RULE_RATE_SMOOTHING, DEFAULT_RULE_RATE_SMOOTHING
+        ),
     }
+    if rule.get(CONF_RULE_AGGREGATE_PARAMETER) is not None:
+        context[CONF_RULE_AGGREGATE_PARAMETER] = rule[CONF_RULE_AGGREGATE_PARAMETER]
+    if rule.get(CONF_RULE_CLEAR_THRESHOLD) is not None:
+        context[CONF_RULE_CLEAR_THRESHOLD] = rule[CONF_RULE_CLEAR_THRESHOLD]
+    if rule.get(CONF_RULE_EXPRESSION) is not None:
+        context[CONF_RULE_EXPRESSION] = rule[CONF_RULE_EXPRESSION]
+    if rule.get(CONF_RULE_ATTRIBUTE):
+        context[CONF_RULE_ATTRIBUTE] = rule[CONF_RULE_ATTRIBUTE]
+    if rule.get(CONF_RULE_SELECTORS):
+        context[CONF_RULE_SELECTORS] = "\n".join(rule[CONF_RULE_SELECTORS])
+    context[CONF_RULE_GROUP_BY] = rule.get(CONF_RULE_GROUP_BY, DEFAULT_RULE_GROUP_BY)
     severity_mode = context[CONF_RULE_SEVERITY_MODE]
     if severity_mode == SEVERITY_MODE_SEMAFOR:
         context[CONF_RULE_DIRECTION] = rule.get(CONF_RULE_DIRECTION)
@@ -2514,6 +3834,13 @@ def _seed_rule_context(rule: dict[str, Any]) -> dict[str, Any]:
         if isinstance(shutdown_cfg, dict):
             context[CONF_RULE_SHUTDOWN_THRESHOLD] = shutdown_cfg.get("threshold")
             context[CONF_RULE_SHUTDOWN_DURATION] = shutdown_cfg.get("duration_seconds")
+        for level in LEVEL_ORDER:
+            cfg = levels.get(level)
+            if isinstance(cfg, dict) and cfg.get("clear_threshold") is not None:
+                context[_clear_threshold_key(level)] = cfg["clear_threshold"]
+        custom = _custom_levels(rule)
+        if custom:
+            context[CONF_RULE_LEVELS] = custom
     else:
         condition = rule.get(CONF_RULE_CONDITION)
         context[CONF_RULE_CONDITION] = condition
@@ -2525,6 +3852,8 @@ def _seed_rule_context(rule: dict[str, Any]) -> dict[str, Any]:
             context[CONF_RULE_THRESHOLD] = thresholds[0]
         if rule.get(CONF_RULE_DATA_TYPE) == DATA_TYPE_TEXT and thresholds:
             context[CONF_RULE_TEXT_MATCH] = thresholds[0]
+        if rule.get(CONF_RULE_TEXT_PATTERNS):
+            context[CONF_RULE_TEXT_PATTERNS] = "\n".join(rule[CONF_RULE_TEXT_PATTERNS])
     return context
 
 
@@ -2540,6 +3869,8 @@ def _data_type_options() -> list[selector.SelectOptionDict]:
         DATA_TYPE_NUMERIC: "Numeric",
         DATA_TYPE_BINARY: "Binary",
         DATA_TYPE_TEXT: "Text",
+        DATA_TYPE_COMPOSITE: "Composite (other rules)",
+        DATA_TYPE_EXPRESSION: "Expression (formula over entities)",
     }
     return [
         selector.SelectOptionDict(value=value, label=labels.get(value, value))
@@ -2553,6 +3884,10 @@ def _aggregate_options(options: list[str]) -> list[selector.SelectOptionDict]:
         "min": "Min",
         "sum": "Sum",
         "avg": "Average",
+        "spread": "Spread (max - min)",
+        "median": "Median",
+        "percentile": "Percentile (parameter = N)",
+        "count_above": "Count above (parameter = limit)",
         "any": "Any",
         "all": "All",
         "count": "Count",
@@ -2623,6 +3958,43 @@ def _severity_mode_options() -> list[selector.SelectOptionDict]:
     ]
 
 
+def _window_function_options() -> list[selector.SelectOptionDict]:
+    labels = {
+        "none": "None (current value)",
+        "avg": "Rolling average",
+        "min": "Rolling minimum",
+        "max": "Rolling maximum",
+        "integral": "Integral (value x seconds)",
+    }
+    return [
+        selector.SelectOptionDict(value=value, label=labels.get(value, value))
+        for value in WINDOW_FUNCTIONS
+    ]
+
+
+def _group_by_options() -> list[selector.SelectOptionDict]:
+    labels = {
+        "none": "None (one rule)",
+        "device": "Device",
+        "capture": "First * of the selector",
+    }
+    return [
+        selector.SelectOptionDict(value=value, label=labels.get(value, value))
+        for value in GROUP_BY_OPTIONS
+    ]
+
+
+def _input_mode_options() -> list[selector.SelectOptionDict]:
+    labels = {
+        "value": "Value",
+        "rate": "Rate of change (per second)",
+    }
+    return [
+        selector.SelectOptionDict(value=value, label=labels.get(value, value))
+        for value in INPUT_MODES
+    ]
+
+
 def _direction_options() -> list[selector.SelectOptionDict]:
     labels = {
         "higher_is_worse": "Higher is worse",
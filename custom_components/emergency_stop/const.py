@@ -14,12 +14,15 @@ CONF_RULE_NAME = "rule_name"
 CONF_RULE_DATA_TYPE = "data_type"
 CONF_RULE_ENTITIES = "entities"
 CONF_RULE_AGGREGATE = "aggregate"
+CONF_RULE_AGGREGATE_PARAMETER = "aggregate_parameter"
+CONF_RULE_ATTRIBUTE = "attribute"
 CONF_RULE_CONDITION = "condition"
 CONF_RULE_THRESHOLDS = "thresholds"
 CONF_RULE_DURATION = "duration_seconds"
 CONF_RULE_INTERVAL = "interval_seconds"
 CONF_RULE_LEVEL = "level"
 CONF_RULE_LATCHED = "latched"
+CONF_RULE_FREEZE_LATCHED = "freeze_latched"
 CONF_RULE_UNKNOWN_HANDLING = "unknown_handling"
 CONF_RULE_SEVERITY_MODE = "severity_mode"
 CONF_RULE_DIRECTION = "direction"
@@ -28,6 +31,23 @@ CONF_RULE_TEXT_CASE_SENSITIVE = "text_case_sensitive"
 CONF_RULE_TEXT_TRIM = "text_trim"
 CONF_RULE_NOTIFY_EMAIL = "notify_email"
 CONF_RULE_NOTIFY_MOBILE = "notify_mobile"
+CONF_RULE_WINDOW_FUNCTION = "window_function"
+CONF_RULE_WINDOW_SECONDS = "window_seconds"
+CONF_RULE_INPUT_MODE = "input_mode"
+CONF_RULE_RATE_SMOOTHING = "rate_smoothing_seconds"
+CONF_RULE_STALE_SECONDS = "stale_seconds"
+CONF_RULE_HYSTERESIS = "hysteresis"
+CONF_RULE_CLEAR_THRESHOLD = "clear_threshold"
+CONF_RULE_CLEAR_DURATION = "clear_duration_seconds"
+CONF_RULE_MAX_INTERVAL = "max_interval_seconds"
+CONF_RULE_PRECONDITION_ENTITIES = "precondition_entities"
+CONF_RULE_PRECONDITION_RULES = "precondition_rules"
+CONF_RULE_SOURCE_RULES = "source_rules"
+CONF_RULE_COINCIDENCE = "coincidence_seconds"
+CONF_RULE_EXPRESSION = "expression"
+CONF_RULE_SELECTORS = "selectors"
+CONF_RULE_GROUP_BY = "group_by"
+CONF_RULE_TEXT_PATTERNS = "text_patterns"
 
 # Config-flow helper fields (not persisted in entry data)
 CONF_RULE_THRESHOLD = "threshold"
@@ -40,6 +60,9 @@ CONF_RULE_LIMIT_THRESHOLD = "limit_threshold"
 CONF_RULE_LIMIT_DURATION = "limit_duration_seconds"
 CONF_RULE_SHUTDOWN_THRESHOLD = "shutdown_threshold"
 CONF_RULE_SHUTDOWN_DURATION = "shutdown_duration_seconds"
+CONF_RULE_NOTIFY_CLEAR_THRESHOLD = "notify_clear_threshold"
+CONF_RULE_LIMIT_CLEAR_THRESHOLD = "limit_clear_threshold"
+CONF_RULE_SHUTDOWN_CLEAR_THRESHOLD = "shutdown_clear_threshold"
 
 CONF_BREVO_API_KEY = "brevo_api_key"
 CONF_BREVO_SENDER = "brevo_sender_email"
@@ -53,6 +76,13 @@ CONF_REPORT_DOMAINS = "report_domains"
 CONF_REPORT_ENTITY_IDS = "report_entity_ids"
 CONF_REPORT_RETENTION_MAX_FILES = "report_retention_max_files"
 CONF_REPORT_RETENTION_MAX_AGE_DAYS = "report_retention_max_age_days"
+CONF_EVAL_SLICE_MS = "eval_slice_ms"
+CONF_INPUT_BATCH_MS = "input_batch_ms"
+CONF_INPUT_BATCH_MAX_LATENCY_MS = "input_batch_max_latency_ms"
+CONF_INPUT_BATCH_MAX_CHANGES = "input_batch_max_changes"
+CONF_INPUT_BATCH_SHUTDOWN_MS = "input_batch_shutdown_ms"
+CONF_WATCHDOG_LAG_MS = "watchdog_lag_ms"
+CONF_WATCHDOG_LEVEL = "watchdog_level"
 CONF_MOBILE_NOTIFY_ENABLED = "mobile_notify_enabled"
 CONF_MOBILE_NOTIFY_TARGETS_NOTIFY = "mobile_notify_targets_notify"
 CONF_MOBILE_NOTIFY_TARGETS_LIMIT = "mobile_notify_targets_limit"
@@ -105,6 +135,9 @@ SERVICE_SIMULATE_LEVEL = "simulate_level"
 SERVICE_CLEAR_SIMULATION = "clear_simulation"
 SERVICE_EXPORT_RULES = "export_rules"
 
+# Dispatcher signal sent with the entry_id when rules change without a reload.
+SIGNAL_RULES_UPDATED = "emergency_stop_rules_updated_{}"
+
 # Action-oriented severity levels for direct use in automations.
 LEVEL_NOTIFY = "notify"
 LEVEL_LIMIT = "limit"
@@ -120,20 +153,69 @@ LEVEL_ORDER = [LEVEL_NOTIFY, LEVEL_LIMIT, LEVEL_SHUTDOWN]
 DATA_TYPE_NUMERIC = "numeric"
 DATA_TYPE_BINARY = "binary"
 DATA_TYPE_TEXT = "text"
-DATA_TYPE_OPTIONS = [DATA_TYPE_NUMERIC, DATA_TYPE_BINARY, DATA_TYPE_TEXT]
+DATA_TYPE_COMPOSITE = "composite"
+DATA_TYPE_EXPRESSION = "expression"
+DATA_TYPE_OPTIONS = [
+    DATA_TYPE_NUMERIC,
+    DATA_TYPE_BINARY,
+    DATA_TYPE_TEXT,
+    DATA_TYPE_COMPOSITE,
+    DATA_TYPE_EXPRESSION,
+]
+# Data types whose rules evaluate to a number.
+NUMERIC_DATA_TYPES = [DATA_TYPE_NUMERIC, DATA_TYPE_EXPRESSION]
 
 AGGREGATE_MAX = "max"
 AGGREGATE_MIN = "min"
 AGGREGATE_SUM = "sum"
 AGGREGATE_AVG = "avg"
+AGGREGATE_SPREAD = "spread"
+AGGREGATE_MEDIAN = "median"
+AGGREGATE_PERCENTILE = "percentile"
+AGGREGATE_COUNT_ABOVE = "count_above"
 AGGREGATE_ANY = "any"
 AGGREGATE_ALL = "all"
 AGGREGATE_COUNT = "count"
 
-NUMERIC_AGGREGATES = [AGGREGATE_MAX, AGGREGATE_MIN, AGGREGATE_SUM, AGGREGATE_AVG]
+NUMERIC_AGGREGATES = [
+    AGGREGATE_MAX,
+    AGGREGATE_MIN,
+    AGGREGATE_SUM,
+    AGGREGATE_AVG,
+    AGGREGATE_SPREAD,
+    AGGREGATE_MEDIAN,
+    AGGREGATE_PERCENTILE,
+    AGGREGATE_COUNT_ABOVE,
+]
+# Aggregates that need aggregate_parameter: the percentile (0-100] or the
+# per-entity limit counted by count_above.
+PARAMETRIC_AGGREGATES = [AGGREGATE_PERCENTILE, AGGREGATE_COUNT_ABOVE]
 BINARY_AGGREGATES = [AGGREGATE_ANY, AGGREGATE_ALL, AGGREGATE_COUNT]
 TEXT_AGGREGATES = [AGGREGATE_ANY, AGGREGATE_ALL]
 
+# Time-window functions applied to a numeric aggregate over window_seconds.
+WINDOW_NONE = "none"
+WINDOW_AVG = "avg"
+WINDOW_MIN = "min"
+WINDOW_MAX = "max"
+WINDOW_INTEGRAL = "integral"
+WINDOW_FUNCTIONS = [WINDOW_NONE, WINDOW_AVG, WINDOW_MIN, WINDOW_MAX, WINDOW_INTEGRAL]
+
+# Numeric rule input: the aggregate itself or its rate of change per second.
+INPUT_MODE_VALUE = "value"
+INPUT_MODE_RATE = "rate"
+INPUT_MODES = [INPUT_MODE_VALUE, INPUT_MODE_RATE]
+
+# Rule families: one rule evaluated separately for each group of its entities,
+# by device or by the first ``*`` of its glob selector.
+GROUP_BY_NONE = "none"
+GROUP_BY_DEVICE = "device"
+GROUP_BY_CAPTURE = "capture"
+GROUP_BY_OPTIONS = [GROUP_BY_NONE, GROUP_BY_DEVICE, GROUP_BY_CAPTURE]
+
+# Entities usable as a rule precondition; the rule runs unless they are off.
+PRECONDITION_DOMAINS = ["binary_sensor", "input_boolean", "switch"]
+
 COND_GT = "gt"
 COND_GTE = "gte"
 COND_LT = "lt"
@@ -158,9 +240,23 @@ DEFAULT_RULE_DURATION = 10
 DEFAULT_RULE_INTERVAL = 1
 DEFAULT_RULE_LEVEL = LEVEL_NOTIFY
 DEFAULT_RULE_LATCHED = True
+DEFAULT_RULE_FREEZE_LATCHED = False
 DEFAULT_RULE_UNKNOWN_HANDLING = UNKNOWN_IGNORE
 DEFAULT_RULE_NOTIFY_EMAIL = True
 DEFAULT_RULE_NOTIFY_MOBILE = True
+DEFAULT_RULE_WINDOW_FUNCTION = WINDOW_NONE
+DEFAULT_RULE_WINDOW_SECONDS = 60
+DEFAULT_RULE_INPUT_MODE = INPUT_MODE_VALUE
+DEFAULT_RULE_RATE_SMOOTHING = 10
+# 0 disables the staleness check.
+DEFAULT_RULE_STALE_SECONDS = 0
+# 0 clears on the trip threshold, as before hysteresis existed.
+DEFAULT_RULE_HYSTERESIS = 0
+DEFAULT_RULE_CLEAR_DURATION = 0
+# 0 keeps the fixed interval_seconds schedule.
+DEFAULT_RULE_MAX_INTERVAL = 0
+DEFAULT_RULE_COINCIDENCE = 0
+DEFAULT_RULE_GROUP_BY = GROUP_BY_NONE
 DEFAULT_TEXT_CASE_SENSITIVE = False
 DEFAULT_TEXT_TRIM = True
 DEFAULT_MOBILE_NOTIFY_ENABLED = False
@@ -170,6 +266,19 @@ DEFAULT_MOBILE_NOTIFY_URGENT_SHUTDOWN = True
 DEFAULT_EMAIL_LEVELS = [LEVEL_NOTIFY, LEVEL_LIMIT, LEVEL_SHUTDOWN]
 DEFAULT_REPORT_RETENTION_MAX_FILES = 0
 DEFAULT_REPORT_RETENTION_MAX_AGE_DAYS = 0
+# Event-loop time one evaluation slice may take; 0 evaluates in one go.
+DEFAULT_EVAL_SLICE_MS = 20
+# Input changes of limit and notify rules collected before they are
+# evaluated; a window of 0 evaluates every change at once.
+DEFAULT_INPUT_BATCH_MS = 20
+DEFAULT_INPUT_BATCH_MAX_LATENCY_MS = 100
+DEFAULT_INPUT_BATCH_MAX_CHANGES = 500
+# Shutdown inputs get their own, much shorter batch; 0 bypasses it.
+DEFAULT_INPUT_BATCH_SHUTDOWN_MS = 5
+# Event-loop lag that marks the evaluator unhealthy, and the stop level it
+# then raises (normal = only the health sensor turns off).
+DEFAULT_WATCHDOG_LAG_MS = 1000
+DEFAULT_WATCHDOG_LEVEL = LEVEL_NORMAL
 
 SEVERITY_MODE_SIMPLE = "simple"
 SEVERITY_MODE_SEMAFOR = "semafor"
@@ -180,3 +289,7 @@ DIRECTION_LOWER_IS_WORSE = "lower_is_worse"
 DIRECTION_OPTIONS = [DIRECTION_HIGHER_IS_WORSE, DIRECTION_LOWER_IS_WORSE]
 
 MIN_EVAL_INTERVAL = timedelta(seconds=1)
+# Refresh of the reported reading of a frozen latched rule.
+FROZEN_OBSERVE_SECONDS = 60
+# Period of the evaluator heartbeat.
+HEARTBEAT_SECONDS = 1
@@ -2,21 +2,29 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from datetime import timedelta
+from datetime import datetime, timedelta
 import asyncio
 import json
 from pathlib import Path
 import logging
 import time
-import zlib
-from typing import Any, Awaitable, Callable
+from typing import Any, Awaitable, Callable, Collection
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import entity_registry as er
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import (
+    device_registry as dr,
+    entity_registry as er,
+    event as event_helper,
+)
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from .brevo import async_send_brevo_email
-from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
+)
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import dt as dt_util
 
@@ -44,6 +52,11 @@ from .const import (
     CONF_BREVO_RECIPIENT_NOTIFY,
     CONF_BREVO_RECIPIENT_SHUTDOWN,
     CONF_EMAIL_LEVELS,
+    CONF_EVAL_SLICE_MS,
+    CONF_INPUT_BATCH_MAX_CHANGES,
+    CONF_INPUT_BATCH_MAX_LATENCY_MS,
+    CONF_INPUT_BATCH_MS,
+    CONF_INPUT_BATCH_SHUTDOWN_MS,
     CONF_MOBILE_NOTIFY_ENABLED,
     CONF_MOBILE_NOTIFY_TARGETS_NOTIFY,
     CONF_MOBILE_NOTIFY_TARGETS_LIMIT,
@@ -57,54 +70,23 @@ from .const import (
     CONF_REPORT_RETENTION_MAX_AGE_DAYS,
     CONF_REPORT_RETENTION_MAX_FILES,
     CONF_RULES,
-    CONF_RULE_AGGREGATE,
-    CONF_RULE_CONDITION,
-    CONF_RULE_DATA_TYPE,
-    CONF_RULE_DURATION,
-    CONF_RULE_ENTITIES,
-    CONF_RULE_ID,
-    CONF_RULE_INTERVAL,
-    CONF_RULE_LATCHED,
-    CONF_RULE_LEVEL,
-    CONF_RULE_SEVERITY_MODE,
-    CONF_RULE_DIRECTION,
-    CONF_RULE_LEVELS,
-    CONF_RULE_NAME,
-    CONF_RULE_NOTIFY_EMAIL,
-    CONF_RULE_NOTIFY_MOBILE,
-    CONF_RULE_TEXT_CASE_SENSITIVE,
-    CONF_RULE_TEXT_TRIM,
-    CONF_RULE_UNKNOWN_HANDLING,
-    CONF_RULE_THRESHOLDS,
-    COND_BETWEEN,
-    COND_CONTAINS,
-    COND_EQUALS,
-    COND_EQ,
-    COND_GT,
-    COND_GTE,
-    COND_IS_OFF,
-    COND_IS_ON,
-    COND_LT,
-    COND_LTE,
-    DATA_TYPE_BINARY,
-    DATA_TYPE_NUMERIC,
-    DATA_TYPE_TEXT,
-    DEFAULT_RULE_DURATION,
-    DEFAULT_RULE_INTERVAL,
-    DEFAULT_RULE_LATCHED,
-    DEFAULT_RULE_LEVEL,
-    DEFAULT_RULE_NOTIFY_EMAIL,
-    DEFAULT_RULE_NOTIFY_MOBILE,
-    DEFAULT_RULE_UNKNOWN_HANDLING,
-    DEFAULT_TEXT_CASE_SENSITIVE,
-    DEFAULT_TEXT_TRIM,
+    CONF_WATCHDOG_LAG_MS,
+    CONF_WATCHDOG_LEVEL,
     DEFAULT_MOBILE_NOTIFY_ENABLED,
     DEFAULT_MOBILE_NOTIFY_URGENT_NOTIFY,
     DEFAULT_MOBILE_NOTIFY_URGENT_LIMIT,
     DEFAULT_MOBILE_NOTIFY_URGENT_SHUTDOWN,
     DEFAULT_EMAIL_LEVELS,
+    DEFAULT_EVAL_SLICE_MS,
+    DEFAULT_INPUT_BATCH_MAX_CHANGES,
+    DEFAULT_INPUT_BATCH_MAX_LATENCY_MS,
+    DEFAULT_INPUT_BATCH_MS,
+    DEFAULT_INPUT_BATCH_SHUTDOWN_MS,
     DEFAULT_REPORT_RETENTION_MAX_AGE_DAYS,
     DEFAULT_REPORT_RETENTION_MAX_FILES,
+    DEFAULT_WATCHDOG_LAG_MS,
+    DEFAULT_WATCHDOG_LEVEL,
+    HEARTBEAT_SECONDS,
     LEVEL_LIMIT,
     LEVEL_NORMAL,
     LEVEL_NOTIFY,
@@ -114,17 +96,41 @@ from .const import (
     REPORT_MODE_BASIC,
     REPORT_MODE_EXTENDED,
     SEVERITY_MODE_SEMAFOR,
-    SEVERITY_MODE_SIMPLE,
-    DIRECTION_HIGHER_IS_WORSE,
-    DIRECTION_LOWER_IS_WORSE,
-    UNKNOWN_TREAT_OK,
-    UNKNOWN_TREAT_VIOLATION,
+    SIGNAL_RULES_UPDATED,
+    DOMAIN,
+)
+from .engine import (
+    LEVEL_RANK,
+    RuleConfig,
+    RuleEngine as CoreRuleEngine,
+    RuleRuntimeState,
+    RuleSetChanges,
+    highest_level,
+    load_rules,
+    min_interval,
 )
+from .engine.batch import MicroBatch
+from .engine.lanes import LANES
+from .engine.selectors import EntityInfo, SelectorIndex
+from .engine.watchdog import Heartbeat
 
 _LOGGER = logging.getLogger(__name__)
 
-_LEVEL_RANK = {LEVEL_NOTIFY: 1, LEVEL_LIMIT: 2, LEVEL_SHUTDOWN: 3}
 _NOTIFICATION_TIMEOUT_SECONDS = 3
+_STORAGE_VERSION = 1
+_STORAGE_SAVE_DELAY_SECONDS = 5
+# A shutdown lane pass taking longer than this is logged.
+_SHUTDOWN_LANE_BUDGET_SECONDS = 0.05
+# Name of the sliced pass over rules woken by input changes.
+_INPUT_PASS = "inputs"
+# Without a completed pass for this long, the heartbeat publishes the loop
+# lag and jitter sensors itself.
+_LAG_PUBLISH_SECONDS = 5
+# homeassistant.const.EVENT_STATE_REPORTED, fired since HA 2024.4 when an
+# entity writes an unchanged state.
+_EVENT_STATE_REPORTED = "state_reported"
+# Per-entity state_reported tracking, where this Home Assistant has it.
+_TRACK_STATE_REPORT = getattr(event_helper, "async_track_state_report_event", None)
 
 REPORT_BASE_DIR = Path("/media/emergency-stop")
 REPORT_LOG_DIR = REPORT_BASE_DIR / "logs"
@@ -161,70 +167,30 @@ def _format_notify_message(
     return "\n".join(lines)
 
 
-def _deterministic_offset_seconds(rule_id: str, interval_seconds: int) -> int:
-    if interval_seconds <= 1:
-        return 0
-    checksum = zlib.crc32(rule_id.encode("utf-8")) & 0xFFFFFFFF
-    return int(checksum % interval_seconds)
+class _HassClock:
+    """Clock backed by Home Assistant's UTC helper."""
 
+    def monotonic(self) -> float:
+        return time.monotonic()
 
-@dataclass
-class RuleConfig:
-    rule_id: str
-    name: str
-    data_type: str
-    entities: list[str]
-    aggregate: str
-    condition: str | None
-    thresholds: list[Any]
-    duration_seconds: int
-    interval_seconds: int
-    level: str
-    latched: bool
-    unknown_handling: str
-    severity_mode: str
-    direction: str | None
-    levels: dict[str, dict[str, Any]]
-    text_case_sensitive: bool
-    text_trim: bool
-    notify_email: bool = True
-    notify_mobile: bool = True
+    def utcnow(self) -> datetime:
+        return dt_util.utcnow()
 
 
-@dataclass
-class RuleRuntimeState:
-    active: bool = False
-    active_since: str | None = None
-    last_update: str | None = None
-    last_eval_monotonic: float | None = None
-    violation_started_at: float | None = None
-    last_match: bool | None = None
-    last_aggregate: float | int | str | None = None
-    last_entity: str | None = None
-    last_detail: str | None = None
-    last_invalid_reason: str | None = None
-    current_level: str | None = None
-    latched_level: str | None = None
-    level_violation_started_at: dict[str, float | None] = field(default_factory=dict)
-    level_active_since: dict[str, str | None] = field(default_factory=dict)
-    active_levels: list[str] = field(default_factory=list)
+class RuleEngine(CoreRuleEngine):
+    """Rule engine evaluating against the Home Assistant state machine."""
 
-    def reset(self) -> None:
-        self.active = False
-        self.active_since = None
-        self.last_update = None
-        self.last_eval_monotonic = None
-        self.violation_started_at = None
-        self.last_match = None
-        self.last_aggregate = None
-        self.last_entity = None
-        self.last_detail = None
-        self.last_invalid_reason = None
-        self.current_level = None
-        self.latched_level = None
-        self.level_violation_started_at = {}
-        self.level_active_since = {}
-        self.active_levels = []
+    def __init__(self, rules: list[RuleConfig]) -> None:
+        super().__init__(rules, clock=_HassClock())
+
+    def evaluate(
+        self,
+        hass: HomeAssistant,
+        lanes: Collection[str] | None = None,
+        budget: float | None = None,
+        pass_name: str = "tick",
+    ) -> bool:
+        return super().evaluate(hass.states, lanes, budget, pass_name)
 
 
 @dataclass
@@ -322,8 +288,8 @@ class EmergencyStopState:
             level = event.get("level")
             if level and (
                 bucket["highest_level"] is None
-                or _LEVEL_RANK.get(level, 0)
-                > _LEVEL_RANK.get(bucket["highest_level"], 0)
+                or LEVEL_RANK.get(level, 0)
+                > LEVEL_RANK.get(bucket["highest_level"], 0)
             ):
                 bucket["highest_level"] = level
 
@@ -345,409 +311,6 @@ class EmergencyStopState:
         return by_reason
 
 
-@dataclass
-class RuleEvalResult:
-    match: bool | None
-    aggregate: float | int | str | None
-    detail: str
-    entity_id: str | None
-    invalid_reason: str | None = None
-
-
-class RuleEngine:
-    """Evaluate dynamic rules."""
-
-    def __init__(self, rules: list[RuleConfig]) -> None:
-        self._rules = rules
-        self._states: dict[str, RuleRuntimeState] = {
-            rule.rule_id: RuleRuntimeState() for rule in rules
-        }
-        self._invalid_logged: set[tuple[str, str, str]] = set()
-        self._seed_initial_offsets()
-
-    @property
-    def rules(self) -> list[RuleConfig]:
-        return self._rules
-
-    @property
-    def states(self) -> dict[str, RuleRuntimeState]:
-        return self._states
-
-    def reset(self) -> None:
-        for state in self._states.values():
-            state.reset()
-
-    def _seed_initial_offsets(self) -> None:
-        now_monotonic = time.monotonic()
-        for rule in self._rules:
-            interval = max(1, int(rule.interval_seconds))
-            offset = _deterministic_offset_seconds(rule.rule_id, interval)
-            state = self._states.get(rule.rule_id)
-            if state is None:
-                continue
-            state.last_eval_monotonic = now_monotonic - (interval - offset)
-
-    @staticmethod
-    def _simple_state_signature(state: RuleRuntimeState) -> tuple[Any, ...]:
-        return (
-            state.active,
-            state.active_since,
-            state.last_match,
-            state.last_aggregate,
-            state.last_entity,
-            state.last_detail,
-            state.last_invalid_reason,
-            state.violation_started_at is not None,
-        )
-
-    @staticmethod
-    def _semafor_state_signature(
-        rule: RuleConfig, state: RuleRuntimeState
-    ) -> tuple[Any, ...]:
-        level_runtime = tuple(
-            (
-                level,
-                state.level_violation_started_at.get(level) is not None,
-                state.level_active_since.get(level),
-            )
-            for level in LEVEL_ORDER
-            if level in rule.levels
-        )
-        return (
-            state.active,
-            state.active_since,
-            state.current_level,
-            state.latched_level,
-            tuple(state.active_levels),
-            state.last_aggregate,
-            state.last_entity,
-            state.last_detail,
-            state.last_invalid_reason,
-            level_runtime,
-        )
-
-    def evaluate(self, hass: HomeAssistant) -> None:
-        now = dt_util.utcnow()
-        now_iso = now.isoformat()
-        now_monotonic = time.monotonic()
-
-        for rule in self._rules:
-            state = self._states[rule.rule_id]
-            if state.last_eval_monotonic is not None and (
-                now_monotonic - state.last_eval_monotonic
-            ) < rule.interval_seconds:
-                continue
-
-            state.last_eval_monotonic = now_monotonic
-            if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
-                self._evaluate_semafor(rule, hass, state, now_iso, now_monotonic)
-            else:
-                previous_signature = self._simple_state_signature(state)
-                result = self._evaluate_rule(rule, hass)
-                state.last_match = result.match
-                state.last_aggregate = result.aggregate
-                state.last_entity = result.entity_id
-                state.last_detail = result.detail
-                state.last_invalid_reason = result.invalid_reason
-
-                if result.match is True:
-                    if state.violation_started_at is None:
-                        state.violation_started_at = now_monotonic
-                    if (now_monotonic - state.violation_started_at) >= rule.duration_seconds:
-                        if not state.active:
-                            state.active = True
-                            state.active_since = now_iso
-                else:
-                    state.violation_started_at = None
-                    if not rule.latched:
-                        state.active = False
-                        state.active_since = None
-
-                if self._simple_state_signature(state) != previous_signature:
-                    state.last_update = now_iso
-
-    def _evaluate_rule(self, rule: RuleConfig, hass: HomeAssistant) -> RuleEvalResult:
-        if rule.data_type == DATA_TYPE_NUMERIC:
-            return self._evaluate_numeric(rule, hass)
-        if rule.data_type == DATA_TYPE_BINARY:
-            return self._evaluate_binary(rule, hass)
-        return self._evaluate_text(rule, hass)
-
-    def _evaluate_semafor(
-        self,
-        rule: RuleConfig,
-        hass: HomeAssistant,
-        state: RuleRuntimeState,
-        now_iso: str,
-        now_monotonic: float,
-    ) -> None:
-        previous_signature = self._semafor_state_signature(rule, state)
-        if rule.data_type == DATA_TYPE_NUMERIC:
-            value, entity_id, invalid_reason = self._collect_numeric_value(rule, hass)
-        elif rule.data_type == DATA_TYPE_BINARY and rule.aggregate == "count":
-            value, entity_id, invalid_reason = self._collect_binary_count(rule, hass)
-        else:
-            _LOGGER.error(
-                "Rule %s (%s): semafor mode is not supported for data_type=%s aggregate=%s",
-                rule.name,
-                rule.rule_id,
-                rule.data_type,
-                rule.aggregate,
-            )
-            value, entity_id, invalid_reason = None, None, "unsupported"
-
-        state.last_aggregate = value
-        state.last_entity = entity_id
-        state.last_invalid_reason = invalid_reason
-
-        matches: dict[str, bool | None] = {}
-        if invalid_reason is not None:
-            if rule.unknown_handling == UNKNOWN_TREAT_VIOLATION:
-                matches = {level: True for level in rule.levels}
-            elif rule.unknown_handling == UNKNOWN_TREAT_OK:
-                matches = {level: False for level in rule.levels}
-            else:
-                matches = {level: None for level in rule.levels}
-            state.last_detail = f"{rule.name}: {invalid_reason}"
-        else:
-            for level, cfg in rule.levels.items():
-                threshold = cfg["threshold"]
-                if rule.direction == DIRECTION_LOWER_IS_WORSE:
-                    matches[level] = value <= threshold
-                else:
-                    matches[level] = value >= threshold
-
-        active_levels: list[str] = []
-        for level in LEVEL_ORDER:
-            cfg = rule.levels.get(level)
-            if not cfg:
-                continue
-            match = matches.get(level)
-            if match is True:
-                started_at = state.level_violation_started_at.get(level)
-                if started_at is None:
-                    state.level_violation_started_at[level] = now_monotonic
-                    started_at = now_monotonic
-                duration = cfg["duration_seconds"]
-                if (now_monotonic - started_at) >= duration:
-                    if not state.level_active_since.get(level):
-                        state.level_active_since[level] = now_iso
-                    active_levels.append(level)
-            else:
-                state.level_violation_started_at[level] = None
-                if not rule.latched:
-                    state.level_active_since[level] = None
-
-        state.active_levels = active_levels
-        highest_level = _highest_level(active_levels)
-
-        if rule.latched:
-            if highest_level:
-                state.latched_level = _highest_level(
-                    [level for level in [state.latched_level, highest_level] if level]
-                )
-            state.current_level = state.latched_level
-            state.active = state.current_level is not None
-            state.active_since = (
-                state.level_active_since.get(state.current_level)
-                if state.current_level
-                else None
-            )
-        else:
-            state.current_level = highest_level
-            state.active = state.current_level is not None
-            state.active_since = (
-                state.level_active_since.get(state.current_level)
-                if state.current_level
-                else None
-            )
-
-        if state.current_level and invalid_reason is None:
-            threshold = rule.levels[state.current_level]["threshold"]
-            state.last_detail = _format_semafor_detail(
-                rule, state.current_level, value, threshold
-            )
-
-        if self._semafor_state_signature(rule, state) != previous_signature:
-            state.last_update = now_iso
-
-    def _evaluate_numeric(self, rule: RuleConfig, hass: HomeAssistant) -> RuleEvalResult:
-        values: list[tuple[str, float]] = []
-        for entity_id in rule.entities:
-            state = hass.states.get(entity_id)
-            value, reason = _parse_numeric_state(state)
-            if reason is not None:
-                self._log_invalid(rule, entity_id, reason, state)
-                continue
-            values.append((entity_id, value))
-
-        if not values:
-            return _handle_unknown(rule, "no_valid_values")
-
-        if not _has_required_thresholds(rule):
-            _LOGGER.error("Rule %s (%s): missing thresholds", rule.name, rule.rule_id)
-            return _handle_unknown(rule, "missing_thresholds")
-
-        aggregate, entity_id = _aggregate_numeric(values, rule.aggregate)
-        match = _compare_numeric(aggregate, rule.condition, rule.thresholds)
-        detail = _format_numeric_detail(rule, aggregate)
-        return RuleEvalResult(match, aggregate, detail, entity_id)
-
-    def _evaluate_binary(self, rule: RuleConfig, hass: HomeAssistant) -> RuleEvalResult:
-        values: list[tuple[str, str]] = []
-        for entity_id in rule.entities:
-            state = hass.states.get(entity_id)
-            value, reason = _parse_binary_state(state)
-            if reason is not None:
-                self._log_invalid(rule, entity_id, reason, state)
-                continue
-            values.append((entity_id, value))
-
-        if not values:
-            return _handle_unknown(rule, "no_valid_values")
-
-        if rule.aggregate == "count":
-            if not _has_required_thresholds(rule):
-                _LOGGER.error(
-                    "Rule %s (%s): missing thresholds for count condition",
-                    rule.name,
-                    rule.rule_id,
-                )
-                return _handle_unknown(rule, "missing_thresholds")
-            count_on = sum(1 for _, value in values if value == "on")
-            match = _compare_numeric(count_on, rule.condition, rule.thresholds)
-            detail = _format_binary_count_detail(rule, count_on)
-            return RuleEvalResult(match, count_on, detail, None)
-
-        if rule.condition not in (COND_IS_ON, COND_IS_OFF):
-            _LOGGER.error(
-                "Rule %s (%s): invalid binary condition %s",
-                rule.name,
-                rule.rule_id,
-                rule.condition,
-            )
-            return _handle_unknown(rule, "invalid_condition")
-
-        target = "on" if rule.condition == COND_IS_ON else "off"
-        matching = [entity_id for entity_id, value in values if value == target]
-        if rule.aggregate == "any":
-            match = bool(matching)
-            entity_id = matching[0] if matching else None
-        else:
-            match = len(matching) == len(values)
-            entity_id = values[0][0] if values else None
-        detail = _format_binary_state_detail(rule, target)
-        return RuleEvalResult(match, None, detail, entity_id)
-
-    def _evaluate_text(self, rule: RuleConfig, hass: HomeAssistant) -> RuleEvalResult:
-        values: list[tuple[str, str]] = []
-        for entity_id in rule.entities:
-            state = hass.states.get(entity_id)
-            value, reason = _parse_text_state(state)
-            if reason is not None:
-                self._log_invalid(rule, entity_id, reason, state)
-                continue
-            values.append((entity_id, value))
-
-        if not values:
-            return _handle_unknown(rule, "no_valid_values")
-
-        if not rule.thresholds:
-            _LOGGER.error("Rule %s (%s): missing text match", rule.name, rule.rule_id)
-            return _handle_unknown(rule, "missing_thresholds")
-
-        match_value = str(rule.thresholds[0]) if rule.thresholds else ""
-        if rule.text_trim:
-            match_value = match_value.strip()
-        if not rule.text_case_sensitive:
-            match_value = match_value.lower()
-
-        matches: list[str] = []
-        for entity_id, raw in values:
-            normalized = raw
-            if rule.text_trim:
-                normalized = normalized.strip()
-            if not rule.text_case_sensitive:
-                normalized = normalized.lower()
-            if rule.condition == COND_CONTAINS:
-                if match_value and match_value in normalized:
-                    matches.append(entity_id)
-            else:
-                if normalized == match_value:
-                    matches.append(entity_id)
-
-        if rule.aggregate == "any":
-            match = bool(matches)
-            entity_id = matches[0] if matches else None
-        else:
-            match = len(matches) == len(values)
-            entity_id = values[0][0] if values else None
-
-        detail = _format_text_detail(rule, match_value)
-        return RuleEvalResult(match, None, detail, entity_id)
-
-    def _collect_numeric_value(
-        self, rule: RuleConfig, hass: HomeAssistant
-    ) -> tuple[float | None, str | None, str | None]:
-        values: list[tuple[str, float]] = []
-        for entity_id in rule.entities:
-            state = hass.states.get(entity_id)
-            value, reason = _parse_numeric_state(state)
-            if reason is not None:
-                self._log_invalid(rule, entity_id, reason, state)
-                continue
-            values.append((entity_id, value))
-
-        if not values:
-            return None, None, "no_valid_values"
-
-        aggregate, entity_id = _aggregate_numeric(values, rule.aggregate)
-        return aggregate, entity_id, None
-
-    def _collect_binary_count(
-        self, rule: RuleConfig, hass: HomeAssistant
-    ) -> tuple[int | None, str | None, str | None]:
-        values: list[tuple[str, str]] = []
-        for entity_id in rule.entities:
-            state = hass.states.get(entity_id)
-            value, reason = _parse_binary_state(state)
-            if reason is not None:
-                self._log_invalid(rule, entity_id, reason, state)
-                continue
-            values.append((entity_id, value))
-
-        if not values:
-            return None, None, "no_valid_values"
-
-        count_on = sum(1 for _, value in values if value == "on")
-        return count_on, None, None
-
-    def _log_invalid(
-        self, rule: RuleConfig, entity_id: str, reason: str, state: Any
-    ) -> None:
-        state_value = state.state if state is not None else None
-        key = (rule.rule_id, entity_id, reason)
-        if key not in self._invalid_logged:
-            _LOGGER.warning(
-                "Rule %s (%s): invalid state for %s (%s): %s",
-                rule.name,
-                rule.rule_id,
-                entity_id,
-                reason,
-                state_value,
-            )
-            self._invalid_logged.add(key)
-        else:
-            _LOGGER.debug(
-                "Rule %s (%s): invalid state for %s (%s): %s",
-                rule.name,
-                rule.rule_id,
-                entity_id,
-                reason,
-                state_value,
-            )
-
-
 class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
     """Coordinator for Emergency Stop integration."""
 
@@ -787,6 +350,15 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
             ),
             DEFAULT_REPORT_RETENTION_MAX_AGE_DAYS,
         )
+        eval_slice_ms = _coerce_non_negative_int(
+            config.get(CONF_EVAL_SLICE_MS, DEFAULT_EVAL_SLICE_MS),
+            DEFAULT_EVAL_SLICE_MS,
+        )
+        self._eval_slice = eval_slice_ms / 1000 if eval_slice_ms else None
+        self._input_batch = _input_batch(config)
+        self._batch_cancel: Callable[[], None] | None = None
+        self._shutdown_batch = _shutdown_batch(config)
+        self._shutdown_batch_cancel: Callable[[], None] | None = None
         self._acknowledged = False
         self._mobile_notify_enabled = bool(
             config.get(CONF_MOBILE_NOTIFY_ENABLED, DEFAULT_MOBILE_NOTIFY_ENABLED)
@@ -822,11 +394,46 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
         self._simulation: SimulationState | None = None
         self._simulation_cancel: Callable[[], None] | None = None
 
-        rules = _load_rules(config)
+        self._settings = _settings_config(config)
+        # Rules as configured; the engine gets them with selectors resolved.
+        self._configured_rules = load_rules(config)
+        self._selector_index: SelectorIndex | None = None
+        self._selector_unsubs: list[Callable[[], None]] = []
+        rules = self._expand_selectors(self._configured_rules)
         self._rule_engine = RuleEngine(rules)
         self._stop_state = EmergencyStopState(level=LEVEL_NORMAL)
-
-        update_interval = timedelta(seconds=_min_interval(rules))
+        self._store: Store[dict[str, Any]] = Store(
+            hass, _STORAGE_VERSION, _storage_key(entry.entry_id)
+        )
+        self._persist_signature: tuple[Any, ...] | None = None
+        self._freshness_unsubs: list[Callable[[], None]] = []
+        self._stale_cancel: Callable[[], None] | None = None
+        self._stale_deadline: float | None = None
+        self._lane_unsubs: list[Callable[[], None]] = []
+        self._lane_over_budget = False
+
+        update_interval = timedelta(seconds=min_interval(rules))
+        lag_threshold = (
+            _coerce_non_negative_int(
+                config.get(CONF_WATCHDOG_LAG_MS, DEFAULT_WATCHDOG_LAG_MS),
+                DEFAULT_WATCHDOG_LAG_MS,
+            )
+            / 1000
+        )
+        self._heartbeat = Heartbeat(
+            HEARTBEAT_SECONDS,
+            lag_threshold,
+            _stall_after(update_interval, lag_threshold),
+        )
+        self._heartbeat_cancel: Callable[[], None] | None = None
+        # Loop time listeners last saw the heartbeat figures.
+        self._lag_published_at = 0.0
+        watchdog_level = config.get(CONF_WATCHDOG_LEVEL, DEFAULT_WATCHDOG_LEVEL)
+        self._watchdog_level = (
+            watchdog_level if watchdog_level in LEVEL_OPTIONS else LEVEL_NORMAL
+        )
+        # The stop event raised while the evaluator is unhealthy, if any.
+        self._watchdog_events: list[dict[str, Any]] = []
         super().__init__(
             hass,
             _LOGGER,
@@ -834,43 +441,556 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
             update_interval=update_interval,
         )
 
-    async def _async_update_data(self) -> EmergencyStopState:
-        now_monotonic = time.monotonic()
-        if self._simulation:
-            if (
-                self._simulation.expires_at_monotonic is not None
-                and now_monotonic >= self._simulation.expires_at_monotonic
-            ):
-                send_notifications = self._simulation.send_notifications
-                self._simulation = None
-                if self._simulation_cancel:
-                    self._simulation_cancel()
-                    self._simulation_cancel = None
-                if not send_notifications:
-                    self._suppress_level_notification = True
-            else:
-                self._stop_state = self._build_simulation_state()
-                return self._stop_state
+    async def async_config_entry_first_refresh(self) -> None:
+        await self._async_restore_runtime()
+        self.entry.async_on_unload(self.async_save_runtime)
+        self.entry.async_on_unload(self._async_stop_freshness)
+        self.entry.async_on_unload(self._async_stop_selectors)
+        self.entry.async_on_unload(self._async_stop_lanes)
+        self.entry.async_on_unload(self._async_stop_heartbeat)
+        self._async_track_freshness()
+        self._async_track_selectors()
+        self._async_track_lanes()
+        await super().async_config_entry_first_refresh()
+        self._async_start_heartbeat()
+
+    async def async_save_runtime(self) -> None:
+        """Write runtime state immediately, bypassing the save delay."""
+        await self._store.async_save(self._runtime_store_data())
+
+    def async_apply_options(self) -> bool:
+        """Apply changed rules in place; return False when a reload is needed."""
+        config = _get_entry_config(self.entry)
+        if _settings_config(config) != self._settings:
+            return False
+        self._configured_rules = load_rules(config)
+        rules = self._expand_selectors(self._configured_rules)
+        self._async_track_selectors()
+        changes = self._rule_engine.update_rules(rules)
+        if not changes.has_changes:
+            return True
+        _LOGGER.info(
+            "Emergency Stop rules updated in place: %s added, %s changed, %s removed",
+            len(changes.added),
+            len(changes.changed),
+            len(changes.removed),
+        )
+        self._async_rules_changed(changes)
+        return True
+
+    @callback
+    def _async_rules_changed(self, changes: RuleSetChanges) -> None:
+        self.update_interval = timedelta(seconds=min_interval(self.rules))
+        self._heartbeat.stall_after = _stall_after(
+            self.update_interval, self._heartbeat.threshold
+        )
+        self._async_track_freshness()
+        self._async_track_lanes()
+        async_dispatcher_send(
+            self.hass, SIGNAL_RULES_UPDATED.format(self.entry.entry_id), changes
+        )
+        self._schedule_runtime_save()
+
+    def _expand_selectors(self, rules: list[RuleConfig]) -> list[RuleConfig]:
+        """Resolve selectors and family groups; the registry is scanned once.
+
+        Entities without a registry entry (no unique_id) are taken from the
+        state machine, with no area or device.
+        """
+        if not any(rule.selectors or rule.group_by for rule in rules):
+            self._selector_index = None
+            return rules
+        if self._selector_index is None:
+            registry = er.async_get(self.hass)
+            devices = dr.async_get(self.hass)
+            index = SelectorIndex(
+                _entity_info(entry, devices)
+                for entry in registry.entities.values()
+                if entry.disabled_by is None
+            )
+            for entity_id in self.hass.states.async_entity_ids():
+                if registry.async_get(entity_id) is None:
+                    index.update(EntityInfo(entity_id))
+            self._selector_index = index
+        return self._selector_index.expand(rules)
+
+    @callback
+    def _async_track_selectors(self) -> None:
+        """Follow registry changes while any rule uses selectors."""
+        if self._selector_index is None:
+            self._async_stop_selectors()
+            return
+        if self._selector_unsubs:
+            return
+        self._selector_unsubs = [
+            self.hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED, self._handle_entity_registry_update
+            ),
+            self.hass.bus.async_listen(
+                dr.EVENT_DEVICE_REGISTRY_UPDATED, self._handle_device_registry_update
+            ),
+            self.hass.bus.async_listen(
+                EVENT_STATE_CHANGED,
+                self._handle_state_added_or_removed,
+                event_filter=_is_state_added_or_removed,
+            ),
+        ]
+
+    @callback
+    def _async_stop_selectors(self) -> None:
+        for unsub in self._selector_unsubs:
+            unsub()
+        self._selector_unsubs = []
+
+    @callback
+    def _handle_entity_registry_update(self, event: Event) -> None:
+        index = self._selector_index
+        if index is None:
+            return
+        data = event.data
+        changed = False
+        if data.get("old_entity_id"):
+            changed = index.remove(data["old_entity_id"])
+        if data["action"] == "remove":
+            changed = index.remove(data["entity_id"]) or changed
+        else:
+            changed = self._index_entity(index, data["entity_id"]) or changed
+        if changed:
+            self._async_refresh_members()
+
+    @callback
+    def _handle_device_registry_update(self, event: Event) -> None:
+        # Entities without an own area inherit the area of their device, and
+        # families grouped by device are keyed by its name.
+        index = self._selector_index
+        changes = event.data.get("changes", {})
+        if index is None or not {"area_id", "name", "name_by_user"} & set(changes):
+            return
+        changed = False
+        for entry in er.async_entries_for_device(
+            er.async_get(self.hass), event.data["device_id"]
+        ):
+            changed = self._index_entity(index, entry.entity_id) or changed
+        if changed:
+            self._async_refresh_members()
+
+    @callback
+    def _handle_state_added_or_removed(self, event: Event) -> None:
+        # Registered entities follow the registry events above.
+        index = self._selector_index
+        entity_id = event.data["entity_id"]
+        if index is None or er.async_get(self.hass).async_get(entity_id) is not None:
+            return
+        if event.data.get("new_state") is None:
+            changed = index.remove(entity_id)
+        else:
+            changed = index.update(EntityInfo(entity_id))
+        if changed:
+            self._async_refresh_members()
+
+    def _index_entity(self, index: SelectorIndex, entity_id: str) -> bool:
+        entry = er.async_get(self.hass).async_get(entity_id)
+        if entry is None or entry.disabled_by is not None:
+            return index.remove(entity_id)
+        return index.update(_entity_info(entry, dr.async_get(self.hass)))
+
+    @callback
+    def _async_refresh_members(self) -> None:
+        """Hand the new selector members to the engine, keeping rule state."""
+        changes = self._rule_engine.update_rules(
+            self._expand_selectors(self._configured_rules)
+        )
+        if not changes.has_changes:
+            return
+        _LOGGER.debug(
+            "Selector members changed for rule(s): %s",
+            ", ".join(rule.rule_id for rule in changes.members),
+        )
+        self._async_rules_changed(changes)
+        self.hass.async_create_task(self.async_request_refresh())
 
-        prev_mobile_level = self._last_mobile_level
-        prev_email_active = self._last_email_active
-        self._rule_engine.evaluate(self.hass)
+    async def _async_restore_runtime(self) -> None:
+        try:
+            data = await self._store.async_load()
+        except Exception:
+            _LOGGER.exception("Failed to load Emergency Stop runtime state.")
+            return
+        if not isinstance(data, dict):
+            return
+        restored = self._rule_engine.restore_runtime(
+            data.get("rules") or {}, time.monotonic(), dt_util.utcnow().timestamp()
+        )
+        self._acknowledged = bool(data.get("acknowledged", False))
         self._stop_state = _build_stop_state(
+            self._rule_engine.rules, self._rule_engine.states, self._acknowledged
+        )
+        email_rules = [rule for rule in self._rule_engine.rules if rule.notify_email]
+        self._last_email_active = _build_stop_state(
+            email_rules, self._rule_engine.states, self._acknowledged
+        ).active
+        self._persist_signature = self._current_persist_signature()
+        _LOGGER.debug("Restored runtime state for %s rule(s).", restored)
+
+    @callback
+    def _async_track_freshness(self) -> None:
+        """Follow updates of the entities rules watch for staleness."""
+        self._async_stop_freshness()
+        entity_ids = self._rule_engine.freshness.entity_ids
+        if not entity_ids:
+            return
+        self._freshness_unsubs = [
+            async_track_state_change_event(
+                self.hass, sorted(entity_ids), self._handle_entity_update
+            ),
+            self._async_track_state_reported(entity_ids),
+        ]
+        self._schedule_stale_check()
+
+    @callback
+    def _async_track_state_reported(
+        self, entity_ids: Collection[str]
+    ) -> Callable[[], None]:
+        if _TRACK_STATE_REPORT is not None:
+            return _TRACK_STATE_REPORT(
+                self.hass, sorted(entity_ids), self._handle_entity_update
+            )
+        watched = frozenset(entity_ids)
+
+        @callback
+        def _is_watched(event_or_data: Any) -> bool:
+            # Older releases pass the event, HA 2024.4+ only its data.
+            data = getattr(event_or_data, "data", event_or_data)
+            return data.get("entity_id") in watched
+
+        # HA 2024.4+ requires a filter (and an immediate listener) here.
+        return self.hass.bus.async_listen(
+            _EVENT_STATE_REPORTED,
+            self._handle_entity_update,
+            event_filter=_is_watched,
+            run_immediately=True,
+        )
+
+    @callback
+    def _async_stop_freshness(self) -> None:
+        for unsub in self._freshness_unsubs:
+            unsub()
+        self._freshness_unsubs = []
+        if self._stale_cancel:
+            self._stale_cancel()
+            self._stale_cancel = None
+        self._stale_deadline = None
+
+    @callback
+    def _handle_entity_update(self, event: Event) -> None:
+        self._rule_engine.freshness.touch(event.data["entity_id"], time.monotonic())
+        # The earliest deadline may have moved; re-arm the timer for it.
+        self._schedule_stale_check()
+
+    def _schedule_stale_check(self) -> None:
+        deadline = self._rule_engine.freshness.next_deadline()
+        if deadline == self._stale_deadline and (
+            deadline is None or self._stale_cancel is not None
+        ):
+            return
+        if self._stale_cancel:
+            self._stale_cancel()
+            self._stale_cancel = None
+        self._stale_deadline = deadline
+        if deadline is None:
+            return
+        self._stale_cancel = async_call_later(
+            self.hass,
+            max(0.0, deadline - time.monotonic()),
+            self._handle_stale_deadline,
+        )
+
+    @callback
+    def _handle_stale_deadline(self, _now: Any) -> None:
+        self._stale_cancel = None
+        self._stale_deadline = None
+        if self._rule_engine.expire_stale():
+            if not self._simulation:
+                # Trip at the deadline: a requested refresh is debounced.
+                self._evaluate_shutdown_lane()
+                self._flush_input_batch()
+            # Notifications and the runtime save follow with a full pass.
+            self.hass.async_create_task(self.async_request_refresh())
+        self._schedule_stale_check()
+
+    @callback
+    def _async_track_lanes(self) -> None:
+        """Evaluate rules when their inputs change, not only on the tick.
+
+        A shutdown input runs the shutdown lane at once, so a shutdown does
+        not wait for the next tick or for the notify and limit rules. Inputs
+        of the lower lanes are micro-batched: a burst of changes evaluates
+        each woken rule once.
+        """
+        self._async_stop_lanes()
+        shutdown_ids = {
+            entity_id
+            for rule in self._rule_engine.lane_rules(LEVEL_SHUTDOWN)
+            for entity_id in rule.watched_entities
+        }
+        lane_ids = {
+            entity_id
+            for lane in LANES[1:]
+            for rule in self._rule_engine.lane_rules(lane)
+            for entity_id in rule.watched_entities
+        }
+        if shutdown_ids:
+            self._lane_unsubs.append(
+                async_track_state_change_event(
+                    self.hass, sorted(shutdown_ids), self._handle_shutdown_input
+                )
+            )
+        if lane_ids:
+            self._lane_unsubs.append(
+                async_track_state_change_event(
+                    self.hass, sorted(lane_ids), self._handle_lane_input
+                )
+            )
+
+    @callback
+    def _async_stop_lanes(self) -> None:
+        for unsub in self._lane_unsubs:
+            unsub()
+        self._lane_unsubs = []
+        self._cancel_input_batch()
+        self._cancel_shutdown_batch()
+
+    @callback
+    def _handle_shutdown_input(self, event: Event) -> None:
+        if self._simulation:
+            return
+        if not self._rule_engine.wake(event.data["entity_id"], LEVEL_SHUTDOWN):
+            return
+        if self._shutdown_batch is None:
+            self._evaluate_shutdown_lane()
+            return
+        # A few milliseconds at most, counted from the first change: a burst
+        # over a wide shutdown rule evaluates it once, not once per change.
+        now = time.monotonic()
+        if self._shutdown_batch.add(now):
+            self._evaluate_shutdown_lane()
+        elif self._shutdown_batch_cancel is None:
+            self._shutdown_batch_cancel = async_call_later(
+                self.hass,
+                max(0.0, self._shutdown_batch.flush_at - now),
+                self._handle_shutdown_batch_deadline,
+            )
+
+    @callback
+    def _handle_shutdown_batch_deadline(self, _now: Any) -> None:
+        self._shutdown_batch_cancel = None
+        self._evaluate_shutdown_lane()
+
+    @callback
+    def _handle_lane_input(self, event: Event) -> None:
+        if self._simulation:
+            return
+        woken = False
+        for lane in LANES[1:]:
+            woken = self._rule_engine.wake(event.data["entity_id"], lane) or woken
+        if not woken:
+            return
+        if self._input_batch is None:
+            self._flush_input_batch()
+            return
+        # Woken rules stay queued in the engine, so a burst of changes runs
+        # each of them once when the batch is flushed.
+        now = time.monotonic()
+        if self._input_batch.add(now):
+            self._flush_input_batch()
+        elif self._batch_cancel is None:
+            self._schedule_batch_flush(now)
+
+    def _schedule_batch_flush(self, now: float) -> None:
+        self._batch_cancel = async_call_later(
+            self.hass,
+            max(0.0, self._input_batch.flush_at - now),
+            self._handle_batch_deadline,
+        )
+
+    @callback
+    def _handle_batch_deadline(self, _now: Any) -> None:
+        self._batch_cancel = None
+        now = time.monotonic()
+        if not self._input_batch.pending:
+            return
+        if self._input_batch.flush_at > now:
+            # Changes kept arriving: wait for a quiet window or max latency.
+            self._schedule_batch_flush(now)
+            return
+        self._flush_input_batch()
+
+    def _flush_input_batch(self) -> None:
+        """Evaluate the limit and notify rules woken by input changes.
+
+        Runs in slices like the tick: when a slice is spent, it yields to
+        the event loop and continues where it stopped.
+        """
+        if self._batch_cancel:
+            self._batch_cancel()
+            self._batch_cancel = None
+        # Its own cursor: a flush runs during the yields of a sliced tick.
+        if not self._rule_engine.evaluate(
+            self.hass, LANES[1:], self._eval_slice, _INPUT_PASS
+        ):
+            self._batch_cancel = async_call_later(
+                self.hass, 0, self._handle_batch_resume
+            )
+            return
+        self._cancel_input_batch()
+        self._async_publish_level()
+
+    @callback
+    def _handle_batch_resume(self, _now: Any) -> None:
+        self._batch_cancel = None
+        self._flush_input_batch()
+
+    def _cancel_input_batch(self) -> None:
+        if self._batch_cancel:
+            self._batch_cancel()
+            self._batch_cancel = None
+        if self._input_batch is not None:
+            self._input_batch.clear()
+
+    def _cancel_shutdown_batch(self) -> None:
+        if self._shutdown_batch_cancel:
+            self._shutdown_batch_cancel()
+            self._shutdown_batch_cancel = None
+        if self._shutdown_batch is not None:
+            self._shutdown_batch.clear()
+
+    def _evaluate_shutdown_lane(self) -> None:
+        """Evaluate the shutdown lane; publish at once if the stop level moved.
+
+        Covers any pending shutdown input batch. Other changes (values,
+        details) and the notifications and runtime save follow with the next
+        regular pass.
+        """
+        self._cancel_shutdown_batch()
+        started = time.monotonic()
+        self._rule_engine.evaluate(self.hass, (LEVEL_SHUTDOWN,))
+        elapsed = time.monotonic() - started
+        if elapsed > _SHUTDOWN_LANE_BUDGET_SECONDS:
+            if not self._lane_over_budget:
+                _LOGGER.warning(
+                    "Shutdown rules took %.0f ms to evaluate (budget %.0f ms)",
+                    elapsed * 1000,
+                    _SHUTDOWN_LANE_BUDGET_SECONDS * 1000,
+                )
+            self._lane_over_budget = True
+        else:
+            self._lane_over_budget = False
+        self._async_publish_level()
+
+    def _async_publish_level(self) -> None:
+        """Publish the stop state at once if the stop level moved."""
+        stop_state = _build_stop_state(
             self._rule_engine.rules,
             self._rule_engine.states,
             self._acknowledged,
             previous=self._stop_state,
+            extra_events=self._watchdog_events,
         )
+        if (
+            stop_state.active == self._stop_state.active
+            and stop_state.level == self._stop_state.level
+        ):
+            return
+        self._stop_state = stop_state
+        self.async_update_listeners()
+
+    @callback
+    def _async_start_heartbeat(self) -> None:
+        loop = self.hass.loop
+        self._heartbeat.evaluated(loop.time())
+        due = self._heartbeat.start(loop.time())
+        self._heartbeat_cancel = loop.call_at(due, self._handle_heartbeat).cancel
+
+    @callback
+    def _async_stop_heartbeat(self) -> None:
+        if self._heartbeat_cancel:
+            self._heartbeat_cancel()
+            self._heartbeat_cancel = None
+
+    @callback
+    def _handle_heartbeat(self) -> None:
+        loop = self.hass.loop
+        now = loop.time()
+        healthy = self._heartbeat.healthy
+        due = self._heartbeat.beat(now)
+        self._heartbeat_cancel = loop.call_at(due, self._handle_heartbeat).cancel
+        if self._heartbeat.healthy != healthy:
+            self._async_health_changed()
+        elif now - self._lag_published_at >= _LAG_PUBLISH_SECONDS:
+            # The sensors otherwise only refresh with evaluation passes,
+            # which are what a stall stops.
+            self.async_update_listeners()
+        else:
+            return
+        self._lag_published_at = now
+
+    @callback
+    def _async_health_changed(self) -> None:
+        """Publish a health flip, raising or clearing the watchdog event."""
+        heartbeat = self._heartbeat
+        if heartbeat.healthy:
+            _LOGGER.info("Rule evaluation is back on time")
+            self._watchdog_events = []
+        else:
+            if heartbeat.stalled:
+                detail = f"No evaluation for over {heartbeat.stall_after:.0f} s"
+            else:
+                detail = (
+                    f"Event loop lag {heartbeat.lag * 1000:.0f} ms "
+                    f"(limit {heartbeat.threshold * 1000:.0f} ms)"
+                )
+            _LOGGER.warning("Rule evaluator unhealthy: %s", detail)
+            self._watchdog_events = _watchdog_events(
+                self._watchdog_level, detail, heartbeat.lag
+            )
+        if not self._simulation:
+            self._stop_state = _build_stop_state(
+                self._rule_engine.rules,
+                self._rule_engine.states,
+                self._acknowledged,
+                previous=self._stop_state,
+                extra_events=self._watchdog_events,
+            )
+            # No evaluation pass may come to send them: that is the stall.
+            self.hass.async_create_task(self._async_send_notifications())
+        self.async_update_listeners()
+
+    def _notification_states(
+        self,
+    ) -> tuple[EmergencyStopState, EmergencyStopState]:
+        """Stop states of the email and mobile notification rules."""
         email_rules = [rule for rule in self._rule_engine.rules if rule.notify_email]
         mobile_rules = [rule for rule in self._rule_engine.rules if rule.notify_mobile]
         email_state = _build_stop_state(
-            email_rules, self._rule_engine.states, self._acknowledged
+            email_rules,
+            self._rule_engine.states,
+            self._acknowledged,
+            extra_events=self._watchdog_events,
         )
         mobile_state = _build_stop_state(
-            mobile_rules, self._rule_engine.states, self._acknowledged
+            mobile_rules,
+            self._rule_engine.states,
+            self._acknowledged,
+            extra_events=self._watchdog_events,
         )
-        if not self._stop_state.active:
-            self._acknowledged = False
+        return email_state, mobile_state
+
+    async def _async_send_notifications(
+        self, states: tuple[EmergencyStopState, EmergencyStopState] | None = None
+    ) -> None:
+        """Send the email and mobile notifications due since the last call."""
+        email_state, mobile_state = states or self._notification_states()
+        prev_mobile_level = self._last_mobile_level
+        prev_email_active = self._last_email_active
         side_effects: list[asyncio.Future] = []
         side_effects.append(
             self._maybe_send_activation_email(prev_email_active, email_state)
@@ -889,6 +1009,72 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
             )
             self._last_mobile_level = mobile_state.level
         await self._run_side_effects(side_effects, "notifications/email")
+
+    def _current_persist_signature(self) -> tuple[Any, ...]:
+        return (self._acknowledged, self._rule_engine.persist_signature())
+
+    def _schedule_runtime_save(self) -> None:
+        signature = self._current_persist_signature()
+        if signature == self._persist_signature:
+            return
+        self._persist_signature = signature
+        self._store.async_delay_save(
+            self._runtime_store_data, _STORAGE_SAVE_DELAY_SECONDS
+        )
+
+    def _runtime_store_data(self) -> dict[str, Any]:
+        return {
+            "acknowledged": self._acknowledged,
+            "rules": self._rule_engine.export_runtime(
+                time.monotonic(), dt_util.utcnow().timestamp()
+            ),
+        }
+
+    async def _async_update_data(self) -> EmergencyStopState:
+        now_monotonic = time.monotonic()
+        if self._simulation:
+            if (
+                self._simulation.expires_at_monotonic is not None
+                and now_monotonic >= self._simulation.expires_at_monotonic
+            ):
+                send_notifications = self._simulation.send_notifications
+                self._simulation = None
+                if self._simulation_cancel:
+                    self._simulation_cancel()
+                    self._simulation_cancel = None
+                if not send_notifications:
+                    self._suppress_level_notification = True
+            else:
+                self._heartbeat.evaluated(self.hass.loop.time())
+                self._stop_state = self._build_simulation_state()
+                return self._stop_state
+
+        # Shutdown lane first, published on its own; the lower lanes yield to
+        # the event loop between slices so shutdown inputs arriving meanwhile
+        # are handled.
+        self._evaluate_shutdown_lane()
+        await asyncio.sleep(0)
+        while not self._rule_engine.evaluate(self.hass, LANES[1:], self._eval_slice):
+            await asyncio.sleep(0)
+        # Any pending input batch is covered by this pass.
+        self._cancel_input_batch()
+        self._heartbeat.evaluated(self.hass.loop.time())
+        self._lag_published_at = self.hass.loop.time()
+        if self._freshness_unsubs:
+            self._schedule_stale_check()
+        self._stop_state = _build_stop_state(
+            self._rule_engine.rules,
+            self._rule_engine.states,
+            self._acknowledged,
+            previous=self._stop_state,
+            extra_events=self._watchdog_events,
+        )
+        # Built before the acknowledgement is cleared below.
+        notification_states = self._notification_states()
+        if not self._stop_state.active:
+            self._acknowledged = False
+        self._schedule_runtime_save()
+        await self._async_send_notifications(notification_states)
         return self._stop_state
 
     @property
@@ -899,22 +1085,35 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
     def rule_states(self) -> dict[str, RuleRuntimeState]:
         return self._rule_engine.states
 
+    def rule_lane(self, rule_id: str) -> str:
+        return self._rule_engine.lane_of(rule_id)
+
     def reset(self) -> None:
         now_iso = dt_util.utcnow().isoformat()
         self._acknowledged = False
         self._rule_engine.reset()
         self._stop_state = EmergencyStopState(last_update=now_iso, level=LEVEL_NORMAL)
+        self._schedule_runtime_save()
 
     def acknowledge(self) -> None:
         now_iso = dt_util.utcnow().isoformat()
         self._acknowledged = True
         self._stop_state.acknowledged = True
         self._stop_state.last_update = now_iso
+        self._schedule_runtime_save()
 
     @property
     def stop_state(self) -> EmergencyStopState:
         return self._stop_state
 
+    @property
+    def heartbeat(self) -> Heartbeat:
+        return self._heartbeat
+
+    @property
+    def watchdog_level(self) -> str:
+        return self._watchdog_level
+
     def _effective_email_level(self, level: str | None) -> str:
         if level in LEVEL_OPTIONS:
             return level
@@ -1239,7 +1438,7 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
         rules_config = config.get(CONF_RULES, [])
         state_rows: list[dict[str, Any]] = []
         for rule in self._rule_engine.rules:
-            for entity_id in rule.entities:
+            for entity_id in rule.watched_entities:
                 state = self.hass.states.get(entity_id)
                 attributes: dict[str, Any] = {}
                 name = entity_id
@@ -1273,6 +1472,8 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
                     "last_match": runtime.last_match,
                     "last_aggregate": runtime.last_aggregate,
                     "last_entity": runtime.last_entity,
+                    "last_pack": runtime.last_pack,
+                    "last_cell": runtime.last_cell,
                     "last_detail": runtime.last_detail,
                     "last_update": runtime.last_update,
                     "latched": rule.latched,
@@ -1284,6 +1485,8 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
                     "current_level": runtime.current_level,
                     "latched_level": runtime.latched_level,
                     "active_levels": list(runtime.active_levels),
+                    "last_group": runtime.last_group,
+                    "groups": runtime.groups,
                 }
             )
 
@@ -1660,80 +1863,97 @@ class EmergencyStopCoordinator(DataUpdateCoordinator[EmergencyStopState]):
                 )
 
 
-def _load_rules(config: dict[str, Any]) -> list[RuleConfig]:
-    rules: list[RuleConfig] = []
-    for raw in config.get(CONF_RULES, []) or []:
-        try:
-            rule_id = str(raw.get(CONF_RULE_ID))
-            name = str(raw.get(CONF_RULE_NAME))
-        except (TypeError, ValueError):
-            _LOGGER.error("Invalid rule definition; missing id/name: %s", raw)
-            continue
-        if not rule_id or not name:
-            _LOGGER.error("Invalid rule definition; missing id/name: %s", raw)
-            continue
+def _input_batch(config: dict[str, Any]) -> MicroBatch | None:
+    window = _coerce_non_negative_int(
+        config.get(CONF_INPUT_BATCH_MS, DEFAULT_INPUT_BATCH_MS),
+        DEFAULT_INPUT_BATCH_MS,
+    )
+    if not window:
+        return None
+    max_latency = _coerce_non_negative_int(
+        config.get(CONF_INPUT_BATCH_MAX_LATENCY_MS, DEFAULT_INPUT_BATCH_MAX_LATENCY_MS),
+        DEFAULT_INPUT_BATCH_MAX_LATENCY_MS,
+    )
+    max_changes = _coerce_non_negative_int(
+        config.get(CONF_INPUT_BATCH_MAX_CHANGES, DEFAULT_INPUT_BATCH_MAX_CHANGES),
+        DEFAULT_INPUT_BATCH_MAX_CHANGES,
+    )
+    return MicroBatch(window / 1000, max(window, max_latency) / 1000, max_changes)
 
-        thresholds = list(raw.get(CONF_RULE_THRESHOLDS, []))
-        severity_mode = raw.get(CONF_RULE_SEVERITY_MODE, SEVERITY_MODE_SIMPLE)
-        levels: dict[str, dict[str, Any]] = {}
-        raw_levels = raw.get(CONF_RULE_LEVELS, {}) or {}
-        if isinstance(raw_levels, dict):
-            for level in LEVEL_ORDER:
-                cfg = raw_levels.get(level)
-                if not isinstance(cfg, dict):
-                    continue
-                try:
-                    threshold = cfg.get("threshold")
-                    duration = cfg.get("duration_seconds")
-                    if threshold is None or duration is None:
-                        continue
-                    levels[level] = {
-                        "threshold": float(threshold),
-                        "duration_seconds": int(duration),
-                    }
-                except (TypeError, ValueError):
-                    continue
-        rule = RuleConfig(
-            rule_id=rule_id,
-            name=name,
-            data_type=raw.get(CONF_RULE_DATA_TYPE, DATA_TYPE_NUMERIC),
-            entities=list(raw.get(CONF_RULE_ENTITIES, [])),
-            aggregate=raw.get(CONF_RULE_AGGREGATE, ""),
-            condition=raw.get(CONF_RULE_CONDITION, ""),
-            thresholds=thresholds,
-            duration_seconds=max(
-                1, int(raw.get(CONF_RULE_DURATION, DEFAULT_RULE_DURATION))
-            ),
-            interval_seconds=max(
-                1, int(raw.get(CONF_RULE_INTERVAL, DEFAULT_RULE_INTERVAL))
-            ),
-            level=raw.get(CONF_RULE_LEVEL, DEFAULT_RULE_LEVEL),
-            latched=bool(raw.get(CONF_RULE_LATCHED, DEFAULT_RULE_LATCHED)),
-            unknown_handling=raw.get(
-                CONF_RULE_UNKNOWN_HANDLING, DEFAULT_RULE_UNKNOWN_HANDLING
-            ),
-            severity_mode=severity_mode,
-            direction=raw.get(CONF_RULE_DIRECTION),
-            levels=levels,
-            text_case_sensitive=bool(
-                raw.get(CONF_RULE_TEXT_CASE_SENSITIVE, DEFAULT_TEXT_CASE_SENSITIVE)
-            ),
-            text_trim=bool(raw.get(CONF_RULE_TEXT_TRIM, DEFAULT_TEXT_TRIM)),
-            notify_email=bool(
-                raw.get(CONF_RULE_NOTIFY_EMAIL, DEFAULT_RULE_NOTIFY_EMAIL)
-            ),
-            notify_mobile=bool(
-                raw.get(CONF_RULE_NOTIFY_MOBILE, DEFAULT_RULE_NOTIFY_MOBILE)
-            ),
-        )
-        rules.append(rule)
-    return rules
+
+def _shutdown_batch(config: dict[str, Any]) -> MicroBatch | None:
+    latency = _coerce_non_negative_int(
+        config.get(CONF_INPUT_BATCH_SHUTDOWN_MS, DEFAULT_INPUT_BATCH_SHUTDOWN_MS),
+        DEFAULT_INPUT_BATCH_SHUTDOWN_MS,
+    )
+    if not latency:
+        return None
+    max_changes = _coerce_non_negative_int(
+        config.get(CONF_INPUT_BATCH_MAX_CHANGES, DEFAULT_INPUT_BATCH_MAX_CHANGES),
+        DEFAULT_INPUT_BATCH_MAX_CHANGES,
+    )
+    # Window and max latency equal: flushed a fixed time after the first change.
+    return MicroBatch(latency / 1000, latency / 1000, max_changes)
 
 
-def _min_interval(rules: list[RuleConfig]) -> int:
-    if not rules:
-        return 1
-    return max(1, min(rule.interval_seconds for rule in rules))
+def _stall_after(update_interval: timedelta, lag_threshold: float) -> float:
+    """Seconds without a completed pass before the evaluator counts as stalled."""
+    return 2 * update_interval.total_seconds() + max(lag_threshold, HEARTBEAT_SECONDS)
+
+
+def _watchdog_events(level: str, detail: str, lag: float) -> list[dict[str, Any]]:
+    if level == LEVEL_NORMAL:
+        return []
+    now_iso = dt_util.utcnow().isoformat()
+    return [
+        {
+            "rule_id": "watchdog",
+            "reason": "Rule evaluator unhealthy",
+            "level": level,
+            "entity_id": None,
+            "value": round(lag * 1000),
+            "detail": detail,
+            "latched": False,
+            "first_seen": now_iso,
+            "last_seen": now_iso,
+            "data_type": "watchdog",
+        }
+    ]
+
+
+def _settings_config(config: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in config.items() if key != CONF_RULES}
+
+
+@callback
+def _is_state_added_or_removed(event_or_data: Any) -> bool:
+    # Older releases pass the event, HA 2024.4+ only its data.
+    data = getattr(event_or_data, "data", event_or_data)
+    return data.get("old_state") is None or data.get("new_state") is None
+
+
+def _entity_info(entry: er.RegistryEntry, devices: dr.DeviceRegistry) -> EntityInfo:
+    area_id = entry.area_id
+    device = devices.async_get(entry.device_id) if entry.device_id else None
+    if area_id is None and device is not None:
+        area_id = device.area_id
+    return EntityInfo(
+        entity_id=entry.entity_id,
+        area_id=area_id,
+        device_class=entry.device_class or entry.original_device_class,
+        labels=frozenset(entry.labels),
+        device_id=entry.device_id,
+        device_name=(device.name_by_user or device.name) if device else None,
+    )
+
+
+def _storage_key(entry_id: str) -> str:
+    return f"{DOMAIN}.{entry_id}"
+
+
+async def async_remove_runtime_store(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove persisted runtime state for a deleted config entry."""
+    await Store(hass, _STORAGE_VERSION, _storage_key(entry_id)).async_remove()
 
 
 def _rule_active_level(
@@ -1742,7 +1962,7 @@ def _rule_active_level(
     if runtime is None or not runtime.active:
         return None
     if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
-        return runtime.current_level
+        return rule.stop_level(runtime.current_level)
     return rule.level
 
 
@@ -1751,8 +1971,9 @@ def _build_stop_state(
     states: dict[str, RuleRuntimeState],
     acknowledged: bool,
     previous: EmergencyStopState | None = None,
+    extra_events: list[dict[str, Any]] | None = None,
 ) -> EmergencyStopState:
-    active_events: list[dict[str, Any]] = []
+    active_events: list[dict[str, Any]] = list(extra_events or ())
     for rule in rules:
         runtime = states.get(rule.rule_id)
         level = _rule_active_level(rule, runtime)
@@ -1764,6 +1985,9 @@ def _build_stop_state(
                 "reason": rule.name,
                 "level": level,
                 "entity_id": runtime.last_entity,
+                "group": rule.group_name(runtime.last_group),
+                "pack": runtime.last_pack,
+                "cell": runtime.last_cell,
                 "value": runtime.last_aggregate,
                 "detail": runtime.last_detail or rule.name,
                 "latched": rule.latched,
@@ -1792,21 +2016,21 @@ def _build_stop_state(
         return stop_state
 
     def primary_sort_key(event: dict[str, Any]) -> tuple[int, str, str]:
-        rank = _LEVEL_RANK.get(event.get("level", ""), 0)
+        rank = LEVEL_RANK.get(event.get("level", ""), 0)
         first_seen = event.get("first_seen") or ""
         rule_id = event.get("rule_id") or ""
         return (-rank, first_seen, rule_id)
 
     primary = min(active_events, key=primary_sort_key)
-    level = _highest_level([event.get("level", "") for event in active_events])
+    level = highest_level([event.get("level", "") for event in active_events])
     stop_state = EmergencyStopState(
         active=True,
         level=level,
         primary_reason=primary.get("reason"),
         primary_level=primary.get("level"),
-        primary_pack=None,
+        primary_pack=primary.get("pack"),
         primary_input=None,
-        primary_cell=None,
+        primary_cell=primary.get("cell"),
         primary_sensor_entity=primary.get("entity_id"),
         primary_value=primary.get("value"),
         primary_detail=primary.get("detail"),
@@ -1840,124 +2064,6 @@ def _stop_states_equal(
     )
 
 
-def _parse_numeric_state(state: Any) -> tuple[float | None, str | None]:
-    if state is None:
-        return None, "missing"
-    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
-        return None, "unknown"
-    try:
-        return float(state.state), None
-    except (TypeError, ValueError):
-        return None, "invalid"
-
-
-def _parse_binary_state(state: Any) -> tuple[str | None, str | None]:
-    if state is None:
-        return None, "missing"
-    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
-        return None, "unknown"
-    value = str(state.state).lower()
-    if value in ("on", "off"):
-        return value, None
-    return None, "invalid"
-
-
-def _parse_text_state(state: Any) -> tuple[str | None, str | None]:
-    if state is None:
-        return None, "missing"
-    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
-        return None, "unknown"
-    return str(state.state), None
-
-
-def _aggregate_numeric(
-    values: list[tuple[str, float]], aggregate: str
-) -> tuple[float, str | None]:
-    if aggregate == "min":
-        entity_id, value = min(values, key=lambda item: item[1])
-        return value, entity_id
-    if aggregate == "sum":
-        return sum(value for _, value in values), None
-    if aggregate == "avg":
-        return sum(value for _, value in values) / len(values), None
-    entity_id, value = max(values, key=lambda item: item[1])
-    return value, entity_id
-
-
-def _compare_numeric(value: float | int, condition: str, thresholds: list[Any]) -> bool:
-    if condition == COND_GT:
-        return value > float(thresholds[0])
-    if condition == COND_GTE:
-        return value >= float(thresholds[0])
-    if condition == COND_LT:
-        return value < float(thresholds[0])
-    if condition == COND_LTE:
-        return value <= float(thresholds[0])
-    if condition == COND_EQ:
-        return value == float(thresholds[0])
-    low = float(thresholds[0])
-    high = float(thresholds[1])
-    return low <= value <= high
-
-
-def _has_required_thresholds(rule: RuleConfig) -> bool:
-    if rule.condition == COND_BETWEEN:
-        return len(rule.thresholds) >= 2
-    return len(rule.thresholds) >= 1
-
-
-def _highest_level(levels: list[str] | None) -> str | None:
-    if not levels:
-        return None
-    return max(levels, key=lambda level: _LEVEL_RANK.get(level, 0))
-
-
-def _handle_unknown(rule: RuleConfig, reason: str) -> RuleEvalResult:
-    detail = f"{rule.name}: {reason}"
-    if rule.unknown_handling == UNKNOWN_TREAT_VIOLATION:
-        return RuleEvalResult(True, None, detail, None, reason)
-    if rule.unknown_handling == UNKNOWN_TREAT_OK:
-        return RuleEvalResult(False, None, detail, None, reason)
-    return RuleEvalResult(None, None, detail, None, reason)
-
-
-def _format_numeric_detail(rule: RuleConfig, value: float) -> str:
-    if rule.condition == COND_BETWEEN and len(rule.thresholds) >= 2:
-        return (
-            f"{rule.name}: {rule.aggregate}={value:.3f} between "
-            f"{rule.thresholds[0]}..{rule.thresholds[1]}"
-        )
-    threshold = rule.thresholds[0] if rule.thresholds else ""
-    return f"{rule.name}: {rule.aggregate}={value:.3f} {rule.condition} {threshold}"
-
-
-def _format_binary_state_detail(rule: RuleConfig, target: str) -> str:
-    return f"{rule.name}: {rule.aggregate} is {target}"
-
-
-def _format_binary_count_detail(rule: RuleConfig, count_on: int) -> str:
-    if rule.condition == COND_BETWEEN and len(rule.thresholds) >= 2:
-        return (
-            f"{rule.name}: count={count_on} between "
-            f"{rule.thresholds[0]}..{rule.thresholds[1]}"
-        )
-    threshold = rule.thresholds[0] if rule.thresholds else ""
-    return f"{rule.name}: count={count_on} {rule.condition} {threshold}"
-
-
-def _format_text_detail(rule: RuleConfig, match_value: str) -> str:
-    return f"{rule.name}: {rule.condition} '{match_value}'"
-
-
-def _format_semafor_detail(
-    rule: RuleConfig, level: str, value: float | int | None, threshold: float | int
-) -> str:
-    if value is None:
-        return f"{rule.name}: {level} threshold {threshold}"
-    comparator = ">=" if rule.direction != DIRECTION_LOWER_IS_WORSE else "<="
-    return f"{rule.name}: {level} {value} {comparator} {threshold}"
-
-
 def _get_entry_config(entry: ConfigEntry) -> dict[str, Any]:
     return {**entry.data, **entry.options}
 
@@ -1970,8 +2076,8 @@ def _split_notify_service(service: str) -> tuple[str, str]:
 
 
 def _is_downgrade(prev_level: str, new_level: str) -> bool:
-    prev_rank = _LEVEL_RANK.get(prev_level, 0)
-    new_rank = _LEVEL_RANK.get(new_level, 0)
+    prev_rank = LEVEL_RANK.get(prev_level, 0)
+    new_rank = LEVEL_RANK.get(new_level, 0)
     return new_rank < prev_rank
 
 
@@ -0,0 +1,43 @@
+"""Rule evaluation core for Emergency Stop.
+
+Nothing in this package imports Home Assistant. The engine reads entity
+states through a ``StateProvider`` and time through a ``Clock``, so the same
+code runs inside the integration, in offline tooling, and on a virtual clock.
+"""
+from __future__ import annotations
+
+from .core import (
+    LEVEL_RANK,
+    RuleConfig,
+    RuleEngine,
+    RuleEvalResult,
+    RuleRuntimeState,
+    RuleSetChanges,
+    deterministic_offset_seconds,
+    highest_level,
+    load_rules,
+    min_interval,
+    normalize_aggregate,
+    rule_fingerprint,
+)
+from .protocols import Clock, EntityState, StateProvider, SystemClock, VirtualClock
+
+__all__ = [
+    "LEVEL_RANK",
+    "Clock",
+    "EntityState",
+    "RuleConfig",
+    "RuleEngine",
+    "RuleEvalResult",
+    "RuleRuntimeState",
+    "RuleSetChanges",
+    "StateProvider",
+    "SystemClock",
+    "VirtualClock",
+    "deterministic_offset_seconds",
+    "highest_level",
+    "load_rules",
+    "min_interval",
+    "normalize_aggregate",
+    "rule_fingerprint",
+]
@@ -0,0 +1,147 @@
+"""Offline rule evaluation.
+
+Usage::
+
+    python -m custom_components.emergency_stop.engine replay \\
+        emergency_stop_rules_<entry>_<timestamp>.json states.ndjson
+
+    python -m custom_components.emergency_stop.engine backtest \\
+        emergency_stop_rules_<entry>_<timestamp>.json home-assistant_v2.db
+
+``replay`` writes every activation, level change and clear to stdout as one
+JSON object per line. ``backtest`` reads the recorder database and prints a
+per-rule summary: activations and time spent in each level.
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+import json
+import logging
+import sqlite3
+import sys
+from typing import Iterable, TextIO
+
+from .backtest import run_backtest
+from .recorder import DEFAULT_BATCH_SIZE, iter_recorder_changes, open_recorder_db
+from .replay import Transition, iter_ndjson_changes, load_rule_export, replay
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    # Invalid/missing state messages are expected noise until every entity
+    # has its first recorded state; show them only on request.
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.CRITICAL,
+        format="%(levelname)s %(message)s",
+    )
+    try:
+        rules = load_rule_export(args.rules)
+    except (OSError, ValueError) as err:
+        parser.error(f"cannot load rules: {err}")
+    if not rules:
+        parser.error(f"{args.rules}: rule set is empty")
+    return args.handler(args, rules)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_components.emergency_stop.engine",
+        description="Evaluate an exported Emergency Stop rule set offline.",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="print engine log messages"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = commands.add_parser(
+        "replay", help="replay an NDJSON stream of state changes"
+    )
+    replay_parser.add_argument("rules", help="rules export (JSON)")
+    replay_parser.add_argument(
+        "states", help="time-ordered NDJSON state changes, '-' for stdin"
+    )
+    replay_parser.add_argument(
+        "--until", type=_parse_time, help="stop the virtual clock at this ISO time"
+    )
+    replay_parser.set_defaults(handler=_run_replay)
+
+    backtest_parser = commands.add_parser(
+        "backtest", help="summarize rule behaviour over a recorder database"
+    )
+    backtest_parser.add_argument("rules", help="rules export (JSON)")
+    backtest_parser.add_argument("database", help="recorder SQLite database")
+    backtest_parser.add_argument(
+        "--start", type=_parse_time, help="first moment to evaluate (ISO time)"
+    )
+    backtest_parser.add_argument(
+        "--end", type=_parse_time, help="last moment to evaluate (ISO time)"
+    )
+    backtest_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="rows fetched per entity per round trip",
+    )
+    backtest_parser.set_defaults(handler=_run_backtest)
+    return parser
+
+
+def _run_replay(args: argparse.Namespace, rules) -> int:
+    if args.states == "-":
+        return _replay_lines(sys.stdin, rules, args.until)
+    with open(args.states, encoding="utf-8") as handle:
+        return _replay_lines(handle, rules, args.until)
+
+
+def _run_backtest(args: argparse.Namespace, rules) -> int:
+    entity_ids = {entity_id for rule in rules for entity_id in rule.watched_entities}
+    try:
+        connection = open_recorder_db(args.database)
+    except sqlite3.Error as err:
+        print(f"error: {args.database}: {err}", file=sys.stderr)
+        return 1
+    try:
+        changes = iter_recorder_changes(
+            connection,
+            entity_ids,
+            start=args.start,
+            end=args.end,
+            batch_size=max(1, args.batch_size),
+            attributes=any(rule.attribute for rule in rules),
+        )
+        report = run_backtest(rules, changes, args.end)
+    except sqlite3.Error as err:
+        print(f"error: {args.database}: {err}", file=sys.stderr)
+        return 1
+    finally:
+        connection.close()
+    json.dump(report.as_dict(), sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+    return 0
+
+
+def _replay_lines(lines: Iterable[str], rules, until: datetime | None) -> int:
+    try:
+        _write_transitions(replay(rules, iter_ndjson_changes(lines), until), sys.stdout)
+    except ValueError as err:
+        print(f"error: {err}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _write_transitions(transitions: Iterable[Transition], output: TextIO) -> None:
+    for transition in transitions:
+        output.write(json.dumps(transition.as_dict(), ensure_ascii=False) + "\n")
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
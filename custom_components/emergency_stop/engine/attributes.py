@@ -0,0 +1,100 @@
+"""Numeric rule inputs read from entity attributes, including lists.
+
+A BMS typically publishes one entity per pack with the cell voltages as a
+list attribute. Instead of one entity per cell, a rule reads the attribute
+at ``path`` from each of its entities and flattens lists into a single
+value vector. The aggregate runs over that vector once, and the position of
+the reading behind it (pack = entity, cell = list item) is recovered from its
+index only for the one or two readings that are reported.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Mapping, NamedTuple
+
+
+class CellRef(NamedTuple):
+    """Where a reading came from; ``pack`` and ``cell`` count from 1."""
+
+    entity_id: str
+    pack: int
+    cell: int | None
+
+
+@lru_cache(maxsize=256)
+def parse_path(path: str) -> tuple[str | int, ...]:
+    """Split ``bms.cells.0`` into keys; numeric parts index into lists."""
+    parts = str(path).strip().split(".")
+    if not all(part.strip() for part in parts):
+        raise ValueError(f"invalid attribute path: {path!r}")
+    return tuple(int(part) if part.isdigit() else part.strip() for part in parts)
+
+
+def resolve(attributes: Mapping[str, Any] | None, path: tuple[str | int, ...]) -> Any:
+    """Value at ``path``, or None when any step is missing."""
+    value: Any = attributes
+    for key in path:
+        if isinstance(key, int) and isinstance(value, (list, tuple)):
+            if key >= len(value):
+                return None
+            value = value[key]
+        elif isinstance(value, Mapping):
+            value = value.get(key)
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+@dataclass
+class CellValues:
+    """Flattened readings of a rule with the pack and cell of each one."""
+
+    values: list[float] = field(default_factory=list)
+    # Parallel to ``values``; cells are None for scalar attributes.
+    packs: list[int] = field(default_factory=list)
+    cells: list[int | None] = field(default_factory=list)
+
+    def add(self, pack: int, value: Any) -> int:
+        """Add a scalar or list reading; return how many items were invalid."""
+        if not isinstance(value, (list, tuple)):
+            number = _as_number(value)
+            if number is None:
+                return 1
+            self.values.append(number)
+            self.packs.append(pack)
+            self.cells.append(None)
+            return 0
+        invalid = 0
+        for cell, item in enumerate(value, start=1):
+            number = _as_number(item)
+            if number is None:
+                invalid += 1
+                continue
+            self.values.append(number)
+            self.packs.append(pack)
+            self.cells.append(cell)
+        return invalid
+
+    def indexed(self) -> list[tuple[int, float]]:
+        """``(index, value)`` pairs for the aggregates, in one pass."""
+        return list(enumerate(self.values))
+
+    def locate(self, index: int | None, entities: list[str]) -> CellRef | None:
+        if index is None:
+            return None
+        pack = self.packs[index]
+        return CellRef(entities[pack - 1], pack, self.cells[index])
+
+
+def _as_number(value: Any) -> float | None:
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    # NaN never compares; treat it like an unreadable cell.
+    return number if number == number else None
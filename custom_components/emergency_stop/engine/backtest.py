@@ -0,0 +1,143 @@
+"""Summarize what a rule set would have done over recorded history."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterable
+
+from ..const import LEVEL_ORDER
+from .core import RuleConfig
+from .replay import Replayer, StateChange, Transition
+
+
+@dataclass
+class LevelStats:
+    seconds: float = 0.0
+    periods: int = 0
+    longest_seconds: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.seconds += seconds
+        self.periods += 1
+        self.longest_seconds = max(self.longest_seconds, seconds)
+
+
+@dataclass
+class RuleStats:
+    rule_id: str
+    rule_name: str
+    activations: int = 0
+    active_seconds: float = 0.0
+    levels: dict[str, LevelStats] = field(default_factory=dict)
+    # Least to most severe; levels not in it follow in order of occurrence.
+    level_order: tuple[str, ...] = tuple(LEVEL_ORDER)
+    current_level: str | None = None
+    level_since: datetime | None = None
+    active_since: datetime | None = None
+
+    def as_dict(self) -> dict[str, Any]:
+        rank = {level: index for index, level in enumerate(self.level_order)}
+        occurred = sorted(
+            self.levels.items(), key=lambda item: rank.get(item[0], len(rank))
+        )
+        return {
+            "rule_id": self.rule_id,
+            "rule_name": self.rule_name,
+            "activations": self.activations,
+            "active_seconds": round(self.active_seconds, 3),
+            "levels": {
+                level: {
+                    "seconds": round(stats.seconds, 3),
+                    "periods": stats.periods,
+                    "longest_seconds": round(stats.longest_seconds, 3),
+                    "mean_seconds": round(stats.seconds / stats.periods, 3),
+                }
+                for level, stats in occurred
+            },
+        }
+
+
+class BacktestReport:
+    """Running per-rule totals built from a transition stream.
+
+    Memory is bounded by the number of rules and levels, not by the length
+    of the history.
+    """
+
+    def __init__(self, rules: list[RuleConfig]) -> None:
+        self._stats = {
+            rule.rule_id: RuleStats(
+                rule.rule_id,
+                rule.name,
+                level_order=rule.ladder.levels or tuple(LEVEL_ORDER),
+            )
+            for rule in rules
+        }
+        self.start: datetime | None = None
+        self.end: datetime | None = None
+        self.changes = 0
+
+    @property
+    def rules(self) -> list[RuleStats]:
+        return list(self._stats.values())
+
+    def add(self, transition: Transition) -> None:
+        stats = self._stats[transition.rule_id]
+        when = transition.when
+        self._close_level(stats, when)
+        if transition.previous_level is None:
+            stats.activations += 1
+            stats.active_since = when
+        if transition.level is None and stats.active_since is not None:
+            stats.active_seconds += (when - stats.active_since).total_seconds()
+            stats.active_since = None
+        stats.current_level = transition.level
+        stats.level_since = when if transition.level is not None else None
+
+    def close(self, end: datetime) -> None:
+        """Count levels still active at ``end`` as ending there."""
+        self.end = end
+        for stats in self._stats.values():
+            self._close_level(stats, end)
+            if stats.active_since is not None:
+                stats.active_seconds += (end - stats.active_since).total_seconds()
+                stats.active_since = end
+            stats.level_since = end if stats.current_level is not None else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "state_changes": self.changes,
+            "rules": [stats.as_dict() for stats in self._stats.values()],
+        }
+
+    @staticmethod
+    def _close_level(stats: RuleStats, when: datetime) -> None:
+        if stats.current_level is None or stats.level_since is None:
+            return
+        seconds = (when - stats.level_since).total_seconds()
+        stats.levels.setdefault(stats.current_level, LevelStats()).add(seconds)
+
+
+def run_backtest(
+    rules: list[RuleConfig],
+    changes: Iterable[StateChange],
+    end: datetime | None = None,
+) -> BacktestReport:
+    """Replay ``changes`` and return the per-rule summary."""
+    report = BacktestReport(rules)
+    replayer: Replayer | None = None
+    for change in changes:
+        if replayer is None:
+            replayer = Replayer(rules, change.when)
+            report.start = change.when
+        for transition in replayer.feed(change):
+            report.add(transition)
+        report.changes += 1
+    if replayer is None:
+        return report
+    for transition in replayer.finish(end):
+        report.add(transition)
+    report.close(end or replayer.now)
+    return report
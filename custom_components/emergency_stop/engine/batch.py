@@ -0,0 +1,48 @@
+"""Micro-batching of input changes that wake rules.
+
+A burst of updates (a BMS publishing hundreds of cell sensors at once) would
+otherwise evaluate the same wide rule once per update. The batch only decides
+*when* to evaluate: the woken rules are already queued in the engine, so each
+of them runs once per flush however many of its inputs changed.
+"""
+from __future__ import annotations
+
+
+class MicroBatch:
+    """Flush timing for a burst of input changes (monotonic seconds).
+
+    A batch is flushed once no change arrived for ``window`` seconds, but
+    never later than ``max_latency`` after its first change, and at once when
+    it holds ``max_changes`` changes (0 = no cap).
+    """
+
+    def __init__(self, window: float, max_latency: float, max_changes: int) -> None:
+        self.window = window
+        self.max_latency = max_latency
+        self.max_changes = max_changes
+        self._first: float | None = None
+        self._last = 0.0
+        self.changes = 0
+
+    @property
+    def pending(self) -> bool:
+        return self._first is not None
+
+    @property
+    def flush_at(self) -> float | None:
+        """Monotonic time the pending batch is due; None when empty."""
+        if self._first is None:
+            return None
+        return min(self._last + self.window, self._first + self.max_latency)
+
+    def add(self, now: float) -> bool:
+        """Record a change; True when the batch must be flushed right away."""
+        if self._first is None:
+            self._first = now
+        self._last = now
+        self.changes += 1
+        return bool(self.max_changes) and self.changes >= self.max_changes
+
+    def clear(self) -> None:
+        self._first = None
+        self.changes = 0
@@ -0,0 +1,2611 @@
+"""Home Assistant independent rule evaluation core."""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field, fields, replace
+from datetime import datetime
+from functools import cached_property
+import hashlib
+import json
+import logging
+import re
+import zlib
+from typing import Any, Callable, Collection, Iterable
+
+from ..const import (
+    AGGREGATE_COUNT_ABOVE,
+    AGGREGATE_MEDIAN,
+    AGGREGATE_PERCENTILE,
+    AGGREGATE_SPREAD,
+    CONF_RULES,
+    CONF_RULE_AGGREGATE,
+    CONF_RULE_AGGREGATE_PARAMETER,
+    CONF_RULE_ATTRIBUTE,
+    CONF_RULE_CLEAR_DURATION,
+    CONF_RULE_CLEAR_THRESHOLD,
+    CONF_RULE_COINCIDENCE,
+    CONF_RULE_CONDITION,
+    CONF_RULE_DATA_TYPE,
+    CONF_RULE_DIRECTION,
+    CONF_RULE_DURATION,
+    CONF_RULE_ENTITIES,
+    CONF_RULE_EXPRESSION,
+    CONF_RULE_FREEZE_LATCHED,
+    CONF_RULE_GROUP_BY,
+    CONF_RULE_HYSTERESIS,
+    CONF_RULE_ID,
+    CONF_RULE_INPUT_MODE,
+    CONF_RULE_INTERVAL,
+    CONF_RULE_LATCHED,
+    CONF_RULE_LEVEL,
+    CONF_RULE_LEVELS,
+    CONF_RULE_MAX_INTERVAL,
+    CONF_RULE_NAME,
+    CONF_RULE_NOTIFY_EMAIL,
+    CONF_RULE_NOTIFY_MOBILE,
+    CONF_RULE_PRECONDITION_ENTITIES,
+    CONF_RULE_PRECONDITION_RULES,
+    CONF_RULE_RATE_SMOOTHING,
+    CONF_RULE_SELECTORS,
+    CONF_RULE_SEVERITY_MODE,
+    CONF_RULE_SOURCE_RULES,
+    CONF_RULE_STALE_SECONDS,
+    CONF_RULE_TEXT_CASE_SENSITIVE,
+    CONF_RULE_TEXT_PATTERNS,
+    CONF_RULE_TEXT_TRIM,
+    CONF_RULE_THRESHOLDS,
+    CONF_RULE_UNKNOWN_HANDLING,
+    CONF_RULE_WINDOW_FUNCTION,
+    CONF_RULE_WINDOW_SECONDS,
+    COND_BETWEEN,
+    COND_EQ,
+    COND_EQUALS,
+    COND_GT,
+    COND_GTE,
+    COND_IS_OFF,
+    COND_IS_ON,
+    COND_LT,
+    COND_LTE,
+    DATA_TYPE_BINARY,
+    DATA_TYPE_COMPOSITE,
+    DATA_TYPE_EXPRESSION,
+    DATA_TYPE_NUMERIC,
+    DATA_TYPE_TEXT,
+    DEFAULT_RULE_CLEAR_DURATION,
+    DEFAULT_RULE_COINCIDENCE,
+    DEFAULT_RULE_DURATION,
+    DEFAULT_RULE_FREEZE_LATCHED,
+    DEFAULT_RULE_HYSTERESIS,
+    DEFAULT_RULE_INPUT_MODE,
+    DEFAULT_RULE_INTERVAL,
+    DEFAULT_RULE_LATCHED,
+    DEFAULT_RULE_LEVEL,
+    DEFAULT_RULE_MAX_INTERVAL,
+    DEFAULT_RULE_NOTIFY_EMAIL,
+    DEFAULT_RULE_NOTIFY_MOBILE,
+    DEFAULT_RULE_RATE_SMOOTHING,
+    DEFAULT_RULE_STALE_SECONDS,
+    DEFAULT_RULE_UNKNOWN_HANDLING,
+    DEFAULT_RULE_WINDOW_FUNCTION,
+    DEFAULT_RULE_WINDOW_SECONDS,
+    DEFAULT_TEXT_CASE_SENSITIVE,
+    DEFAULT_TEXT_TRIM,
+    DIRECTION_LOWER_IS_WORSE,
+    FROZEN_OBSERVE_SECONDS,
+    GROUP_BY_CAPTURE,
+    GROUP_BY_DEVICE,
+    INPUT_MODE_RATE,
+    INPUT_MODES,
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    LEVEL_ORDER,
+    LEVEL_SHUTDOWN,
+    NUMERIC_DATA_TYPES,
+    PARAMETRIC_AGGREGATES,
+    SEVERITY_MODE_SEMAFOR,
+    SEVERITY_MODE_SIMPLE,
+    UNKNOWN_TREAT_OK,
+    UNKNOWN_TREAT_VIOLATION,
+    WINDOW_FUNCTIONS,
+    WINDOW_NONE,
+)
+from .attributes import CellRef, CellValues, parse_path, resolve
+from .expression import (
+    CompiledExpression,
+    ExpressionError,
+    compile_expression,
+    input_name,
+    input_names,
+)
+from .freshness import FreshnessIndex
+from .graph import CycleError, topological_order
+from .ladder import LevelLadder, build_ladder, stop_level_of
+from .lanes import assign_lanes, by_lane
+from .protocols import Clock, StateProvider, SystemClock
+from .rate import RateOfChange
+from .schedule import adaptive_interval
+from .selection import median, percentile
+from .selectors import parse_selector
+from .textmatch import TextMatcher, compile_needles
+from .window import TimeWindow
+
+_LOGGER = logging.getLogger(__name__)
+
+# Mirrors homeassistant.const without importing Home Assistant.
+STATE_UNAVAILABLE = "unavailable"
+STATE_UNKNOWN = "unknown"
+
+LEVEL_RANK = {LEVEL_NOTIFY: 1, LEVEL_LIMIT: 2, LEVEL_SHUTDOWN: 3}
+
+_PERCENTILE_SHORTHAND = re.compile(r"p(\d+(?:\.\d+)?)")
+
+
+def deterministic_offset_seconds(rule_id: str, interval_seconds: int) -> int:
+    if interval_seconds <= 1:
+        return 0
+    checksum = zlib.crc32(rule_id.encode("utf-8")) & 0xFFFFFFFF
+    return int(checksum % interval_seconds)
+
+
+@dataclass
+class RuleConfig:
+    rule_id: str
+    name: str
+    data_type: str
+    entities: list[str]
+    aggregate: str
+    condition: str | None
+    thresholds: list[Any]
+    duration_seconds: int
+    interval_seconds: int
+    level: str
+    latched: bool
+    unknown_handling: str
+    severity_mode: str
+    direction: str | None
+    levels: dict[str, dict[str, Any]]
+    text_case_sensitive: bool
+    text_trim: bool
+    notify_email: bool = True
+    notify_mobile: bool = True
+    window_function: str = DEFAULT_RULE_WINDOW_FUNCTION
+    window_seconds: int = DEFAULT_RULE_WINDOW_SECONDS
+    input_mode: str = DEFAULT_RULE_INPUT_MODE
+    rate_smoothing_seconds: int = DEFAULT_RULE_RATE_SMOOTHING
+    aggregate_parameter: float | None = None
+    stale_seconds: int = DEFAULT_RULE_STALE_SECONDS
+    hysteresis: float = DEFAULT_RULE_HYSTERESIS
+    clear_threshold: float | None = None
+    clear_duration_seconds: int = DEFAULT_RULE_CLEAR_DURATION
+    max_interval_seconds: int = DEFAULT_RULE_MAX_INTERVAL
+    # Binary entities that must not be off, and rules that must be active,
+    # for this rule to be evaluated at all.
+    precondition_entities: tuple[str, ...] = ()
+    precondition_rules: tuple[str, ...] = ()
+    # Composite rules read these rules' active state instead of entities; a
+    # source counts as active for coincidence_seconds after it clears.
+    source_rules: tuple[str, ...] = ()
+    coincidence_seconds: int = DEFAULT_RULE_COINCIDENCE
+    # Expression rules compute their value from the entities by name.
+    expression: str | None = None
+    # Numeric rules read this attribute path of each entity instead of its
+    # state; list values expand into one reading per item (cell).
+    attribute: str | None = None
+    # Selectors matched against the entity registry; their members are
+    # appended to ``entities`` by the integration (see selectors.py).
+    selectors: tuple[str, ...] = ()
+    # Rule families: members are split into groups (by device or by the
+    # first selector wildcard) and the rule is evaluated once per group.
+    # ``groups`` is filled together with the selector members. Device groups
+    # are keyed by device id; ``group_names`` maps keys to display names.
+    group_by: str | None = None
+    groups: tuple[tuple[str, tuple[str, ...]], ...] = ()
+    group_names: tuple[tuple[str, str], ...] = ()
+    # Text rules: needles checked next to the text match in ``thresholds``;
+    # ``/.../`` needles are regular expressions (see textmatch.py).
+    text_patterns: tuple[str, ...] = ()
+    # Latched rules: once the outcome can only change by reset, stop full
+    # evaluation and only refresh the reported reading (see _observe).
+    freeze_latched: bool = DEFAULT_RULE_FREEZE_LATCHED
+
+    @cached_property
+    def ladder(self) -> LevelLadder:
+        """Semafor levels from least to most severe (see ladder.py)."""
+        return build_ladder(self.levels, self.direction == DIRECTION_LOWER_IS_WORSE)
+
+    def stop_level(self, level: str | None) -> str | None:
+        """The stop level (notify/limit/shutdown) a semafor level raises."""
+        if level is None:
+            return None
+        return (self.levels.get(level) or {}).get("stop_level", level)
+
+    def group_name(self, key: str | None) -> str | None:
+        """Display name of a family group."""
+        return dict(self.group_names).get(key, key) if key is not None else None
+
+    @property
+    def is_numeric(self) -> bool:
+        """Whether the rule evaluates to a number (numeric or expression)."""
+        return self.data_type in NUMERIC_DATA_TYPES
+
+    @property
+    def has_window(self) -> bool:
+        return self.is_numeric and self.window_function != WINDOW_NONE
+
+    @property
+    def has_rate(self) -> bool:
+        return self.is_numeric and self.input_mode == INPUT_MODE_RATE
+
+    @property
+    def has_preconditions(self) -> bool:
+        return bool(self.precondition_entities or self.precondition_rules)
+
+    @property
+    def is_composite(self) -> bool:
+        return self.data_type == DATA_TYPE_COMPOSITE
+
+    @property
+    def inputs(self) -> Iterable[str]:
+        """Ids read by the rule: entities, or source rules of a composite."""
+        return self.source_rules if self.is_composite else self.entities
+
+    @property
+    def watched_entities(self) -> list[str]:
+        """Input entities followed by precondition entities."""
+        return [*self.entities, *self.precondition_entities]
+
+    @property
+    def is_adaptive(self) -> bool:
+        """Whether the interval stretches with the distance to the thresholds."""
+        return self.max_interval_seconds > self.interval_seconds and (
+            self.is_numeric
+            or (self.data_type == DATA_TYPE_BINARY and self.aggregate == "count")
+        )
+
+    @property
+    def settle_seconds(self) -> float:
+        """How long the evaluated value can keep moving after input stops."""
+        seconds = 0.0
+        if self.has_rate:
+            # The smoothed rate decays towards zero; after five time
+            # constants less than 1% of the last slope is left.
+            seconds += 5 * self.rate_smoothing_seconds + self.interval_seconds
+        if self.has_window:
+            seconds += self.window_seconds + self.interval_seconds
+        return seconds
+
+
+# Fields added after runtime persistence shipped. They are left out of the
+# fingerprint while at their default, so upgrading does not discard the
+# stored state of every rule.
+_FINGERPRINT_OPTIONAL_FIELDS = (
+    "window_function",
+    "window_seconds",
+    "input_mode",
+    "rate_smoothing_seconds",
+    "aggregate_parameter",
+    "stale_seconds",
+    "hysteresis",
+    "clear_threshold",
+    "clear_duration_seconds",
+    "max_interval_seconds",
+    "precondition_entities",
+    "precondition_rules",
+    "source_rules",
+    "coincidence_seconds",
+    "expression",
+    "attribute",
+    "selectors",
+    "group_by",
+    "groups",
+    "group_names",
+    "text_patterns",
+    "freeze_latched",
+)
+
+
+@dataclass
+class RuleRuntimeState:
+    active: bool = False
+    active_since: str | None = None
+    last_update: str | None = None
+    last_eval_monotonic: float | None = None
+    violation_started_at: float | None = None
+    last_match: bool | None = None
+    last_aggregate: float | int | str | None = None
+    last_entity: str | None = None
+    # Low end of a spread; last_entity holds the high end.
+    last_entity_low: str | None = None
+    # Position of the reported reading for attribute inputs: the entity
+    # (pack) and list item (cell), both counted from 1.
+    last_pack: int | None = None
+    last_cell: int | None = None
+    last_detail: str | None = None
+    last_invalid_reason: str | None = None
+    current_level: str | None = None
+    latched_level: str | None = None
+    level_violation_started_at: dict[str, float | None] = field(default_factory=dict)
+    level_active_since: dict[str, str | None] = field(default_factory=dict)
+    active_levels: list[str] = field(default_factory=list)
+    # Start of the current clear_duration_seconds hold; not persisted, so a
+    # restart only lengthens the hold.
+    clear_started_at: float | None = None
+    level_clear_started_at: dict[str, float | None] = field(default_factory=dict)
+    # Seconds until the next evaluation of an adaptive rule; None means
+    # interval_seconds.
+    eval_interval: float | None = None
+    # Unmet precondition (entity or rule id) while evaluation is skipped.
+    inhibited_by: str | None = None
+    # Rule families: summary per group and the group reported as worst.
+    groups: dict[str, dict[str, Any]] = field(default_factory=dict)
+    last_group: str | None = None
+    # Latched for good until reset; the rule is only observed (see _observe).
+    frozen: bool = False
+
+    def reset(self) -> None:
+        self.active = False
+        self.active_since = None
+        self.last_update = None
+        self.last_eval_monotonic = None
+        self.violation_started_at = None
+        self.last_match = None
+        self.last_aggregate = None
+        self.last_entity = None
+        self.last_entity_low = None
+        self.last_pack = None
+        self.last_cell = None
+        self.last_detail = None
+        self.last_invalid_reason = None
+        self.current_level = None
+        self.latched_level = None
+        self.level_violation_started_at = {}
+        self.level_active_since = {}
+        self.active_levels = []
+        self.clear_started_at = None
+        self.level_clear_started_at = {}
+        self.eval_interval = None
+        self.inhibited_by = None
+        self.groups = {}
+        self.last_group = None
+        self.frozen = False
+
+
+class _SourceState:
+    __slots__ = ("state", "attributes")
+
+    def __init__(self, state: str) -> None:
+        self.state = state
+        self.attributes: dict[str, Any] = {}
+
+
+_SOURCE_ON = _SourceState("on")
+_SOURCE_OFF = _SourceState("off")
+
+
+class _SourceStates:
+    """Source rules of a composite rule, seen as binary entities."""
+
+    def __init__(self, engine: RuleEngine, rule: RuleConfig, now: float) -> None:
+        self._engine = engine
+        self._rule = rule
+        self._now = now
+
+    def get(self, rule_id: str) -> _SourceState | None:
+        active = self._engine.source_active(self._rule, rule_id, self._now)
+        if active is None:
+            return None
+        return _SOURCE_ON if active else _SOURCE_OFF
+
+
+@dataclass
+class RuleEvalResult:
+    match: bool | None
+    aggregate: float | int | str | None
+    detail: str
+    entity_id: str | None
+    invalid_reason: str | None = None
+    entity_low: str | None = None
+    pack: int | None = None
+    cell: int | None = None
+
+
+@dataclass
+class RuleSetChanges:
+    """Difference between two rule sets, keyed by rule_id."""
+
+    added: list[RuleConfig] = field(default_factory=list)
+    changed: list[RuleConfig] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    # Selector rules whose resolved entities changed; their state is kept.
+    members: list[RuleConfig] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.members)
+
+
+class RuleEngine:
+    """Evaluate dynamic rules against a state provider and clock."""
+
+    def __init__(self, rules: list[RuleConfig], clock: Clock | None = None) -> None:
+        self._clock: Clock = clock or SystemClock()
+        self._rules = rules
+        self._states: dict[str, RuleRuntimeState] = {
+            rule.rule_id: RuleRuntimeState() for rule in rules
+        }
+        self._invalid_logged: set[tuple[str, str, str]] = set()
+        self._windows: dict[str, TimeWindow] = {}
+        self._rates: dict[str, RateOfChange] = {}
+        # Raw slope of the evaluated value, for adaptive intervals.
+        self._trends: dict[str, RateOfChange] = {}
+        self._expressions: dict[str, CompiledExpression] = {}
+        self._freshness = FreshnessIndex()
+        # Rules to evaluate on the next pass regardless of their interval.
+        self._due: set[str] = set()
+        # Evaluation order (lane by lane), lane of each rule, composite rules
+        # to wake when a rule's active state flips, and rules by input entity.
+        self._order: list[RuleConfig] = []
+        self._lanes: dict[str, str] = {}
+        self._dependents: dict[str, list[str]] = {}
+        self._watchers: dict[str, list[str]] = {}
+        # Position in _order where each budgeted pass stopped (see evaluate).
+        self._cursors: dict[str, int] = {}
+        self._plan(rules)
+        # Last monotonic time each rule was seen active, for coincidence.
+        self._last_active: dict[str, float] = {}
+        # Per-group rule and state of rule families, and the family owning
+        # each group rule id (group windows live in the maps above).
+        self._families: dict[str, dict[str, tuple[RuleConfig, RuleRuntimeState]]] = {}
+        self._family_of: dict[str, str] = {}
+        self._seed_initial_offsets(rules)
+        self._queue_composites(rules)
+        self._reset_windows(rules)
+        self._sync_families(rules)
+        self._watch_freshness()
+
+    @property
+    def rules(self) -> list[RuleConfig]:
+        return self._rules
+
+    @property
+    def states(self) -> dict[str, RuleRuntimeState]:
+        return self._states
+
+    @property
+    def freshness(self) -> FreshnessIndex:
+        """Last-update index of entities used by rules with ``stale_seconds``."""
+        return self._freshness
+
+    def expire_stale(self) -> bool:
+        """Queue rules whose inputs just went stale; True when any were."""
+        expired = self._freshness.pop_expired(self._clock.monotonic())
+        if not expired:
+            return False
+        queued = False
+        for rule in self._rules:
+            if rule.stale_seconds and not expired.isdisjoint(rule.entities):
+                self._due.add(rule.rule_id)
+                queued = True
+        return queued
+
+    def reset(self) -> None:
+        for rule in self._rules:
+            state = self._states[rule.rule_id]
+            if state.frozen:
+                self._thaw(rule, state)
+        for state in self._states.values():
+            state.reset()
+        for members in self._families.values():
+            for _member, member_state in members.values():
+                member_state.reset()
+
+    def group_states(self, rule_id: str) -> dict[str, RuleRuntimeState]:
+        """Runtime state of each group of a rule family, by group key."""
+        return {
+            key: member_state
+            for key, (_member, member_state) in self._families.get(rule_id, {}).items()
+        }
+
+    def update_rules(self, rules: list[RuleConfig]) -> RuleSetChanges:
+        """Swap in a new rule set, keeping runtime state of unchanged rules."""
+        previous_rules = {rule.rule_id: rule for rule in self._rules}
+        new_ids = {rule.rule_id for rule in rules}
+        changes = RuleSetChanges(
+            removed=[rule_id for rule_id in previous_rules if rule_id not in new_ids]
+        )
+        merged: list[RuleConfig] = []
+        states: dict[str, RuleRuntimeState] = {}
+        fresh: list[RuleConfig] = []
+        for rule in rules:
+            previous = previous_rules.get(rule.rule_id)
+            if previous is not None and previous == rule:
+                merged.append(previous)
+                states[rule.rule_id] = self._states[rule.rule_id]
+                continue
+            if previous is not None and _only_members_differ(previous, rule):
+                merged.append(rule)
+                states[rule.rule_id] = self._states[rule.rule_id]
+                changes.members.append(rule)
+                # A new group has not latched yet.
+                self._thaw(rule, states[rule.rule_id])
+                # Evaluate against the new members right away.
+                self._due.add(rule.rule_id)
+                continue
+            if previous is None:
+                changes.added.append(rule)
+            else:
+                changes.changed.append(rule)
+            merged.append(rule)
+            states[rule.rule_id] = RuleRuntimeState()
+            fresh.append(rule)
+
+        self._rules = merged
+        self._states = states
+        self._plan(merged)
+        fresh_ids = {rule.rule_id for rule in fresh}
+        self._last_active = {
+            rule_id: seen
+            for rule_id, seen in self._last_active.items()
+            if rule_id in states and rule_id not in fresh_ids
+        }
+        self._invalid_logged = {
+            key
+            for key in self._invalid_logged
+            if key[0] in states and key[0] not in fresh_ids
+        }
+        self._seed_initial_offsets(fresh)
+        self._windows = self._kept(self._windows, states, fresh_ids)
+        self._rates = self._kept(self._rates, states, fresh_ids)
+        self._trends = self._kept(self._trends, states, fresh_ids)
+        self._expressions = self._kept(self._expressions, states, fresh_ids)
+        self._reset_windows(fresh)
+        self._due &= set(states)
+        self._queue_composites(fresh)
+        for rule_id in fresh_ids | set(changes.removed):
+            self._drop_family(rule_id)
+        self._sync_families([*fresh, *changes.members])
+        self._watch_freshness()
+        return changes
+
+    def _plan(self, rules: list[RuleConfig]) -> None:
+        self._cursors.clear()
+        order = _evaluation_order(rules)
+        rule_ids = [rule.rule_id for rule in order]
+        self._lanes = assign_lanes(
+            rule_ids,
+            {rule.rule_id: _raised_levels(rule) for rule in order},
+            _dependencies(order),
+        )
+        position = {
+            rule_id: index
+            for index, rule_id in enumerate(by_lane(rule_ids, self._lanes))
+        }
+        self._order = sorted(order, key=lambda rule: position[rule.rule_id])
+        self._dependents = _rule_dependents(rules)
+        self._watchers = {}
+        for rule in order:
+            for entity_id in rule.watched_entities:
+                self._watchers.setdefault(entity_id, []).append(rule.rule_id)
+
+    def _kept(
+        self, by_rule: dict[str, Any], states: dict[str, Any], fresh_ids: set[str]
+    ) -> dict[str, Any]:
+        """Entries of rules (or family groups) that survive an update."""
+        kept = {}
+        for rule_id, value in by_rule.items():
+            owner = self._family_of.get(rule_id, rule_id)
+            if owner in states and owner not in fresh_ids:
+                kept[rule_id] = value
+        return kept
+
+    def _sync_families(self, rules: list[RuleConfig]) -> None:
+        """Create group rules and states, keeping those of unchanged groups."""
+        for rule in rules:
+            previous = self._families.get(rule.rule_id, {})
+            members: dict[str, tuple[RuleConfig, RuleRuntimeState]] = {}
+            for key, entities in rule.groups:
+                member = replace(
+                    rule,
+                    rule_id=f"{rule.rule_id}[{key}]",
+                    name=f"{rule.name} [{rule.group_name(key)}]",
+                    entities=list(entities),
+                    groups=(),
+                    group_names=(),
+                )
+                old = previous.pop(key, None)
+                if old is None:
+                    members[key] = (member, RuleRuntimeState())
+                    self._family_of[member.rule_id] = rule.rule_id
+                    self._reset_windows([member])
+                else:
+                    # Same group, possibly other members: keep its timers.
+                    members[key] = (member, old[1])
+            for member, _state in previous.values():
+                self._drop_group(member.rule_id)
+            if members:
+                self._families[rule.rule_id] = members
+            else:
+                self._families.pop(rule.rule_id, None)
+
+    def _drop_family(self, rule_id: str) -> None:
+        for member, _state in self._families.pop(rule_id, {}).values():
+            self._drop_group(member.rule_id)
+
+    def _drop_group(self, member_id: str) -> None:
+        self._family_of.pop(member_id, None)
+        self._windows.pop(member_id, None)
+        self._rates.pop(member_id, None)
+        self._trends.pop(member_id, None)
+
+    def _queue_composites(self, rules: list[RuleConfig]) -> None:
+        # Composite rules otherwise only run when a source changes.
+        self._due.update(rule.rule_id for rule in rules if rule.is_composite)
+
+    def _reset_windows(self, rules: list[RuleConfig]) -> None:
+        for rule in rules:
+            if rule.has_rate:
+                self._rates[rule.rule_id] = RateOfChange(rule.rate_smoothing_seconds)
+            if rule.is_adaptive:
+                self._trends[rule.rule_id] = RateOfChange(0)
+            if rule.has_window:
+                self._windows[rule.rule_id] = TimeWindow(
+                    rule.window_function, rule.window_seconds
+                )
+            if rule.data_type == DATA_TYPE_EXPRESSION:
+                try:
+                    self._expressions[rule.rule_id] = _compile_rule_expression(rule)
+                except ExpressionError as err:
+                    _LOGGER.error(
+                        "Rule %s (%s): invalid expression: %s",
+                        rule.name,
+                        rule.rule_id,
+                        err,
+                    )
+
+    def _watch_freshness(self) -> None:
+        max_ages: dict[str, set[float]] = {}
+        for rule in self._rules:
+            if rule.stale_seconds:
+                for entity_id in rule.entities:
+                    max_ages.setdefault(entity_id, set()).add(rule.stale_seconds)
+        self._freshness.watch(max_ages)
+
+    def _seed_initial_offsets(self, rules: list[RuleConfig]) -> None:
+        now_monotonic = self._clock.monotonic()
+        for rule in rules:
+            interval = max(1, int(rule.interval_seconds))
+            offset = deterministic_offset_seconds(rule.rule_id, interval)
+            state = self._states.get(rule.rule_id)
+            if state is None:
+                continue
+            state.last_eval_monotonic = now_monotonic - (interval - offset)
+
+    @staticmethod
+    def _simple_state_signature(state: RuleRuntimeState) -> tuple[Any, ...]:
+        return (
+            state.active,
+            state.active_since,
+            state.last_match,
+            state.last_aggregate,
+            state.last_entity,
+            state.last_detail,
+            state.last_invalid_reason,
+            state.violation_started_at is not None,
+        )
+
+    @staticmethod
+    def _semafor_state_signature(
+        rule: RuleConfig, state: RuleRuntimeState
+    ) -> tuple[Any, ...]:
+        level_runtime = tuple(
+            (
+                level,
+                state.level_violation_started_at.get(level) is not None,
+                state.level_active_since.get(level),
+            )
+            for level in rule.ladder.levels
+        )
+        return (
+            state.active,
+            state.active_since,
+            state.current_level,
+            state.latched_level,
+            tuple(state.active_levels),
+            state.last_aggregate,
+            state.last_entity,
+            state.last_detail,
+            state.last_invalid_reason,
+            level_runtime,
+        )
+
+    def persist_signature(self) -> tuple[Any, ...]:
+        """Return a signature of the runtime fields worth persisting."""
+        signature = []
+        for rule in self._rules:
+            signature.append(_persist_state_signature(rule, self._states[rule.rule_id]))
+            for member, member_state in self._families.get(rule.rule_id, {}).values():
+                signature.append(_persist_state_signature(member, member_state))
+        return tuple(signature)
+
+    def export_runtime(
+        self, now_monotonic: float, now_wall: float
+    ) -> dict[str, dict[str, Any]]:
+        """Serialize runtime state, converting monotonic stamps to wall time."""
+        data: dict[str, dict[str, Any]] = {}
+        for rule in self._rules:
+            raw = _serialize_runtime_state(
+                rule, self._states[rule.rule_id], now_monotonic, now_wall
+            )
+            members = self._families.get(rule.rule_id)
+            if members:
+                raw["groups"] = {
+                    key: _serialize_runtime_state(
+                        member, member_state, now_monotonic, now_wall
+                    )
+                    for key, (member, member_state) in members.items()
+                }
+            data[rule.rule_id] = raw
+        return data
+
+    def restore_runtime(
+        self, data: dict[str, Any], now_monotonic: float, now_wall: float
+    ) -> int:
+        """Restore runtime state for rules whose configuration did not change."""
+        restored = 0
+        for rule in self._rules:
+            raw = data.get(rule.rule_id)
+            if not isinstance(raw, dict):
+                continue
+            if raw.get("fingerprint") != rule_fingerprint(rule):
+                _LOGGER.debug(
+                    "Rule %s (%s): configuration changed; runtime state not restored",
+                    rule.name,
+                    rule.rule_id,
+                )
+                continue
+            try:
+                _apply_runtime_state(
+                    rule, self._states[rule.rule_id], raw, now_monotonic, now_wall
+                )
+            except (TypeError, ValueError, AttributeError):
+                _LOGGER.warning(
+                    "Rule %s (%s): stored runtime state is invalid; ignoring",
+                    rule.name,
+                    rule.rule_id,
+                )
+                self._states[rule.rule_id].reset()
+                continue
+            # Groups are restored by key, as update_rules keeps them: a pack
+            # added while Home Assistant was down must not drop the latches
+            # of the others.
+            self._restore_groups(rule, raw, now_monotonic, now_wall)
+            restored += 1
+        return restored
+
+    def _restore_groups(
+        self,
+        rule: RuleConfig,
+        raw: dict[str, Any],
+        now_monotonic: float,
+        now_wall: float,
+    ) -> None:
+        stored = raw.get("groups")
+        if not isinstance(stored, dict):
+            return
+        for key, (member, member_state) in self._families.get(rule.rule_id, {}).items():
+            raw_group = stored.get(key)
+            if not isinstance(raw_group, dict):
+                continue
+            try:
+                _apply_runtime_state(
+                    member, member_state, raw_group, now_monotonic, now_wall
+                )
+            except (TypeError, ValueError, AttributeError):
+                member_state.reset()
+
+    def lane_of(self, rule_id: str) -> str:
+        """Priority lane of a rule (see lanes.py)."""
+        return self._lanes.get(rule_id, LEVEL_NOTIFY)
+
+    def lane_rules(self, lane: str) -> list[RuleConfig]:
+        return [rule for rule in self._order if self._lanes[rule.rule_id] == lane]
+
+    def wake(self, entity_id: str, lane: str) -> bool:
+        """Queue the rules of ``lane`` that read ``entity_id``; True if any."""
+        queued = False
+        for rule_id in self._watchers.get(entity_id, ()):
+            if self._lanes[rule_id] == lane:
+                self._due.add(rule_id)
+                queued = True
+        return queued
+
+    def evaluate(
+        self,
+        provider: StateProvider,
+        lanes: Collection[str] | None = None,
+        budget: float | None = None,
+        pass_name: str = "tick",
+    ) -> bool:
+        """Evaluate the rules that are due, in all lanes or only ``lanes``.
+
+        With a ``budget`` (seconds), the pass stops once the budget is spent
+        and returns False; the next call with the same ``pass_name`` resumes
+        where it stopped. Passes with different names keep their own cursor,
+        so they can interleave. Each call first runs the rules whose duration
+        timer has expired and the rules woken behind the cursor, so a slice
+        never delays a pending trip. Returns True once the pass is complete.
+        """
+        now = self._clock.utcnow()
+        now_iso = now.isoformat()
+        now_monotonic = self._clock.monotonic()
+
+        # Dependency order: a rule sees its sources' and preconditions' result
+        # from this pass, and a flip wakes only the rules built on it.
+        if budget is None:
+            for rule in self._order:
+                if lanes is None or self._lanes[rule.rule_id] in lanes:
+                    self._step(rule, provider, now_iso, now_monotonic)
+            return True
+
+        cursor = self._cursors.get(pass_name, 0)
+        selected = [
+            (index, rule)
+            for index, rule in enumerate(self._order)
+            if lanes is None or self._lanes[rule.rule_id] in lanes
+        ]
+        for index, rule in selected:
+            deadline = self.timer_deadline(rule)
+            if deadline is not None and deadline <= now_monotonic:
+                self._due.add(rule.rule_id)
+            elif index >= cursor or rule.rule_id not in self._due:
+                continue
+            self._step(rule, provider, now_iso, now_monotonic)
+
+        stop_at = now_monotonic + budget
+        first = True
+        for index, rule in selected:
+            if index < cursor:
+                continue
+            if not first and self._clock.monotonic() >= stop_at:
+                self._cursors[pass_name] = index
+                return False
+            first = False
+            self._step(rule, provider, now_iso, now_monotonic)
+        self._cursors.pop(pass_name, None)
+        return True
+
+    def _step(
+        self,
+        rule: RuleConfig,
+        provider: StateProvider,
+        now_iso: str,
+        now_monotonic: float,
+    ) -> None:
+        state = self._states[rule.rule_id]
+        was_active = state.active
+        self._evaluate_one(rule, provider, state, now_iso, now_monotonic)
+        if state.active or was_active:
+            # A rule that just cleared was active up to now.
+            self._last_active[rule.rule_id] = now_monotonic
+        if state.active != was_active:
+            self._due.update(self._dependents.get(rule.rule_id, ()))
+
+    def _evaluate_one(
+        self,
+        rule: RuleConfig,
+        provider: StateProvider,
+        state: RuleRuntimeState,
+        now_iso: str,
+        now_monotonic: float,
+    ) -> None:
+        if state.frozen:
+            # Only a reset changes the outcome now: no timers, preconditions
+            # or wake-ups, just a slow refresh of the reported reading.
+            self._due.discard(rule.rule_id)
+            if (
+                state.last_eval_monotonic is not None
+                and now_monotonic - state.last_eval_monotonic
+                < eval_interval(rule, state)
+            ):
+                return
+            state.last_eval_monotonic = now_monotonic
+            if rule.is_composite:
+                provider = _SourceStates(self, rule, now_monotonic)
+            self._observe(rule, provider, state)
+            return
+        if rule.has_preconditions:
+            blocker = self._unmet_precondition(rule, provider)
+            if blocker is not None:
+                if state.inhibited_by != blocker:
+                    self._inhibit(rule, state, blocker, now_iso)
+                state.last_eval_monotonic = now_monotonic
+                self._due.discard(rule.rule_id)
+                return
+            if state.inhibited_by is not None:
+                # Resume at once instead of waiting out the interval.
+                state.inhibited_by = None
+                self._due.add(rule.rule_id)
+        if rule.is_composite:
+            if not (
+                rule.rule_id in self._due
+                or _timer_running(rule, state)
+                or self.coincidence_deadline(rule, state.last_eval_monotonic)
+                is not None
+            ):
+                return
+            provider = _SourceStates(self, rule, now_monotonic)
+        if (
+            rule.rule_id not in self._due
+            and state.last_eval_monotonic is not None
+            and (now_monotonic - state.last_eval_monotonic)
+            < eval_interval(rule, state)
+        ):
+            return
+        self._due.discard(rule.rule_id)
+
+        state.last_eval_monotonic = now_monotonic
+        if rule.rule_id in self._families:
+            self._evaluate_family(rule, provider, state, now_iso, now_monotonic)
+        elif rule.severity_mode == SEVERITY_MODE_SEMAFOR:
+            self._evaluate_semafor(rule, provider, state, now_iso, now_monotonic)
+        else:
+            self._evaluate_simple(rule, provider, state, now_iso, now_monotonic)
+        if rule.is_adaptive:
+            self._adapt_interval(rule, state, now_monotonic)
+        if rule.freeze_latched and rule.latched and self._latch_settled(rule, state):
+            self._freeze(rule, state)
+
+    def _evaluate_simple(
+        self,
+        rule: RuleConfig,
+        provider: StateProvider,
+        state: RuleRuntimeState,
+        now_iso: str,
+        now_monotonic: float,
+    ) -> None:
+        previous_signature = self._simple_state_signature(state)
+        result = self._evaluate_rule(
+            rule, provider, engaged=state.violation_started_at is not None
+        )
+        state.last_match = result.match
+        state.last_aggregate = result.aggregate
+        state.last_entity = result.entity_id
+        state.last_entity_low = result.entity_low
+        state.last_pack = result.pack
+        state.last_cell = result.cell
+        state.last_detail = result.detail
+        state.last_invalid_reason = result.invalid_reason
+
+        if result.match is True:
+            state.clear_started_at = None
+            if state.violation_started_at is None:
+                state.violation_started_at = now_monotonic
+            if (now_monotonic - state.violation_started_at) >= rule.duration_seconds:
+                if not state.active:
+                    state.active = True
+                    state.active_since = now_iso
+        elif self._hold_clear(rule, state, now_monotonic):
+            pass
+        else:
+            state.violation_started_at = None
+            if not rule.latched:
+                state.active = False
+                state.active_since = None
+
+        if self._simple_state_signature(state) != previous_signature:
+            state.last_update = now_iso
+
+    def _evaluate_family(
+        self,
+        rule: RuleConfig,
+        provider: StateProvider,
+        state: RuleRuntimeState,
+        now_iso: str,
+        now_monotonic: float,
+    ) -> None:
+        """Evaluate every group of a rule family in one pass.
+
+        Each group keeps its own timers, latch and window, exactly like a
+        separate rule would. The family state is the worst case: active
+        while any group is, at the highest level of any group, and reporting
+        the group that is furthest past (or closest to) its threshold.
+        """
+        previous_signature = self._state_signature(rule, state)
+        evaluate = (
+            self._evaluate_semafor
+            if rule.severity_mode == SEVERITY_MODE_SEMAFOR
+            else self._evaluate_simple
+        )
+        members = self._families[rule.rule_id]
+        worst_key: str | None = None
+        worst_rank: tuple[Any, ...] | None = None
+        for key, (member, member_state) in members.items():
+            member_state.last_eval_monotonic = now_monotonic
+            evaluate(member, provider, member_state, now_iso, now_monotonic)
+            rank = _group_rank(member, member_state)
+            if worst_rank is None or rank > worst_rank:
+                worst_key, worst_rank = key, rank
+        _fold_family(
+            rule, state, [member_state for _member, member_state in members.values()]
+        )
+        if worst_key is not None:
+            _copy_reading(state, members[worst_key][1])
+        state.last_group = worst_key
+        state.groups = {
+            key: {
+                "name": rule.group_name(key),
+                "active": member_state.active,
+                "level": member_state.current_level,
+                "aggregate": member_state.last_aggregate,
+                "entity_id": member_state.last_entity,
+                "invalid_reason": member_state.last_invalid_reason,
+            }
+            for key, (_member, member_state) in members.items()
+        }
+        if self._state_signature(rule, state) != previous_signature:
+            state.last_update = now_iso
+
+    def timer_deadline(self, rule: RuleConfig) -> float | None:
+        """Monotonic time the first running duration timer of ``rule`` expires.
+
+        Includes the group timers of a family: the folded state hides a
+        group's running timer while another group is active.
+        """
+        state = self._states[rule.rule_id]
+        if state.frozen:
+            return None
+        deadlines = [_timer_deadline(rule, state)]
+        deadlines.extend(
+            _timer_deadline(member, member_state)
+            for member, member_state in self._families.get(rule.rule_id, {}).values()
+        )
+        return min(
+            (deadline for deadline in deadlines if deadline is not None), default=None
+        )
+
+    def coincidence_deadline(
+        self, rule: RuleConfig, since: float | None
+    ) -> float | None:
+        """Earliest end after ``since`` of a cleared source still counted active.
+
+        A composite rule has to be evaluated again at that point to see the
+        source drop out of the coincidence window.
+        """
+        if not rule.coincidence_seconds:
+            return None
+        deadline: float | None = None
+        for rule_id in rule.source_rules:
+            state = self._states.get(rule_id)
+            seen = self._last_active.get(rule_id)
+            if state is None or state.active or seen is None:
+                continue
+            until = seen + rule.coincidence_seconds
+            if since is not None and until <= since:
+                continue
+            if deadline is None or until < deadline:
+                deadline = until
+        return deadline
+
+    def source_active(self, rule: RuleConfig, rule_id: str, now: float) -> bool | None:
+        """Whether source ``rule_id`` counts as active for composite ``rule``."""
+        state = self._states.get(rule_id)
+        if state is None:
+            return None
+        if state.active:
+            return True
+        seen = self._last_active.get(rule_id)
+        return seen is not None and now - seen < rule.coincidence_seconds
+
+    def _unmet_precondition(
+        self, rule: RuleConfig, provider: StateProvider
+    ) -> str | None:
+        """First precondition that is known to be false, if any.
+
+        Only an explicit ``off`` inhibits: a precondition entity that is
+        missing or unavailable lets the rule run, so a broken mode sensor
+        cannot switch protection off. Rules are evaluated in dependency
+        order, so precondition rules already reflect this pass.
+        """
+        for entity_id in rule.precondition_entities:
+            state = provider.get(entity_id)
+            if state is not None and state.state == "off":
+                return entity_id
+        for rule_id in rule.precondition_rules:
+            state = self._states.get(rule_id)
+            if state is not None and not state.active:
+                return rule_id
+        return None
+
+    def _inhibit(
+        self,
+        rule: RuleConfig,
+        state: RuleRuntimeState,
+        blocker: str,
+        now_iso: str,
+    ) -> None:
+        """Stop timers and clear the result of a rule whose precondition is off.
+
+        A latched rule keeps its latch; everything else returns to inactive.
+        Rules that list this one as a precondition are inhibited in turn, so
+        a whole subtree is skipped without reading any of its entities.
+        """
+        previous_signature = self._state_signature(rule, state)
+        state.inhibited_by = blocker
+        state.violation_started_at = None
+        state.clear_started_at = None
+        state.level_violation_started_at = {}
+        state.level_clear_started_at = {}
+        state.active_levels = []
+        state.eval_interval = None
+        state.last_match = None
+        state.last_aggregate = None
+        state.last_entity = None
+        state.last_entity_low = None
+        state.last_pack = None
+        state.last_cell = None
+        state.last_invalid_reason = "inhibited"
+        state.last_detail = f"{rule.name}: inhibited by {blocker}"
+        if rule.latched:
+            state.current_level = state.latched_level
+        else:
+            state.active = False
+            state.active_since = None
+            state.current_level = None
+            state.level_active_since = {}
+        # Windows and rates would bridge the gap with old samples.
+        self._restart_inputs(rule)
+        for member, member_state in self._families.get(rule.rule_id, {}).values():
+            self._inhibit(member, member_state, blocker, now_iso)
+        state.groups = {}
+        state.last_group = None
+        if self._state_signature(rule, state) != previous_signature:
+            state.last_update = now_iso
+
+    def _restart_inputs(self, rule: RuleConfig) -> None:
+        self._windows.pop(rule.rule_id, None)
+        self._rates.pop(rule.rule_id, None)
+        self._trends.pop(rule.rule_id, None)
+        self._reset_windows([rule])
+
+    def _freeze(self, rule: RuleConfig, state: RuleRuntimeState) -> None:
+        state.frozen = True
+        state.eval_interval = max(float(rule.interval_seconds), FROZEN_OBSERVE_SECONDS)
+
+    def _thaw(self, rule: RuleConfig, state: RuleRuntimeState) -> None:
+        """Resume full evaluation of a frozen rule on the next pass."""
+        state.frozen = False
+        state.eval_interval = None
+        self._due.add(rule.rule_id)
+        # Sparse samples taken while frozen say nothing about a window.
+        self._restart_inputs(rule)
+        for member, _member_state in self._families.get(rule.rule_id, {}).values():
+            self._restart_inputs(member)
+
+    def _latch_settled(self, rule: RuleConfig, state: RuleRuntimeState) -> bool:
+        """Whether only a reset can change the outcome of ``rule``."""
+        members = self._families.get(rule.rule_id)
+        if members:
+            return all(
+                self._latch_settled(member, member_state)
+                for member, member_state in members.values()
+            )
+        if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
+            levels = rule.ladder.levels
+            return bool(levels) and state.latched_level == levels[-1]
+        return state.active
+
+    def _observe(
+        self, rule: RuleConfig, provider: StateProvider, state: RuleRuntimeState
+    ) -> None:
+        """Refresh the reported reading of a frozen rule.
+
+        Timers, levels and the latch are left alone; the reading only keeps
+        the report context (value, entity, detail) current until reset.
+        """
+        members = self._families.get(rule.rule_id)
+        if members:
+            for key, (member, member_state) in members.items():
+                self._observe(member, provider, member_state)
+                summary = state.groups.get(key)
+                if summary is not None:
+                    summary["aggregate"] = member_state.last_aggregate
+                    summary["entity_id"] = member_state.last_entity
+                    summary["invalid_reason"] = member_state.last_invalid_reason
+            if state.last_group in members:
+                _copy_reading(state, members[state.last_group][1])
+            return
+        if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
+            value, entity_id, entity_low, invalid_reason = self._collect_level_value(
+                rule, provider
+            )
+            reported = entity_id if isinstance(entity_id, CellRef) else None
+            state.last_aggregate = value
+            state.last_entity = _ref_entity(entity_id)
+            state.last_entity_low = _ref_entity(entity_low)
+            state.last_pack = reported.pack if reported else None
+            state.last_cell = reported.cell if reported else None
+            state.last_invalid_reason = invalid_reason
+            if invalid_reason is not None:
+                state.last_detail = f"{rule.name}: {invalid_reason}"
+            elif state.current_level in rule.levels:
+                threshold = rule.levels[state.current_level]["threshold"]
+                state.last_detail = _format_semafor_detail(
+                    rule, state.current_level, value, threshold
+                ) + _format_extremes(entity_id, entity_low)
+            return
+        result = self._evaluate_rule(rule, provider, engaged=True)
+        state.last_match = result.match
+        state.last_aggregate = result.aggregate
+        state.last_entity = result.entity_id
+        state.last_entity_low = result.entity_low
+        state.last_pack = result.pack
+        state.last_cell = result.cell
+        state.last_detail = result.detail
+        state.last_invalid_reason = result.invalid_reason
+
+    def _state_signature(
+        self, rule: RuleConfig, state: RuleRuntimeState
+    ) -> tuple[Any, ...]:
+        if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
+            return self._semafor_state_signature(rule, state)
+        return self._simple_state_signature(state)
+
+    def _adapt_interval(
+        self, rule: RuleConfig, state: RuleRuntimeState, now: float
+    ) -> None:
+        value = state.last_aggregate
+        if (
+            state.last_invalid_reason is not None
+            or not isinstance(value, (int, float))
+            or _timer_running(rule, state)
+        ):
+            # Durations are timed at the base interval, and an unreadable
+            # value has no distance to anything.
+            state.eval_interval = None
+            return
+        rate = abs(self._trends[rule.rule_id].add(now, float(value)))
+        state.eval_interval = adaptive_interval(
+            _threshold_margin(rule, float(value)),
+            rate,
+            rule.interval_seconds,
+            rule.max_interval_seconds,
+        )
+
+    def _evaluate_rule(
+        self, rule: RuleConfig, provider: StateProvider, engaged: bool = False
+    ) -> RuleEvalResult:
+        if rule.is_numeric:
+            return self._evaluate_numeric(rule, provider, engaged)
+        if rule.data_type in (DATA_TYPE_BINARY, DATA_TYPE_COMPOSITE):
+            return self._evaluate_binary(rule, provider, engaged)
+        return self._evaluate_text(rule, provider)
+
+    @staticmethod
+    def _hold_clear(rule: RuleConfig, state: RuleRuntimeState, now: float) -> bool:
+        """Keep an active rule active until it has been clear long enough."""
+        if not (rule.clear_duration_seconds and state.active and not rule.latched):
+            state.clear_started_at = None
+            return False
+        if state.clear_started_at is None:
+            state.clear_started_at = now
+        if now - state.clear_started_at < rule.clear_duration_seconds:
+            return True
+        state.clear_started_at = None
+        return False
+
+    def _evaluate_semafor(
+        self,
+        rule: RuleConfig,
+        provider: StateProvider,
+        state: RuleRuntimeState,
+        now_iso: str,
+        now_monotonic: float,
+    ) -> None:
+        previous_signature = self._semafor_state_signature(rule, state)
+        value, entity_id, entity_low, invalid_reason = self._collect_level_value(
+            rule, provider
+        )
+        reported = entity_id if isinstance(entity_id, CellRef) else None
+
+        state.last_aggregate = value
+        state.last_entity = _ref_entity(entity_id)
+        state.last_entity_low = _ref_entity(entity_low)
+        state.last_pack = reported.pack if reported else None
+        state.last_cell = reported.cell if reported else None
+        state.last_invalid_reason = invalid_reason
+
+        ladder = rule.ladder
+        matches: dict[str, bool | None] = {}
+        if invalid_reason is not None:
+            if rule.unknown_handling == UNKNOWN_TREAT_VIOLATION:
+                matches = {level: True for level in rule.levels}
+            elif rule.unknown_handling == UNKNOWN_TREAT_OK:
+                matches = {level: False for level in rule.levels}
+            else:
+                matches = {level: None for level in rule.levels}
+            state.last_detail = f"{rule.name}: {invalid_reason}"
+        else:
+            matches = dict.fromkeys(ladder.tripped(value), True)
+            # Engaged levels release on their own clear threshold instead.
+            for level, started_at in state.level_violation_started_at.items():
+                cfg = rule.levels.get(level)
+                if started_at is None or cfg is None:
+                    continue
+                threshold = _level_clear_threshold(rule, cfg)
+                if rule.direction == DIRECTION_LOWER_IS_WORSE:
+                    matches[level] = value <= threshold
+                else:
+                    matches[level] = value >= threshold
+
+        # Only levels that match or still hold timers need any work; the
+        # others are untouched, so the cost follows the levels in play.
+        live = set(matches)
+        live.update(state.level_violation_started_at)
+        live.update(state.level_clear_started_at)
+        if not rule.latched:
+            live.update(state.level_active_since)
+        active_levels: list[str] = []
+        for level in sorted(live, key=ladder.rank):
+            cfg = rule.levels.get(level)
+            if not cfg:
+                continue
+            match = matches.get(level)
+            if match is True:
+                state.level_clear_started_at.pop(level, None)
+                started_at = state.level_violation_started_at.get(level)
+                if started_at is None:
+                    state.level_violation_started_at[level] = now_monotonic
+                    started_at = now_monotonic
+                duration = cfg["duration_seconds"]
+                if (now_monotonic - started_at) >= duration:
+                    if not state.level_active_since.get(level):
+                        state.level_active_since[level] = now_iso
+                    active_levels.append(level)
+            elif self._hold_level_clear(rule, state, level, now_monotonic):
+                active_levels.append(level)
+            else:
+                state.level_violation_started_at.pop(level, None)
+                if not rule.latched:
+                    state.level_active_since.pop(level, None)
+
+        state.active_levels = active_levels
+        top_level = active_levels[-1] if active_levels else None
+
+        if rule.latched:
+            if top_level:
+                state.latched_level = ladder.highest([state.latched_level, top_level])
+            state.current_level = state.latched_level
+            state.active = state.current_level is not None
+            state.active_since = (
+                state.level_active_since.get(state.current_level)
+                if state.current_level
+                else None
+            )
+        else:
+            state.current_level = top_level
+            state.active = state.current_level is not None
+            state.active_since = (
+                state.level_active_since.get(state.current_level)
+                if state.current_level
+                else None
+            )
+
+        if state.current_level and invalid_reason is None:
+            threshold = rule.levels[state.current_level]["threshold"]
+            state.last_detail = _format_semafor_detail(
+                rule, state.current_level, value, threshold
+            ) + _format_extremes(entity_id, entity_low)
+
+        if self._semafor_state_signature(rule, state) != previous_signature:
+            state.last_update = now_iso
+
+    def _collect_level_value(
+        self, rule: RuleConfig, provider: StateProvider
+    ) -> tuple[Any, Any, Any, str | None]:
+        """Value a semafor rule classifies, with its extreme entities."""
+        if rule.is_numeric:
+            return self._collect_numeric_value(rule, provider)
+        if (
+            rule.data_type in (DATA_TYPE_BINARY, DATA_TYPE_COMPOSITE)
+            and rule.aggregate == "count"
+        ):
+            value, entity_id, invalid_reason = self._collect_binary_count(rule, provider)
+            return value, entity_id, None, invalid_reason
+        _LOGGER.error(
+            "Rule %s (%s): semafor mode is not supported for data_type=%s aggregate=%s",
+            rule.name,
+            rule.rule_id,
+            rule.data_type,
+            rule.aggregate,
+        )
+        return None, None, None, "unsupported"
+
+    @staticmethod
+    def _hold_level_clear(
+        rule: RuleConfig, state: RuleRuntimeState, level: str, now: float
+    ) -> bool:
+        if not (
+            rule.clear_duration_seconds
+            and state.level_active_since.get(level)
+            and not rule.latched
+        ):
+            state.level_clear_started_at.pop(level, None)
+            return False
+        started_at = state.level_clear_started_at.get(level)
+        if started_at is None:
+            state.level_clear_started_at[level] = started_at = now
+        if now - started_at < rule.clear_duration_seconds:
+            return True
+        state.level_clear_started_at.pop(level, None)
+        return False
+
+    def _evaluate_numeric(
+        self, rule: RuleConfig, provider: StateProvider, engaged: bool = False
+    ) -> RuleEvalResult:
+        values, cells = self._read_numeric(rule, provider)
+
+        if not values:
+            return _handle_unknown(rule, "no_valid_values")
+
+        if not _has_required_thresholds(rule):
+            _LOGGER.error("Rule %s (%s): missing thresholds", rule.name, rule.rule_id)
+            return _handle_unknown(rule, "missing_thresholds")
+
+        if _missing_aggregate_parameter(rule):
+            return _handle_unknown(rule, "missing_aggregate_parameter")
+
+        aggregate, entity_id, entity_low, reason = self._aggregate_inputs(
+            rule, values, cells
+        )
+        if reason is not None:
+            return _handle_unknown(rule, reason)
+        aggregate = self._apply_rate(rule, aggregate)
+        aggregate, entity_id, entity_low = self._apply_window(
+            rule, aggregate, entity_id, entity_low
+        )
+        match = _compare_numeric(aggregate, *_release_condition(rule, engaged))
+        detail = _format_numeric_detail(rule, aggregate) + _format_extremes(
+            entity_id, entity_low
+        )
+        reported = entity_id if isinstance(entity_id, CellRef) else None
+        return RuleEvalResult(
+            match,
+            aggregate,
+            detail,
+            _ref_entity(entity_id),
+            entity_low=_ref_entity(entity_low),
+            pack=reported.pack if reported else None,
+            cell=reported.cell if reported else None,
+        )
+
+    def _evaluate_binary(
+        self, rule: RuleConfig, provider: StateProvider, engaged: bool = False
+    ) -> RuleEvalResult:
+        values = self._read_values(rule, provider, _parse_binary_state)
+
+        if not values:
+            return _handle_unknown(rule, "no_valid_values")
+
+        if rule.aggregate == "count":
+            if not _has_required_thresholds(rule):
+                _LOGGER.error(
+                    "Rule %s (%s): missing thresholds for count condition",
+                    rule.name,
+                    rule.rule_id,
+                )
+                return _handle_unknown(rule, "missing_thresholds")
+            count_on = sum(1 for _, value in values if value == "on")
+            match = _compare_numeric(count_on, *_release_condition(rule, engaged))
+            detail = _format_binary_count_detail(rule, count_on)
+            return RuleEvalResult(match, count_on, detail, None)
+
+        if rule.condition not in (COND_IS_ON, COND_IS_OFF):
+            _LOGGER.error(
+                "Rule %s (%s): invalid binary condition %s",
+                rule.name,
+                rule.rule_id,
+                rule.condition,
+            )
+            return _handle_unknown(rule, "invalid_condition")
+
+        target = "on" if rule.condition == COND_IS_ON else "off"
+        matching = [entity_id for entity_id, value in values if value == target]
+        if rule.aggregate == "any":
+            match = bool(matching)
+            entity_id = matching[0] if matching else None
+        else:
+            match = len(matching) == len(values)
+            entity_id = values[0][0] if values else None
+        detail = _format_binary_state_detail(rule, target)
+        return RuleEvalResult(match, None, detail, entity_id)
+
+    def _evaluate_text(self, rule: RuleConfig, provider: StateProvider) -> RuleEvalResult:
+        values = self._read_values(rule, provider, _parse_text_state)
+
+        if not values:
+            return _handle_unknown(rule, "no_valid_values")
+
+        if not rule.thresholds and not rule.text_patterns:
+            _LOGGER.error("Rule %s (%s): missing text match", rule.name, rule.rule_id)
+            return _handle_unknown(rule, "missing_thresholds")
+
+        matcher = _text_matcher(rule)
+        matches: list[tuple[str, str]] = []
+        for entity_id, raw in values:
+            needle = matcher.match(raw)
+            if needle is not None:
+                matches.append((entity_id, needle))
+
+        if rule.aggregate == "any":
+            match = bool(matches)
+            entity_id = matches[0][0] if matches else None
+        else:
+            match = len(matches) == len(values)
+            entity_id = values[0][0] if values else None
+        # Report the needle that matched, for a list of them.
+        needle = matches[0][1] if matches else None
+        detail = _format_text_detail(rule, needle or ", ".join(matcher.needles))
+        return RuleEvalResult(match, needle, detail, entity_id)
+
+    def _collect_numeric_value(
+        self, rule: RuleConfig, provider: StateProvider
+    ) -> tuple[float | None, Any, Any, str | None]:
+        values, cells = self._read_numeric(rule, provider)
+
+        if not values:
+            return None, None, None, "no_valid_values"
+
+        if _missing_aggregate_parameter(rule):
+            return None, None, None, "missing_aggregate_parameter"
+
+        aggregate, entity_id, entity_low, reason = self._aggregate_inputs(
+            rule, values, cells
+        )
+        if reason is not None:
+            return None, None, None, reason
+        aggregate = self._apply_rate(rule, aggregate)
+        aggregate, entity_id, entity_low = self._apply_window(
+            rule, aggregate, entity_id, entity_low
+        )
+        return aggregate, entity_id, entity_low, None
+
+    def _read_numeric(
+        self, rule: RuleConfig, provider: StateProvider
+    ) -> tuple[list[tuple[Any, float]], CellValues | None]:
+        """Entity values, or indexed attribute readings with their positions."""
+        if not rule.attribute:
+            return self._read_values(rule, provider, _parse_numeric_state), None
+        cells = self._read_cells(rule, provider)
+        return cells.indexed(), cells
+
+    def _aggregate_inputs(
+        self,
+        rule: RuleConfig,
+        values: list[tuple[Any, float]],
+        cells: CellValues | None = None,
+    ) -> tuple[float | None, Any, Any, str | None]:
+        """Aggregate or expression value, its extremes and an invalid reason.
+
+        For attribute inputs the extremes come back as ``CellRef``s, located
+        from the index of the reading the aggregate picked.
+        """
+        if rule.data_type != DATA_TYPE_EXPRESSION:
+            aggregate, high, low = _aggregate_numeric(
+                values, rule.aggregate, rule.aggregate_parameter
+            )
+            if cells is not None:
+                high = cells.locate(high, rule.entities)
+                low = cells.locate(low, rule.entities)
+            return aggregate, high, low, None
+        expression = self._expressions.get(rule.rule_id)
+        if expression is None:
+            return None, None, None, "invalid_expression"
+        try:
+            value = expression.evaluate(
+                {input_name(entity_id): value for entity_id, value in values}
+            )
+        except NameError:
+            # An input the expression needs is unavailable or stale.
+            return None, None, None, "missing_input"
+        except (ArithmeticError, TypeError, ValueError):
+            return None, None, None, "expression_error"
+        return value, None, None, None
+
+    def _apply_rate(self, rule: RuleConfig, aggregate: float) -> float:
+        rate = self._rates.get(rule.rule_id)
+        if rate is None:
+            return aggregate
+        return rate.add(self._clock.monotonic(), aggregate)
+
+    def _apply_window(
+        self,
+        rule: RuleConfig,
+        aggregate: float,
+        entity_id: Any,
+        entity_low: Any,
+    ) -> tuple[float, Any, Any]:
+        window = self._windows.get(rule.rule_id)
+        if window is None:
+            return aggregate, entity_id, entity_low
+        window.add(self._clock.monotonic(), aggregate, entity_id)
+        # The window reports a single entity; the current low end no longer
+        # belongs to the reported value.
+        value, window_entity = window.value()
+        return value, window_entity, None
+
+    def _collect_binary_count(
+        self, rule: RuleConfig, provider: StateProvider
+    ) -> tuple[int | None, str | None, str | None]:
+        values = self._read_values(rule, provider, _parse_binary_state)
+
+        if not values:
+            return None, None, "no_valid_values"
+
+        count_on = sum(1 for _, value in values if value == "on")
+        return count_on, None, None
+
+    def _read_cells(self, rule: RuleConfig, provider: StateProvider) -> CellValues:
+        path = parse_path(rule.attribute)
+        cells = CellValues()
+        for pack, entity_id in enumerate(rule.entities, start=1):
+            state = provider.get(entity_id)
+            value, reason = _parse_attribute_state(state, path)
+            if reason is None and rule.stale_seconds and self._is_stale(
+                rule, entity_id, state
+            ):
+                reason = "stale"
+            # Unreadable items are skipped; the rest of the list still counts.
+            if reason is None and cells.add(pack, value):
+                reason = "invalid_items"
+            if reason is not None:
+                self._log_invalid(rule, entity_id, reason, state)
+        return cells
+
+    def _read_values(
+        self,
+        rule: RuleConfig,
+        provider: StateProvider,
+        parse: Callable[[Any], tuple[Any, str | None]],
+    ) -> list[tuple[str, Any]]:
+        values: list[tuple[str, Any]] = []
+        for entity_id in rule.inputs:
+            state = provider.get(entity_id)
+            value, reason = parse(state)
+            if reason is None and rule.stale_seconds and self._is_stale(
+                rule, entity_id, state
+            ):
+                reason = "stale"
+            if reason is not None:
+                self._log_invalid(rule, entity_id, reason, state)
+                continue
+            values.append((entity_id, value))
+        return values
+
+    def _is_stale(self, rule: RuleConfig, entity_id: str, state: Any) -> bool:
+        now = self._clock.monotonic()
+        # HA 2024.4+ bumps last_reported when a sensor repeats its value;
+        # older cores only move last_updated on an actual change.
+        updated = getattr(state, "last_reported", None) or getattr(
+            state, "last_updated", None
+        )
+        if isinstance(updated, datetime):
+            age = (self._clock.utcnow() - updated).total_seconds()
+            self._freshness.touch(entity_id, now - max(0.0, age))
+        elif self._freshness.last_seen(entity_id) is None:
+            # No timestamp to go by: the first sighting starts the clock.
+            self._freshness.touch(entity_id, now)
+        seen = self._freshness.last_seen(entity_id)
+        return seen is not None and now - seen >= rule.stale_seconds
+
+    def _log_invalid(
+        self, rule: RuleConfig, entity_id: str, reason: str, state: Any
+    ) -> None:
+        state_value = state.state if state is not None else None
+        key = (rule.rule_id, entity_id, reason)
+        if key not in self._invalid_logged:
+            _LOGGER.warning(
+                "Rule %s (%s): invalid state for %s (%s): %s",
+                rule.name,
+                rule.rule_id,
+                entity_id,
+                reason,
+                state_value,
+            )
+            self._invalid_logged.add(key)
+        else:
+            _LOGGER.debug(
+                "Rule %s (%s): invalid state for %s (%s): %s",
+                rule.name,
+                rule.rule_id,
+                entity_id,
+                reason,
+                state_value,
+            )
+
+
+def load_rules(config: dict[str, Any]) -> list[RuleConfig]:
+    rules: list[RuleConfig] = []
+    for raw in config.get(CONF_RULES, []) or []:
+        try:
+            rule_id = str(raw.get(CONF_RULE_ID))
+            name = str(raw.get(CONF_RULE_NAME))
+        except (TypeError, ValueError):
+            _LOGGER.error("Invalid rule definition; missing id/name: %s", raw)
+            continue
+        if not rule_id or not name:
+            _LOGGER.error("Invalid rule definition; missing id/name: %s", raw)
+            continue
+
+        thresholds = list(raw.get(CONF_RULE_THRESHOLDS, []))
+        severity_mode = raw.get(CONF_RULE_SEVERITY_MODE, SEVERITY_MODE_SIMPLE)
+        try:
+            aggregate, aggregate_parameter = normalize_aggregate(
+                raw.get(CONF_RULE_AGGREGATE, ""),
+                raw.get(CONF_RULE_AGGREGATE_PARAMETER),
+            )
+        except (TypeError, ValueError):
+            _LOGGER.error(
+                "Rule %s (%s): invalid aggregate_parameter %s",
+                name,
+                rule_id,
+                raw.get(CONF_RULE_AGGREGATE_PARAMETER),
+            )
+            aggregate, aggregate_parameter = raw.get(CONF_RULE_AGGREGATE, ""), None
+        levels: dict[str, dict[str, Any]] = {}
+        raw_levels = raw.get(CONF_RULE_LEVELS, {}) or {}
+        if isinstance(raw_levels, dict):
+            for level, cfg in raw_levels.items():
+                if not isinstance(cfg, dict):
+                    continue
+                stop_level = stop_level_of(level, cfg)
+                if stop_level is None:
+                    _LOGGER.error(
+                        "Rule %s (%s): level %s needs a stop_level (%s); ignoring it",
+                        name,
+                        rule_id,
+                        level,
+                        "/".join(LEVEL_ORDER),
+                    )
+                    continue
+                try:
+                    threshold = cfg.get("threshold")
+                    duration = cfg.get("duration_seconds")
+                    if threshold is None or duration is None:
+                        continue
+                    levels[level] = {
+                        "threshold": float(threshold),
+                        "duration_seconds": int(duration),
+                    }
+                    if cfg.get("clear_threshold") is not None:
+                        levels[level]["clear_threshold"] = float(cfg["clear_threshold"])
+                    if stop_level != level:
+                        levels[level]["stop_level"] = stop_level
+                except (TypeError, ValueError):
+                    continue
+        rule = RuleConfig(
+            rule_id=rule_id,
+            name=name,
+            data_type=raw.get(CONF_RULE_DATA_TYPE, DATA_TYPE_NUMERIC),
+            entities=list(raw.get(CONF_RULE_ENTITIES, [])),
+            aggregate=aggregate,
+            condition=raw.get(CONF_RULE_CONDITION, ""),
+            thresholds=thresholds,
+            duration_seconds=max(
+                1, int(raw.get(CONF_RULE_DURATION, DEFAULT_RULE_DURATION))
+            ),
+            interval_seconds=max(
+                1, int(raw.get(CONF_RULE_INTERVAL, DEFAULT_RULE_INTERVAL))
+            ),
+            level=raw.get(CONF_RULE_LEVEL, DEFAULT_RULE_LEVEL),
+            latched=bool(raw.get(CONF_RULE_LATCHED, DEFAULT_RULE_LATCHED)),
+            unknown_handling=raw.get(
+                CONF_RULE_UNKNOWN_HANDLING, DEFAULT_RULE_UNKNOWN_HANDLING
+            ),
+            severity_mode=severity_mode,
+            direction=raw.get(CONF_RULE_DIRECTION),
+            levels=levels,
+            text_case_sensitive=bool(
+                raw.get(CONF_RULE_TEXT_CASE_SENSITIVE, DEFAULT_TEXT_CASE_SENSITIVE)
+            ),
+            text_trim=bool(raw.get(CONF_RULE_TEXT_TRIM, DEFAULT_TEXT_TRIM)),
+            notify_email=bool(
+                raw.get(CONF_RULE_NOTIFY_EMAIL, DEFAULT_RULE_NOTIFY_EMAIL)
+            ),
+            notify_mobile=bool(
+                raw.get(CONF_RULE_NOTIFY_MOBILE, DEFAULT_RULE_NOTIFY_MOBILE)
+            ),
+            window_function=_load_window_function(raw, rule_id, name),
+            window_seconds=max(
+                1,
+                int(raw.get(CONF_RULE_WINDOW_SECONDS) or DEFAULT_RULE_WINDOW_SECONDS),
+            ),
+            input_mode=_load_input_mode(raw, rule_id, name),
+            rate_smoothing_seconds=_load_rate_smoothing(raw),
+            aggregate_parameter=aggregate_parameter,
+            stale_seconds=max(
+                0, int(raw.get(CONF_RULE_STALE_SECONDS) or DEFAULT_RULE_STALE_SECONDS)
+            ),
+            hysteresis=max(
+                0.0, float(raw.get(CONF_RULE_HYSTERESIS) or DEFAULT_RULE_HYSTERESIS)
+            ),
+            clear_threshold=_load_clear_threshold(raw, rule_id, name),
+            clear_duration_seconds=max(
+                0, int(raw.get(CONF_RULE_CLEAR_DURATION) or DEFAULT_RULE_CLEAR_DURATION)
+            ),
+            max_interval_seconds=max(
+                0, int(raw.get(CONF_RULE_MAX_INTERVAL) or DEFAULT_RULE_MAX_INTERVAL)
+            ),
+            precondition_entities=tuple(
+                raw.get(CONF_RULE_PRECONDITION_ENTITIES) or ()
+            ),
+            precondition_rules=tuple(raw.get(CONF_RULE_PRECONDITION_RULES) or ()),
+            source_rules=tuple(raw.get(CONF_RULE_SOURCE_RULES) or ()),
+            coincidence_seconds=max(
+                0, int(raw.get(CONF_RULE_COINCIDENCE) or DEFAULT_RULE_COINCIDENCE)
+            ),
+            expression=raw.get(CONF_RULE_EXPRESSION),
+            attribute=_load_attribute(raw),
+            selectors=_load_selectors(raw),
+            group_by=_load_group_by(raw),
+            text_patterns=_load_text_patterns(raw),
+            freeze_latched=bool(
+                raw.get(CONF_RULE_FREEZE_LATCHED, DEFAULT_RULE_FREEZE_LATCHED)
+            ),
+        )
+        if rule.attribute:
+            try:
+                parse_path(rule.attribute)
+            except ValueError as err:
+                _LOGGER.error("Rule %s (%s): %s", name, rule_id, err)
+                continue
+        try:
+            for text in rule.selectors:
+                parse_selector(text)
+        except ValueError as err:
+            _LOGGER.error("Rule %s (%s): %s", name, rule_id, err)
+            continue
+        if rule.data_type == DATA_TYPE_EXPRESSION:
+            try:
+                _compile_rule_expression(rule)
+            except ExpressionError as err:
+                _LOGGER.error("Rule %s (%s): invalid expression: %s", name, rule_id, err)
+                continue
+        if rule.data_type == DATA_TYPE_TEXT:
+            try:
+                _text_matcher(rule)
+            except ValueError as err:
+                _LOGGER.error("Rule %s (%s): %s", name, rule_id, err)
+                continue
+        rules.append(rule)
+    return _resolve_dependencies(rules)
+
+
+def _resolve_dependencies(rules: list[RuleConfig]) -> list[RuleConfig]:
+    """Break references to unknown rules and dependency cycles.
+
+    A precondition that is unknown or part of a cycle is dropped, so the rule
+    is evaluated unconditionally: a broken dependency must not switch
+    protection off. A composite rule in a cycle has no evaluation order and
+    is left out; an unknown source counts as a missing input.
+    """
+    rule_ids = {rule.rule_id for rule in rules}
+    resolved: list[RuleConfig] = []
+    for rule in rules:
+        unknown_sources = [dep for dep in rule.source_rules if dep not in rule_ids]
+        if unknown_sources:
+            _LOGGER.error(
+                "Rule %s (%s): unknown source rules %s",
+                rule.name,
+                rule.rule_id,
+                ", ".join(unknown_sources),
+            )
+        unknown = [dep for dep in rule.precondition_rules if dep not in rule_ids]
+        if unknown:
+            _LOGGER.error(
+                "Rule %s (%s): unknown precondition rules %s; ignoring them",
+                rule.name,
+                rule.rule_id,
+                ", ".join(unknown),
+            )
+            rule = replace(
+                rule,
+                precondition_rules=tuple(
+                    dep for dep in rule.precondition_rules if dep in rule_ids
+                ),
+            )
+        resolved.append(rule)
+    try:
+        topological_order(_dependencies(resolved))
+    except CycleError as err:
+        _LOGGER.error(
+            "%s; composite rules in it are disabled and precondition rules ignored",
+            err,
+        )
+        members = set(err.members)
+        resolved = [
+            replace(rule, precondition_rules=())
+            if rule.rule_id in members
+            else rule
+            for rule in resolved
+            if not (rule.rule_id in members and rule.is_composite)
+        ]
+    return resolved
+
+
+def _dependencies(rules: list[RuleConfig]) -> dict[str, set[str]]:
+    return {
+        rule.rule_id: {*rule.precondition_rules, *rule.source_rules} for rule in rules
+    }
+
+
+def _raised_levels(rule: RuleConfig) -> list[str | None]:
+    """Stop levels ``rule`` can raise."""
+    if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
+        return [rule.stop_level(level) for level in rule.levels]
+    return [rule.level]
+
+
+def _rule_dependents(rules: list[RuleConfig]) -> dict[str, list[str]]:
+    """Rules to wake when a rule flips: composites and precondition users."""
+    dependents: dict[str, list[str]] = {}
+    for rule in rules:
+        for rule_id in dict.fromkeys((*rule.source_rules, *rule.precondition_rules)):
+            dependents.setdefault(rule_id, []).append(rule.rule_id)
+    return dependents
+
+
+def _evaluation_order(rules: list[RuleConfig]) -> list[RuleConfig]:
+    by_id = {rule.rule_id: rule for rule in rules}
+    try:
+        order = topological_order(_dependencies(rules))
+    except CycleError as err:
+        # load_rules already breaks cycles; this only guards hand-built rules.
+        _LOGGER.error("%s; evaluating in configured order", err)
+        return list(rules)
+    return [by_id[rule_id] for rule_id in order]
+
+
+def _text_matcher(rule: RuleConfig) -> TextMatcher:
+    # Cached by needles and options, like expressions.
+    return compile_needles(
+        tuple(str(value) for value in (*rule.thresholds[:1], *rule.text_patterns)),
+        rule.condition == COND_EQUALS,
+        rule.text_case_sensitive,
+        rule.text_trim,
+    )
+
+
+def _compile_rule_expression(rule: RuleConfig) -> CompiledExpression:
+    # Cached by text and names: reloading an unchanged rule set compiles nothing.
+    return compile_expression(
+        rule.expression or "", frozenset(input_names(rule.entities))
+    )
+
+
+def normalize_aggregate(aggregate: Any, parameter: Any) -> tuple[str, float | None]:
+    """Expand the ``pN`` shorthand (``p95``) into ``percentile`` with N."""
+    aggregate = str(aggregate or "")
+    shorthand = _PERCENTILE_SHORTHAND.fullmatch(aggregate)
+    if shorthand:
+        return AGGREGATE_PERCENTILE, float(shorthand.group(1))
+    if parameter is None or parameter == "":
+        return aggregate, None
+    return aggregate, float(parameter)
+
+
+def _load_attribute(raw: dict[str, Any]) -> str | None:
+    # Attribute inputs feed the numeric aggregates only.
+    if raw.get(CONF_RULE_DATA_TYPE, DATA_TYPE_NUMERIC) != DATA_TYPE_NUMERIC:
+        return None
+    return str(raw.get(CONF_RULE_ATTRIBUTE) or "").strip() or None
+
+
+def _load_selectors(raw: dict[str, Any]) -> tuple[str, ...]:
+    # Expression names and composite sources have to be spelled out.
+    if raw.get(CONF_RULE_DATA_TYPE, DATA_TYPE_NUMERIC) in (
+        DATA_TYPE_EXPRESSION,
+        DATA_TYPE_COMPOSITE,
+    ):
+        return ()
+    selectors = raw.get(CONF_RULE_SELECTORS) or ()
+    if isinstance(selectors, str):
+        selectors = selectors.splitlines()
+    return tuple(
+        " ".join(str(text).split()) for text in selectors if str(text).strip()
+    )
+
+
+def _load_text_patterns(raw: dict[str, Any]) -> tuple[str, ...]:
+    if raw.get(CONF_RULE_DATA_TYPE) != DATA_TYPE_TEXT:
+        return ()
+    patterns = raw.get(CONF_RULE_TEXT_PATTERNS) or ()
+    if isinstance(patterns, str):
+        patterns = patterns.splitlines()
+    return tuple(str(pattern) for pattern in patterns if str(pattern).strip())
+
+
+def _load_group_by(raw: dict[str, Any]) -> str | None:
+    if raw.get(CONF_RULE_DATA_TYPE, DATA_TYPE_NUMERIC) in (
+        DATA_TYPE_EXPRESSION,
+        DATA_TYPE_COMPOSITE,
+    ):
+        return None
+    group_by = raw.get(CONF_RULE_GROUP_BY)
+    if group_by in (GROUP_BY_DEVICE, GROUP_BY_CAPTURE):
+        return group_by
+    return None
+
+
+def _only_members_differ(previous: RuleConfig, rule: RuleConfig) -> bool:
+    if not (rule.selectors or rule.group_by):
+        return False
+    return (
+        replace(
+            previous,
+            entities=rule.entities,
+            groups=rule.groups,
+            group_names=rule.group_names,
+        )
+        == rule
+    )
+
+
+def _load_window_function(raw: dict[str, Any], rule_id: str, name: str) -> str:
+    function = raw.get(CONF_RULE_WINDOW_FUNCTION) or DEFAULT_RULE_WINDOW_FUNCTION
+    if function not in WINDOW_FUNCTIONS:
+        _LOGGER.error(
+            "Rule %s (%s): unknown window_function %s; ignoring window",
+            name,
+            rule_id,
+            function,
+        )
+        return WINDOW_NONE
+    return function
+
+
+def _load_input_mode(raw: dict[str, Any], rule_id: str, name: str) -> str:
+    mode = raw.get(CONF_RULE_INPUT_MODE) or DEFAULT_RULE_INPUT_MODE
+    if mode not in INPUT_MODES:
+        _LOGGER.error(
+            "Rule %s (%s): unknown input_mode %s; using the value",
+            name,
+            rule_id,
+            mode,
+        )
+        return DEFAULT_RULE_INPUT_MODE
+    return mode
+
+
+def _load_rate_smoothing(raw: dict[str, Any]) -> int:
+    # Zero is meaningful (no smoothing), so only a missing value defaults.
+    smoothing = raw.get(CONF_RULE_RATE_SMOOTHING)
+    if smoothing is None:
+        return DEFAULT_RULE_RATE_SMOOTHING
+    return max(0, int(smoothing))
+
+
+def _load_clear_threshold(raw: dict[str, Any], rule_id: str, name: str) -> float | None:
+    clear = raw.get(CONF_RULE_CLEAR_THRESHOLD)
+    if clear is None:
+        return None
+    if raw.get(CONF_RULE_CONDITION) not in (COND_GT, COND_GTE, COND_LT, COND_LTE):
+        _LOGGER.error(
+            "Rule %s (%s): clear_threshold needs a gt/gte/lt/lte condition; ignoring",
+            name,
+            rule_id,
+        )
+        return None
+    return float(clear)
+
+
+def rule_fingerprint(rule: RuleConfig) -> str:
+    """Hash of the configured rule.
+
+    Selector and family rules are hashed without their resolved members:
+    membership at the next start may differ (a pack added, an entity not
+    loaded yet), which update_rules handles without dropping state either.
+    """
+    if rule.selectors or rule.group_by:
+        rule = replace(rule, entities=[], groups=(), group_names=())
+    data = asdict(rule)
+    defaults = {item.name: item.default for item in fields(RuleConfig)}
+    for name in _FINGERPRINT_OPTIONAL_FIELDS:
+        if data[name] == defaults[name]:
+            del data[name]
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _monotonic_to_wall(
+    value: float | None, now_monotonic: float, now_wall: float
+) -> float | None:
+    if value is None:
+        return None
+    return now_wall - (now_monotonic - value)
+
+
+def _wall_to_monotonic(
+    value: Any, now_monotonic: float, now_wall: float
+) -> float | None:
+    if value is None:
+        return None
+    elapsed = max(0.0, now_wall - float(value))
+    return now_monotonic - elapsed
+
+
+def _persist_state_signature(
+    rule: RuleConfig, state: RuleRuntimeState
+) -> tuple[Any, ...]:
+    return (
+        rule.rule_id,
+        state.active,
+        state.active_since,
+        state.current_level,
+        state.latched_level,
+        tuple(state.active_levels),
+        state.violation_started_at is not None,
+        tuple(
+            (
+                level,
+                state.level_violation_started_at.get(level) is not None,
+                state.level_active_since.get(level),
+            )
+            for level in rule.ladder.levels
+        ),
+    )
+
+
+def _serialize_runtime_state(
+    rule: RuleConfig,
+    state: RuleRuntimeState,
+    now_monotonic: float,
+    now_wall: float,
+) -> dict[str, Any]:
+    return {
+        "fingerprint": rule_fingerprint(rule),
+        "active": state.active,
+        "active_since": state.active_since,
+        "last_update": state.last_update,
+        "last_match": state.last_match,
+        "last_aggregate": state.last_aggregate,
+        "last_entity": state.last_entity,
+        "last_pack": state.last_pack,
+        "last_cell": state.last_cell,
+        "last_detail": state.last_detail,
+        "last_invalid_reason": state.last_invalid_reason,
+        "current_level": state.current_level,
+        "latched_level": state.latched_level,
+        "active_levels": list(state.active_levels),
+        "violation_started_at": _monotonic_to_wall(
+            state.violation_started_at, now_monotonic, now_wall
+        ),
+        "level_violation_started_at": {
+            level: _monotonic_to_wall(started_at, now_monotonic, now_wall)
+            for level, started_at in state.level_violation_started_at.items()
+        },
+        "level_active_since": dict(state.level_active_since),
+    }
+
+
+def _apply_runtime_state(
+    rule: RuleConfig,
+    state: RuleRuntimeState,
+    raw: dict[str, Any],
+    now_monotonic: float,
+    now_wall: float,
+) -> None:
+    def known_level(level: Any) -> str | None:
+        return level if level in rule.levels else None
+
+    state.active = bool(raw.get("active"))
+    state.active_since = raw.get("active_since")
+    state.last_update = raw.get("last_update")
+    state.last_match = raw.get("last_match")
+    state.last_aggregate = raw.get("last_aggregate")
+    state.last_entity = raw.get("last_entity")
+    state.last_pack = raw.get("last_pack")
+    state.last_cell = raw.get("last_cell")
+    state.last_detail = raw.get("last_detail")
+    state.last_invalid_reason = raw.get("last_invalid_reason")
+    state.violation_started_at = _wall_to_monotonic(
+        raw.get("violation_started_at"), now_monotonic, now_wall
+    )
+    if rule.severity_mode != SEVERITY_MODE_SEMAFOR:
+        return
+    state.current_level = known_level(raw.get("current_level"))
+    state.latched_level = known_level(raw.get("latched_level"))
+    state.active_levels = [
+        level for level in raw.get("active_levels") or [] if known_level(level)
+    ]
+    state.level_violation_started_at = {
+        level: _wall_to_monotonic(started_at, now_monotonic, now_wall)
+        for level, started_at in (raw.get("level_violation_started_at") or {}).items()
+        if known_level(level)
+    }
+    state.level_active_since = {
+        level: active_since
+        for level, active_since in (raw.get("level_active_since") or {}).items()
+        if known_level(level)
+    }
+    state.active = state.current_level is not None
+
+
+def eval_interval(rule: RuleConfig, state: RuleRuntimeState) -> float:
+    """Seconds between evaluations of ``rule`` at the moment."""
+    if state.eval_interval is None:
+        return rule.interval_seconds
+    return state.eval_interval
+
+
+def _timer_running(rule: RuleConfig, state: RuleRuntimeState) -> bool:
+    if state.clear_started_at is not None:
+        return True
+    if state.violation_started_at is not None and not state.active:
+        return True
+    if any(started is not None for started in state.level_clear_started_at.values()):
+        return True
+    return any(
+        started is not None and not state.level_active_since.get(level)
+        for level, started in state.level_violation_started_at.items()
+    )
+
+
+def _timer_deadline(rule: RuleConfig, state: RuleRuntimeState) -> float | None:
+    """Monotonic time the first running duration timer of ``rule`` expires."""
+    if state.frozen:
+        return None
+    deadlines: list[float] = []
+    if state.violation_started_at is not None and not state.active:
+        deadlines.append(state.violation_started_at + rule.duration_seconds)
+    if state.clear_started_at is not None:
+        deadlines.append(state.clear_started_at + rule.clear_duration_seconds)
+    for level, started in state.level_violation_started_at.items():
+        cfg = rule.levels.get(level)
+        if started is not None and cfg and not state.level_active_since.get(level):
+            deadlines.append(started + cfg["duration_seconds"])
+    deadlines.extend(
+        started + rule.clear_duration_seconds
+        for started in state.level_clear_started_at.values()
+        if started is not None
+    )
+    return min(deadlines, default=None)
+
+
+def _copy_reading(state: RuleRuntimeState, source: RuleRuntimeState) -> None:
+    """Report the reading of family group ``source`` as the family's."""
+    state.last_match = source.last_match
+    state.last_aggregate = source.last_aggregate
+    state.last_entity = source.last_entity
+    state.last_entity_low = source.last_entity_low
+    state.last_pack = source.last_pack
+    state.last_cell = source.last_cell
+    state.last_detail = source.last_detail
+    state.last_invalid_reason = source.last_invalid_reason
+
+
+def _group_rank(rule: RuleConfig, state: RuleRuntimeState) -> tuple[Any, ...]:
+    """Order groups of a family from least to most severe."""
+    value = state.last_aggregate
+    closeness = 0.0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        closeness = -_threshold_margin(rule, float(value))
+    return (
+        state.active,
+        rule.ladder.rank(state.current_level),
+        state.last_match is True,
+        state.last_invalid_reason is None,
+        closeness,
+    )
+
+
+def _fold_family(
+    rule: RuleConfig, state: RuleRuntimeState, members: list[RuleRuntimeState]
+) -> None:
+    """Worst case of the group states: activity, levels and running timers."""
+
+    def earliest(values: Iterable[Any]) -> Any:
+        return min((value for value in values if value is not None), default=None)
+
+    active = [member for member in members if member.active]
+    state.active = bool(active)
+    state.active_since = earliest(member.active_since for member in active)
+    state.violation_started_at = earliest(
+        member.violation_started_at for member in members
+    )
+    state.clear_started_at = earliest(member.clear_started_at for member in members)
+    if rule.severity_mode != SEVERITY_MODE_SEMAFOR:
+        return
+    ladder = rule.ladder
+    state.current_level = ladder.highest(member.current_level for member in members)
+    state.latched_level = ladder.highest(member.latched_level for member in members)
+    state.active_levels = [
+        level
+        for level in ladder.levels
+        if any(level in member.active_levels for member in members)
+    ]
+    state.level_violation_started_at = _earliest_per_level(
+        rule, [member.level_violation_started_at for member in members]
+    )
+    state.level_active_since = _earliest_per_level(
+        rule, [member.level_active_since for member in members]
+    )
+    state.level_clear_started_at = _earliest_per_level(
+        rule, [member.level_clear_started_at for member in members]
+    )
+
+
+def _earliest_per_level(
+    rule: RuleConfig, by_level: list[dict[str, Any]]
+) -> dict[str, Any]:
+    merged: dict[str, Any] = {}
+    for level in rule.levels:
+        values = [item[level] for item in by_level if item.get(level) is not None]
+        if values:
+            merged[level] = min(values)
+    return merged
+
+
+def _threshold_margin(rule: RuleConfig, value: float) -> float:
+    """Signed distance from ``value`` to the nearest trip or clear point.
+
+    Positive while the value is on the safe side of every point; zero or
+    negative (how far past) once it crossed one, hysteresis band included.
+    """
+    points: list[float] = []
+    if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
+        for cfg in rule.levels.values():
+            points.append(cfg["threshold"])
+            points.append(_level_clear_threshold(rule, cfg))
+        if not points:
+            return 0.0
+        if rule.direction == DIRECTION_LOWER_IS_WORSE:
+            return value - max(points)
+        return min(points) - value
+    if not _has_required_thresholds(rule):
+        return 0.0
+    points.extend(float(threshold) for threshold in rule.thresholds[:2])
+    points.extend(float(point) for point in _release_condition(rule, True)[1])
+    if rule.condition in (COND_GT, COND_GTE):
+        return min(points) - value
+    if rule.condition in (COND_LT, COND_LTE):
+        return value - max(points)
+    # eq and between trip inside [low, high]: past means inside.
+    return max(min(points) - value, value - max(points))
+
+
+def min_interval(rules: list[RuleConfig]) -> int:
+    if not rules:
+        return 1
+    return max(1, min(rule.interval_seconds for rule in rules))
+
+
+def _parse_numeric_state(state: Any) -> tuple[float | None, str | None]:
+    if state is None:
+        return None, "missing"
+    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+        return None, "unknown"
+    try:
+        return float(state.state), None
+    except (TypeError, ValueError):
+        return None, "invalid"
+
+
+def _parse_attribute_state(
+    state: Any, path: tuple[str | int, ...]
+) -> tuple[Any, str | None]:
+    if state is None:
+        return None, "missing"
+    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+        return None, "unknown"
+    value = resolve(state.attributes, path)
+    if value is None:
+        return None, "missing_attribute"
+    return value, None
+
+
+def _parse_binary_state(state: Any) -> tuple[str | None, str | None]:
+    if state is None:
+        return None, "missing"
+    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+        return None, "unknown"
+    value = str(state.state).lower()
+    if value in ("on", "off"):
+        return value, None
+    return None, "invalid"
+
+
+def _parse_text_state(state: Any) -> tuple[str | None, str | None]:
+    if state is None:
+        return None, "missing"
+    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+        return None, "unknown"
+    return str(state.state), None
+
+
+def _aggregate_numeric(
+    values: list[tuple[str, float]],
+    aggregate: str,
+    parameter: float | None = None,
+) -> tuple[float, str | None, str | None]:
+    """Return the aggregate, the entity behind it and, for spread, the low end."""
+    if aggregate == "min":
+        entity_id, value = min(values, key=lambda item: item[1])
+        return value, entity_id, None
+    if aggregate == "sum":
+        return sum(value for _, value in values), None, None
+    if aggregate == "avg":
+        return sum(value for _, value in values) / len(values), None, None
+    if aggregate == AGGREGATE_SPREAD:
+        return _spread(values)
+    if aggregate == AGGREGATE_MEDIAN:
+        return (*median(values), None)
+    if aggregate == AGGREGATE_PERCENTILE:
+        return (*percentile(values, parameter), None)
+    if aggregate == AGGREGATE_COUNT_ABOVE:
+        return sum(1 for _, value in values if value > parameter), None, None
+    entity_id, value = max(values, key=lambda item: item[1])
+    return value, entity_id, None
+
+
+def _spread(values: list[tuple[str, float]]) -> tuple[float, str, str]:
+    # One pass for both extremes; wide cell lists are the common case.
+    high_entity, high = values[0]
+    low_entity, low = high_entity, high
+    for entity_id, value in values:
+        if value > high:
+            high_entity, high = entity_id, value
+        elif value < low:
+            low_entity, low = entity_id, value
+    return high - low, high_entity, low_entity
+
+
+def _compare_numeric(value: float | int, condition: str, thresholds: list[Any]) -> bool:
+    if condition == COND_GT:
+        return value > float(thresholds[0])
+    if condition == COND_GTE:
+        return value >= float(thresholds[0])
+    if condition == COND_LT:
+        return value < float(thresholds[0])
+    if condition == COND_LTE:
+        return value <= float(thresholds[0])
+    if condition == COND_EQ:
+        return value == float(thresholds[0])
+    low = float(thresholds[0])
+    high = float(thresholds[1])
+    return low <= value <= high
+
+
+def _release_condition(rule: RuleConfig, engaged: bool) -> tuple[str, list[Any]]:
+    """Condition and thresholds a rule is held to while it is violated.
+
+    Once a violation has started, the rule only clears past its clear point:
+    ``clear_threshold`` when set, else the trip threshold moved back by
+    ``hysteresis``. With neither set this is the trip comparison itself.
+    """
+    if not engaged or not (rule.hysteresis or rule.clear_threshold is not None):
+        return rule.condition, rule.thresholds
+    band = rule.hysteresis
+    threshold = float(rule.thresholds[0])
+    if rule.condition in (COND_GT, COND_GTE):
+        clear = rule.clear_threshold
+        return rule.condition, [threshold - band if clear is None else clear]
+    if rule.condition in (COND_LT, COND_LTE):
+        clear = rule.clear_threshold
+        return rule.condition, [threshold + band if clear is None else clear]
+    if rule.condition == COND_EQ:
+        return COND_BETWEEN, [threshold - band, threshold + band]
+    return COND_BETWEEN, [threshold - band, float(rule.thresholds[1]) + band]
+
+
+def _level_clear_threshold(rule: RuleConfig, cfg: dict[str, Any]) -> float:
+    clear = cfg.get("clear_threshold")
+    if clear is not None:
+        return clear
+    if rule.direction == DIRECTION_LOWER_IS_WORSE:
+        return cfg["threshold"] + rule.hysteresis
+    return cfg["threshold"] - rule.hysteresis
+
+
+def _missing_aggregate_parameter(rule: RuleConfig) -> bool:
+    if rule.aggregate in PARAMETRIC_AGGREGATES and rule.aggregate_parameter is None:
+        _LOGGER.error(
+            "Rule %s (%s): %s needs aggregate_parameter",
+            rule.name,
+            rule.rule_id,
+            rule.aggregate,
+        )
+        return True
+    return False
+
+
+def _has_required_thresholds(rule: RuleConfig) -> bool:
+    if rule.condition == COND_BETWEEN:
+        return len(rule.thresholds) >= 2
+    return len(rule.thresholds) >= 1
+
+
+def highest_level(levels: list[str] | None) -> str | None:
+    if not levels:
+        return None
+    return max(levels, key=lambda level: LEVEL_RANK.get(level, 0))
+
+
+def _handle_unknown(rule: RuleConfig, reason: str) -> RuleEvalResult:
+    detail = f"{rule.name}: {reason}"
+    if rule.unknown_handling == UNKNOWN_TREAT_VIOLATION:
+        return RuleEvalResult(True, None, detail, None, reason)
+    if rule.unknown_handling == UNKNOWN_TREAT_OK:
+        return RuleEvalResult(False, None, detail, None, reason)
+    return RuleEvalResult(None, None, detail, None, reason)
+
+
+def _aggregate_label(rule: RuleConfig) -> str:
+    label = rule.aggregate
+    if rule.data_type == DATA_TYPE_EXPRESSION:
+        label = f"({rule.expression})"
+    elif rule.aggregate == AGGREGATE_PERCENTILE:
+        label = f"p{rule.aggregate_parameter:g}"
+    elif rule.aggregate == AGGREGATE_COUNT_ABOVE:
+        label = f"count_above_{rule.aggregate_parameter:g}"
+    if rule.has_rate:
+        label = f"rate({label})"
+    if rule.has_window:
+        label = f"{rule.window_function}_{rule.window_seconds}s({label})"
+    return label
+
+
+def _format_numeric_detail(rule: RuleConfig, value: float) -> str:
+    label = _aggregate_label(rule)
+    if rule.condition == COND_BETWEEN and len(rule.thresholds) >= 2:
+        return (
+            f"{rule.name}: {label}={value:.3f} between "
+            f"{rule.thresholds[0]}..{rule.thresholds[1]}"
+        )
+    threshold = rule.thresholds[0] if rule.thresholds else ""
+    return f"{rule.name}: {label}={value:.3f} {rule.condition} {threshold}"
+
+
+def _format_extremes(entity_high: Any, entity_low: Any) -> str:
+    if entity_low is None:
+        # A single cell is worth naming; a whole entity is in last_entity.
+        if isinstance(entity_high, CellRef) and entity_high.cell is not None:
+            return f" ({_format_ref(entity_high)})"
+        return ""
+    return f" (max {_format_ref(entity_high)}, min {_format_ref(entity_low)})"
+
+
+def _format_ref(ref: Any) -> str:
+    if isinstance(ref, CellRef) and ref.cell is not None:
+        return f"{ref.entity_id} cell {ref.cell}"
+    return str(_ref_entity(ref))
+
+
+def _ref_entity(ref: Any) -> str | None:
+    """Entity id of an aggregate's reported reading."""
+    return ref.entity_id if isinstance(ref, CellRef) else ref
+
+
+def _format_binary_state_detail(rule: RuleConfig, target: str) -> str:
+    return f"{rule.name}: {rule.aggregate} is {target}"
+
+
+def _format_binary_count_detail(rule: RuleConfig, count_on: int) -> str:
+    if rule.condition == COND_BETWEEN and len(rule.thresholds) >= 2:
+        return (
+            f"{rule.name}: count={count_on} between "
+            f"{rule.thresholds[0]}..{rule.thresholds[1]}"
+        )
+    threshold = rule.thresholds[0] if rule.thresholds else ""
+    return f"{rule.name}: count={count_on} {rule.condition} {threshold}"
+
+
+def _format_text_detail(rule: RuleConfig, match_value: str) -> str:
+    return f"{rule.name}: {rule.condition} '{match_value}'"
+
+
+def _format_semafor_detail(
+    rule: RuleConfig, level: str, value: float | int | None, threshold: float | int
+) -> str:
+    if value is None:
+        return f"{rule.name}: {level} threshold {threshold}"
+    comparator = ">=" if rule.direction != DIRECTION_LOWER_IS_WORSE else "<="
+    return f"{rule.name}: {level} {value} {comparator} {threshold}"
@@ -0,0 +1,189 @@
+"""Arithmetic/logic expressions over a rule's inputs, compiled once.
+
+An expression is parsed with :mod:`ast`, checked against a small whitelist
+of nodes and compiled into a code object. Evaluation is a single ``eval`` of
+that code object with an empty ``__builtins__`` and a namespace holding only
+the rule's inputs and the functions below, so its cost is close to that of
+the native aggregates.
+"""
+from __future__ import annotations
+
+import ast
+from dataclasses import dataclass
+from functools import lru_cache
+import math
+from typing import Any, Iterable
+
+from .selection import median as _median, percentile as _percentile
+
+# Name bound to all valid inputs of the rule, for the aggregate functions.
+VALUES = "values"
+
+_MAX_LENGTH = 1000
+
+_OPERATORS = (
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.UAdd,
+    ast.USub,
+    ast.Not,
+    ast.And,
+    ast.Or,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+)
+_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.Compare,
+    ast.IfExp,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    *_OPERATORS,
+)
+
+
+class ExpressionError(ValueError):
+    """Expression that does not parse or leaves the allowed grammar."""
+
+
+def _flatten(args: tuple[Any, ...]) -> list[float]:
+    flat: list[float] = []
+    for arg in args:
+        if isinstance(arg, tuple):
+            flat.extend(arg)
+        else:
+            flat.append(float(arg))
+    if not flat:
+        raise ValueError("no values")
+    return flat
+
+
+def _pairs(args: tuple[Any, ...]) -> list[tuple[str, float]]:
+    return [("", value) for value in _flatten(args)]
+
+
+def _avg(*args: Any) -> float:
+    flat = _flatten(args)
+    return sum(flat) / len(flat)
+
+
+def _spread(*args: Any) -> float:
+    flat = _flatten(args)
+    return max(flat) - min(flat)
+
+
+def _count(*args: Any) -> int:
+    return sum(1 for value in _flatten(args) if value)
+
+
+FUNCTIONS: dict[str, Any] = {
+    "abs": abs,
+    "min": lambda *args: min(_flatten(args)),
+    "max": lambda *args: max(_flatten(args)),
+    "sum": lambda *args: sum(_flatten(args)),
+    "avg": _avg,
+    "spread": _spread,
+    "median": lambda *args: _median(_pairs(args))[0],
+    "percentile": lambda percent, *args: _percentile(_pairs(args), float(percent))[0],
+    "count": _count,
+    "round": lambda value, digits=0: round(float(value), int(digits)),
+}
+_GLOBALS: dict[str, Any] = {"__builtins__": {}, **FUNCTIONS}
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    text: str
+    code: Any
+    names: frozenset[str]
+
+    def evaluate(self, inputs: dict[str, float]) -> float:
+        """Evaluate with ``inputs`` by name; booleans become 1.0 / 0.0.
+
+        Raises ``NameError`` when a referenced input is not in ``inputs`` and
+        ``ArithmeticError`` / ``ValueError`` for results that are not a finite
+        number (division by zero, no values for an aggregate, ...).
+        """
+        namespace = {VALUES: tuple(inputs.values()), **inputs}
+        result = eval(self.code, _GLOBALS, namespace)
+        if isinstance(result, tuple):
+            raise ValueError("expression returned several values")
+        value = float(result)
+        if not math.isfinite(value):
+            raise ArithmeticError("result is not finite")
+        return value
+
+
+def input_name(entity_id: str) -> str:
+    """Name of an entity in expressions: its object id (``sensor.cell_1`` → ``cell_1``)."""
+    return entity_id.split(".", 1)[-1]
+
+
+def input_names(entity_ids: Iterable[str]) -> dict[str, str]:
+    """Map expression names to entity ids; raise on clashes or invalid names."""
+    names: dict[str, str] = {}
+    for entity_id in entity_ids:
+        name = input_name(entity_id)
+        if not name.isidentifier() or name in FUNCTIONS or name == VALUES:
+            raise ExpressionError(f"{entity_id}: '{name}' cannot be used as a name")
+        if name in names:
+            raise ExpressionError(
+                f"{names[name]} and {entity_id} share the name '{name}'"
+            )
+        names[name] = entity_id
+    return names
+
+
+@lru_cache(maxsize=256)
+def compile_expression(
+    text: str, allowed_names: frozenset[str]
+) -> CompiledExpression:
+    """Validate ``text`` and compile it once; repeated calls hit the cache."""
+    if not text or not text.strip():
+        raise ExpressionError("empty expression")
+    if len(text) > _MAX_LENGTH:
+        raise ExpressionError(f"expression longer than {_MAX_LENGTH} characters")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as err:
+        raise ExpressionError(f"syntax error: {err.msg}") from err
+
+    names: set[str] = set()
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if not isinstance(node, _NODES):
+            raise ExpressionError(f"{type(node).__name__} is not allowed")
+        if isinstance(node, ast.Constant) and type(node.value) not in (
+            int,
+            float,
+            bool,
+        ):
+            raise ExpressionError("only numeric constants are allowed")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ExpressionError("only the built-in functions can be called")
+            if node.keywords:
+                raise ExpressionError("keyword arguments are not allowed")
+        elif isinstance(node, ast.Name):
+            if node.id in FUNCTIONS:
+                if id(node) not in called:
+                    raise ExpressionError(f"'{node.id}' must be called")
+            elif node.id != VALUES and node.id not in allowed_names:
+                raise ExpressionError(f"unknown name '{node.id}'")
+            else:
+                names.add(node.id)
+    code = compile(tree, "<expression>", "eval")
+    return CompiledExpression(text=text, code=code, names=frozenset(names))
@@ -0,0 +1,84 @@
+"""Last-seen index of entity updates with staleness deadlines."""
+from __future__ import annotations
+
+import heapq
+
+# Updates closer together than this are one update. Timestamps converted
+# from wall time jitter slightly between evaluations and would otherwise
+# push a new heap entry on every pass.
+_RESOLUTION = 0.01
+
+
+class FreshnessIndex:
+    """Monotonic time each watched entity was last updated or reported.
+
+    Every update pushes one ``(deadline, entity_id, seen_at)`` entry per
+    distinct max age watching the entity. Entries made obsolete by a newer
+    update are dropped lazily when they reach the top of the heap, so finding
+    the next entity to go stale is O(log n) and nothing scans all entities.
+    """
+
+    def __init__(self) -> None:
+        self._seen: dict[str, float] = {}
+        self._max_ages: dict[str, set[float]] = {}
+        self._deadlines: list[tuple[float, str, float]] = []
+
+    @property
+    def entity_ids(self) -> set[str]:
+        """Entities watched by at least one rule."""
+        return set(self._max_ages)
+
+    def watch(self, max_ages: dict[str, set[float]]) -> None:
+        """Replace the watched entities and their max ages (seconds)."""
+        self._max_ages = {
+            entity_id: set(ages) for entity_id, ages in max_ages.items() if ages
+        }
+        self._seen = {
+            entity_id: seen
+            for entity_id, seen in self._seen.items()
+            if entity_id in self._max_ages
+        }
+        self._deadlines = [
+            (seen + age, entity_id, seen)
+            for entity_id, seen in self._seen.items()
+            for age in self._max_ages[entity_id]
+        ]
+        heapq.heapify(self._deadlines)
+
+    def last_seen(self, entity_id: str) -> float | None:
+        return self._seen.get(entity_id)
+
+    def touch(self, entity_id: str, when: float) -> None:
+        """Record an update of ``entity_id`` at monotonic time ``when``."""
+        ages = self._max_ages.get(entity_id)
+        if ages is None:
+            return
+        previous = self._seen.get(entity_id)
+        if previous is not None and when <= previous + _RESOLUTION:
+            return
+        self._seen[entity_id] = when
+        for age in ages:
+            heapq.heappush(self._deadlines, (when + age, entity_id, when))
+
+    def next_deadline(self) -> float | None:
+        """Earliest time a watched entity can go stale, if any."""
+        self._drop_obsolete()
+        return self._deadlines[0][0] if self._deadlines else None
+
+    def pop_expired(self, now: float) -> set[str]:
+        """Return entities whose deadline passed at or before ``now``."""
+        expired: set[str] = set()
+        while True:
+            self._drop_obsolete()
+            if not self._deadlines or self._deadlines[0][0] > now:
+                return expired
+            _, entity_id, _ = heapq.heappop(self._deadlines)
+            expired.add(entity_id)
+
+    def _drop_obsolete(self) -> None:
+        deadlines = self._deadlines
+        while deadlines:
+            _, entity_id, seen_at = deadlines[0]
+            if self._seen.get(entity_id) == seen_at:
+                return
+            heapq.heappop(deadlines)
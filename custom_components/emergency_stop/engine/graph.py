@@ -0,0 +1,59 @@
+"""Evaluation order of rules that depend on other rules."""
+from __future__ import annotations
+
+from collections import deque
+
+
+class CycleError(ValueError):
+    """Rules in a dependency loop."""
+
+    def __init__(self, members: list[str]) -> None:
+        super().__init__(f"dependency cycle between rules: {', '.join(members)}")
+        self.members = members
+
+
+def topological_order(dependencies: dict[str, set[str]]) -> list[str]:
+    """Order rule ids so every rule comes after the rules it depends on.
+
+    Kahn's algorithm, O(rules + edges). Ties keep the order of
+    ``dependencies``, so rules without dependencies are evaluated in their
+    configured order. Dependencies on unknown ids are ignored.
+    """
+    position = {rule_id: index for index, rule_id in enumerate(dependencies)}
+    dependents: dict[str, list[str]] = {rule_id: [] for rule_id in dependencies}
+    pending: dict[str, int] = {}
+    for rule_id, depends_on in dependencies.items():
+        known = {dep for dep in depends_on if dep in dependents}
+        pending[rule_id] = len(known)
+        for dep in known:
+            dependents[dep].append(rule_id)
+
+    ready = deque(rule_id for rule_id, count in pending.items() if count == 0)
+    order: list[str] = []
+    while ready:
+        rule_id = ready.popleft()
+        order.append(rule_id)
+        released = []
+        for dependent in dependents[rule_id]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                released.append(dependent)
+        ready.extend(sorted(released, key=position.__getitem__))
+    if len(order) < len(dependencies):
+        raise CycleError(_cycle_members(dependents, pending))
+    return order
+
+
+def _cycle_members(
+    dependents: dict[str, list[str]], pending: dict[str, int]
+) -> list[str]:
+    """Unordered rules minus those that merely depend on a cycle."""
+    remaining = {rule_id for rule_id, count in pending.items() if count > 0}
+    changed = True
+    while changed:
+        changed = False
+        for rule_id in list(remaining):
+            if not any(dependent in remaining for dependent in dependents[rule_id]):
+                remaining.discard(rule_id)
+                changed = True
+    return [rule_id for rule_id in dependents if rule_id in remaining]
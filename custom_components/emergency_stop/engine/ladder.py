@@ -0,0 +1,80 @@
+"""Semafor levels ordered by threshold and classified with ``bisect``.
+
+A semafor rule is not limited to notify / limit / shutdown: it may define
+any ordered set of levels, e.g. warn, derate_25, derate_50 and shutdown, each
+with its own threshold and duration timer. Levels named other than the three
+stop levels say which stop level they raise (``stop_level``).
+
+The levels are ordered from least to most severe by their thresholds, so the
+levels a value trips are always a prefix of that order. Thresholds are kept
+as one ascending array (negated when lower is worse), and a single bisect
+finds that prefix instead of comparing against every level.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+import re
+from typing import Any, Iterable, Mapping
+
+from ..const import LEVEL_ORDER
+
+# Custom level names, e.g. derate_25.
+_LEVEL_NAME = re.compile(r"[a-z][a-z0-9_]*")
+_STOP_RANK = {level: rank for rank, level in enumerate(LEVEL_ORDER, start=1)}
+
+
+@dataclass(frozen=True)
+class LevelLadder:
+    # Least to most severe.
+    levels: tuple[str, ...] = ()
+    # Trip thresholds in ``levels`` order, ascending.
+    keys: tuple[float, ...] = ()
+    lower_is_worse: bool = False
+    ranks: Mapping[str, int] = field(default_factory=dict)
+
+    def tripped(self, value: float) -> tuple[str, ...]:
+        """Levels whose trip threshold ``value`` reaches."""
+        key = -value if self.lower_is_worse else value
+        return self.levels[: bisect_right(self.keys, key)]
+
+    def rank(self, level: str | None) -> int:
+        """1 for the least severe level; 0 for unknown levels and None."""
+        return self.ranks.get(level, 0) if level is not None else 0
+
+    def highest(self, levels: Iterable[str | None]) -> str | None:
+        return max(
+            (level for level in levels if level in self.ranks),
+            key=self.ranks.__getitem__,
+            default=None,
+        )
+
+
+def stop_level_of(level: Any, cfg: Mapping[str, Any]) -> str | None:
+    """Stop level raised by ``level``; None for an invalid custom level."""
+    if level in LEVEL_ORDER:
+        return level
+    if not isinstance(level, str) or not _LEVEL_NAME.fullmatch(level):
+        return None
+    stop_level = cfg.get("stop_level")
+    return stop_level if stop_level in LEVEL_ORDER else None
+
+
+def build_ladder(
+    levels: Mapping[str, Mapping[str, Any]], lower_is_worse: bool
+) -> LevelLadder:
+    sign = -1.0 if lower_is_worse else 1.0
+
+    def order(level: str) -> tuple[float, int]:
+        # Levels sharing a threshold are ordered by the stop level they raise.
+        cfg = levels[level]
+        stop_level = cfg.get("stop_level", level)
+        return sign * float(cfg["threshold"]), _STOP_RANK.get(stop_level, 0)
+
+    ordered = sorted(levels, key=order)
+    return LevelLadder(
+        levels=tuple(ordered),
+        keys=tuple(sign * float(levels[level]["threshold"]) for level in ordered),
+        lower_is_worse=lower_is_worse,
+        ranks={level: index for index, level in enumerate(ordered, start=1)},
+    )
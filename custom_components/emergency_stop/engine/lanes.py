@@ -0,0 +1,54 @@
+"""Priority lanes: rules grouped by the most severe stop level they raise.
+
+A pass evaluates the shutdown lane first, then limit, then notify, so a large
+set of notify rules never delays a shutdown rule in the same pass, and the
+integration can run the shutdown lane on its own (on input changes) without
+touching the others.
+
+A rule that another rule depends on (as a source or precondition) runs in
+the most urgent lane of its dependents, so dependencies are still evaluated
+before the rules that read them.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Mapping
+
+from ..const import LEVEL_NOTIFY, LEVEL_ORDER
+
+# Most urgent first.
+LANES = tuple(reversed(LEVEL_ORDER))
+_URGENCY = {lane: rank for rank, lane in enumerate(reversed(LANES))}
+
+
+def lane_for(levels: Iterable[str | None]) -> str:
+    """The lane of a rule raising ``levels``; notify when it raises none."""
+    return max(
+        (level for level in levels if level in _URGENCY),
+        key=_URGENCY.__getitem__,
+        default=LEVEL_NOTIFY,
+    )
+
+
+def assign_lanes(
+    order: list[str],
+    raised: Mapping[str, Iterable[str | None]],
+    dependencies: Mapping[str, Iterable[str]],
+) -> dict[str, str]:
+    """Lane of every rule id; ``order`` lists dependencies before dependents."""
+    lanes = {rule_id: lane_for(raised.get(rule_id, ())) for rule_id in order}
+    # Dependents first, so each rule's lane is final before it is passed on.
+    for rule_id in reversed(order):
+        lane = lanes[rule_id]
+        for dependency in dependencies.get(rule_id, ()):
+            if dependency in lanes and _URGENCY[lane] > _URGENCY[lanes[dependency]]:
+                lanes[dependency] = lane
+    return lanes
+
+
+def by_lane(order: list[str], lanes: Mapping[str, str]) -> list[str]:
+    """``order`` regrouped lane by lane, most urgent first.
+
+    The sort is stable and a dependency is never in a less urgent lane than
+    its dependents, so the result is still a valid evaluation order.
+    """
+    return sorted(order, key=lambda rule_id: -_URGENCY[lanes[rule_id]])
@@ -0,0 +1,57 @@
+"""Interfaces the rule engine needs from its host."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import time
+from typing import Any, Mapping, Protocol
+
+
+class EntityState(Protocol):
+    """Minimal view of an entity state (matches Home Assistant's State)."""
+
+    state: str
+    attributes: Mapping[str, Any]
+
+
+class StateProvider(Protocol):
+    """Lookup of the current state of an entity.
+
+    Home Assistant's ``hass.states`` satisfies this protocol as-is.
+    """
+
+    def get(self, entity_id: str) -> EntityState | None:
+        ...
+
+
+class Clock(Protocol):
+    """Source of monotonic time (durations) and UTC wall time (timestamps)."""
+
+    def monotonic(self) -> float:
+        ...
+
+    def utcnow(self) -> datetime:
+        ...
+
+
+class SystemClock:
+    """Real-time clock."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def utcnow(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+
+class VirtualClock:
+    """Clock that only moves when told to, anchored at a wall-clock origin."""
+
+    def __init__(self, origin: datetime) -> None:
+        self.origin = origin
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def utcnow(self) -> datetime:
+        return self.origin + timedelta(seconds=self.now)
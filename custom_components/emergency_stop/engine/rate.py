@@ -0,0 +1,43 @@
+"""Smoothed rate of change of a rule's evaluated value."""
+from __future__ import annotations
+
+import math
+
+
+class RateOfChange:
+    """Exponentially smoothed derivative in units per second.
+
+    Each sample is differenced against the previous one and folded into an
+    EMA whose weight follows the elapsed time, ``1 - exp(-dt / smoothing)``,
+    so irregular evaluation spacing (startup offsets, replay skips) does not
+    change the effective time constant. State is three floats per rule.
+    """
+
+    def __init__(self, smoothing_seconds: float) -> None:
+        self.smoothing_seconds = smoothing_seconds
+        self._last_time: float | None = None
+        self._last_value = 0.0
+        self._rate: float | None = None
+
+    def add(self, now: float, value: float) -> float:
+        """Record ``value`` at ``now`` and return the smoothed rate."""
+        last_time = self._last_time
+        if last_time is None:
+            self._last_time = now
+            self._last_value = value
+            return 0.0
+        elapsed = now - last_time
+        if elapsed <= 0:
+            # Same instant: keep the first sample, nothing to difference.
+            return self._rate or 0.0
+        raw = (value - self._last_value) / elapsed
+        self._last_time = now
+        self._last_value = value
+        if self._rate is None or self.smoothing_seconds <= 0:
+            # Seed the average with the first observed slope instead of zero,
+            # which would delay detection by a full time constant.
+            self._rate = raw
+        else:
+            weight = 1.0 - math.exp(-elapsed / self.smoothing_seconds)
+            self._rate += weight * (raw - self._rate)
+        return self._rate
@@ -0,0 +1,150 @@
+"""Stream entity states out of a Home Assistant recorder SQLite database."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import heapq
+import json
+import sqlite3
+from typing import Any, Iterable, Iterator
+
+from .replay import StateChange
+
+DEFAULT_BATCH_SIZE = 1000
+# Entity IDs per metadata lookup; SQLite before 3.32 allows 999 variables.
+_METADATA_CHUNK = 500
+
+# Recorder schema 38+ (HA 2023.4): states.metadata_id -> states_meta.entity_id,
+# with an index on (metadata_id, last_updated_ts). Attributes are shared
+# between states through states.attributes_id -> state_attributes.
+_METADATA_QUERY = "SELECT metadata_id, entity_id FROM states_meta WHERE entity_id IN ({})"
+_INITIAL_STATE_QUERY = (
+    "SELECT state, last_updated_ts, {attributes} FROM states{join}"
+    " WHERE metadata_id = ? AND last_updated_ts < ?"
+    " ORDER BY last_updated_ts DESC LIMIT 1"
+)
+_STATES_QUERY = (
+    "SELECT last_updated_ts, state_id, state, {attributes} FROM states{join}"
+    " WHERE metadata_id = ? AND last_updated_ts >= ? AND last_updated_ts < ?"
+    " ORDER BY last_updated_ts, state_id"
+)
+_ATTRIBUTES_JOIN = (
+    " LEFT JOIN state_attributes"
+    " ON state_attributes.attributes_id = states.attributes_id"
+)
+
+
+def open_recorder_db(path: str) -> sqlite3.Connection:
+    """Open the recorder database read-only."""
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def iter_recorder_changes(
+    connection: sqlite3.Connection,
+    entity_ids: Iterable[str],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    attributes: bool = False,
+) -> Iterator[StateChange]:
+    """Yield recorded states of ``entity_ids`` in time order.
+
+    Each entity is read through its own cursor walking the
+    ``(metadata_id, last_updated_ts)`` index in ``batch_size`` chunks and the
+    cursors are merged on timestamp, so neither SQLite nor Python ever holds
+    more than one batch per entity. When ``start`` is given, the last state
+    each entity had before it is emitted first, stamped at ``start``.
+    With ``attributes``, state attributes are joined in as well; only rules
+    reading an attribute need them.
+    """
+    metadata = _resolve_metadata_ids(connection, sorted(set(entity_ids)))
+    start_ts = start.timestamp() if start is not None else float("-inf")
+    end_ts = end.timestamp() if end is not None else float("inf")
+    query = {
+        "attributes": "state_attributes.shared_attrs" if attributes else "NULL",
+        "join": _ATTRIBUTES_JOIN if attributes else "",
+    }
+
+    if start is not None:
+        initial_query = _INITIAL_STATE_QUERY.format(**query)
+        for metadata_id, entity_id in metadata:
+            row = connection.execute(initial_query, (metadata_id, start_ts)).fetchone()
+            if row is not None and row[0] is not None:
+                yield StateChange(
+                    when=start,
+                    entity_id=entity_id,
+                    state=row[0],
+                    attributes=_load_attributes(row[2]),
+                )
+
+    states_query = _STATES_QUERY.format(**query)
+    streams = [
+        _iter_entity_rows(
+            connection,
+            states_query,
+            metadata_id,
+            entity_id,
+            start_ts,
+            end_ts,
+            batch_size,
+        )
+        for metadata_id, entity_id in metadata
+    ]
+    for timestamp, _state_id, entity_id, state, attrs in heapq.merge(*streams):
+        yield StateChange(
+            when=datetime.fromtimestamp(timestamp, tz=timezone.utc),
+            entity_id=entity_id,
+            state=state,
+            attributes=attrs,
+        )
+
+
+def _resolve_metadata_ids(
+    connection: sqlite3.Connection, entity_ids: list[str]
+) -> list[tuple[int, str]]:
+    rows: list[tuple[int, str]] = []
+    for index in range(0, len(entity_ids), _METADATA_CHUNK):
+        chunk = entity_ids[index : index + _METADATA_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows.extend(connection.execute(_METADATA_QUERY.format(placeholders), chunk))
+    return sorted(rows)
+
+
+def _load_attributes(shared_attrs: str | None) -> dict[str, Any]:
+    if not shared_attrs:
+        return {}
+    try:
+        attributes = json.loads(shared_attrs)
+    except ValueError:
+        return {}
+    return attributes if isinstance(attributes, dict) else {}
+
+
+def _iter_entity_rows(
+    connection: sqlite3.Connection,
+    query: str,
+    metadata_id: int,
+    entity_id: str,
+    start_ts: float,
+    end_ts: float,
+    batch_size: int,
+) -> Iterator[tuple[float, int, str, str, dict[str, Any]]]:
+    cursor = connection.cursor()
+    # Consecutive states mostly share one attributes row; parse it once.
+    shared_attrs: str | None = None
+    attributes: dict[str, Any] = {}
+    try:
+        cursor.execute(query, (metadata_id, start_ts, end_ts))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for timestamp, state_id, state, attrs in rows:
+                # Rows without a state are entity removals.
+                if timestamp is None or state is None:
+                    continue
+                if attrs != shared_attrs:
+                    shared_attrs = attrs
+                    attributes = _load_attributes(attrs)
+                yield timestamp, state_id, entity_id, state, attributes
+    finally:
+        cursor.close()
@@ -0,0 +1,335 @@
+"""Replay recorded state changes through the rule engine on a virtual clock."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import json
+import math
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from ..const import CONF_RULES, SEVERITY_MODE_SEMAFOR
+from .core import (
+    RuleConfig,
+    RuleEngine,
+    RuleRuntimeState,
+    eval_interval,
+    load_rules,
+    min_interval,
+)
+from .protocols import VirtualClock
+
+_TIMESTAMP_KEYS = ("last_updated", "last_changed", "time_fired", "time", "timestamp")
+_EPSILON = 1e-9
+
+
+@dataclass
+class StateChange:
+    """A single recorded entity state."""
+
+    when: datetime
+    entity_id: str
+    state: str
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ReplayState:
+    state: str
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Transition:
+    """A rule entering, leaving or changing its level."""
+
+    when: datetime
+    rule_id: str
+    rule_name: str
+    previous_level: str | None
+    level: str | None
+    value: float | int | str | None
+    entity_id: str | None
+    detail: str | None
+
+    @property
+    def kind(self) -> str:
+        if self.previous_level is None:
+            return "activated"
+        if self.level is None:
+            return "cleared"
+        return "level_changed"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "time": self.when.isoformat(),
+            "rule_id": self.rule_id,
+            "rule_name": self.rule_name,
+            "event": self.kind,
+            "previous_level": self.previous_level,
+            "level": self.level,
+            "value": self.value,
+            "entity_id": self.entity_id,
+            "detail": self.detail,
+        }
+
+
+class ReplayStates:
+    """State provider fed from recorded changes."""
+
+    def __init__(self) -> None:
+        self._states: dict[str, ReplayState] = {}
+
+    def get(self, entity_id: str) -> ReplayState | None:
+        return self._states.get(entity_id)
+
+    def set(self, change: StateChange) -> None:
+        self._states[change.entity_id] = ReplayState(change.state, change.attributes)
+
+
+class Replayer:
+    """Drive a rule engine from a time-ordered stream of state changes.
+
+    The virtual clock ticks on the coordinator grid (the shortest rule
+    interval), but only on ticks where some rule can change: a rule is
+    evaluated after one of its entities changed, or when a running duration
+    timer is due. Everything in between would re-evaluate identical input and
+    is skipped, which is what makes a month of data replay in seconds.
+    """
+
+    def __init__(self, rules: list[RuleConfig], origin: datetime) -> None:
+        self._clock = VirtualClock(origin)
+        self._states = ReplayStates()
+        self._engine = RuleEngine(rules, clock=self._clock)
+        self._tick = float(min_interval(rules))
+        self._rules_by_entity: dict[str, list[RuleConfig]] = {}
+        for rule in rules:
+            for entity_id in rule.watched_entities:
+                self._rules_by_entity.setdefault(entity_id, []).append(rule)
+        self._levels: dict[str, str | None] = {rule.rule_id: None for rule in rules}
+        # Every rule gets one evaluation up front, as after an HA start.
+        self._dirty: dict[str, RuleConfig] = {rule.rule_id: rule for rule in rules}
+        # Time-window and rate rules keep changing after their input stops
+        # (the window rolls over, the rate decays); they stay awake until
+        # this offset.
+        self._settle_until: dict[str, float] = {}
+
+    @property
+    def engine(self) -> RuleEngine:
+        return self._engine
+
+    @property
+    def now(self) -> datetime:
+        return self._clock.utcnow()
+
+    def feed(self, change: StateChange) -> list[Transition]:
+        """Apply one state change, evaluating every tick due before it."""
+        offset = self._offset(change.when)
+        transitions = self._advance(offset)
+        if offset > self._clock.now:
+            self._clock.now = offset
+        self._states.set(change)
+        self._engine.freshness.touch(change.entity_id, self._clock.now)
+        for rule in self._rules_by_entity.get(change.entity_id, []):
+            if rule.rule_id not in self._dirty:
+                self._align_phase(rule, self._clock.now)
+                self._dirty[rule.rule_id] = rule
+            if rule.settle_seconds:
+                self._settle_until[rule.rule_id] = (
+                    self._clock.now + rule.settle_seconds
+                )
+        return transitions
+
+    def finish(self, until: datetime | None = None) -> list[Transition]:
+        """Run pending evaluations, up to ``until`` when given."""
+        limit = math.inf if until is None else self._offset(until) + _EPSILON
+        return self._advance(limit)
+
+    def _offset(self, when: datetime) -> float:
+        return (when - self._clock.origin).total_seconds()
+
+    def _advance(self, limit: float) -> list[Transition]:
+        transitions: list[Transition] = []
+        while True:
+            wake = self._next_wake()
+            # Staleness fires at its exact deadline, off the tick grid, as
+            # the coordinator's timer does.
+            stale_at = self._engine.freshness.next_deadline()
+            if stale_at is not None and (wake is None or stale_at < wake):
+                wake = max(stale_at, self._clock.now)
+            if wake is None or wake >= limit:
+                return transitions
+            self._clock.now = wake
+            self._engine.expire_stale()
+            self._engine.evaluate(self._states)
+            transitions.extend(self._collect_transitions(wake))
+
+    def _next_wake(self) -> float | None:
+        wake: float | None = None
+        for rule in self._engine.rules:
+            state = self._engine.states[rule.rule_id]
+            awake = (
+                rule.rule_id in self._dirty
+                or self._settle_until.get(rule.rule_id, -math.inf) > self._clock.now
+            )
+            deadlines = [
+                self._engine.timer_deadline(rule),
+                self._engine.coincidence_deadline(rule, state.last_eval_monotonic),
+            ]
+            due = _rule_due_at(
+                rule,
+                state,
+                awake,
+                min((at for at in deadlines if at is not None), default=None),
+            )
+            if due is None:
+                continue
+            due = max(due, self._clock.now)
+            due = math.ceil(due / self._tick - _EPSILON) * self._tick
+            if wake is None or due < wake:
+                wake = due
+        return wake
+
+    def _align_phase(self, rule: RuleConfig, now: float) -> None:
+        """Catch an idle rule's schedule up to the ticks it would have run."""
+        state = self._engine.states[rule.rule_id]
+        last = state.last_eval_monotonic
+        interval = eval_interval(rule, state)
+        if last is None or last + interval >= now:
+            return
+        missed = math.ceil((now - last) / interval - _EPSILON) - 1
+        state.last_eval_monotonic = last + missed * interval
+
+    def _collect_transitions(self, now: float) -> list[Transition]:
+        transitions: list[Transition] = []
+        when = self._clock.utcnow()
+        for rule in self._engine.rules:
+            state = self._engine.states[rule.rule_id]
+            if state.last_eval_monotonic != now:
+                continue
+            self._dirty.pop(rule.rule_id, None)
+            level = _rule_level(rule, state)
+            previous = self._levels[rule.rule_id]
+            if level == previous:
+                continue
+            self._levels[rule.rule_id] = level
+            transitions.append(
+                Transition(
+                    when=when,
+                    rule_id=rule.rule_id,
+                    rule_name=rule.name,
+                    previous_level=previous,
+                    level=level,
+                    value=state.last_aggregate,
+                    entity_id=state.last_entity,
+                    detail=state.last_detail,
+                )
+            )
+        return transitions
+
+
+def replay(
+    rules: list[RuleConfig],
+    changes: Iterable[StateChange],
+    until: datetime | None = None,
+) -> Iterator[Transition]:
+    """Yield rule transitions for a time-ordered stream of state changes."""
+    replayer: Replayer | None = None
+    for change in changes:
+        if until is not None and change.when > until:
+            break
+        if replayer is None:
+            replayer = Replayer(rules, change.when)
+        yield from replayer.feed(change)
+    if replayer is not None:
+        yield from replayer.finish(until)
+
+
+def load_rule_export(path: str | Path) -> list[RuleConfig]:
+    """Load rules from an ``emergency_stop_rules_*.json`` export."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    raw_rules = data.get(CONF_RULES) if isinstance(data, dict) else data
+    if not isinstance(raw_rules, list):
+        raise ValueError(f"{path}: no rules list found")
+    return load_rules({CONF_RULES: raw_rules})
+
+
+def iter_ndjson_changes(lines: Iterable[str]) -> Iterator[StateChange]:
+    """Parse NDJSON state records, skipping blank lines.
+
+    Each line is either a state object (``entity_id``, ``state``,
+    ``attributes``, ``last_updated``) or a ``state_changed`` event carrying
+    one in ``data.new_state``.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            change = parse_state_change(json.loads(line))
+        except (TypeError, ValueError, KeyError) as err:
+            raise ValueError(f"line {line_number}: {err}") from err
+        if change is not None:
+            yield change
+
+
+def parse_state_change(record: dict[str, Any]) -> StateChange | None:
+    if "data" in record or "new_state" in record:
+        data = record.get("data", record)
+        new_state = data.get("new_state")
+        if new_state is None:
+            return None
+        if "time_fired" in record and not _has_timestamp(new_state):
+            new_state = {**new_state, "time_fired": record["time_fired"]}
+        record = new_state
+    return StateChange(
+        when=_parse_timestamp(record),
+        entity_id=str(record["entity_id"]),
+        state=str(record["state"]),
+        attributes=dict(record.get("attributes") or {}),
+    )
+
+
+def _has_timestamp(record: dict[str, Any]) -> bool:
+    return any(record.get(key) is not None for key in _TIMESTAMP_KEYS)
+
+
+def _parse_timestamp(record: dict[str, Any]) -> datetime:
+    for key in _TIMESTAMP_KEYS:
+        value = record.get(key)
+        if value is None:
+            continue
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        parsed = datetime.fromisoformat(str(value))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed
+    raise ValueError("missing timestamp")
+
+
+def _rule_level(rule: RuleConfig, state: RuleRuntimeState) -> str | None:
+    if rule.severity_mode == SEVERITY_MODE_SEMAFOR:
+        return state.current_level
+    return rule.level if state.active else None
+
+
+def _rule_due_at(
+    rule: RuleConfig,
+    state: RuleRuntimeState,
+    dirty: bool,
+    deadline: float | None = None,
+) -> float | None:
+    """Earliest time an evaluation of ``rule`` could change its state.
+
+    ``deadline`` is when a duration timer of the rule (or of one of its
+    groups) expires, or a cleared source of a composite rule drops out of
+    its coincidence window.
+    """
+    last = state.last_eval_monotonic
+    interval = eval_interval(rule, state)
+    next_eval = interval if last is None else last + interval
+    if dirty:
+        return next_eval
+    if deadline is None:
+        return None
+    return max(next_eval, deadline)
@@ -0,0 +1,26 @@
+"""Evaluation interval from the distance to the nearest threshold."""
+from __future__ import annotations
+
+# Fraction of the projected time-to-threshold to wait before looking again.
+# Half leaves room for the value to accelerate between two evaluations.
+_SAFETY = 0.5
+
+
+def adaptive_interval(
+    margin: float, rate: float, min_interval: float, max_interval: float
+) -> float:
+    """Seconds until the next evaluation of a rule ``margin`` from a limit.
+
+    ``rate`` is the recent speed of the evaluated value in units per second.
+    At the current speed the value needs ``margin / rate`` seconds to reach
+    the limit; the rule is looked at again after half of that, clamped to
+    ``[min_interval, max_interval]``. ``margin`` is signed: zero or negative
+    once the value is at or past a threshold, however far past, and then,
+    like a value closing in fast, it is evaluated at ``min_interval``; a
+    flat one far from every threshold at ``max_interval``.
+    """
+    if margin <= 0:
+        return min_interval
+    if rate <= 0:
+        return max_interval
+    return min(max_interval, max(min_interval, _SAFETY * margin / rate))
@@ -0,0 +1,82 @@
+"""Order statistics over a rule's entity values without a full sort."""
+from __future__ import annotations
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Optional: the pure-Python quickselect covers every size.
+    np = None
+
+# Below this width the conversion to an array costs more than it saves.
+NUMPY_MIN_SIZE = 64
+
+
+def kth_smallest(values: list[tuple[str, float]], k: int) -> tuple[str, float]:
+    """Return the ``(entity_id, value)`` pair of rank ``k`` (0-based)."""
+    if np is not None and len(values) >= NUMPY_MIN_SIZE:
+        array = np.fromiter((value for _, value in values), float, len(values))
+        return values[int(np.argpartition(array, k)[k])]
+    items = list(values)
+    _quickselect(items, k)
+    return items[k]
+
+
+def median(values: list[tuple[str, float]]) -> tuple[float, str | None]:
+    """Return the median and, for an odd count, the entity that holds it."""
+    count = len(values)
+    upper = count // 2
+    if count % 2:
+        entity_id, value = kth_smallest(values, upper)
+        return value, entity_id
+    if np is not None and count >= NUMPY_MIN_SIZE:
+        array = np.fromiter((value for _, value in values), float, count)
+        order = np.argpartition(array, (upper - 1, upper))
+        low, high = array[order[upper - 1]], array[order[upper]]
+        return float(low + high) / 2, None
+    items = list(values)
+    _quickselect(items, upper)
+    # Everything left of the pivot is <= it, so the lower middle is their max.
+    low = max(value for _, value in items[:upper])
+    return (low + items[upper][1]) / 2, None
+
+
+def percentile(
+    values: list[tuple[str, float]], percent: float
+) -> tuple[float, str | None]:
+    """Nearest-rank percentile: always an actual reading of one entity."""
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    entity_id, value = kth_smallest(values, min(rank, len(values)) - 1)
+    return value, entity_id
+
+
+def _quickselect(items: list[tuple[str, float]], k: int) -> None:
+    """Partition ``items`` in place so ``items[k]`` holds rank ``k``.
+
+    Three-way partitioning keeps runs of equal readings, common with
+    redundant sensors, from degrading to quadratic time.
+    """
+    left, right = 0, len(items) - 1
+    while left < right:
+        middle = (left + right) // 2
+        pivot = sorted(
+            (items[left][1], items[middle][1], items[right][1])
+        )[1]
+        lower, index, upper = left, left, right
+        while index <= upper:
+            value = items[index][1]
+            if value < pivot:
+                items[lower], items[index] = items[index], items[lower]
+                lower += 1
+                index += 1
+            elif value > pivot:
+                items[index], items[upper] = items[upper], items[index]
+                upper -= 1
+            else:
+                index += 1
+        if k < lower:
+            right = lower - 1
+        elif k > upper:
+            left = upper + 1
+        else:
+            return
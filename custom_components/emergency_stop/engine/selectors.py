@@ -0,0 +1,234 @@
+"""Entity selectors resolved through an incrementally maintained index.
+
+A selector picks entities by what they are instead of by id. It is one or
+more space separated terms, all of which must match:
+
+* ``sensor.pack_*_cell_*_voltage`` - glob over the entity id (``*``, ``?``)
+* ``area:<area_id>``, ``label:<label_id>``, ``device_class:<class>``
+
+A rule lists any number of selectors; its members are its static entities
+plus every entity matched by at least one selector. The index is filled once
+from the entity registry (and the state machine, for entities without a
+registry entry) and then updated one entity at a time, re-testing only the
+selectors in use, so registry events never trigger a rescan.
+
+A rule with ``group_by`` is a family: its members are split into groups (one
+per device, or per value of the first ``*`` of its glob) that the engine
+evaluates separately in the same pass.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from functools import lru_cache
+import re
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+from ..const import GROUP_BY_CAPTURE, GROUP_BY_DEVICE
+
+if TYPE_CHECKING:
+    from .core import RuleConfig
+
+_KEYS = ("area", "label", "device_class")
+
+
+class EntityInfo(NamedTuple):
+    """What selectors can match on, taken from the entity registry."""
+
+    entity_id: str
+    area_id: str | None = None
+    device_class: str | None = None
+    labels: frozenset[str] = frozenset()
+    device_id: str | None = None
+    device_name: str | None = None
+
+
+@dataclass(frozen=True)
+class Selector:
+    text: str
+    pattern: re.Pattern[str] | None = None
+    area: str | None = None
+    label: str | None = None
+    device_class: str | None = None
+
+    def matches(self, info: EntityInfo) -> bool:
+        if self.pattern is not None and not self.pattern.fullmatch(info.entity_id):
+            return False
+        if self.area is not None and info.area_id != self.area:
+            return False
+        if self.label is not None and self.label not in info.labels:
+            return False
+        return self.device_class is None or info.device_class == self.device_class
+
+    def captures(self, entity_id: str) -> tuple[str, ...]:
+        """Text matched by each ``*`` of the glob, in order."""
+        if self.pattern is None:
+            return ()
+        match = self.pattern.fullmatch(entity_id)
+        return match.groups() if match else ()
+
+
+@lru_cache(maxsize=256)
+def parse_selector(text: str) -> Selector:
+    """Parse one selector; raise ValueError when it is empty or malformed."""
+    terms = str(text).split()
+    if not terms:
+        raise ValueError("empty selector")
+    values: dict[str, str] = {}
+    pattern: re.Pattern[str] | None = None
+    for term in terms:
+        key, sep, value = term.partition(":")
+        if sep:
+            if key not in _KEYS or not value or key in values:
+                raise ValueError(f"invalid selector term: {term!r}")
+            values[key] = value
+            continue
+        if pattern is not None or "." not in term:
+            raise ValueError(f"invalid selector term: {term!r}")
+        pattern = _compile_glob(term)
+    return Selector(text=" ".join(terms), pattern=pattern, **values)
+
+
+def _compile_glob(glob: str) -> re.Pattern[str]:
+    parts = []
+    for char in glob:
+        if char == "*":
+            parts.append("(.*?)")
+        elif char == "?":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts))
+
+
+class SelectorIndex:
+    """Entities known to the registry and the members of each used selector."""
+
+    def __init__(self, infos: Iterable[EntityInfo] = ()) -> None:
+        self._entities: dict[str, EntityInfo] = {info.entity_id: info for info in infos}
+        self._members: dict[Selector, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def get(self, entity_id: str) -> EntityInfo | None:
+        return self._entities.get(entity_id)
+
+    def resolve(self, selector: Selector) -> list[str]:
+        """Entity ids matched by ``selector``, sorted."""
+        members = self._members.get(selector)
+        if members is None:
+            members = {
+                entity_id
+                for entity_id, info in self._entities.items()
+                if selector.matches(info)
+            }
+            self._members[selector] = members
+        return sorted(members)
+
+    def update(self, info: EntityInfo) -> bool:
+        """Add or replace one entity; True when any selector's members changed."""
+        self._entities[info.entity_id] = info
+        changed = False
+        for selector, members in self._members.items():
+            if selector.matches(info):
+                if info.entity_id not in members:
+                    members.add(info.entity_id)
+                    changed = True
+            elif info.entity_id in members:
+                members.discard(info.entity_id)
+                changed = True
+        return changed
+
+    def remove(self, entity_id: str) -> bool:
+        """Forget one entity; True when any selector's members changed."""
+        if self._entities.pop(entity_id, None) is None:
+            return False
+        changed = False
+        for members in self._members.values():
+            if entity_id in members:
+                members.discard(entity_id)
+                changed = True
+        return changed
+
+    def members(self, rule: RuleConfig) -> list[str]:
+        """The rule's own entities followed by new selector matches."""
+        entities = list(rule.entities)
+        seen = set(entities)
+        for text in rule.selectors:
+            for entity_id in self.resolve(parse_selector(text)):
+                if entity_id not in seen:
+                    seen.add(entity_id)
+                    entities.append(entity_id)
+        return entities
+
+    def expand(self, rules: list[RuleConfig]) -> list[RuleConfig]:
+        """Rules with their selectors resolved into ``entities``.
+
+        Selectors no longer used by any rule stop being maintained.
+        """
+        used = {parse_selector(text) for rule in rules for text in rule.selectors}
+        self._members = {
+            selector: members
+            for selector, members in self._members.items()
+            if selector in used
+        }
+        expanded = []
+        for rule in rules:
+            if not (rule.selectors or rule.group_by):
+                expanded.append(rule)
+                continue
+            entities = self.members(rule)
+            groups, names = self.groups(rule, entities) if rule.group_by else ((), ())
+            expanded.append(
+                replace(rule, entities=entities, groups=groups, group_names=names)
+            )
+        return expanded
+
+    def groups(
+        self, rule: RuleConfig, entities: list[str]
+    ) -> tuple[tuple[tuple[str, tuple[str, ...]], ...], tuple[tuple[str, str], ...]]:
+        """Split ``entities`` into ``(key, members)`` groups in natural order.
+
+        Device groups are keyed by device id, so renaming a device keeps its
+        group; the device name is returned separately as ``(key, name)``
+        pairs and orders the groups. Entities the grouping cannot place form
+        a group of their own.
+        """
+        glob = next(
+            (
+                selector
+                for selector in map(parse_selector, rule.selectors)
+                if selector.pattern is not None
+            ),
+            None,
+        )
+        grouped: dict[str, list[str]] = {}
+        names: dict[str, str] = {}
+        for entity_id in entities:
+            key: str | None = None
+            if rule.group_by == GROUP_BY_DEVICE:
+                info = self._entities.get(entity_id)
+                if info is not None and info.device_id is not None:
+                    key = info.device_id
+                    if info.device_name:
+                        names[key] = info.device_name
+            elif rule.group_by == GROUP_BY_CAPTURE and glob is not None:
+                captures = glob.captures(entity_id)
+                key = captures[0] if captures else None
+            grouped.setdefault(key or entity_id, []).append(entity_id)
+        ordered = sorted(
+            grouped.items(), key=lambda item: _natural(names.get(item[0], item[0]))
+        )
+        return (
+            tuple((key, tuple(members)) for key, members in ordered),
+            tuple((key, names[key]) for key, _members in ordered if key in names),
+        )
+
+
+def _natural(text: str) -> tuple[tuple[int, int | str], ...]:
+    # pack_2 before pack_10.
+    return tuple(
+        (0, int(part)) if part.isdigit() else (1, part.casefold())
+        for part in re.split(r"(\d+)", text)
+        if part
+    )
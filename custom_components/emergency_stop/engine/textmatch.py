@@ -0,0 +1,115 @@
+"""Text rule needles compiled into a single regular expression.
+
+A text rule compares its values against one needle or a list of them. Plain
+needles are matched literally and ``/.../`` needles are regular expressions.
+All of them become alternatives of one pattern, compiled once per distinct
+rule, with case folding and trimming folded into the pattern instead of
+being applied to every value on every evaluation. Each alternative is a
+named group, so the group that matched names the needle to report.
+
+Wrapping a pattern in a group renumbers its own groups, which breaks
+backreferences such as ``(a)\1``; such patterns (and ones with named groups,
+which may clash between needles) are compiled on their own. The needles
+between them form runs of combined alternatives, and runs and separate
+patterns are tried in configured order. Global inline flags such as ``(?i)``
+are only valid at the start of a pattern, so they become scoped ``(?i:...)``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+
+# \1 .. \99 or (?P=name) in a pattern.
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+# Global inline flags at the start of a pattern, e.g. (?i) or (?ms).
+_GLOBAL_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+
+
+@dataclass(frozen=True)
+class TextMatcher:
+    needles: tuple[str, ...]
+    # ``(needle index, pattern)`` in configured order; the index is None for
+    # a run of needles combined into one pattern of named groups.
+    patterns: tuple[tuple[int | None, re.Pattern[str]], ...]
+    # ``equals`` compares the whole value; ``contains`` searches in it.
+    whole: bool
+
+    def match(self, text: str) -> str | None:
+        """The first needle found in (or equal to) ``text``, or None."""
+        for index, regex in self.patterns:
+            found = self._find(regex, text)
+            if found is None:
+                continue
+            if index is not None:
+                return self.needles[index]
+            if found.lastgroup is not None:
+                return self.needles[int(found.lastgroup[2:])]
+        return None
+
+    def _find(self, regex: re.Pattern[str], text: str) -> re.Match[str] | None:
+        return regex.fullmatch(text) if self.whole else regex.search(text)
+
+
+def is_regex(needle: str) -> bool:
+    return len(needle) > 2 and needle.startswith("/") and needle.endswith("/")
+
+
+@lru_cache(maxsize=256)
+def compile_needles(
+    needles: tuple[str, ...], whole: bool, case_sensitive: bool, trim: bool
+) -> TextMatcher:
+    """Compile needles; raise ValueError for an invalid regular expression."""
+    kept = tuple(
+        needle
+        for needle in (needle.strip() if trim else needle for needle in needles)
+        if needle
+    )
+    if not kept:
+        return TextMatcher((), (), whole)
+    flags = 0 if case_sensitive else re.IGNORECASE
+    patterns: list[tuple[int | None, re.Pattern[str]]] = []
+    run: list[str] = []
+    for index, needle in enumerate(kept):
+        body = _scoped_flags(needle[1:-1]) if is_regex(needle) else re.escape(needle)
+        try:
+            compiled = re.compile(body)
+        except re.error as err:
+            raise ValueError(f"invalid pattern {needle!r}: {err}") from err
+        if compiled.groupindex or (compiled.groups and _BACKREFERENCE.search(body)):
+            if run:
+                patterns.append((None, _compile_run(run, whole, trim, flags)))
+                run = []
+            patterns.append((index, re.compile(_wrap(body, whole, trim), flags)))
+        else:
+            run.append(f"(?P<_n{index}>{body})")
+    if run:
+        patterns.append((None, _compile_run(run, whole, trim, flags)))
+    return TextMatcher(kept, tuple(patterns), whole)
+
+
+def _compile_run(
+    alternatives: list[str], whole: bool, trim: bool, flags: int
+) -> re.Pattern[str]:
+    try:
+        return re.compile(_wrap("|".join(alternatives), whole, trim), flags)
+    except re.error as err:
+        raise ValueError(f"invalid patterns: {err}") from err
+
+
+def _scoped_flags(body: str) -> str:
+    """``(?i)abc`` as ``(?i:abc)``, which is valid inside an alternation."""
+    scoped = ""
+    while found := _GLOBAL_FLAGS.match(body):
+        scoped += found.group(1)
+        body = body[found.end() :]
+    if not scoped:
+        return body
+    return f"(?{''.join(dict.fromkeys(scoped))}:{body})"
+
+
+def _wrap(pattern: str, whole: bool, trim: bool) -> str:
+    if whole and trim:
+        # Same as stripping the value before comparing it.
+        return rf"\s*(?:{pattern})\s*"
+    return pattern
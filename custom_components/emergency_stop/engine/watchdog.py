@@ -0,0 +1,53 @@
+"""Heartbeat telling whether the evaluator still runs on time.
+
+A starved event loop does not fail: timers simply fire late and evaluation
+silently stops. A callback due every ``period`` seconds measures how late the
+loop runs it (lag) and how much that lateness varies (jitter), and checks
+that an evaluation pass completed recently. Each beat is a subtraction and a
+few comparisons, and each pass only records its end time.
+"""
+from __future__ import annotations
+
+# Smoothing of the jitter estimate, as for RTP interarrival jitter.
+_JITTER_GAIN = 1 / 16
+
+
+class Heartbeat:
+    """Lag, jitter and health of the evaluator (monotonic seconds).
+
+    Unhealthy when the last beat ran more than ``threshold`` late, or when no
+    evaluation pass completed for ``stall_after`` seconds.
+    """
+
+    def __init__(self, period: float, threshold: float, stall_after: float) -> None:
+        self.period = period
+        self.threshold = threshold
+        self.stall_after = stall_after
+        self.lag = 0.0
+        self.jitter = 0.0
+        self.stalled = False
+        self.healthy = True
+        self._due: float | None = None
+        self._evaluated: float | None = None
+
+    def start(self, now: float) -> float:
+        """Arm the heartbeat; return when the first beat is due."""
+        self._due = now + self.period
+        return self._due
+
+    def evaluated(self, now: float) -> None:
+        """Record the end of an evaluation pass."""
+        self._evaluated = now
+
+    def beat(self, now: float) -> float:
+        """Record a beat at ``now``; return when the next one is due."""
+        lag = 0.0 if self._due is None else max(0.0, now - self._due)
+        self.jitter += (abs(lag - self.lag) - self.jitter) * _JITTER_GAIN
+        self.lag = lag
+        self.stalled = (
+            self._evaluated is not None and now - self._evaluated > self.stall_after
+        )
+        self.healthy = lag <= self.threshold and not self.stalled
+        # From now, not from the missed due time: no burst of catch-up beats.
+        self._due = now + self.period
+        return self._due
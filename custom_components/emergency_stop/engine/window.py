@@ -0,0 +1,99 @@
+"""Rolling time-window aggregates over a rule's evaluated value."""
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+from ..const import WINDOW_AVG, WINDOW_INTEGRAL, WINDOW_MAX, WINDOW_MIN
+
+
+class TimeWindow:
+    """Rolling avg/min/max/integral of samples from the last ``seconds``.
+
+    Each sample is added and evicted once, so updates are amortized O(1):
+    avg and integral keep a running trapezoid area between consecutive
+    samples, and min/max a monotonic deque whose head is the current extreme.
+    Memory is bounded by ``seconds`` / evaluation interval.
+
+    avg is time-weighted: the area divided by the time it covers, so uneven
+    evaluation intervals do not skew it. For avg and integral the last sample
+    from before the window start is kept, and its segment is cut at the
+    window start, so the window is covered from its start.
+    """
+
+    def __init__(self, function: str, seconds: float) -> None:
+        self.function = function
+        self.seconds = seconds
+        # (monotonic time, value, entity_id or CellRef of the reading)
+        self._samples: deque[tuple[float, float, Any]] = deque()
+        # Trapezoid area between the retained samples (avg, integral).
+        self._area = 0.0
+        self._now = 0.0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, now: float, value: float, entity_id: Any = None) -> None:
+        samples = self._samples
+        if self.function in (WINDOW_AVG, WINDOW_INTEGRAL):
+            if samples:
+                last_time, last_value, _ = samples[-1]
+                self._area += (now - last_time) * (value + last_value) / 2
+        elif self.function == WINDOW_MIN:
+            while samples and samples[-1][1] >= value:
+                samples.pop()
+        elif self.function == WINDOW_MAX:
+            while samples and samples[-1][1] <= value:
+                samples.pop()
+        samples.append((now, value, entity_id))
+        self._now = now
+        self._evict(now - self.seconds)
+
+    def value(self) -> tuple[float | None, Any]:
+        """Return the window value and, for min/max, the entity behind it."""
+        samples = self._samples
+        if not samples:
+            return None, None
+        if self.function in (WINDOW_AVG, WINDOW_INTEGRAL):
+            area, span = self._window_area()
+            if self.function == WINDOW_INTEGRAL:
+                return area, None
+            if span <= 0:
+                return samples[-1][1], None
+            return area / span, None
+        _, value, entity_id = samples[0]
+        return value, entity_id
+
+    def _window_area(self) -> tuple[float, float]:
+        """Area from the window start (or first sample) on, and its span."""
+        samples = self._samples
+        horizon = self._now - self.seconds
+        first_time, first_value, _ = samples[0]
+        if first_time >= horizon:
+            return self._area, self._now - first_time
+        # Carried over from before the window: drop the part of its segment
+        # that lies before the window start.
+        next_time, next_value, _ = samples[1]
+        at_horizon = first_value + (next_value - first_value) * (
+            horizon - first_time
+        ) / (next_time - first_time)
+        before = (horizon - first_time) * (first_value + at_horizon) / 2
+        return self._area - before, self.seconds
+
+    def _evict(self, horizon: float) -> None:
+        samples = self._samples
+        if self.function in (WINDOW_MIN, WINDOW_MAX):
+            # The newest sample is never older than the horizon, so the head
+            # of the monotonic deque is always defined after eviction.
+            while samples[0][0] < horizon:
+                samples.popleft()
+            return
+        # Keep the newest sample at or before the horizon: its segment
+        # reaches into the window.
+        while len(samples) > 1 and samples[1][0] <= horizon:
+            oldest_time, oldest_value, _ = samples.popleft()
+            next_time, next_value, _ = samples[0]
+            self._area -= (next_time - oldest_time) * (oldest_value + next_value) / 2
+        if len(samples) == 1:
+            # Drop accumulated float error whenever the window collapses.
+            self._area = 0.0
@@ -1,10 +1,16 @@
 """Sensor platform for Emergency Stop."""
 from __future__ import annotations
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
@@ -31,6 +37,8 @@ async def async_setup_entry(
     coordinator: EmergencyStopCoordinator = hass.data[DOMAIN][entry.entry_id]
     entities: list[SensorEntity] = [
         EmergencyStopLevelSensor(coordinator),
+        EmergencyStopLoopLagSensor(coordinator),
+        EmergencyStopTickJitterSensor(coordinator),
     ]
     async_add_entities(entities)
 
@@ -59,3 +67,50 @@ class EmergencyStopLevelSensor(
     def icon(self) -> str | None:
         level = self.coordinator.stop_state.level or LEVEL_NORMAL
         return _LEVEL_ICON_MAP.get(level, "mdi:alert-octagon")
+
+
+class _EvaluatorTimingSensor(
+    CoordinatorEntity[EmergencyStopCoordinator], SensorEntity
+):
+    """Base for the evaluator heartbeat timings, in milliseconds."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 0
+    _attr_icon = "mdi:timer-sand"
+
+    def __init__(
+        self, coordinator: EmergencyStopCoordinator, key: str, name: str
+    ) -> None:
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{DOMAIN}_{key}"
+        self._attr_name = name
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, "emergency_stop")},
+            name=NAME,
+        )
+
+
+class EmergencyStopLoopLagSensor(_EvaluatorTimingSensor):
+    """How late the event loop ran the last evaluator heartbeat."""
+
+    def __init__(self, coordinator: EmergencyStopCoordinator) -> None:
+        super().__init__(coordinator, "loop_lag", "Evaluator Loop Lag")
+
+    @property
+    def native_value(self) -> float:
+        return round(self.coordinator.heartbeat.lag * 1000, 1)
+
+
+class EmergencyStopTickJitterSensor(_EvaluatorTimingSensor):
+    """Smoothed variation of the heartbeat lag."""
+
+    def __init__(self, coordinator: EmergencyStopCoordinator) -> None:
+        super().__init__(coordinator, "tick_jitter", "Evaluator Tick Jitter")
+
+    @property
+    def native_value(self) -> float:
+        return round(self.coordinator.heartbeat.jitter * 1000, 1)
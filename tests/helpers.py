@@ -0,0 +1,62 @@
+"""Test doubles shared by the rule engine tests."""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from custom_components.emergency_stop.const import DATA_TYPE_NUMERIC, LEVEL_SHUTDOWN
+from custom_components.emergency_stop.engine import RuleConfig
+
+START = datetime(2026, 2, 2, tzinfo=timezone.utc)
+
+
+class FakeClock:
+    """Engine clock; each monotonic read advances it by ``tick`` seconds."""
+
+    def __init__(self, now=0.0, tick=0.0):
+        self.now = now
+        self.tick = tick
+
+    def monotonic(self):
+        self.now += self.tick
+        return self.now
+
+    def utcnow(self):
+        return START + timedelta(seconds=self.now)
+
+
+class DictStates(dict):
+    """``hass.states`` holding state objects or plain state strings."""
+
+    def get(self, entity_id):
+        value = super().get(entity_id)
+        if value is None or hasattr(value, "state"):
+            return value
+        return SimpleNamespace(state=value, attributes={})
+
+    def set(self, entity_id, value):
+        self[entity_id] = SimpleNamespace(state=str(value), attributes={})
+
+
+def rule_config(**fields):
+    """RuleConfig of a simple numeric rule; ``fields`` override the defaults."""
+    rule_id = fields.get("rule_id", "rule")
+    values = dict(
+        rule_id=rule_id,
+        name=rule_id,
+        data_type=DATA_TYPE_NUMERIC,
+        entities=[f"sensor.{rule_id}"],
+        aggregate="max",
+        condition="gt",
+        thresholds=[],
+        duration_seconds=0,
+        interval_seconds=1,
+        level=LEVEL_SHUTDOWN,
+        latched=False,
+        unknown_handling="ignore",
+        severity_mode="simple",
+        direction=None,
+        levels={},
+        text_case_sensitive=False,
+        text_trim=True,
+    )
+    values.update(fields)
+    return RuleConfig(**values)
@@ -0,0 +1,175 @@
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+from custom_components.emergency_stop.const import (
+    DATA_TYPE_TEXT,
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+)
+from custom_components.emergency_stop.engine import RuleEngine
+from custom_components.emergency_stop.engine.schedule import adaptive_interval
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+def _rule(**overrides):
+    values = dict(
+        rule_id="temp",
+        name="Temperature",
+        entities=["sensor.temp"],
+        thresholds=[60],
+        duration_seconds=10,
+        max_interval_seconds=30,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def test_interval_follows_projected_time_to_threshold():
+    assert adaptive_interval(0, 5, 1, 30) == 1
+    assert adaptive_interval(10, 0, 1, 30) == 30
+    assert adaptive_interval(10, 1, 1, 30) == 5
+    assert adaptive_interval(10, 0.1, 1, 30) == 30
+    assert adaptive_interval(1, 10, 1, 30) == 1
+
+
+def test_rule_is_adaptive_only_with_a_wider_max_interval():
+    assert _rule().is_adaptive
+    assert not _rule(max_interval_seconds=0).is_adaptive
+    assert not _rule(max_interval_seconds=1).is_adaptive
+    assert not _rule(data_type=DATA_TYPE_TEXT, aggregate="any").is_adaptive
+
+
+def test_flat_value_backs_off_and_approach_speeds_up():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine([_rule()], clock=clock)
+    state = engine.states["temp"]
+
+    states.set("sensor.temp", 20)
+    clock.now = 1
+    engine.evaluate(states)
+    # No slope yet: far from 60 and not moving.
+    assert state.eval_interval == 30
+
+    clock.now = 20
+    engine.evaluate(states)
+    assert state.last_eval_monotonic == 1
+
+    states.set("sensor.temp", 50)
+    clock.now = 31
+    engine.evaluate(states)
+    # 30 units in 30 s, 10 left: half of the 10 s to the limit.
+    assert state.last_eval_monotonic == 31
+    assert state.eval_interval == 5
+
+    states.set("sensor.temp", 59)
+    clock.now = 36
+    engine.evaluate(states)
+    assert state.eval_interval == 1
+
+
+def test_semafor_margin_uses_nearest_level():
+    clock = FakeClock()
+    states = DictStates()
+    rule = _rule(
+        severity_mode="semafor",
+        direction="higher_is_worse",
+        condition=None,
+        thresholds=[],
+        levels={
+            LEVEL_NOTIFY: {"threshold": 40, "duration_seconds": 10},
+            LEVEL_LIMIT: {"threshold": 80, "duration_seconds": 10},
+        },
+    )
+    engine = RuleEngine([rule], clock=clock)
+    state = engine.states["temp"]
+    for now, value in ((1, 10), (31, 25)):
+        states.set("sensor.temp", value)
+        clock.now = now
+        engine.evaluate(states)
+    # 0.5 units/s with 15 left to notify: half of 30 s.
+    assert state.last_eval_monotonic == 31
+    assert state.eval_interval == 15
+
+
+def test_running_duration_stays_at_base_interval():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine([_rule()], clock=clock)
+    state = engine.states["temp"]
+    states.set("sensor.temp", 20)
+    clock.now = 1
+    engine.evaluate(states)
+    assert state.eval_interval == 30
+
+    states.set("sensor.temp", 70)
+    clock.now = 31
+    engine.evaluate(states)
+    assert state.violation_started_at == 31
+    assert state.eval_interval is None
+
+    states.set("sensor.temp", "unavailable")
+    clock.now = 32
+    engine.evaluate(states)
+    assert state.last_eval_monotonic == 32
+    assert state.eval_interval is None
+
+
+def test_import_validates_max_interval():
+    raw = {
+        "rule_id": "temp",
+        "rule_name": "Temperature",
+        "data_type": "numeric",
+        "entities": ["sensor.temp"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [60],
+        "duration_seconds": 10,
+        "interval_seconds": 5,
+        "max_interval_seconds": 60,
+    }
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["max_interval_seconds"] == 60
+
+    normalized, error = _normalize_import_rules([{**raw, "max_interval_seconds": 0}])
+    assert "max_interval_seconds" not in normalized[0]
+
+    _, error = _normalize_import_rules([{**raw, "max_interval_seconds": 3}])
+    assert error == "import_invalid_rule"
+
+
+def test_value_far_past_threshold_stays_at_base_interval():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine([_rule(duration_seconds=0)], clock=clock)
+    state = engine.states["temp"]
+    states.set("sensor.temp", 500)
+    clock.now = 1
+    engine.evaluate(states)
+    assert state.active is True
+    assert state.eval_interval == 1
+
+    # Inside the hysteresis band counts as crossed too.
+    engine = RuleEngine([_rule(duration_seconds=0, hysteresis=5)], clock=clock)
+    state = engine.states["temp"]
+    states.set("sensor.temp", 57)
+    engine.evaluate(states)
+    assert state.eval_interval == 1
+
+
+def test_step_change_wakes_rule_before_its_interval():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine([_rule(level=LEVEL_LIMIT)], clock=clock)
+    state = engine.states["temp"]
+    states.set("sensor.temp", 20)
+    clock.now = 1
+    engine.evaluate(states)
+    assert state.eval_interval == 30
+
+    states.set("sensor.temp", 90)
+    clock.now = 3
+    assert engine.wake("sensor.temp", LEVEL_LIMIT) is True
+    engine.evaluate(states)
+    assert state.last_eval_monotonic == 3
+    assert state.violation_started_at == 3
@@ -0,0 +1,171 @@
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+from custom_components.emergency_stop.const import LEVEL_SHUTDOWN, SEVERITY_MODE_SEMAFOR
+from custom_components.emergency_stop.coordinator import _build_stop_state
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.attributes import parse_path, resolve
+
+from helpers import DictStates, FakeClock, rule_config
+
+PACKS = ["sensor.pack_1", "sensor.pack_2"]
+
+
+class PackStates(DictStates):
+    def set(self, entity_id, cells, state="52.1"):
+        self[entity_id] = SimpleNamespace(
+            state=state, attributes={"cell_voltages": cells}
+        )
+
+
+def _rule(aggregate="max", **overrides):
+    values = dict(
+        rule_id="cells",
+        name="Cells",
+        entities=list(PACKS),
+        aggregate=aggregate,
+        thresholds=[3.6],
+        duration_seconds=1,
+        attribute="cell_voltages",
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _evaluate(rule, states, clock=None):
+    clock = clock or FakeClock(10.0)
+    engine = RuleEngine([rule], clock=clock)
+    engine.evaluate(states)
+    return engine, engine.states[rule.rule_id]
+
+
+def test_path_resolution():
+    assert parse_path("bms.cells.0") == ("bms", "cells", 0)
+    attributes = {"bms": {"cells": [3.3, 3.4]}, "temps": [21]}
+    assert resolve(attributes, parse_path("bms.cells.1")) == 3.4
+    assert resolve(attributes, parse_path("bms.cells.5")) is None
+    assert resolve(attributes, parse_path("temps.x")) is None
+    with pytest.raises(ValueError):
+        parse_path("bms..cells")
+
+
+def test_max_reports_pack_and_cell():
+    states = PackStates()
+    states.set("sensor.pack_1", [3.30, 3.31, 3.29])
+    states.set("sensor.pack_2", [3.30, 3.70, 3.28])
+    _, state = _evaluate(_rule(), states)
+    assert state.last_aggregate == 3.70
+    assert state.last_entity == "sensor.pack_2"
+    assert (state.last_pack, state.last_cell) == (2, 2)
+    assert state.last_detail.endswith("(sensor.pack_2 cell 2)")
+
+
+def test_spread_names_both_cells_and_skips_unreadable_items():
+    states = PackStates()
+    states.set("sensor.pack_1", [3.30, "n/a", 3.10])
+    states.set("sensor.pack_2", [3.35, None, 3.30])
+    _, state = _evaluate(_rule("spread", thresholds=[0.2]), states)
+    assert state.last_aggregate == pytest.approx(0.25)
+    assert state.last_entity == "sensor.pack_2"
+    assert state.last_entity_low == "sensor.pack_1"
+    assert (state.last_pack, state.last_cell) == (2, 1)
+    assert "(max sensor.pack_2 cell 1, min sensor.pack_1 cell 3)" in state.last_detail
+
+
+def test_unavailable_pack_and_missing_attribute_are_invalid_inputs():
+    states = PackStates()
+    states.set("sensor.pack_1", [3.30, 3.31], state="unavailable")
+    states["sensor.pack_2"] = SimpleNamespace(state="52.1", attributes={})
+    _, state = _evaluate(_rule(), states)
+    assert state.last_invalid_reason == "no_valid_values"
+
+
+def test_percentile_over_many_cells_and_scalar_attribute():
+    states = PackStates()
+    states.set("sensor.pack_1", [3.30 + i / 1000 for i in range(32)])
+    states.set("sensor.pack_2", [3.20 + i / 1000 for i in range(32)])
+    _, state = _evaluate(
+        _rule("percentile", aggregate_parameter=100, thresholds=[4.0]), states
+    )
+    assert state.last_aggregate == pytest.approx(3.331)
+    assert (state.last_pack, state.last_cell) == (1, 32)
+
+    states["sensor.pack_1"] = SimpleNamespace(state="on", attributes={"temp": 41})
+    states["sensor.pack_2"] = SimpleNamespace(state="on", attributes={"temp": 45})
+    _, state = _evaluate(_rule(attribute="temp", thresholds=[40]), states)
+    assert state.last_aggregate == 45
+    assert (state.last_pack, state.last_cell) == (2, None)
+
+
+def test_window_max_keeps_cell_of_the_extreme():
+    clock = FakeClock(10.0)
+    states = PackStates()
+    rule = _rule(window_function="max", window_seconds=30)
+    engine = RuleEngine([rule], clock=clock)
+    states.set("sensor.pack_1", [3.30, 3.65])
+    states.set("sensor.pack_2", [3.30, 3.30])
+    engine.evaluate(states)
+    clock.now = 11
+    states.set("sensor.pack_1", [3.30, 3.30])
+    engine.evaluate(states)
+    state = engine.states["cells"]
+    assert state.last_aggregate == 3.65
+    assert (state.last_pack, state.last_cell) == (1, 2)
+
+
+def test_semafor_rule_and_stop_state_fill_primary_pack_and_cell():
+    clock = FakeClock(10.0)
+    states = PackStates()
+    rule = _rule(
+        severity_mode=SEVERITY_MODE_SEMAFOR,
+        direction="higher_is_worse",
+        condition=None,
+        thresholds=[],
+        levels={"shutdown": {"threshold": 3.6, "duration_seconds": 1}},
+    )
+    engine = RuleEngine([rule], clock=clock)
+    states.set("sensor.pack_1", [3.30, 3.31])
+    states.set("sensor.pack_2", [3.75, 3.30])
+    engine.evaluate(states)
+    clock.now = 11
+    engine.evaluate(states)
+    state = engine.states["cells"]
+    assert state.current_level == LEVEL_SHUTDOWN
+    assert (state.last_pack, state.last_cell) == (2, 1)
+
+    stop_state = _build_stop_state([rule], engine.states, False)
+    assert stop_state.primary_sensor_entity == "sensor.pack_2"
+    assert (stop_state.primary_pack, stop_state.primary_cell) == (2, 1)
+
+
+def test_load_and_import_attribute():
+    raw = {
+        "rule_id": "cells",
+        "rule_name": "Cells",
+        "data_type": "numeric",
+        "entities": list(PACKS),
+        "attribute": " cell_voltages ",
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [3.6],
+    }
+    rules = load_rules(
+        {
+            "rules": [
+                raw,
+                {**raw, "rule_id": "bad", "attribute": "cells..0"},
+                {**raw, "rule_id": "binary", "data_type": "binary", "condition": "is_on"},
+            ]
+        }
+    )
+    assert [rule.rule_id for rule in rules] == ["cells", "binary"]
+    assert rules[0].attribute == "cell_voltages"
+    assert rules[1].attribute is None
+
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["attribute"] == "cell_voltages"
+    _, error = _normalize_import_rules([{**raw, "attribute": "cells..0"}])
+    assert error == "import_invalid_rule"
@@ -0,0 +1,202 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+from custom_components.emergency_stop.engine import recorder
+from custom_components.emergency_stop.engine.__main__ import main
+from custom_components.emergency_stop.engine.backtest import run_backtest
+from custom_components.emergency_stop.engine.recorder import iter_recorder_changes
+from custom_components.emergency_stop.engine.replay import load_rule_export
+
+START = datetime(2026, 2, 2, 10, 0, tzinfo=timezone.utc).timestamp()
+
+RULES = [
+    {
+        "rule_id": "voltage",
+        "rule_name": "Voltage",
+        "data_type": "numeric",
+        "entities": ["sensor.cell_1", "sensor.cell_2"],
+        "aggregate": "max",
+        "severity_mode": "semafor",
+        "direction": "higher_is_worse",
+        "levels": {
+            "notify": {"threshold": 3.5, "duration_seconds": 5},
+            "shutdown": {"threshold": 3.8, "duration_seconds": 5},
+        },
+        "interval_seconds": 1,
+        "latched": False,
+    }
+]
+
+
+def _create_db(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE states_meta (metadata_id INTEGER PRIMARY KEY, entity_id TEXT);
+        CREATE TABLE states (
+            state_id INTEGER PRIMARY KEY,
+            metadata_id INTEGER,
+            state TEXT,
+            last_updated_ts REAL
+        );
+        CREATE INDEX ix_states_metadata_id_last_updated_ts
+            ON states (metadata_id, last_updated_ts);
+        INSERT INTO states_meta VALUES (1, 'sensor.cell_1'), (2, 'sensor.cell_2'),
+            (3, 'sensor.other');
+        """
+    )
+    rows = [
+        (1, "3.6", -60),
+        (2, "3.2", -30),
+        (1, "3.3", 10),
+        (2, "3.6", 20),
+        (3, "9.9", 25),
+        (2, "3.9", 100),
+        (1, None, 150),
+        (2, "3.1", 200),
+    ]
+    connection.executemany(
+        "INSERT INTO states (metadata_id, state, last_updated_ts) VALUES (?, ?, ?)",
+        [(metadata_id, state, START + offset) for metadata_id, state, offset in rows],
+    )
+    connection.commit()
+    connection.close()
+
+
+def test_recorder_changes_are_merged_in_time_order(tmp_path):
+    db_path = tmp_path / "home-assistant_v2.db"
+    _create_db(db_path)
+    start = datetime.fromtimestamp(START, tz=timezone.utc)
+
+    with sqlite3.connect(db_path) as connection:
+        changes = list(
+            iter_recorder_changes(
+                connection, ["sensor.cell_1", "sensor.cell_2"], start=start, batch_size=1
+            )
+        )
+
+    assert [(c.entity_id, c.state, (c.when - start).total_seconds()) for c in changes] == [
+        ("sensor.cell_1", "3.6", 0.0),
+        ("sensor.cell_2", "3.2", 0.0),
+        ("sensor.cell_1", "3.3", 10.0),
+        ("sensor.cell_2", "3.6", 20.0),
+        ("sensor.cell_2", "3.9", 100.0),
+        ("sensor.cell_2", "3.1", 200.0),
+    ]
+
+
+def test_backtest_reports_time_in_each_level(tmp_path):
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": RULES}), encoding="utf-8")
+    db_path = tmp_path / "home-assistant_v2.db"
+    _create_db(db_path)
+    start = datetime.fromtimestamp(START, tz=timezone.utc)
+    end = datetime.fromtimestamp(START + 300, tz=timezone.utc)
+
+    with sqlite3.connect(db_path) as connection:
+        report = run_backtest(
+            load_rule_export(rules_path),
+            iter_recorder_changes(connection, ["sensor.cell_1", "sensor.cell_2"], start, end),
+            end,
+        )
+
+    stats = report.as_dict()["rules"][0]
+    assert stats["activations"] == 2
+    assert set(stats["levels"]) == {"notify", "shutdown"}
+    assert stats["levels"]["notify"]["periods"] == 2
+    assert stats["levels"]["shutdown"]["periods"] == 1
+    assert 90 <= stats["levels"]["shutdown"]["seconds"] <= 100
+    assert stats["active_seconds"] == sum(
+        level["seconds"] for level in stats["levels"].values()
+    )
+    assert report.as_dict()["end"] == end.isoformat()
+
+
+def test_cli_backtest_prints_summary(tmp_path, capsys):
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": RULES}), encoding="utf-8")
+    db_path = tmp_path / "home-assistant_v2.db"
+    _create_db(db_path)
+
+    assert main(["backtest", str(rules_path), str(db_path), "--batch-size", "2"]) == 0
+
+    report = json.loads(capsys.readouterr().out)
+    assert report["state_changes"] == 6
+    assert report["rules"][0]["rule_id"] == "voltage"
+
+
+def test_backtest_reads_attributes_and_custom_levels(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, "_METADATA_CHUNK", 1)
+    rules = [
+        {
+            "rule_id": "bms",
+            "rule_name": "BMS",
+            "data_type": "numeric",
+            "entities": ["sensor.bms"],
+            "attribute": "max_cell",
+            "aggregate": "max",
+            "severity_mode": "semafor",
+            "direction": "higher_is_worse",
+            "levels": {
+                "warn": {"threshold": 3.5, "duration_seconds": 1, "stop_level": "notify"},
+                "derate": {"threshold": 3.7, "duration_seconds": 1, "stop_level": "limit"},
+            },
+            "interval_seconds": 1,
+            "latched": False,
+        }
+    ]
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"rules": rules}), encoding="utf-8")
+    db_path = tmp_path / "home-assistant_v2.db"
+    connection = sqlite3.connect(db_path)
+    connection.executescript(
+        """
+        CREATE TABLE states_meta (metadata_id INTEGER PRIMARY KEY, entity_id TEXT);
+        CREATE TABLE state_attributes (
+            attributes_id INTEGER PRIMARY KEY,
+            shared_attrs TEXT
+        );
+        CREATE TABLE states (
+            state_id INTEGER PRIMARY KEY,
+            metadata_id INTEGER,
+            attributes_id INTEGER,
+            state TEXT,
+            last_updated_ts REAL
+        );
+        INSERT INTO states_meta VALUES (1, 'sensor.bms'), (2, 'sensor.other');
+        INSERT INTO state_attributes VALUES
+            (1, '{"max_cell": 3.3}'), (2, '{"max_cell": 3.6}'), (3, '{"max_cell": 3.8}');
+        """
+    )
+    connection.executemany(
+        "INSERT INTO states (metadata_id, attributes_id, state, last_updated_ts)"
+        " VALUES (?, ?, ?, ?)",
+        [
+            (1, 1, "ok", START),
+            (1, 2, "ok", START + 10),
+            (1, 3, "ok", START + 20),
+            (1, 1, "ok", START + 60),
+        ],
+    )
+    connection.commit()
+    connection.close()
+    end = datetime.fromtimestamp(START + 100, tz=timezone.utc)
+
+    with sqlite3.connect(db_path) as connection:
+        changes = list(
+            iter_recorder_changes(
+                connection, ["sensor.bms", "sensor.other"], attributes=True
+            )
+        )
+        report = run_backtest(load_rule_export(rules_path), iter(changes), end)
+
+    assert [change.attributes for change in changes] == [
+        {"max_cell": 3.3},
+        {"max_cell": 3.6},
+        {"max_cell": 3.8},
+        {"max_cell": 3.3},
+    ]
+    levels = report.as_dict()["rules"][0]["levels"]
+    assert list(levels) == ["warn", "derate"]
+    assert levels["derate"]["periods"] == 1
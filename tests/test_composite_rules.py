@@ -0,0 +1,256 @@
+from datetime import timedelta
+
+from custom_components.emergency_stop.config_flow import (
+    _build_rule_config,
+    _normalize_import_rules,
+)
+from custom_components.emergency_stop.const import (
+    DATA_TYPE_BINARY,
+    DATA_TYPE_COMPOSITE,
+    LEVEL_LIMIT,
+    LEVEL_SHUTDOWN,
+)
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.replay import StateChange, replay
+
+from helpers import DictStates, FakeClock, START, rule_config
+
+
+def _base(rule_id, **overrides):
+    values = dict(
+        rule_id=rule_id,
+        name=rule_id.title(),
+        data_type=DATA_TYPE_BINARY,
+        entities=[f"binary_sensor.{rule_id}"],
+        aggregate="any",
+        condition="is_on",
+        level=LEVEL_LIMIT,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _composite(rule_id, sources, **overrides):
+    return _base(
+        rule_id,
+        data_type=DATA_TYPE_COMPOSITE,
+        entities=[],
+        source_rules=tuple(sources),
+        level=LEVEL_SHUTDOWN,
+        **overrides,
+    )
+
+
+def _raw(rule_id, **extra):
+    return {
+        "rule_id": rule_id,
+        "rule_name": rule_id.title(),
+        "data_type": "binary",
+        "entities": [f"binary_sensor.{rule_id}"],
+        "aggregate": "any",
+        "condition": "is_on",
+        **extra,
+    }
+
+
+def _raw_composite(rule_id, sources, **extra):
+    return _raw(
+        rule_id,
+        data_type="composite",
+        entities=[],
+        source_rules=sources,
+        **extra,
+    )
+
+
+def test_k_of_n_follows_sources_in_the_same_pass():
+    clock = FakeClock()
+    states = DictStates()
+    sources = ["a", "b", "c", "d"]
+    composite = _composite(
+        "two_of_four", sources, aggregate="count", condition="gte", thresholds=[2]
+    )
+    # The composite is configured first; evaluation order puts it last.
+    engine = RuleEngine([composite, *(_base(rule_id) for rule_id in sources)], clock=clock)
+    for rule_id in sources:
+        states.set(f"binary_sensor.{rule_id}", "off")
+
+    active = []
+    for second, on in enumerate((["a"], ["a", "c"], ["c"]), start=10):
+        for rule_id in sources:
+            states.set(f"binary_sensor.{rule_id}", "on" if rule_id in on else "off")
+        clock.now = second
+        engine.evaluate(states)
+        active.append(engine.states["two_of_four"].active)
+    assert active == [False, True, False]
+    assert engine.states["two_of_four"].last_aggregate == 1
+
+
+def test_composite_is_evaluated_only_when_a_source_flips():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine(
+        [_base("a"), _base("b"), _composite("both", ["a", "b"], aggregate="all")],
+        clock=clock,
+    )
+    states.set("binary_sensor.a", "off")
+    states.set("binary_sensor.b", "off")
+    clock.now = 10
+    engine.evaluate(states)
+    assert engine.states["both"].last_eval_monotonic == 10
+
+    for second in (11, 12, 13):
+        clock.now = second
+        engine.evaluate(states)
+    assert engine.states["both"].last_eval_monotonic == 10
+
+    states.set("binary_sensor.a", "on")
+    clock.now = 14
+    engine.evaluate(states)
+    assert engine.states["both"].last_eval_monotonic == 14
+    assert engine.states["both"].active is False
+
+
+def test_coincidence_window_joins_sources_active_apart():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine(
+        [
+            _base("overtemp"),
+            _base("overcurrent"),
+            _composite(
+                "both",
+                ["overtemp", "overcurrent"],
+                aggregate="all",
+                coincidence_seconds=10,
+            ),
+        ],
+        clock=clock,
+    )
+    timeline = {
+        10: ("on", "off"),
+        12: ("off", "off"),
+        18: ("off", "on"),
+        19: ("off", "off"),
+        40: ("off", "on"),
+    }
+    active = {}
+    for second in range(10, 41):
+        if second in timeline:
+            overtemp, overcurrent = timeline[second]
+            states.set("binary_sensor.overtemp", overtemp)
+            states.set("binary_sensor.overcurrent", overcurrent)
+        clock.now = second
+        engine.evaluate(states)
+        active[second] = engine.states["both"].active
+    # Overtemp cleared at 12, so it counts as active until 22.
+    assert [second for second, on in active.items() if on] == [18, 19, 20, 21]
+    assert active[40] is False
+
+
+def test_load_rules_disables_composites_in_a_cycle():
+    rules = load_rules(
+        {
+            "rules": [
+                _raw("a", precondition_rules=["loop_b"]),
+                _raw_composite("loop_b", ["a", "loop_c"]),
+                _raw_composite("loop_c", ["loop_b"]),
+                _raw_composite("ok", ["a", "missing"]),
+            ]
+        }
+    )
+    by_id = {rule.rule_id: rule for rule in rules}
+    assert set(by_id) == {"a", "ok"}
+    assert by_id["a"].precondition_rules == ()
+    assert by_id["ok"].source_rules == ("a", "missing")
+    assert by_id["ok"].is_composite
+
+
+def test_replay_reports_composite_and_coincidence_expiry():
+    rules = [
+        _base("overtemp", interval_seconds=5),
+        _base("overcurrent", interval_seconds=5),
+        _composite(
+            "both",
+            ["overtemp", "overcurrent"],
+            aggregate="all",
+            coincidence_seconds=30,
+            interval_seconds=5,
+        ),
+    ]
+    changes = [
+        StateChange(START, "binary_sensor.overtemp", "off"),
+        StateChange(START, "binary_sensor.overcurrent", "off"),
+        StateChange(START + timedelta(seconds=60), "binary_sensor.overtemp", "on"),
+        StateChange(START + timedelta(seconds=70), "binary_sensor.overtemp", "off"),
+        StateChange(START + timedelta(seconds=80), "binary_sensor.overcurrent", "on"),
+        StateChange(START + timedelta(seconds=85), "binary_sensor.overcurrent", "off"),
+    ]
+    transitions = [
+        t for t in replay(rules, changes, START + timedelta(seconds=300))
+        if t.rule_id == "both"
+    ]
+    assert [t.kind for t in transitions] == ["activated", "cleared"]
+    assert transitions[0].when == START + timedelta(seconds=80)
+    # Overtemp cleared at 70 and drops out of the window at 100.
+    assert transitions[1].when == START + timedelta(seconds=100)
+
+
+def test_import_validates_composite_rules():
+    normalized, error = _normalize_import_rules(
+        [
+            _raw("a"),
+            _raw("b"),
+            _raw_composite(
+                "both",
+                ["a", "b"],
+                aggregate="count",
+                condition="gte",
+                thresholds=[2],
+                coincidence_seconds=10,
+                stale_seconds=30,
+            ),
+        ]
+    )
+    assert error is None
+    composite = normalized[2]
+    assert composite["entities"] == []
+    assert composite["source_rules"] == ["a", "b"]
+    assert composite["coincidence_seconds"] == 10
+    assert "stale_seconds" not in composite
+
+    _, error = _normalize_import_rules([_raw("a"), _raw_composite("both", [])])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules([_raw("a"), _raw_composite("both", ["a", "x"])])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules(
+        [
+            _raw("a", precondition_rules=["both"]),
+            _raw_composite("both", ["a"]),
+        ]
+    )
+    assert error == "import_invalid_rule"
+
+
+def test_build_rule_config_keeps_only_composite_fields():
+    rule = _build_rule_config(
+        {
+            "rule_name": "Both",
+            "data_type": "composite",
+            "source_rules": ["a", "b"],
+            "aggregate": "count",
+            "coincidence_seconds": 10,
+        },
+        {
+            "condition": "gte",
+            "thresholds": [2],
+            "stale_seconds": 30,
+            "max_interval_seconds": 60,
+        },
+        [],
+    )
+    assert rule["entities"] == []
+    assert rule["source_rules"] == ["a", "b"]
+    assert rule["coincidence_seconds"] == 10
+    assert "stale_seconds" not in rule
+    assert "max_interval_seconds" not in rule
@@ -0,0 +1,35 @@
+from custom_components.emergency_stop.engine import RuleEngine
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+def _rule():
+    return rule_config(
+        rule_id="rule_1",
+        name="Rule 1",
+        entities=["sensor.voltage"],
+        thresholds=[3.5],
+        duration_seconds=5,
+    )
+
+
+def test_engine_runs_on_injected_clock_and_state_provider():
+    clock = FakeClock()
+    states = DictStates({"sensor.voltage": "3.7"})
+    engine = RuleEngine([_rule()], clock=clock)
+    state = engine.states["rule_1"]
+
+    clock.now = 1.0
+    engine.evaluate(states)
+    assert state.last_match is True
+    assert state.active is False
+
+    clock.now = 6.0
+    engine.evaluate(states)
+    assert state.active is True
+    assert state.active_since == "2026-02-02T00:00:06+00:00"
+
+    states["sensor.voltage"] = "3.4"
+    clock.now = 7.0
+    engine.evaluate(states)
+    assert state.active is False
@@ -0,0 +1,264 @@
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.emergency_stop.config_flow import (
+    _build_rule_config,
+    _normalize_import_rules,
+)
+from custom_components.emergency_stop.const import LEVEL_LIMIT
+from custom_components.emergency_stop.coordinator import (
+    EmergencyStopCoordinator,
+    RuleEngine,
+    _settings_config,
+)
+from custom_components.emergency_stop.engine import load_rules
+from custom_components.emergency_stop.engine.selectors import (
+    EntityInfo,
+    SelectorIndex,
+    parse_selector,
+)
+from custom_components.emergency_stop.engine.watchdog import Heartbeat
+
+from helpers import rule_config
+
+GLOB = "sensor.pack_*_cell_*_voltage"
+
+
+def _rule(rule_id="cells", entities=(), selectors=(GLOB,), **overrides):
+    values = dict(
+        rule_id=rule_id,
+        entities=list(entities),
+        thresholds=[3.6],
+        duration_seconds=5,
+        level=LEVEL_LIMIT,
+        latched=True,
+        selectors=tuple(selectors),
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _cell(pack, cell, **extra):
+    return EntityInfo(f"sensor.pack_{pack}_cell_{cell}_voltage", **extra)
+
+
+def test_parse_selector_terms():
+    selector = parse_selector(f"{GLOB}  area:battery_room device_class:voltage")
+    assert selector.text == f"{GLOB} area:battery_room device_class:voltage"
+    assert selector.captures("sensor.pack_3_cell_12_voltage") == ("3", "12")
+    assert selector.matches(_cell(3, 12, area_id="battery_room", device_class="voltage"))
+    assert not selector.matches(_cell(3, 12, area_id="garage", device_class="voltage"))
+    assert parse_selector("label:bms").matches(
+        EntityInfo("sensor.x", labels=frozenset({"bms"}))
+    )
+    for text in ("", "room:garage", "area:", "area:a area:b", "pack_*", f"{GLOB} {GLOB}"):
+        with pytest.raises(ValueError):
+            parse_selector(text)
+
+
+def test_index_updates_members_incrementally():
+    index = SelectorIndex([_cell(1, 1), _cell(1, 2), EntityInfo("sensor.pack_1_current")])
+    selector = parse_selector(GLOB)
+    assert index.resolve(selector) == [
+        "sensor.pack_1_cell_1_voltage",
+        "sensor.pack_1_cell_2_voltage",
+    ]
+    assert index.update(_cell(2, 1)) is True
+    # Unrelated entities and unchanged members do not count as a change.
+    assert index.update(EntityInfo("sensor.outdoor_temperature")) is False
+    assert index.update(_cell(2, 1, area_id="garage")) is False
+    assert index.remove("sensor.pack_1_cell_1_voltage") is True
+    assert index.remove("sensor.unknown") is False
+    assert index.resolve(selector) == [
+        "sensor.pack_1_cell_2_voltage",
+        "sensor.pack_2_cell_1_voltage",
+    ]
+
+
+def test_expand_appends_matches_after_static_entities():
+    index = SelectorIndex([_cell(1, 1), _cell(1, 2)])
+    plain = _rule("plain", entities=["sensor.a"], selectors=())
+    rules = index.expand(
+        [_rule(entities=["sensor.pack_1_cell_2_voltage", "sensor.extra"]), plain]
+    )
+    assert rules[0].entities == [
+        "sensor.pack_1_cell_2_voltage",
+        "sensor.extra",
+        "sensor.pack_1_cell_1_voltage",
+    ]
+    assert rules[1] is plain
+
+
+def test_member_change_keeps_rule_state():
+    index = SelectorIndex([_cell(1, 1)])
+    configured = [_rule()]
+    engine = RuleEngine(index.expand(configured))
+    engine.states["cells"].active = True
+    state = engine.states["cells"]
+
+    index.update(_cell(2, 1))
+    changes = engine.update_rules(index.expand(configured))
+
+    assert [rule.rule_id for rule in changes.members] == ["cells"]
+    assert not changes.changed
+    assert engine.states["cells"] is state
+    assert engine.rules[0].entities == [
+        "sensor.pack_1_cell_1_voltage",
+        "sensor.pack_2_cell_1_voltage",
+    ]
+    # A changed threshold is still a new rule, with fresh state.
+    changes = engine.update_rules(
+        index.expand([replace(configured[0], thresholds=[3.7])])
+    )
+    assert [rule.rule_id for rule in changes.changed] == ["cells"]
+    assert engine.states["cells"].active is False
+
+
+def test_coordinator_refreshes_members_and_dispatches(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        "custom_components.emergency_stop.coordinator.async_dispatcher_send",
+        lambda hass, signal, changes: sent.append(changes),
+    )
+    monkeypatch.setattr(
+        "custom_components.emergency_stop.coordinator.async_track_state_change_event",
+        lambda hass, entity_ids, action: lambda: None,
+    )
+    index = SelectorIndex([_cell(1, 1)])
+    configured = [_rule(stale_seconds=60)]
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator.hass = SimpleNamespace(async_create_task=lambda coro: coro.close())
+    coordinator.entry = SimpleNamespace(entry_id="entry_1", data={}, options={})
+    coordinator._settings = _settings_config({})
+    coordinator._configured_rules = configured
+    coordinator._selector_index = index
+    coordinator._rule_engine = RuleEngine(index.expand(configured))
+    coordinator._acknowledged = False
+    coordinator._persist_signature = None
+    coordinator._freshness_unsubs = []
+    coordinator._lane_unsubs = []
+    coordinator._input_batch = None
+    coordinator._batch_cancel = None
+    coordinator._shutdown_batch = None
+    coordinator._shutdown_batch_cancel = None
+    coordinator._heartbeat = Heartbeat(1, 1, 10)
+    coordinator._stale_cancel = None
+    coordinator._stale_deadline = None
+    coordinator._store = SimpleNamespace(async_delay_save=lambda *_args: None)
+    tracked = []
+    coordinator._async_track_freshness = lambda: tracked.append(
+        set(coordinator._rule_engine.freshness.entity_ids)
+    )
+
+    index.update(_cell(2, 1))
+    coordinator._async_refresh_members()
+
+    assert [rule.rule_id for rule in sent[0].members] == ["cells"]
+    assert tracked == [
+        {"sensor.pack_1_cell_1_voltage", "sensor.pack_2_cell_1_voltage"}
+    ]
+
+
+def test_load_import_and_build_selectors():
+    raw = {
+        "rule_id": "cells",
+        "rule_name": "Cells",
+        "data_type": "numeric",
+        "entities": [],
+        "selectors": [f" {GLOB} ", "area:battery_room device_class:voltage"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [3.6],
+    }
+    rules = load_rules(
+        {
+            "rules": [
+                raw,
+                {**raw, "rule_id": "bad", "selectors": ["room:garage"]},
+                {
+                    **raw,
+                    "rule_id": "expr",
+                    "data_type": "expression",
+                    "entities": ["sensor.a"],
+                    "expression": "a * 2",
+                },
+            ]
+        }
+    )
+    assert [rule.rule_id for rule in rules] == ["cells", "expr"]
+    assert rules[0].selectors == (GLOB, "area:battery_room device_class:voltage")
+    assert rules[1].selectors == ()
+
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["selectors"] == [GLOB, "area:battery_room device_class:voltage"]
+    _, error = _normalize_import_rules([{**raw, "selectors": ["room:garage"]}])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules([{**raw, "selectors": []}])
+    assert error == "import_invalid_rule"
+
+    rule = _build_rule_config(
+        {
+            "rule_name": "Cells",
+            "data_type": "numeric",
+            "entities": [],
+            "selectors": f"{GLOB}\n\n  label:bms ",
+            "aggregate": "max",
+        },
+        {"condition": "gt", "threshold": 3.6},
+        [],
+    )
+    assert rule["selectors"] == [GLOB, "label:bms"]
+
+
+def test_entities_without_registry_entry_are_selected(monkeypatch):
+    from custom_components.emergency_stop import coordinator as coordinator_module
+
+    registry = SimpleNamespace(
+        entities={},
+        async_get=lambda entity_id: None,
+    )
+    monkeypatch.setattr(coordinator_module.er, "async_get", lambda hass: registry)
+    monkeypatch.setattr(coordinator_module.dr, "async_get", lambda hass: None)
+    listeners = {}
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator.hass = SimpleNamespace(
+        states=SimpleNamespace(
+            async_entity_ids=lambda: ["sensor.pack_1_cell_1_voltage", "sensor.other"]
+        ),
+        bus=SimpleNamespace(
+            async_listen=lambda event_type, action, **kwargs: listeners.update(
+                {event_type: (action, kwargs.get("event_filter"))}
+            )
+            or (lambda: None)
+        ),
+    )
+    coordinator._selector_index = None
+    coordinator._selector_unsubs = []
+    refreshed = []
+    coordinator._async_refresh_members = lambda: refreshed.append(True)
+
+    (rule,) = coordinator._expand_selectors([_rule()])
+    assert rule.entities == ["sensor.pack_1_cell_1_voltage"]
+
+    coordinator._async_track_selectors()
+    action, event_filter = listeners["state_changed"]
+    added = {
+        "entity_id": "sensor.pack_2_cell_1_voltage",
+        "old_state": None,
+        "new_state": object(),
+    }
+    assert event_filter(added) is True
+    assert event_filter({**added, "old_state": object()}) is False
+    action(SimpleNamespace(data=added))
+    assert refreshed == [True]
+    assert coordinator._selector_index.resolve(parse_selector(GLOB)) == [
+        "sensor.pack_1_cell_1_voltage",
+        "sensor.pack_2_cell_1_voltage",
+    ]
+
+    action(SimpleNamespace(data={**added, "old_state": object(), "new_state": None}))
+    assert len(refreshed) == 2
+    assert coordinator._selector_index.get("sensor.pack_2_cell_1_voltage") is None
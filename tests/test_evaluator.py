@@ -9,8 +9,8 @@ from custom_components.emergency_stop.coordinator import (
     RuleEngine,
     RuleRuntimeState,
     _build_stop_state,
-    _deterministic_offset_seconds,
 )
+from custom_components.emergency_stop.engine import deterministic_offset_seconds
 from custom_components.emergency_stop.const import (
     COND_BETWEEN,
     COND_CONTAINS,
@@ -104,9 +104,9 @@ def _rule(
 
 
 def test_deterministic_offset_in_range():
-    offset = _deterministic_offset_seconds("rule_offset", 10)
+    offset = deterministic_offset_seconds("rule_offset", 10)
     assert 0 <= offset < 10
-    assert offset == _deterministic_offset_seconds("rule_offset", 10)
+    assert offset == deterministic_offset_seconds("rule_offset", 10)
 
 
 def test_numeric_rule_triggers_after_duration(base_times):
@@ -260,7 +260,7 @@ def test_per_rule_interval_delays_activation(base_times):
         level=LEVEL_LIMIT,
     )
     engine = RuleEngine([rule])
-    offset = _deterministic_offset_seconds(rule.rule_id, rule.interval_seconds)
+    offset = deterministic_offset_seconds(rule.rule_id, rule.interval_seconds)
 
     monotonic_values.append(float(offset))
     engine.evaluate(hass)
@@ -0,0 +1,179 @@
+import asyncio
+from types import SimpleNamespace
+
+from custom_components.emergency_stop.binary_sensor import (
+    EmergencyStopEvaluatorHealthyBinarySensor,
+)
+from custom_components.emergency_stop.config_flow import _validate_globals
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NORMAL,
+    LEVEL_NOTIFY,
+)
+from custom_components.emergency_stop.coordinator import (
+    EmergencyStopCoordinator,
+    EmergencyStopState,
+    RuleEngine,
+)
+from custom_components.emergency_stop.engine.watchdog import Heartbeat
+from custom_components.emergency_stop.sensor import EmergencyStopLoopLagSensor
+
+from helpers import rule_config
+
+
+class FakeLoop:
+    def __init__(self):
+        self.now = 100.0
+        self.scheduled = []
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback):
+        self.scheduled.append((when, callback))
+        return SimpleNamespace(cancel=lambda: None)
+
+    def run_next(self, late=0.0):
+        when, callback = self.scheduled.pop(0)
+        self.now = when + late
+        callback()
+
+
+def _rule():
+    return rule_config(
+        rule_id="humidity",
+        name="Humidity",
+        thresholds=[80],
+        interval_seconds=5,
+        level=LEVEL_NOTIFY,
+    )
+
+
+def test_heartbeat_measures_lag_jitter_and_stalls():
+    heartbeat = Heartbeat(1, 0.5, 12)
+    assert heartbeat.start(100) == 101
+    heartbeat.evaluated(100)
+    assert heartbeat.beat(101) == 102
+    assert heartbeat.lag == 0
+    assert heartbeat.healthy is True
+
+    # Next beat 0.8 s late: over the limit, and the next one is due a period
+    # after it actually ran.
+    assert heartbeat.beat(102.8) == 103.8
+    assert round(heartbeat.lag, 3) == 0.8
+    assert round(heartbeat.jitter, 3) == 0.05
+    assert heartbeat.healthy is False
+
+    heartbeat.beat(104.0)
+    assert heartbeat.healthy is True
+    heartbeat.beat(112.5)
+    assert heartbeat.stalled is True
+    assert heartbeat.healthy is False
+
+
+def test_unhealthy_evaluator_escalates_and_recovers(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        EmergencyStopCoordinator,
+        "async_update_listeners",
+        lambda self: published.append(self.stop_state.level),
+    )
+    notified = []
+
+    async def level_notifications(self, prev_level, new_level, state):
+        notified.append((prev_level, new_level, state.primary_reason))
+
+    async def activation_email(self, prev_active, state):
+        notified.append(("email", state.active))
+
+    monkeypatch.setattr(
+        EmergencyStopCoordinator,
+        "_maybe_send_level_notifications",
+        level_notifications,
+    )
+    monkeypatch.setattr(
+        EmergencyStopCoordinator, "_maybe_send_activation_email", activation_email
+    )
+    loop = FakeLoop()
+    tasks = []
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator.hass = SimpleNamespace(loop=loop, async_create_task=tasks.append)
+    coordinator._rule_engine = RuleEngine([_rule()])
+    coordinator._simulation = None
+    coordinator._acknowledged = False
+    coordinator._stop_state = EmergencyStopState(level=LEVEL_NORMAL)
+    coordinator._heartbeat = Heartbeat(1, 0.5, 60)
+    coordinator._watchdog_level = LEVEL_LIMIT
+    coordinator._watchdog_events = []
+    coordinator._lag_published_at = loop.now
+    coordinator._last_email_active = False
+    coordinator._last_mobile_level = LEVEL_NORMAL
+    coordinator._suppress_level_notification = False
+
+    coordinator._async_start_heartbeat()
+    loop.run_next()
+    assert published == []
+
+    loop.run_next(late=2.0)
+    assert published == [LEVEL_LIMIT]
+    # The escalation is notified without waiting for an evaluation pass.
+    asyncio.run(tasks.pop())
+    assert notified == [
+        ("email", True),
+        (LEVEL_NORMAL, LEVEL_LIMIT, "Rule evaluator unhealthy"),
+    ]
+    stop_state = coordinator.stop_state
+    assert stop_state.active is True
+    assert stop_state.primary_reason == "Rule evaluator unhealthy"
+    assert stop_state.active_events[0]["rule_id"] == "watchdog"
+    assert stop_state.active_events[0]["value"] == 2000
+
+    lag_sensor = EmergencyStopLoopLagSensor(coordinator)
+    assert lag_sensor.native_value == 2000
+    healthy = EmergencyStopEvaluatorHealthyBinarySensor(coordinator)
+    assert healthy.is_on is False
+    assert healthy.extra_state_attributes["escalation_level"] == LEVEL_LIMIT
+
+    loop.run_next()
+    assert published == [LEVEL_LIMIT, LEVEL_NORMAL]
+    assert coordinator.stop_state.active is False
+    assert healthy.is_on is True
+    asyncio.run(tasks.pop())
+    assert notified[-1] == (LEVEL_LIMIT, LEVEL_NORMAL, None)
+
+
+def test_heartbeat_refreshes_lag_sensors_while_passes_stall(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        EmergencyStopCoordinator,
+        "async_update_listeners",
+        lambda self: published.append(self.heartbeat.lag),
+    )
+    loop = FakeLoop()
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator.hass = SimpleNamespace(loop=loop)
+    coordinator._heartbeat = Heartbeat(1, 5, 60)
+    coordinator._lag_published_at = loop.now
+
+    coordinator._async_start_heartbeat()
+    for _ in range(4):
+        loop.run_next()
+    assert published == []
+    # Five seconds after the last pass the heartbeat publishes on its own,
+    # then again every five seconds.
+    loop.run_next(late=0.5)
+    assert published == [0.5]
+    for _ in range(4):
+        loop.run_next()
+    assert len(published) == 1
+    loop.run_next(late=1.0)
+    assert published == [0.5, 1.0]
+
+
+def test_watchdog_settings_are_validated():
+    assert _validate_globals({"watchdog_level": "normal", "watchdog_lag_ms": 500}) == {}
+    assert _validate_globals({"watchdog_level": "shutdown"}) == {}
+    assert _validate_globals({"watchdog_level": "panic"}) == {
+        "watchdog_level": "invalid_watchdog_level"
+    }
+    assert _validate_globals({"watchdog_lag_ms": -5}) == {"watchdog_lag_ms": "min_0"}
@@ -0,0 +1,200 @@
+import pytest
+
+from custom_components.emergency_stop.config_flow import (
+    _build_rule_config,
+    _normalize_import_rules,
+)
+from custom_components.emergency_stop.const import (
+    DATA_TYPE_EXPRESSION,
+    SEVERITY_MODE_SEMAFOR,
+)
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.expression import (
+    ExpressionError,
+    compile_expression,
+    input_names,
+)
+
+from helpers import DictStates, FakeClock, rule_config
+
+NAMES = frozenset({"current", "voltage"})
+
+
+def _rule(expression, entities=("sensor.current", "sensor.voltage"), **overrides):
+    values = dict(
+        rule_id="power",
+        name="Power",
+        data_type=DATA_TYPE_EXPRESSION,
+        entities=list(entities),
+        aggregate="",
+        thresholds=[1000],
+        duration_seconds=1,
+        expression=expression,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _raw(expression, **extra):
+    return {
+        "rule_id": "power",
+        "rule_name": "Power",
+        "data_type": "expression",
+        "entities": ["sensor.current", "sensor.voltage"],
+        "expression": expression,
+        "condition": "gt",
+        "thresholds": [1000],
+        **extra,
+    }
+
+
+def test_compiled_expression_evaluates_and_is_cached():
+    compiled = compile_expression("current * voltage if current > 0 else 0", NAMES)
+    assert compiled.evaluate({"current": 10.0, "voltage": 50.0}) == 500.0
+    assert compiled.evaluate({"current": -1.0, "voltage": 50.0}) == 0.0
+    assert compile_expression("current * voltage if current > 0 else 0", NAMES) is compiled
+    assert compile_expression("current > 5 and voltage < 60", NAMES).evaluate(
+        {"current": 10.0, "voltage": 50.0}
+    ) == 1.0
+    assert compile_expression("spread(values) + percentile(50, current, 4)", NAMES).evaluate(
+        {"current": 10.0, "voltage": 50.0}
+    ) == 44.0
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "__import__('os')",
+        "current.real",
+        "(lambda: 1)()",
+        "max",
+        "current ** 2",
+        "'text'",
+        "values[0]",
+        "sum(x for x in values)",
+        "round(current, ndigits=1)",
+        "other + 1",
+        "current +",
+    ],
+)
+def test_compile_rejects_anything_outside_the_grammar(text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text, NAMES)
+
+
+def test_input_names_reject_clashes_and_reserved_names():
+    assert input_names(["sensor.cell_1", "sensor.cell_2"]) == {
+        "cell_1": "sensor.cell_1",
+        "cell_2": "sensor.cell_2",
+    }
+    with pytest.raises(ExpressionError):
+        input_names(["sensor.current", "number.current"])
+    with pytest.raises(ExpressionError):
+        input_names(["sensor.max"])
+
+
+def test_engine_compares_expression_value():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine([_rule("current * voltage")], clock=clock)
+    states.set("sensor.current", 30)
+    states.set("sensor.voltage", 50)
+    for second in (10, 11):
+        clock.now = second
+        engine.evaluate(states)
+    state = engine.states["power"]
+    assert state.active is True
+    assert state.last_aggregate == 1500
+    assert state.last_detail.startswith("Power: (current * voltage)=1500.000")
+
+
+def test_missing_input_and_arithmetic_errors_follow_unknown_handling():
+    clock = FakeClock()
+    states = DictStates()
+    engine = RuleEngine(
+        [
+            _rule("current * voltage"),
+            _rule("current / voltage", rule_id="ratio", unknown_handling="treat_violation"),
+            _rule("max(values)", rule_id="peak", thresholds=[20]),
+        ],
+        clock=clock,
+    )
+    states.set("sensor.current", 30)
+    states.set("sensor.voltage", "unavailable")
+    clock.now = 10
+    engine.evaluate(states)
+    assert engine.states["power"].last_invalid_reason == "missing_input"
+    # Aggregates over ``values`` only see the valid inputs.
+    assert engine.states["peak"].last_aggregate == 30
+
+    states.set("sensor.voltage", 0)
+    clock.now = 11
+    engine.evaluate(states)
+    assert engine.states["ratio"].last_invalid_reason == "expression_error"
+    assert engine.states["ratio"].last_match is True
+
+
+def test_semafor_expression_rule():
+    clock = FakeClock()
+    states = DictStates()
+    rule = _rule(
+        "current * voltage",
+        severity_mode=SEVERITY_MODE_SEMAFOR,
+        direction="higher_is_worse",
+        condition=None,
+        thresholds=[],
+        levels={
+            "notify": {"threshold": 500, "duration_seconds": 1},
+            "shutdown": {"threshold": 1000, "duration_seconds": 1},
+        },
+    )
+    engine = RuleEngine([rule], clock=clock)
+    states.set("sensor.current", 15)
+    states.set("sensor.voltage", 50)
+    for second in (10, 11):
+        clock.now = second
+        engine.evaluate(states)
+    assert engine.states["power"].current_level == "notify"
+
+
+def test_load_rules_skips_invalid_expressions():
+    rules = load_rules(
+        {
+            "rules": [
+                _raw("current * voltage"),
+                {**_raw("current * other"), "rule_id": "bad"},
+                {**_raw("__import__('os')"), "rule_id": "worse"},
+            ]
+        }
+    )
+    assert [rule.rule_id for rule in rules] == ["power"]
+    assert rules[0].is_numeric
+
+
+def test_import_and_build_keep_expression():
+    normalized, error = _normalize_import_rules(
+        [_raw(" current * voltage ", aggregate="max", window_function="avg")]
+    )
+    assert error is None
+    assert normalized[0]["expression"] == "current * voltage"
+    assert normalized[0]["aggregate"] is None
+    assert normalized[0]["window_function"] == "avg"
+
+    _, error = _normalize_import_rules([_raw("current ** 2")])
+    assert error == "import_invalid_rule"
+
+    rule = _build_rule_config(
+        {
+            "rule_name": "Power",
+            "data_type": "expression",
+            "entities": ["sensor.current", "sensor.voltage"],
+            "expression": "current * voltage",
+            "aggregate": None,
+        },
+        {"condition": "gt", "threshold": 1000, "hysteresis": 50},
+        [],
+    )
+    assert rule["expression"] == "current * voltage"
+    assert rule["hysteresis"] == 50
+    assert "aggregate_parameter" not in rule
@@ -0,0 +1,177 @@
+from custom_components.emergency_stop.config_flow import (
+    _build_rule_config,
+    _normalize_import_rules,
+)
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    LEVEL_SHUTDOWN,
+    SEVERITY_MODE_SEMAFOR,
+)
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.selectors import EntityInfo, SelectorIndex
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+class CountingStates(DictStates):
+    reads = 0
+
+    def get(self, entity_id):
+        self.reads += 1
+        return super().get(entity_id)
+
+
+def _rule(**overrides):
+    values = dict(
+        rule_id="overvoltage",
+        name="Overvoltage",
+        entities=["sensor.pack_max"],
+        thresholds=[3.6],
+        duration_seconds=1,
+        latched=True,
+        freeze_latched=True,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _run(engine, clock, states, seconds):
+    for second in seconds:
+        clock.now = second
+        engine.evaluate(states)
+
+
+def test_latched_rule_is_only_observed_until_reset():
+    clock = FakeClock(10.0)
+    states = CountingStates()
+    engine = RuleEngine([_rule()], clock=clock)
+    states.set("sensor.pack_max", 3.7)
+    _run(engine, clock, states, [10, 11])
+    state = engine.states["overvoltage"]
+    assert state.active is True
+    assert state.frozen is True
+    assert state.eval_interval == 60
+
+    states.set("sensor.pack_max", 3.4)
+    reads = states.reads
+    _run(engine, clock, states, range(12, 71))
+    assert states.reads == reads
+    assert state.last_aggregate == 3.7
+
+    _run(engine, clock, states, [71])
+    assert states.reads == reads + 1
+    assert state.active is True
+    assert state.last_aggregate == 3.4
+    assert state.last_match is False
+
+    engine.reset()
+    _run(engine, clock, states, [72])
+    assert state.frozen is False
+    assert state.active is False
+    assert state.eval_interval is None
+    assert states.reads == reads + 2
+
+
+def test_semafor_rule_freezes_only_at_its_top_level():
+    clock = FakeClock(10.0)
+    states = CountingStates()
+    rule = _rule(
+        severity_mode=SEVERITY_MODE_SEMAFOR,
+        direction="higher_is_worse",
+        condition=None,
+        thresholds=[],
+        levels={
+            LEVEL_NOTIFY: {"threshold": 3.5, "duration_seconds": 1},
+            LEVEL_LIMIT: {"threshold": 3.6, "duration_seconds": 1},
+            LEVEL_SHUTDOWN: {"threshold": 3.8, "duration_seconds": 1},
+        },
+    )
+    engine = RuleEngine([rule], clock=clock)
+    states.set("sensor.pack_max", 3.65)
+    _run(engine, clock, states, [10, 11])
+    state = engine.states["overvoltage"]
+    assert state.latched_level == LEVEL_LIMIT
+    assert state.frozen is False
+
+    states.set("sensor.pack_max", 3.9)
+    _run(engine, clock, states, [12, 13])
+    assert state.latched_level == LEVEL_SHUTDOWN
+    assert state.frozen is True
+
+    states.set("sensor.pack_max", 3.55)
+    _run(engine, clock, states, [73])
+    assert state.current_level == LEVEL_SHUTDOWN
+    assert state.active_levels == [LEVEL_NOTIFY, LEVEL_LIMIT, LEVEL_SHUTDOWN]
+    assert state.last_aggregate == 3.55
+    assert state.last_detail.startswith("Overvoltage")
+
+
+def test_family_freezes_when_every_group_latched_and_thaws_on_new_group():
+    clock = FakeClock(10.0)
+    states = CountingStates()
+    index = SelectorIndex([EntityInfo("sensor.pack_1_max"), EntityInfo("sensor.pack_2_max")])
+    configured = [
+        _rule(entities=[], selectors=("sensor.pack_*_max",), group_by="capture")
+    ]
+    engine = RuleEngine(index.expand(configured), clock=clock)
+    states.set("sensor.pack_1_max", 3.7)
+    states.set("sensor.pack_2_max", 3.4)
+    _run(engine, clock, states, [10, 11])
+    state = engine.states["overvoltage"]
+    assert state.active is True
+    assert state.frozen is False
+
+    states.set("sensor.pack_2_max", 3.7)
+    _run(engine, clock, states, [12, 13])
+    assert state.frozen is True
+
+    index.update(EntityInfo("sensor.pack_3_max"))
+    engine.update_rules(index.expand(configured))
+    assert state.frozen is False
+    states.set("sensor.pack_3_max", 3.4)
+    _run(engine, clock, states, [14])
+    assert engine.group_states("overvoltage")["1"].active is True
+    assert state.groups["3"]["active"] is False
+
+
+def test_load_import_and_build_freeze_latched():
+    raw = {
+        "rule_id": "overvoltage",
+        "rule_name": "Overvoltage",
+        "data_type": "numeric",
+        "entities": ["sensor.pack_max"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [3.6],
+        "latched": True,
+        "freeze_latched": True,
+    }
+    rules = load_rules({"rules": [raw, {**raw, "rule_id": "plain", "freeze_latched": False}]})
+    assert [rule.freeze_latched for rule in rules] == [True, False]
+
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["freeze_latched"] is True
+    normalized, error = _normalize_import_rules([{**raw, "latched": False}])
+    assert error is None
+    assert "freeze_latched" not in normalized[0]
+
+    context = {
+        "rule_name": "Overvoltage",
+        "data_type": "numeric",
+        "entities": ["sensor.pack_max"],
+        "aggregate": "max",
+    }
+    rule = _build_rule_config(
+        context,
+        {"condition": "gt", "threshold": 3.6, "latched": True, "freeze_latched": True},
+        [],
+    )
+    assert rule["freeze_latched"] is True
+    rule = _build_rule_config(
+        context,
+        {"condition": "gt", "threshold": 3.6, "latched": False, "freeze_latched": True},
+        [],
+    )
+    assert "freeze_latched" not in rule
@@ -0,0 +1,197 @@
+import asyncio
+from types import SimpleNamespace
+
+import custom_components.emergency_stop.entry as integration
+import custom_components.emergency_stop.binary_sensor as binary_sensor_module
+from custom_components.emergency_stop.binary_sensor import (
+    _async_apply_rule_entity_changes,
+)
+from custom_components.emergency_stop.coordinator import (
+    EmergencyStopCoordinator,
+    RuleEngine,
+    _settings_config,
+)
+from custom_components.emergency_stop.engine import RuleSetChanges
+from custom_components.emergency_stop.engine.watchdog import Heartbeat
+from custom_components.emergency_stop.const import (
+    CONF_REPORT_MODE,
+    CONF_RULES,
+    DOMAIN,
+    LEVEL_LIMIT,
+)
+
+from helpers import rule_config
+
+
+def _rule(rule_id, threshold=3.5, name=None):
+    return rule_config(
+        rule_id=rule_id,
+        name=name or rule_id,
+        entities=["sensor.voltage"],
+        thresholds=[threshold],
+        duration_seconds=5,
+        level=LEVEL_LIMIT,
+        latched=True,
+    )
+
+
+def _raw_rule(rule_id, threshold=3.5):
+    return {
+        "rule_id": rule_id,
+        "rule_name": rule_id,
+        "data_type": "numeric",
+        "entities": ["sensor.voltage"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [threshold],
+        "duration_seconds": 5,
+        "interval_seconds": 1,
+        "level": "limit",
+    }
+
+
+def test_update_rules_keeps_state_of_unchanged_rules():
+    keep, edit, drop = _rule("keep"), _rule("edit"), _rule("drop")
+    engine = RuleEngine([keep, edit, drop])
+    for state in engine.states.values():
+        state.active = True
+    keep_state = engine.states["keep"]
+
+    changes = engine.update_rules(
+        [_rule("keep"), _rule("edit", threshold=4.0), _rule("new")]
+    )
+
+    assert [rule.rule_id for rule in changes.added] == ["new"]
+    assert [rule.rule_id for rule in changes.changed] == ["edit"]
+    assert changes.removed == ["drop"]
+    assert engine.states["keep"] is keep_state
+    assert engine.rules[0] is keep
+    assert engine.states["keep"].active is True
+    assert engine.states["edit"].active is False
+    assert engine.states["new"].last_eval_monotonic is not None
+    assert "drop" not in engine.states
+
+
+def _coordinator(config):
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator.hass = SimpleNamespace()
+    coordinator.entry = SimpleNamespace(entry_id="entry_1", data=config, options={})
+    coordinator._settings = _settings_config(config)
+    coordinator._rule_engine = RuleEngine([_rule("r1")])
+    coordinator._acknowledged = False
+    coordinator._persist_signature = None
+    coordinator._freshness_unsubs = []
+    coordinator._lane_unsubs = []
+    coordinator._input_batch = None
+    coordinator._batch_cancel = None
+    coordinator._shutdown_batch = None
+    coordinator._shutdown_batch_cancel = None
+    coordinator._heartbeat = Heartbeat(1, 1, 10)
+    coordinator._stale_cancel = None
+    coordinator._stale_deadline = None
+    coordinator._configured_rules = list(coordinator._rule_engine.rules)
+    coordinator._selector_index = None
+    coordinator._selector_unsubs = []
+    coordinator._store = SimpleNamespace(async_delay_save=lambda *_args: None)
+    return coordinator
+
+
+def test_apply_options_requires_reload_when_settings_change():
+    coordinator = _coordinator({CONF_RULES: [_raw_rule("r1")], CONF_REPORT_MODE: "basic"})
+    coordinator.entry.options = {CONF_REPORT_MODE: "extended"}
+
+    assert coordinator.async_apply_options() is False
+
+
+def test_apply_options_dispatches_rule_changes(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        "custom_components.emergency_stop.coordinator.async_dispatcher_send",
+        lambda hass, signal, changes: sent.append((signal, changes)),
+    )
+    monkeypatch.setattr(
+        "custom_components.emergency_stop.coordinator.async_track_state_change_event",
+        lambda hass, entity_ids, action: lambda: None,
+    )
+    coordinator = _coordinator({CONF_RULES: [_raw_rule("r1")]})
+    coordinator.entry.options = {CONF_RULES: [_raw_rule("r1"), _raw_rule("r2")]}
+
+    assert coordinator.async_apply_options() is True
+    assert len(sent) == 1
+    signal, changes = sent[0]
+    assert signal == "emergency_stop_rules_updated_entry_1"
+    assert [rule.rule_id for rule in changes.added] == ["r2"]
+    assert [rule.rule_id for rule in coordinator.rules] == ["r1", "r2"]
+
+
+def test_update_options_skips_reload_when_applied_in_place():
+    class FakeCoordinator:
+        def __init__(self):
+            self.refreshed = False
+
+        def async_apply_options(self):
+            return True
+
+        async def async_request_refresh(self):
+            self.refreshed = True
+
+    coordinator = FakeCoordinator()
+    reloads = []
+
+    async def async_reload(entry_id):
+        reloads.append(entry_id)
+
+    hass = SimpleNamespace(
+        data={DOMAIN: {"entry_1": coordinator}},
+        config_entries=SimpleNamespace(async_reload=async_reload),
+    )
+    entry = SimpleNamespace(entry_id="entry_1")
+
+    asyncio.run(integration._async_update_options(hass, entry))
+
+    assert reloads == []
+    assert coordinator.refreshed is True
+
+
+def test_rule_entity_changes_add_replace_and_remove(monkeypatch):
+    class FakeEntity:
+        def __init__(self, rule_id):
+            self.rule_id = rule_id
+            self.entity_id = f"binary_sensor.emergency_stop_{rule_id}"
+            self.removed = False
+
+        async def async_remove(self):
+            self.removed = True
+
+    class FakeRegistry:
+        def __init__(self):
+            self.removed = []
+
+        def async_get(self, entity_id):
+            return object()
+
+        def async_remove(self, entity_id):
+            self.removed.append(entity_id)
+
+    registry = FakeRegistry()
+    monkeypatch.setattr(binary_sensor_module.er, "async_get", lambda hass: registry)
+    coordinator = SimpleNamespace(rule_states={}, rules=[])
+    rule_entities = {rule_id: FakeEntity(rule_id) for rule_id in ("keep", "edit", "drop")}
+    old_edit, old_drop = rule_entities["edit"], rule_entities["drop"]
+    added = []
+
+    changes = RuleSetChanges(
+        added=[_rule("new")], changed=[_rule("edit", name="Edited")], removed=["drop"]
+    )
+    asyncio.run(
+        _async_apply_rule_entity_changes(
+            None, coordinator, rule_entities, changes, added.extend
+        )
+    )
+
+    assert old_edit.removed is True
+    assert old_drop.removed is True
+    assert registry.removed == ["binary_sensor.emergency_stop_drop"]
+    assert sorted(rule_entities) == ["edit", "keep", "new"]
+    assert rule_entities["edit"].name == "Edited"
+    assert {entity.rule_id for entity in added} == {"edit", "new"}
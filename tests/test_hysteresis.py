@@ -0,0 +1,223 @@
+from datetime import timedelta
+
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+from custom_components.emergency_stop.const import LEVEL_LIMIT, LEVEL_NOTIFY
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.replay import StateChange, replay
+
+from helpers import DictStates, FakeClock, START, rule_config
+
+
+def _rule(**overrides):
+    values = dict(
+        rule_id="temp",
+        name="Temperature",
+        entities=["sensor.temp"],
+        thresholds=[60],
+        duration_seconds=1,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _run(engine, clock, states, values):
+    """Evaluate one value per second and return the active flag after each."""
+    active = []
+    for value in values:
+        clock.now += 1
+        states.set("sensor.temp", value)
+        engine.evaluate(states)
+        active.append(engine.states["temp"].active)
+    return active
+
+
+def test_without_hysteresis_rule_flaps_on_threshold():
+    clock = FakeClock()
+    engine = RuleEngine([_rule()], clock=clock)
+    assert _run(engine, clock, DictStates(), [61, 61, 59, 61, 61, 59]) == [
+        False, True, False, False, True, False,
+    ]
+
+
+def test_deadband_holds_rule_until_clear_point():
+    clock = FakeClock()
+    engine = RuleEngine([_rule(hysteresis=5)], clock=clock)
+    assert _run(engine, clock, DictStates(), [61, 61, 59, 56, 55, 59]) == [
+        False, True, True, True, False, False,
+    ]
+
+
+def test_clear_threshold_overrides_deadband_for_lower_limit():
+    clock = FakeClock()
+    engine = RuleEngine(
+        [_rule(condition="lt", thresholds=[10], hysteresis=1, clear_threshold=15)],
+        clock=clock,
+    )
+    assert _run(engine, clock, DictStates(), [9, 9, 12, 14.9, 15, 12]) == [
+        False, True, True, True, False, False,
+    ]
+
+
+def test_clear_duration_holds_and_resets_on_return():
+    clock = FakeClock()
+    engine = RuleEngine([_rule(clear_duration_seconds=3)], clock=clock)
+    assert _run(engine, clock, DictStates(), [61, 61, 50, 50, 61, 50, 50, 50, 50]) == [
+        False, True, True, True, True, True, True, True, False,
+    ]
+    assert engine.states["temp"].clear_started_at is None
+
+
+def test_latched_rule_ignores_clear_duration():
+    clock = FakeClock()
+    engine = RuleEngine(
+        [_rule(latched=True, clear_duration_seconds=3)], clock=clock
+    )
+    _run(engine, clock, DictStates(), [61, 61, 50])
+    assert engine.states["temp"].active is True
+    assert engine.states["temp"].clear_started_at is None
+
+
+def test_semafor_levels_clear_at_their_own_points():
+    clock = FakeClock()
+    rule = _rule(
+        severity_mode="semafor",
+        direction="higher_is_worse",
+        condition=None,
+        thresholds=[],
+        hysteresis=2,
+        levels={
+            LEVEL_NOTIFY: {"threshold": 50, "duration_seconds": 1},
+            LEVEL_LIMIT: {
+                "threshold": 60,
+                "duration_seconds": 1,
+                "clear_threshold": 55,
+            },
+        },
+    )
+    engine = RuleEngine([rule], clock=clock)
+    states = DictStates()
+    levels = []
+    for value in (61, 61, 58, 54, 49, 47):
+        _run(engine, clock, states, [value])
+        levels.append(engine.states["temp"].current_level)
+    assert levels == [None, LEVEL_LIMIT, LEVEL_LIMIT, LEVEL_NOTIFY, LEVEL_NOTIFY, None]
+
+
+def test_semafor_clear_duration_keeps_level():
+    clock = FakeClock()
+    rule = _rule(
+        severity_mode="semafor",
+        direction="lower_is_worse",
+        condition=None,
+        thresholds=[],
+        clear_duration_seconds=2,
+        levels={LEVEL_NOTIFY: {"threshold": 10, "duration_seconds": 1}},
+    )
+    engine = RuleEngine([rule], clock=clock)
+    states = DictStates()
+    levels = []
+    for value in (9, 9, 11, 11, 11):
+        _run(engine, clock, states, [value])
+        levels.append(engine.states["temp"].current_level)
+    assert levels == [None, LEVEL_NOTIFY, LEVEL_NOTIFY, LEVEL_NOTIFY, None]
+
+
+def test_replay_clears_after_clear_duration():
+    changes = [
+        StateChange(START, "sensor.temp", "61"),
+        StateChange(START + timedelta(seconds=30), "sensor.temp", "50"),
+    ]
+    transitions = list(
+        replay(
+            [_rule(clear_duration_seconds=30, interval_seconds=5, duration_seconds=5)],
+            changes,
+            START + timedelta(seconds=120),
+        )
+    )
+    assert [t.kind for t in transitions] == ["activated", "cleared"]
+    assert transitions[1].when == START + timedelta(seconds=60)
+
+
+def test_load_rules_reads_clearing_fields():
+    rules = load_rules(
+        {
+            "rules": [
+                {
+                    "rule_id": "temp",
+                    "rule_name": "Temperature",
+                    "data_type": "numeric",
+                    "entities": ["sensor.temp"],
+                    "aggregate": "max",
+                    "condition": "between",
+                    "thresholds": [10, 20],
+                    "hysteresis": 0.5,
+                    "clear_threshold": 5,
+                    "clear_duration_seconds": 30,
+                },
+                {
+                    "rule_id": "volt",
+                    "rule_name": "Voltage",
+                    "data_type": "numeric",
+                    "entities": ["sensor.volt"],
+                    "aggregate": "max",
+                    "severity_mode": "semafor",
+                    "direction": "higher_is_worse",
+                    "levels": {
+                        "notify": {
+                            "threshold": 3.5,
+                            "duration_seconds": 3,
+                            "clear_threshold": 3.45,
+                        }
+                    },
+                },
+            ]
+        }
+    )
+    assert rules[0].hysteresis == 0.5
+    assert rules[0].clear_threshold is None
+    assert rules[0].clear_duration_seconds == 30
+    assert rules[1].levels["notify"]["clear_threshold"] == 3.45
+
+
+def test_import_validates_clear_points():
+    raw = {
+        "rule_id": "temp",
+        "rule_name": "Temperature",
+        "data_type": "numeric",
+        "entities": ["sensor.temp"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [60],
+        "duration_seconds": 5,
+        "interval_seconds": 5,
+        "hysteresis": 2,
+        "clear_threshold": 55,
+        "clear_duration_seconds": 30,
+    }
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["hysteresis"] == 2
+    assert normalized[0]["clear_threshold"] == 55
+    assert normalized[0]["clear_duration_seconds"] == 30
+
+    _, error = _normalize_import_rules([{**raw, "clear_threshold": 65}])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules([{**raw, "hysteresis": -1}])
+    assert error == "import_invalid_rule"
+
+    semafor = {
+        **raw,
+        "severity_mode": "semafor",
+        "direction": "lower_is_worse",
+        "levels": {
+            "notify": {"threshold": 10, "duration_seconds": 5, "clear_threshold": 12}
+        },
+    }
+    del semafor["clear_threshold"]
+    normalized, error = _normalize_import_rules([semafor])
+    assert error is None
+    assert normalized[0]["levels"]["notify"]["clear_threshold"] == 12
+
+    semafor["levels"]["notify"]["clear_threshold"] = 8
+    _, error = _normalize_import_rules([semafor])
+    assert error == "import_invalid_rule"
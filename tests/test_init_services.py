@@ -1,7 +1,7 @@
 import asyncio
 from types import SimpleNamespace
 
-import custom_components.emergency_stop as integration
+import custom_components.emergency_stop.entry as integration
 from custom_components.emergency_stop.const import (
     CONF_NOTIFICATION_LEVEL,
     CONF_SIMULATION_DETAIL,
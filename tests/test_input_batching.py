@@ -0,0 +1,186 @@
+from types import SimpleNamespace
+
+from custom_components.emergency_stop import coordinator as coordinator_module
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NORMAL,
+    LEVEL_SHUTDOWN,
+)
+from custom_components.emergency_stop.coordinator import (
+    EmergencyStopCoordinator,
+    EmergencyStopState,
+    RuleEngine,
+    _input_batch,
+    _shutdown_batch,
+)
+from custom_components.emergency_stop.engine.batch import MicroBatch
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+def _cells_rule(count, level=LEVEL_LIMIT, rule_id="cells"):
+    return rule_config(
+        rule_id=rule_id,
+        entities=[f"sensor.cell_{index}" for index in range(count)],
+        thresholds=[3.65],
+        interval_seconds=5,
+        level=level,
+    )
+
+
+def test_micro_batch_flushes_after_quiet_window_cap_or_max_latency():
+    batch = MicroBatch(0.02, 0.1, 3)
+    assert batch.flush_at is None
+    assert batch.add(1.0) is False
+    assert batch.flush_at == 1.02
+    assert batch.add(1.01) is False
+    assert batch.flush_at == 1.03
+    assert batch.add(1.02) is True
+    batch.clear()
+    assert batch.pending is False
+
+    batch = MicroBatch(0.02, 0.1, 0)
+    for step in range(20):
+        assert batch.add(1.0 + step * 0.01) is False
+    assert batch.flush_at == 1.1
+
+    assert _input_batch({"input_batch_ms": 0}) is None
+    assert _input_batch({}).window == 0.02
+    batch = _input_batch({"input_batch_ms": 50, "input_batch_max_latency_ms": 10})
+    assert batch.max_latency == 0.05
+
+    assert _shutdown_batch({"input_batch_shutdown_ms": 0}) is None
+    batch = _shutdown_batch({})
+    assert (batch.window, batch.max_latency) == (0.005, 0.005)
+
+
+def _coordinator(monkeypatch, engine, states, clock, timers, evaluations):
+    monkeypatch.setattr(coordinator_module.time, "monotonic", lambda: clock.now)
+    monkeypatch.setattr(
+        coordinator_module,
+        "async_call_later",
+        lambda hass, delay, action: timers.append((clock.now + delay, action))
+        or (lambda: None),
+    )
+    monkeypatch.setattr(
+        EmergencyStopCoordinator, "async_update_listeners", lambda self: None
+    )
+    original = engine.evaluate
+    monkeypatch.setattr(
+        engine,
+        "evaluate",
+        lambda hass, lanes=None, budget=None, pass_name="tick": evaluations.append(
+            clock.now
+        )
+        or original(hass, lanes, budget, pass_name),
+    )
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator.hass = SimpleNamespace(states=states)
+    coordinator._rule_engine = engine
+    coordinator._simulation = None
+    coordinator._acknowledged = False
+    coordinator._lane_over_budget = False
+    coordinator._stop_state = EmergencyStopState(level=LEVEL_NORMAL)
+    coordinator._input_batch = MicroBatch(0.02, 0.1, 0)
+    coordinator._batch_cancel = None
+    coordinator._shutdown_batch = None
+    coordinator._shutdown_batch_cancel = None
+    coordinator._eval_slice = None
+    coordinator._watchdog_events = []
+    return coordinator
+
+
+def test_burst_of_cell_updates_evaluates_rule_once(monkeypatch):
+    clock = FakeClock(100.0)
+    timers = []
+    evaluations = []
+    states = DictStates()
+    engine = RuleEngine([_cells_rule(500)])
+    coordinator = _coordinator(monkeypatch, engine, states, clock, timers, evaluations)
+
+    for index in range(500):
+        states.set(f"sensor.cell_{index}", 3.7 if index == 499 else 3.3)
+        clock.now = 100.0 + index * 0.0001
+        coordinator._handle_lane_input(
+            SimpleNamespace(data={"entity_id": f"sensor.cell_{index}"})
+        )
+    assert evaluations == []
+    assert len(timers) == 1
+
+    # The timer first fires inside the window of the last change.
+    deadline, action = timers.pop()
+    clock.now = deadline
+    action(None)
+    assert evaluations == []
+    deadline, action = timers.pop()
+    clock.now = deadline
+    action(None)
+    assert evaluations == [deadline]
+    assert coordinator.stop_state.level == LEVEL_LIMIT
+    assert coordinator._input_batch.pending is False
+
+
+def test_shutdown_input_bypasses_pending_batch(monkeypatch):
+    clock = FakeClock(100.0)
+    timers = []
+    evaluations = []
+    states = DictStates()
+    engine = RuleEngine(
+        [_cells_rule(3), _cells_rule(1, LEVEL_SHUTDOWN, rule_id="pack")]
+    )
+    coordinator = _coordinator(monkeypatch, engine, states, clock, timers, evaluations)
+
+    states.set("sensor.cell_2", 3.3)
+    coordinator._handle_lane_input(SimpleNamespace(data={"entity_id": "sensor.cell_2"}))
+    assert coordinator._input_batch.pending is True
+
+    # The shutdown input is evaluated right away, not with the batch.
+    clock.now = 100.005
+    states.set("sensor.cell_0", 3.7)
+    coordinator._handle_shutdown_input(
+        SimpleNamespace(data={"entity_id": "sensor.cell_0"})
+    )
+    assert evaluations == [100.005]
+    assert coordinator.stop_state.level == LEVEL_SHUTDOWN
+    assert coordinator._input_batch.pending is True
+    assert len(timers) == 1
+
+
+def test_burst_on_wide_shutdown_rule_evaluates_it_once(monkeypatch):
+    clock = FakeClock(100.0)
+    timers = []
+    evaluations = []
+    states = DictStates()
+    engine = RuleEngine([_cells_rule(500, LEVEL_SHUTDOWN)])
+    coordinator = _coordinator(monkeypatch, engine, states, clock, timers, evaluations)
+    coordinator._shutdown_batch = _shutdown_batch({})
+
+    for index in range(500):
+        states.set(f"sensor.cell_{index}", 3.3)
+        clock.now = 100.0 + index * 0.00001
+        coordinator._handle_shutdown_input(
+            SimpleNamespace(data={"entity_id": f"sensor.cell_{index}"})
+        )
+    # The whole burst fits the change cap: evaluated once when it is reached.
+    assert evaluations == [100.0 + 499 * 0.00001]
+    assert coordinator._shutdown_batch.pending is False
+    timers.clear()
+
+    for index in range(10):
+        states.set(f"sensor.cell_{index}", 3.7 if index == 9 else 3.3)
+        clock.now = 101.0 + index * 0.0004
+        coordinator._handle_shutdown_input(
+            SimpleNamespace(data={"entity_id": f"sensor.cell_{index}"})
+        )
+    assert len(evaluations) == 1
+    assert len(timers) == 1
+
+    # Flushed the shutdown latency after the first change, not after a quiet
+    # window.
+    deadline, action = timers.pop()
+    assert deadline == 101.005
+    clock.now = deadline
+    action(None)
+    assert evaluations[1:] == [deadline]
+    assert coordinator.stop_state.level == LEVEL_SHUTDOWN
+    assert coordinator._shutdown_batch.pending is False
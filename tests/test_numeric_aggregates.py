@@ -0,0 +1,167 @@
+import random
+
+import pytest
+
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+
+from custom_components.emergency_stop.const import LEVEL_LIMIT, LEVEL_NOTIFY
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine import selection
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+def _cells(*voltages):
+    return DictStates(
+        {f"sensor.cell_{index}": str(value) for index, value in enumerate(voltages, 1)}
+    )
+
+
+def _rule(aggregate, entities, **overrides):
+    values = dict(
+        rule_id="cells",
+        name="Cells",
+        entities=entities,
+        aggregate=aggregate,
+        thresholds=[0.1],
+        duration_seconds=1,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _evaluate(rule, states, seconds=2):
+    clock = FakeClock()
+    engine = RuleEngine([rule], clock=clock)
+    for second in range(1, seconds + 1):
+        clock.now = second
+        engine.evaluate(states)
+    return engine.states[rule.rule_id]
+
+
+def test_spread_names_both_extremes():
+    states = _cells(3.31, 3.45, 3.30, 3.29, 3.32)
+    state = _evaluate(_rule("spread", sorted(states)), states)
+
+    assert state.active is True
+    assert round(state.last_aggregate, 3) == 0.16
+    assert state.last_entity == "sensor.cell_2"
+    assert state.last_entity_low == "sensor.cell_4"
+    assert state.last_detail == (
+        "Cells: spread=0.160 gt 0.1 (max sensor.cell_2, min sensor.cell_4)"
+    )
+
+
+def test_spread_skips_invalid_cells():
+    states = _cells(3.31, 3.32)
+    states["sensor.cell_3"] = "unavailable"
+    state = _evaluate(_rule("spread", sorted(states)), states)
+
+    assert state.active is False
+    assert round(state.last_aggregate, 3) == 0.01
+
+
+def test_spread_semafor_detail_names_extremes():
+    states = _cells(3.30, 3.50, 3.10)
+    rule = _rule(
+        "spread",
+        sorted(states),
+        severity_mode="semafor",
+        direction="higher_is_worse",
+        levels={
+            LEVEL_NOTIFY: {"threshold": 0.1, "duration_seconds": 1},
+            LEVEL_LIMIT: {"threshold": 0.3, "duration_seconds": 1},
+        },
+    )
+    state = _evaluate(rule, states)
+
+    assert state.current_level == LEVEL_LIMIT
+    assert state.last_detail.endswith("(max sensor.cell_2, min sensor.cell_3)")
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 8, 101])
+def test_selection_matches_sorted_order(size):
+    rng = random.Random(size)
+    values = [(f"sensor.t_{index}", float(rng.randint(0, 20))) for index in range(size)]
+    ordered = sorted(value for _, value in values)
+    for k in range(size):
+        assert selection.kth_smallest(values, k)[1] == ordered[k]
+    expected_median = (ordered[(size - 1) // 2] + ordered[size // 2]) / 2
+    assert selection.median(values)[0] == expected_median
+
+
+def test_selection_without_numpy(monkeypatch):
+    monkeypatch.setattr(selection, "np", None)
+    values = [(f"sensor.t_{index}", float(100 - index)) for index in range(100)]
+    assert selection.kth_smallest(values, 0) == ("sensor.t_99", 1.0)
+    assert selection.median(values) == (50.5, None)
+
+
+def test_median_votes_out_a_faulty_sensor():
+    states = DictStates(
+        {"sensor.temp_a": "41.0", "sensor.temp_b": "120.0", "sensor.temp_c": "40.5"}
+    )
+    rule = _rule("median", sorted(states), thresholds=[80])
+    state = _evaluate(rule, states)
+
+    assert state.active is False
+    assert state.last_aggregate == 41.0
+    assert state.last_entity == "sensor.temp_a"
+
+
+def test_percentile_is_nearest_rank():
+    states = _cells(*range(1, 21))
+    rule = _rule("percentile", sorted(states), thresholds=[18], aggregate_parameter=95)
+    state = _evaluate(rule, states)
+
+    assert state.last_aggregate == 19
+    assert state.last_entity == "sensor.cell_19"
+    assert state.last_detail.startswith("Cells: p95=19.000")
+
+
+def test_count_above_two_out_of_three():
+    states = DictStates(
+        {"sensor.temp_a": "85", "sensor.temp_b": "20", "sensor.temp_c": "40"}
+    )
+    rule = _rule(
+        "count_above",
+        sorted(states),
+        condition="gte",
+        thresholds=[2],
+        aggregate_parameter=80,
+    )
+    state = _evaluate(rule, states)
+    assert state.last_aggregate == 1
+    assert state.active is False
+
+    states["sensor.temp_c"] = "90"
+    state = _evaluate(rule, states)
+    assert state.active is True
+    assert state.last_detail == "Cells: count_above_80=2.000 gte 2"
+
+
+def test_percentile_shorthand_and_missing_parameter():
+    raw = {
+        "rule_id": "cells",
+        "rule_name": "Cells",
+        "data_type": "numeric",
+        "entities": ["sensor.cell_1", "sensor.cell_2"],
+        "aggregate": "p90",
+        "condition": "gt",
+        "thresholds": [3.6],
+        "duration_seconds": 5,
+        "interval_seconds": 1,
+    }
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["aggregate"] == "percentile"
+    assert normalized[0]["aggregate_parameter"] == 90
+    assert load_rules({"rules": [raw]})[0].aggregate_parameter == 90
+
+    _, error = _normalize_import_rules([{**raw, "aggregate": "count_above"}])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules([{**raw, "aggregate": "p150"}])
+    assert error == "import_invalid_rule"
+
+    state = _evaluate(_rule("count_above", ["sensor.cell_1"]), _cells(3.3))
+    assert state.last_invalid_reason == "missing_aggregate_parameter"
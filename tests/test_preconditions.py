@@ -0,0 +1,240 @@
+from datetime import timedelta
+
+import pytest
+
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    LEVEL_SHUTDOWN,
+)
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.graph import CycleError, topological_order
+from custom_components.emergency_stop.engine.replay import StateChange, replay
+
+from helpers import DictStates, FakeClock, START, rule_config
+
+
+def _rule(rule_id, entity_id, **overrides):
+    values = dict(
+        rule_id=rule_id,
+        name=rule_id.title(),
+        entities=[entity_id],
+        thresholds=[60],
+        interval_seconds=10,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _raw(rule_id, **extra):
+    return {
+        "rule_id": rule_id,
+        "rule_name": rule_id.title(),
+        "data_type": "numeric",
+        "entities": [f"sensor.{rule_id}"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [60],
+        **extra,
+    }
+
+
+def test_topological_order_keeps_configured_order_for_ties():
+    assert topological_order({"c": {"a"}, "a": set(), "b": set()}) == ["a", "b", "c"]
+    assert topological_order({"a": {"b"}, "b": {"missing"}}) == ["b", "a"]
+    with pytest.raises(CycleError) as err:
+        topological_order({"a": {"b"}, "b": {"a"}, "c": set(), "d": {"a"}})
+    assert err.value.members == ["a", "b"]
+
+
+def test_entity_off_inhibits_and_resumes_immediately():
+    clock = FakeClock()
+    states = DictStates()
+    rule = _rule("current", "sensor.current", precondition_entities=("binary_sensor.charging",))
+    engine = RuleEngine([rule], clock=clock)
+    state = engine.states["current"]
+    states.set("sensor.current", 70)
+    states.set("binary_sensor.charging", "on")
+    clock.now = 10
+    engine.evaluate(states)
+    assert state.active is True
+
+    clock.now = 11
+    states.set("binary_sensor.charging", "off")
+    engine.evaluate(states)
+    assert state.active is False
+    assert state.inhibited_by == "binary_sensor.charging"
+    assert state.last_invalid_reason == "inhibited"
+
+    clock.now = 12
+    states.set("binary_sensor.charging", "on")
+    engine.evaluate(states)
+    assert state.inhibited_by is None
+    assert state.active is True
+    assert state.last_eval_monotonic == 12
+
+
+def test_unavailable_precondition_entity_does_not_inhibit():
+    states = DictStates()
+    rule = _rule("current", "sensor.current", precondition_entities=("binary_sensor.charging",))
+    clock = FakeClock()
+    engine = RuleEngine([rule], clock=clock)
+    states.set("sensor.current", 70)
+    clock.now = 10
+    engine.evaluate(states)
+    assert engine.states["current"].active is True
+    states.set("binary_sensor.charging", "unavailable")
+    engine.states["current"].last_eval_monotonic = None
+    engine.evaluate(states)
+    assert engine.states["current"].active is True
+
+
+def test_inactive_precondition_rule_skips_subtree_in_same_pass():
+    clock = FakeClock()
+    states = DictStates()
+    # Configured before their preconditions; evaluation order follows the graph.
+    leaf = _rule("leaf", "sensor.leaf", precondition_rules=("middle",))
+    middle = _rule("middle", "sensor.middle", precondition_rules=("root",))
+    root = _rule("root", "sensor.root")
+    engine = RuleEngine([leaf, middle, root], clock=clock)
+    for entity_id in ("sensor.leaf", "sensor.middle", "sensor.root"):
+        states.set(entity_id, 70)
+    clock.now = 10
+    engine.evaluate(states)
+    assert all(engine.states[rule_id].active for rule_id in ("root", "middle", "leaf"))
+
+    clock.now = 20
+    states.set("sensor.root", 50)
+    engine.evaluate(states)
+    assert engine.states["root"].active is False
+    assert engine.states["middle"].inhibited_by == "root"
+    assert engine.states["leaf"].inhibited_by == "middle"
+    assert engine.states["leaf"].active is False
+
+
+def test_precondition_flip_wakes_dependent_behind_the_cursor():
+    clock = FakeClock()
+    states = DictStates()
+    guard = _rule("guard", "sensor.guard", level=LEVEL_SHUTDOWN)
+    pump = _rule(
+        "pump",
+        "sensor.pump",
+        level=LEVEL_LIMIT,
+        interval_seconds=60,
+        precondition_rules=("guard",),
+    )
+    fillers = [
+        _rule(f"fill{index}", f"sensor.fill{index}", level=LEVEL_NOTIFY)
+        for index in range(3)
+    ]
+    engine = RuleEngine([guard, pump, *fillers], clock=clock)
+    for entity_id in ("sensor.guard", "sensor.pump"):
+        states.set(entity_id, 70)
+    for index in range(3):
+        states.set(f"sensor.fill{index}", 10)
+    for state in engine.states.values():
+        state.last_eval_monotonic = None
+    clock.now = 10
+    engine.evaluate(states)
+    assert engine.states["pump"].active is True
+
+    # A sliced pass over the lower lanes stops past the pump.
+    clock.tick = 1.0
+    assert engine.evaluate(states, (LEVEL_LIMIT, LEVEL_NOTIFY), budget=1.5) is False
+
+    # The guard drops in a shutdown-lane pass meanwhile.
+    clock.tick = 0.0
+    states.set("sensor.guard", 50)
+    engine.wake("sensor.guard", LEVEL_SHUTDOWN)
+    engine.evaluate(states, (LEVEL_SHUTDOWN,))
+    assert engine.states["guard"].active is False
+
+    # The resumed slice re-evaluates the pump although its interval runs.
+    engine.evaluate(states, (LEVEL_LIMIT, LEVEL_NOTIFY), budget=1.5)
+    assert engine.states["pump"].inhibited_by == "guard"
+    assert engine.states["pump"].active is False
+
+
+def test_latched_rule_keeps_latch_while_inhibited():
+    clock = FakeClock()
+    states = DictStates()
+    rule = _rule(
+        "current",
+        "sensor.current",
+        latched=True,
+        precondition_entities=("input_boolean.mode",),
+    )
+    engine = RuleEngine([rule], clock=clock)
+    states.set("sensor.current", 70)
+    clock.now = 10
+    engine.evaluate(states)
+    clock.now = 11
+    states.set("input_boolean.mode", "off")
+    engine.evaluate(states)
+    assert engine.states["current"].inhibited_by == "input_boolean.mode"
+    assert engine.states["current"].active is True
+
+
+def test_load_rules_drops_unknown_and_cyclic_preconditions():
+    rules = load_rules(
+        {
+            "rules": [
+                _raw("a", precondition_rules=["b"]),
+                _raw("b", precondition_rules=["a"]),
+                _raw("c", precondition_rules=["a", "missing"]),
+                _raw("d", precondition_entities=["binary_sensor.mode"]),
+            ]
+        }
+    )
+    by_id = {rule.rule_id: rule for rule in rules}
+    assert by_id["a"].precondition_rules == ()
+    assert by_id["b"].precondition_rules == ()
+    assert by_id["c"].precondition_rules == ("a",)
+    assert by_id["d"].precondition_entities == ("binary_sensor.mode",)
+    assert by_id["d"].watched_entities == ["sensor.d", "binary_sensor.mode"]
+
+
+def test_replay_follows_precondition_entity():
+    rule = _rule(
+        "current",
+        "sensor.current",
+        interval_seconds=5,
+        precondition_entities=("binary_sensor.charging",),
+    )
+    changes = [
+        StateChange(START, "binary_sensor.charging", "off"),
+        StateChange(START, "sensor.current", "70"),
+        StateChange(START + timedelta(seconds=30), "binary_sensor.charging", "on"),
+        StateChange(START + timedelta(seconds=60), "binary_sensor.charging", "off"),
+    ]
+    transitions = list(replay([rule], changes, START + timedelta(seconds=90)))
+    assert [t.kind for t in transitions] == ["activated", "cleared"]
+    assert transitions[0].when == START + timedelta(seconds=30)
+    assert transitions[1].when == START + timedelta(seconds=60)
+
+
+def test_import_validates_precondition_rules():
+    normalized, error = _normalize_import_rules(
+        [
+            _raw("a"),
+            _raw(
+                "b",
+                precondition_rules=["a"],
+                precondition_entities=["binary_sensor.mode"],
+            ),
+        ]
+    )
+    assert error is None
+    assert "precondition_rules" not in normalized[0]
+    assert normalized[1]["precondition_rules"] == ["a"]
+    assert normalized[1]["precondition_entities"] == ["binary_sensor.mode"]
+
+    _, error = _normalize_import_rules([_raw("a", precondition_rules=["missing"])])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules([_raw("a", precondition_rules=["a"])])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules(
+        [_raw("a", precondition_rules=["b"]), _raw("b", precondition_rules=["a"])]
+    )
+    assert error == "import_invalid_rule"
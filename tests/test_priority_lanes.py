@@ -0,0 +1,155 @@
+from types import SimpleNamespace
+
+from custom_components.emergency_stop.const import (
+    DATA_TYPE_COMPOSITE,
+    LEVEL_LIMIT,
+    LEVEL_NORMAL,
+    LEVEL_NOTIFY,
+    LEVEL_SHUTDOWN,
+    SEVERITY_MODE_SEMAFOR,
+)
+from custom_components.emergency_stop.coordinator import (
+    EmergencyStopCoordinator,
+    EmergencyStopState,
+    RuleEngine as HassRuleEngine,
+)
+from custom_components.emergency_stop.engine import RuleEngine
+from custom_components.emergency_stop.engine.lanes import assign_lanes
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+def _rule(rule_id, level=LEVEL_NOTIFY, **overrides):
+    values = dict(
+        rule_id=rule_id,
+        thresholds=[50],
+        duration_seconds=1,
+        level=level,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _rules():
+    return [
+        _rule("humidity"),
+        _rule("cabinet", LEVEL_LIMIT),
+        _rule("smoke"),
+        _rule(
+            "fire",
+            LEVEL_SHUTDOWN,
+            data_type=DATA_TYPE_COMPOSITE,
+            entities=[],
+            aggregate="any",
+            condition="is_on",
+            thresholds=[],
+            source_rules=("smoke",),
+        ),
+        _rule(
+            "cells",
+            severity_mode=SEVERITY_MODE_SEMAFOR,
+            direction="higher_is_worse",
+            condition=None,
+            thresholds=[],
+            levels={
+                "warn": {
+                    "threshold": 3.5,
+                    "duration_seconds": 1,
+                    "stop_level": LEVEL_NOTIFY,
+                },
+                "trip": {
+                    "threshold": 3.7,
+                    "duration_seconds": 1,
+                    "stop_level": LEVEL_SHUTDOWN,
+                },
+            },
+        ),
+    ]
+
+
+def test_lanes_follow_levels_and_dependents():
+    lanes = assign_lanes(
+        ["a", "b", "c"],
+        {"a": [LEVEL_NOTIFY], "b": [LEVEL_LIMIT], "c": [LEVEL_SHUTDOWN, None]},
+        {"b": {"a"}, "c": {"b"}},
+    )
+    assert lanes == {"a": LEVEL_SHUTDOWN, "b": LEVEL_SHUTDOWN, "c": LEVEL_SHUTDOWN}
+
+    engine = RuleEngine(_rules(), clock=FakeClock(10.0))
+    shutdown_lane = [rule.rule_id for rule in engine.lane_rules(LEVEL_SHUTDOWN)]
+    assert sorted(shutdown_lane) == ["cells", "fire", "smoke"]
+    assert shutdown_lane.index("smoke") < shutdown_lane.index("fire")
+    assert engine.lane_of("cabinet") == LEVEL_LIMIT
+    assert engine.lane_of("humidity") == LEVEL_NOTIFY
+    assert [rule.rule_id for rule in engine.rules] == [
+        "humidity",
+        "cabinet",
+        "smoke",
+        "fire",
+        "cells",
+    ]
+
+
+def test_evaluate_one_lane_and_wake_by_entity():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    engine = RuleEngine(_rules(), clock=clock)
+    for entity_id in ("sensor.humidity", "sensor.cabinet", "sensor.smoke"):
+        states.set(entity_id, 10)
+    states.set("sensor.cells", 3.4)
+    engine.evaluate(states, (LEVEL_SHUTDOWN,))
+    assert engine.states["smoke"].last_aggregate == 10
+    assert engine.states["humidity"].last_aggregate is None
+
+    engine.evaluate(states)
+    assert engine.states["humidity"].last_aggregate == 10
+
+    # Inside the interval, only a woken rule of the lane runs again.
+    states.set("sensor.smoke", 80)
+    states.set("sensor.humidity", 80)
+    assert engine.wake("sensor.smoke", LEVEL_SHUTDOWN) is True
+    assert engine.wake("sensor.humidity", LEVEL_SHUTDOWN) is False
+    engine.evaluate(states)
+    assert engine.states["smoke"].last_aggregate == 80
+    assert engine.states["smoke"].violation_started_at == 10
+    assert engine.states["humidity"].last_aggregate == 10
+
+
+def test_shutdown_input_publishes_without_lower_lanes(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        EmergencyStopCoordinator,
+        "async_update_listeners",
+        lambda self: published.append(self.stop_state.level),
+    )
+    states = DictStates()
+    rules = [_rule("humidity"), _rule("pack", LEVEL_SHUTDOWN, duration_seconds=0)]
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator.hass = SimpleNamespace(states=states)
+    coordinator._rule_engine = HassRuleEngine(rules)
+    coordinator._simulation = None
+    coordinator._acknowledged = False
+    coordinator._lane_over_budget = False
+    coordinator._input_batch = None
+    coordinator._batch_cancel = None
+    coordinator._shutdown_batch = None
+    coordinator._shutdown_batch_cancel = None
+    coordinator._watchdog_events = []
+    coordinator._stop_state = EmergencyStopState(level=LEVEL_NORMAL)
+
+    states.set("sensor.humidity", 80)
+    states.set("sensor.pack", 20)
+    coordinator._handle_shutdown_input(SimpleNamespace(data={"entity_id": "sensor.pack"}))
+    assert published == []
+
+    states.set("sensor.pack", 80)
+    coordinator._handle_shutdown_input(SimpleNamespace(data={"entity_id": "sensor.pack"}))
+    assert published == [LEVEL_SHUTDOWN]
+    assert coordinator.stop_state.active is True
+    assert coordinator.rule_lane("pack") == LEVEL_SHUTDOWN
+    assert coordinator.rule_states["humidity"].last_aggregate is None
+
+    coordinator._handle_shutdown_input(
+        SimpleNamespace(data={"entity_id": "sensor.humidity"})
+    )
+    assert published == [LEVEL_SHUTDOWN]
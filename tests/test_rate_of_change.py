@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta, timezone
+import math
+
+import pytest
+
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+from custom_components.emergency_stop.const import (
+    INPUT_MODE_RATE,
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    WINDOW_MAX,
+)
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.rate import RateOfChange
+from custom_components.emergency_stop.engine.replay import StateChange, replay
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+def _rule(rate_smoothing_seconds=0, **overrides):
+    values = dict(
+        rule_id="cell_temp",
+        name="Cell temperature",
+        entities=["sensor.cell_temp"],
+        thresholds=[0.5],
+        duration_seconds=1,
+        input_mode=INPUT_MODE_RATE,
+        rate_smoothing_seconds=rate_smoothing_seconds,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def test_rate_is_zero_until_second_sample():
+    rate = RateOfChange(0)
+    assert rate.add(0, 20) == 0.0
+    assert rate.add(2, 24) == pytest.approx(2.0)
+    assert rate.add(2, 30) == pytest.approx(2.0)
+
+
+def test_rate_smoothing_weights_by_elapsed_time():
+    rate = RateOfChange(10)
+    rate.add(0, 0)
+    assert rate.add(1, 1) == pytest.approx(1.0)
+    # One 5 s step and five 1 s steps of zero slope decay the same amount.
+    coarse = rate.add(6, 1)
+    fine = RateOfChange(10)
+    fine.add(0, 0)
+    fine.add(1, 1)
+    for second in range(2, 7):
+        value = fine.add(second, 1)
+    assert coarse == pytest.approx(math.exp(-0.5))
+    assert value == pytest.approx(coarse)
+
+
+def test_rising_temperature_trips_before_absolute_threshold():
+    clock = FakeClock()
+    states = DictStates({"sensor.cell_temp": "30"})
+    engine = RuleEngine([_rule(rate_smoothing_seconds=2)], clock=clock)
+    state = engine.states["cell_temp"]
+
+    for second in range(1, 6):
+        clock.now = second
+        engine.evaluate(states)
+    assert state.active is False
+
+    for second in range(6, 12):
+        clock.now = second
+        states["sensor.cell_temp"] = str(30 + (second - 5))
+        engine.evaluate(states)
+    assert state.active is True
+    assert state.last_detail.startswith("Cell temperature: rate(max)=")
+
+
+def test_falling_rate_with_lt_condition():
+    clock = FakeClock()
+    states = DictStates({"sensor.cell_temp": "100"})
+    engine = RuleEngine(
+        [_rule(condition="lt", thresholds=[-2], unknown_handling="ignore")], clock=clock
+    )
+    for second, value in ((1, "100"), (2, "97"), (3, "94")):
+        clock.now = second
+        states["sensor.cell_temp"] = value
+        engine.evaluate(states)
+    assert engine.states["cell_temp"].last_aggregate == pytest.approx(-3)
+    assert engine.states["cell_temp"].active is True
+
+
+def test_semafor_levels_classify_rate():
+    clock = FakeClock()
+    states = DictStates({"sensor.cell_temp": "20"})
+    rule = _rule(
+        severity_mode="semafor",
+        direction="higher_is_worse",
+        levels={
+            LEVEL_NOTIFY: {"threshold": 0.5, "duration_seconds": 1},
+            LEVEL_LIMIT: {"threshold": 2, "duration_seconds": 1},
+        },
+    )
+    engine = RuleEngine([rule], clock=clock)
+    for second in range(1, 5):
+        clock.now = second
+        states["sensor.cell_temp"] = str(20 + second)
+        engine.evaluate(states)
+    assert engine.states["cell_temp"].current_level == LEVEL_NOTIFY
+
+
+def test_window_applies_to_rate():
+    clock = FakeClock()
+    states = DictStates({"sensor.cell_temp": "20"})
+    rule = _rule(thresholds=[100], window_function=WINDOW_MAX, window_seconds=10)
+    engine = RuleEngine([rule], clock=clock)
+    for second, value in ((1, "20"), (2, "25"), (3, "25"), (4, "25")):
+        clock.now = second
+        states["sensor.cell_temp"] = value
+        engine.evaluate(states)
+    assert engine.states["cell_temp"].last_aggregate == pytest.approx(5)
+    assert engine.states["cell_temp"].last_detail.startswith(
+        "Cell temperature: max_10s(rate(max))="
+    )
+
+
+def test_replay_clears_rate_rule_after_input_stops():
+    rule = _rule(rate_smoothing_seconds=2, thresholds=[1])
+    start = datetime(2026, 2, 2, tzinfo=timezone.utc)
+    changes = [
+        StateChange(start + timedelta(seconds=second), "sensor.cell_temp", str(value))
+        for second, value in ((0, 20), (1, 23), (2, 26), (3, 29))
+    ]
+    transitions = [t.kind for t in replay([rule], changes)]
+    assert transitions == ["activated", "cleared"]
+
+
+def test_load_rules_and_import_keep_rate_settings():
+    raw = {
+        "rule_id": "cell_temp",
+        "rule_name": "Cell temperature",
+        "data_type": "numeric",
+        "entities": ["sensor.cell_temp"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [0.5],
+        "duration_seconds": 5,
+        "interval_seconds": 1,
+        "input_mode": "rate",
+        "rate_smoothing_seconds": 0,
+    }
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["input_mode"] == "rate"
+    assert normalized[0]["rate_smoothing_seconds"] == 0
+
+    rule = load_rules({"rules": normalized})[0]
+    assert rule.has_rate is True
+    assert rule.rate_smoothing_seconds == 0
+
+    _, error = _normalize_import_rules([{**raw, "input_mode": "jerk"}])
+    assert error == "import_invalid_rule"
@@ -18,6 +18,9 @@ class DummyCoordinator:
     def async_add_listener(self, update_callback):
         return lambda: None
 
+    def rule_lane(self, rule_id):
+        return "notify"
+
 
 def test_rule_binary_sensor_attributes():
     rule = RuleConfig(
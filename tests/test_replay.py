@@ -0,0 +1,97 @@
+import json
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from custom_components.emergency_stop.engine.__main__ import main
+from custom_components.emergency_stop.engine.replay import (
+    iter_ndjson_changes,
+    load_rule_export,
+    replay,
+)
+
+RULES = [
+    {
+        "rule_id": "voltage",
+        "rule_name": "Voltage",
+        "data_type": "numeric",
+        "entities": ["sensor.voltage"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [3.5],
+        "duration_seconds": 5,
+        "interval_seconds": 1,
+        "level": "limit",
+        "latched": False,
+    }
+]
+
+STATES = [
+    '{"entity_id": "sensor.voltage", "state": "3.2", "last_updated": "2026-02-02T10:00:00+00:00"}',
+    "",
+    '{"entity_id": "sensor.voltage", "state": "3.7", "last_updated": "2026-02-02T10:00:10+00:00"}',
+    '{"event_type": "state_changed", "time_fired": "2026-02-02T12:00:00Z",'
+    ' "data": {"new_state": {"entity_id": "sensor.voltage", "state": "3.1"}}}',
+]
+
+
+def _write_rules(tmp_path):
+    path = tmp_path / "emergency_stop_rules_entry_20260202T100000Z.json"
+    path.write_text(json.dumps({"version": 1, "rules": RULES}), encoding="utf-8")
+    return path
+
+
+def test_replay_reports_activation_after_duration_and_clear(tmp_path):
+    rules = load_rule_export(_write_rules(tmp_path))
+
+    transitions = list(replay(rules, iter_ndjson_changes(STATES)))
+
+    assert [(t.kind, t.when.isoformat()) for t in transitions] == [
+        ("activated", "2026-02-02T10:00:15+00:00"),
+        ("cleared", "2026-02-02T12:00:00+00:00"),
+    ]
+    assert transitions[0].level == "limit"
+    assert transitions[0].value == 3.7
+
+
+def test_replay_stops_at_until(tmp_path):
+    rules = load_rule_export(_write_rules(tmp_path))
+    until = datetime(2026, 2, 2, 10, 0, 12, tzinfo=timezone.utc)
+
+    assert list(replay(rules, iter_ndjson_changes(STATES), until)) == []
+
+
+def test_cli_writes_transitions_as_ndjson(tmp_path, capsys):
+    states_path = tmp_path / "states.ndjson"
+    states_path.write_text("\n".join(STATES), encoding="utf-8")
+
+    assert main(["replay", str(_write_rules(tmp_path)), str(states_path)]) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["event"] for line in lines] == ["activated", "cleared"]
+
+
+def test_cli_reports_invalid_line(tmp_path, capsys):
+    states_path = tmp_path / "states.ndjson"
+    states_path.write_text('{"entity_id": "sensor.voltage", "state": "1"}\n')
+
+    assert main(["replay", str(_write_rules(tmp_path)), str(states_path)]) == 1
+    assert "line 1: missing timestamp" in capsys.readouterr().err
+
+
+def test_engine_imports_without_home_assistant():
+    # A fresh interpreter: the test session itself has Home Assistant loaded.
+    code = (
+        "import sys\n"
+        "import custom_components.emergency_stop.engine.__main__\n"
+        "loaded = [name for name in sys.modules if name.split('.')[0] == 'homeassistant']\n"
+        "assert not loaded, loaded\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
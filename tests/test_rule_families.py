@@ -0,0 +1,259 @@
+from dataclasses import replace
+from datetime import timedelta
+
+from custom_components.emergency_stop.config_flow import (
+    _build_rule_config,
+    _normalize_import_rules,
+)
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    LEVEL_SHUTDOWN,
+    SEVERITY_MODE_SEMAFOR,
+)
+from custom_components.emergency_stop.coordinator import _build_stop_state
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.replay import Replayer, StateChange
+from custom_components.emergency_stop.engine.selectors import EntityInfo, SelectorIndex
+
+from helpers import DictStates, FakeClock, START, rule_config
+
+GLOB = "sensor.pack_*_cell_*_voltage"
+
+
+def _cell(pack, cell, **extra):
+    return EntityInfo(f"sensor.pack_{pack}_cell_{cell}_voltage", **extra)
+
+
+def _rule(**overrides):
+    values = dict(
+        rule_id="cells",
+        name="Cells",
+        entities=[],
+        thresholds=[3.6],
+        duration_seconds=5,
+        level=LEVEL_LIMIT,
+        selectors=(GLOB,),
+        group_by="capture",
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _family(index, rule, clock):
+    return RuleEngine(index.expand([rule]), clock=clock)
+
+
+def _run(engine, clock, states, seconds):
+    for second in seconds:
+        clock.now = second
+        engine.evaluate(states)
+
+
+def test_expand_groups_by_capture_and_device():
+    index = SelectorIndex(
+        [
+            _cell(10, 1, device_id="d10", device_name="Pack 10"),
+            _cell(2, 1, device_id="d2"),
+            _cell(2, 2, device_id="d2"),
+            EntityInfo("sensor.pack_2_current", device_id="d2"),
+        ]
+    )
+    (rule,) = index.expand([_rule()])
+    assert rule.groups == (
+        ("2", ("sensor.pack_2_cell_1_voltage", "sensor.pack_2_cell_2_voltage")),
+        ("10", ("sensor.pack_10_cell_1_voltage",)),
+    )
+    (rule,) = index.expand(
+        [_rule(group_by="device", entities=["sensor.pack_2_current", "sensor.other"])]
+    )
+    assert [key for key, _ in rule.groups] == ["d2", "d10", "sensor.other"]
+    assert rule.group_names == (("d10", "Pack 10"),)
+    assert dict(rule.groups)["d2"] == (
+        "sensor.pack_2_current",
+        "sensor.pack_2_cell_1_voltage",
+        "sensor.pack_2_cell_2_voltage",
+    )
+
+
+def test_renamed_device_keeps_its_group():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    states.set("sensor.pack_1_cell_1_voltage", 3.7)
+    index = SelectorIndex([_cell(1, 1, device_id="d1", device_name="Pack A")])
+    configured = [_rule(group_by="device")]
+    engine = _family(index, configured[0], clock)
+    _run(engine, clock, states, [10, 16])
+    assert engine.group_states("cells")["d1"].active is True
+    assert engine.states["cells"].groups["d1"]["name"] == "Pack A"
+
+    index.update(_cell(1, 1, device_id="d1", device_name="Pack B"))
+    changes = engine.update_rules(index.expand(configured))
+    assert changes.changed == []
+    assert engine.group_states("cells")["d1"].active is True
+    (rule,) = engine.rules
+    assert rule.group_name("d1") == "Pack B"
+
+
+def test_each_group_has_its_own_timer():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    index = SelectorIndex([_cell(1, 1), _cell(2, 1)])
+    engine = _family(index, _rule(), clock)
+    states.set("sensor.pack_1_cell_1_voltage", 3.7)
+    states.set("sensor.pack_2_cell_1_voltage", 3.3)
+    _run(engine, clock, states, [10, 11, 12, 13])
+    # The violation moves to the other pack: its timer starts from zero.
+    states.set("sensor.pack_1_cell_1_voltage", 3.3)
+    states.set("sensor.pack_2_cell_1_voltage", 3.7)
+    _run(engine, clock, states, [14, 15, 16, 17, 18])
+    state = engine.states["cells"]
+    assert state.active is False
+    assert state.last_group == "2"
+    assert state.last_entity == "sensor.pack_2_cell_1_voltage"
+
+    _run(engine, clock, states, [19])
+    assert state.active is True
+    assert state.groups["2"]["active"] is True
+    assert state.groups["1"]["active"] is False
+
+    stop_state = _build_stop_state(engine.rules, engine.states, False)
+    assert stop_state.level == LEVEL_LIMIT
+    assert [event["group"] for event in stop_state.active_events] == ["2"]
+
+
+def test_replay_wakes_for_a_group_timer_while_another_group_is_active():
+    index = SelectorIndex([_cell(1, 1), _cell(2, 1)])
+    replayer = Replayer(index.expand([_rule()]), START)
+    for second, pack, value in ((0, 1, "3.7"), (0, 2, "3.3"), (10, 2, "3.7")):
+        replayer.feed(
+            StateChange(
+                START + timedelta(seconds=second),
+                f"sensor.pack_{pack}_cell_1_voltage",
+                value,
+            )
+        )
+    replayer.finish(START + timedelta(seconds=20))
+
+    # Pack 2 trips when its own timer runs out, with no input change then.
+    groups = replayer.engine.group_states("cells")
+    assert groups["1"].active is True
+    assert groups["2"].active is True
+    assert groups["2"].active_since == (START + timedelta(seconds=15)).isoformat()
+
+
+def test_semafor_family_takes_the_worst_group_level():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    index = SelectorIndex([_cell(1, 1), _cell(2, 1)])
+    rule = _rule(
+        severity_mode=SEVERITY_MODE_SEMAFOR,
+        direction="higher_is_worse",
+        condition=None,
+        thresholds=[],
+        levels={
+            LEVEL_NOTIFY: {"threshold": 3.5, "duration_seconds": 1},
+            LEVEL_SHUTDOWN: {"threshold": 3.7, "duration_seconds": 1},
+        },
+    )
+    engine = _family(index, rule, clock)
+    states.set("sensor.pack_1_cell_1_voltage", 3.55)
+    states.set("sensor.pack_2_cell_1_voltage", 3.75)
+    _run(engine, clock, states, [10, 11])
+    state = engine.states["cells"]
+    assert state.current_level == LEVEL_SHUTDOWN
+    assert state.active_levels == [LEVEL_NOTIFY, LEVEL_SHUTDOWN]
+    assert state.groups["1"]["level"] == LEVEL_NOTIFY
+    assert state.last_group == "2"
+
+
+def test_new_group_keeps_state_of_existing_groups_and_restores():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    index = SelectorIndex([_cell(1, 1)])
+    configured = [_rule(latched=True, duration_seconds=1)]
+    engine = RuleEngine(index.expand(configured), clock=clock)
+    states.set("sensor.pack_1_cell_1_voltage", 3.7)
+    _run(engine, clock, states, [10, 11])
+    assert engine.group_states("cells")["1"].active is True
+
+    index.update(_cell(2, 1))
+    changes = engine.update_rules(index.expand(configured))
+    assert [rule.rule_id for rule in changes.members] == ["cells"]
+    groups = engine.group_states("cells")
+    assert groups["1"].active is True
+    assert groups["2"].active is False
+
+    data = engine.export_runtime(clock.now, 1000.0)
+    restored = RuleEngine(engine.rules, clock=clock)
+    restored.restore_runtime(data, clock.now, 1000.0)
+    assert restored.group_states("cells")["1"].active is True
+    assert restored.group_states("cells")["2"].active is False
+
+
+def test_latch_restores_when_members_changed_during_restart():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    states.set("sensor.pack_1_cell_1_voltage", 3.7)
+    configured = [_rule(group_by=None, latched=True, duration_seconds=1)]
+    engine = RuleEngine(SelectorIndex([_cell(1, 1)]).expand(configured), clock=clock)
+    _run(engine, clock, states, [10, 11])
+    assert engine.states["cells"].active is True
+    data = engine.export_runtime(clock.now, 1000.0)
+
+    # A pack joined while Home Assistant was down.
+    index = SelectorIndex([_cell(1, 1), _cell(2, 1)])
+    restored = _family(index, configured[0], clock)
+    assert restored.restore_runtime(data, clock.now, 1000.0) == 1
+    assert restored.states["cells"].active is True
+
+    # A changed threshold still discards the stored state.
+    changed = _family(index, replace(configured[0], thresholds=[3.8]), clock)
+    assert changed.restore_runtime(data, clock.now, 1000.0) == 0
+    assert changed.states["cells"].active is False
+
+
+def test_load_import_and_build_group_by():
+    raw = {
+        "rule_id": "cells",
+        "rule_name": "Cells",
+        "data_type": "numeric",
+        "entities": [],
+        "selectors": [GLOB],
+        "group_by": "capture",
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [3.6],
+    }
+    rules = load_rules({"rules": [raw, {**raw, "rule_id": "odd", "group_by": "room"}]})
+    assert [rule.group_by for rule in rules] == ["capture", None]
+
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["group_by"] == "capture"
+    _, error = _normalize_import_rules([{**raw, "selectors": ["label:bms"]}])
+    assert error == "import_invalid_rule"
+
+    rule = _build_rule_config(
+        {
+            "rule_name": "Cells",
+            "data_type": "numeric",
+            "entities": ["sensor.a"],
+            "group_by": "device",
+            "aggregate": "max",
+        },
+        {"condition": "gt", "threshold": 3.6},
+        [],
+    )
+    assert rule["group_by"] == "device"
+    rule = _build_rule_config(
+        {
+            "rule_name": "Cells",
+            "data_type": "numeric",
+            "entities": ["sensor.a"],
+            "aggregate": "max",
+        },
+        {"condition": "gt", "threshold": 3.6},
+        [],
+    )
+    assert "group_by" not in rule
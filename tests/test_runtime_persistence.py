@@ -0,0 +1,158 @@
+import asyncio
+from types import SimpleNamespace
+
+from custom_components.emergency_stop.coordinator import (
+    EmergencyStopCoordinator,
+    RuleEngine,
+    RuleRuntimeState,
+)
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    LEVEL_SHUTDOWN,
+)
+
+from helpers import rule_config
+
+
+def _rule(rule_id="rule_1", threshold=3.5, severity_mode="simple", levels=None):
+    return rule_config(
+        rule_id=rule_id,
+        name="Rule 1",
+        entities=["sensor.voltage"],
+        thresholds=[threshold],
+        duration_seconds=10,
+        latched=True,
+        severity_mode=severity_mode,
+        direction="higher_is_worse" if severity_mode == "semafor" else None,
+        levels=levels or {},
+    )
+
+
+class FakeStore:
+    def __init__(self, data=None):
+        self.data = data
+        self.delay_calls = []
+
+    async def async_load(self):
+        return self.data
+
+    def async_delay_save(self, data_func, delay=0):
+        self.delay_calls.append((data_func, delay))
+
+
+def test_export_and_restore_round_trip_shifts_monotonic_stamps():
+    rule = _rule()
+    engine = RuleEngine([rule])
+    state = engine.states[rule.rule_id]
+    state.active = True
+    state.active_since = "2026-02-02T10:00:00+00:00"
+    state.violation_started_at = 90.0
+
+    exported = engine.export_runtime(now_monotonic=100.0, now_wall=1_000.0)
+    assert exported[rule.rule_id]["violation_started_at"] == 990.0
+
+    restored_engine = RuleEngine([_rule()])
+    restored = restored_engine.restore_runtime(
+        exported, now_monotonic=5.0, now_wall=1_030.0
+    )
+    restored_state = restored_engine.states[rule.rule_id]
+
+    assert restored == 1
+    assert restored_state.active is True
+    assert restored_state.active_since == "2026-02-02T10:00:00+00:00"
+    assert restored_state.violation_started_at == -35.0
+
+
+def test_restore_skips_rules_with_changed_config():
+    engine = RuleEngine([_rule(threshold=3.5)])
+    engine.states["rule_1"].active = True
+    exported = engine.export_runtime(now_monotonic=0.0, now_wall=0.0)
+
+    changed = RuleEngine([_rule(threshold=3.7)])
+    assert changed.restore_runtime(exported, 0.0, 0.0) == 0
+    assert changed.states["rule_1"].active is False
+
+
+def test_restore_semafor_drops_unknown_levels():
+    levels = {
+        LEVEL_NOTIFY: {"threshold": 3.5, "duration_seconds": 1},
+        LEVEL_SHUTDOWN: {"threshold": 3.8, "duration_seconds": 1},
+    }
+    rule = _rule(severity_mode="semafor", levels=levels)
+    engine = RuleEngine([rule])
+    exported = engine.export_runtime(0.0, 0.0)
+    exported[rule.rule_id].update(
+        {
+            "current_level": LEVEL_SHUTDOWN,
+            "latched_level": LEVEL_SHUTDOWN,
+            "active_levels": [LEVEL_LIMIT, LEVEL_SHUTDOWN],
+            "level_active_since": {
+                LEVEL_LIMIT: "2026-02-02T10:00:00+00:00",
+                LEVEL_SHUTDOWN: "2026-02-02T10:00:05+00:00",
+            },
+        }
+    )
+
+    engine.restore_runtime(exported, 0.0, 0.0)
+    state = engine.states[rule.rule_id]
+
+    assert state.active is True
+    assert state.latched_level == LEVEL_SHUTDOWN
+    assert state.active_levels == [LEVEL_SHUTDOWN]
+    assert LEVEL_LIMIT not in state.level_active_since
+
+
+def test_runtime_save_is_scheduled_only_when_signature_changes():
+    coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+    coordinator._rule_engine = RuleEngine([_rule()])
+    coordinator._acknowledged = False
+    coordinator._store = FakeStore()
+    coordinator._persist_signature = None
+
+    coordinator._schedule_runtime_save()
+    coordinator._schedule_runtime_save()
+    assert len(coordinator._store.delay_calls) == 1
+
+    coordinator._rule_engine.states["rule_1"].last_aggregate = 3.1
+    coordinator._schedule_runtime_save()
+    assert len(coordinator._store.delay_calls) == 1
+
+    coordinator._rule_engine.states["rule_1"].active = True
+    coordinator._schedule_runtime_save()
+    assert len(coordinator._store.delay_calls) == 2
+
+    data_func, _ = coordinator._store.delay_calls[-1]
+    assert data_func()["rules"]["rule_1"]["active"] is True
+
+
+def test_restore_runtime_sets_acknowledged_and_stop_state():
+    async def run():
+        engine = RuleEngine([_rule()])
+        engine.states["rule_1"] = RuleRuntimeState(
+            active=True, active_since="2026-02-02T10:00:00+00:00"
+        )
+        stored = {
+            "acknowledged": True,
+            "rules": engine.export_runtime(0.0, 0.0),
+        }
+
+        coordinator = EmergencyStopCoordinator.__new__(EmergencyStopCoordinator)
+        coordinator._rule_engine = RuleEngine([_rule()])
+        coordinator._acknowledged = False
+        coordinator._store = FakeStore(stored)
+        coordinator._persist_signature = None
+        coordinator._last_email_active = False
+        coordinator.entry = SimpleNamespace(entry_id="entry_1")
+
+        await coordinator._async_restore_runtime()
+
+        assert coordinator._acknowledged is True
+        assert coordinator.stop_state.active is True
+        assert coordinator.stop_state.level == LEVEL_SHUTDOWN
+        assert coordinator._last_email_active is True
+
+        coordinator._schedule_runtime_save()
+        assert coordinator._store.delay_calls == []
+
+    asyncio.run(run())
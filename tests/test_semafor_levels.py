@@ -0,0 +1,154 @@
+from custom_components.emergency_stop.config_flow import (
+    _build_rule_config,
+    _normalize_import_rules,
+    _seed_rule_context,
+)
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    LEVEL_SHUTDOWN,
+    SEVERITY_MODE_SEMAFOR,
+)
+from custom_components.emergency_stop.coordinator import _build_stop_state
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.ladder import build_ladder
+
+from helpers import DictStates, FakeClock, rule_config
+
+LEVELS = {
+    "warn": {"threshold": 3.5, "duration_seconds": 1, "stop_level": LEVEL_NOTIFY},
+    "derate_25": {"threshold": 3.55, "duration_seconds": 2, "stop_level": LEVEL_LIMIT},
+    "derate_50": {
+        "threshold": 3.6,
+        "duration_seconds": 2,
+        "clear_threshold": 3.52,
+        "stop_level": LEVEL_LIMIT,
+    },
+    LEVEL_SHUTDOWN: {"threshold": 3.7, "duration_seconds": 3},
+}
+
+
+def _rule(**overrides):
+    values = dict(
+        rule_id="cells",
+        name="Cells",
+        entities=["sensor.cell_max"],
+        condition=None,
+        severity_mode=SEVERITY_MODE_SEMAFOR,
+        direction="higher_is_worse",
+        levels=LEVELS,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _run(engine, clock, states, seconds):
+    for second in seconds:
+        clock.now = second
+        engine.evaluate(states)
+
+
+def test_ladder_classifies_with_one_bisect():
+    ladder = build_ladder(LEVELS, lower_is_worse=False)
+    assert ladder.levels == ("warn", "derate_25", "derate_50", LEVEL_SHUTDOWN)
+    assert ladder.tripped(3.4) == ()
+    assert ladder.tripped(3.55) == ("warn", "derate_25")
+    assert ladder.tripped(9) == ladder.levels
+    assert ladder.rank("derate_50") == 3
+    assert ladder.rank("unknown") == ladder.rank(None) == 0
+    assert ladder.highest(["derate_25", None, "warn"]) == "derate_25"
+
+    low = build_ladder(
+        {
+            LEVEL_NOTIFY: {"threshold": 20, "duration_seconds": 1},
+            "low": {"threshold": 15, "duration_seconds": 1, "stop_level": LEVEL_LIMIT},
+            LEVEL_LIMIT: {"threshold": 15, "duration_seconds": 1},
+            LEVEL_SHUTDOWN: {"threshold": 5, "duration_seconds": 1},
+        },
+        lower_is_worse=True,
+    )
+    assert low.levels == (LEVEL_NOTIFY, "low", LEVEL_LIMIT, LEVEL_SHUTDOWN)
+    assert low.tripped(15) == (LEVEL_NOTIFY, "low", LEVEL_LIMIT)
+    assert low.tripped(15.1) == (LEVEL_NOTIFY,)
+
+
+def test_custom_levels_keep_their_own_timers():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    engine = RuleEngine([_rule()], clock=clock)
+    states.set("sensor.cell_max", 3.62)
+    _run(engine, clock, states, [10, 11])
+    state = engine.states["cells"]
+    assert state.active_levels == ["warn"]
+    _run(engine, clock, states, [12])
+    assert state.active_levels == ["warn", "derate_25", "derate_50"]
+    assert state.current_level == "derate_50"
+
+    stop_state = _build_stop_state(engine.rules, engine.states, False)
+    assert stop_state.level == LEVEL_LIMIT
+    assert stop_state.active_events[0]["level"] == LEVEL_LIMIT
+
+    # Below derate_25 but above the derate_50 clear point: derate_50 holds.
+    states.set("sensor.cell_max", 3.53)
+    _run(engine, clock, states, [13])
+    assert state.active_levels == ["warn", "derate_50"]
+    states.set("sensor.cell_max", 3.51)
+    _run(engine, clock, states, [14])
+    assert state.active_levels == ["warn"]
+    assert engine.rules[0].stop_level(state.current_level) == LEVEL_NOTIFY
+
+
+def test_load_rules_ignores_custom_level_without_stop_level():
+    raw = {
+        "rule_id": "cells",
+        "rule_name": "Cells",
+        "data_type": "numeric",
+        "entities": ["sensor.cell_max"],
+        "aggregate": "max",
+        "severity_mode": "semafor",
+        "direction": "higher_is_worse",
+        "levels": LEVELS,
+    }
+    broken = {**LEVELS, "warn": {"threshold": 3.5, "duration_seconds": 1}}
+    rules = load_rules({"rules": [raw, {**raw, "rule_id": "bad", "levels": broken}]})
+    assert [rule.ladder.levels[0] for rule in rules] == ["warn", "derate_25"]
+    assert rules[0].stop_level("derate_25") == LEVEL_LIMIT
+
+
+def test_import_validates_order_and_ui_keeps_custom_levels():
+    raw = {
+        "rule_id": "cells",
+        "rule_name": "Cells",
+        "data_type": "numeric",
+        "entities": ["sensor.cell_max"],
+        "aggregate": "max",
+        "severity_mode": "semafor",
+        "direction": "higher_is_worse",
+        "levels": LEVELS,
+    }
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["levels"]["derate_50"]["stop_level"] == LEVEL_LIMIT
+    assert "stop_level" not in normalized[0]["levels"][LEVEL_SHUTDOWN]
+
+    # A worse threshold must not raise a lower stop level.
+    swapped = {
+        **LEVELS,
+        "warn": {"threshold": 3.65, "duration_seconds": 1, "stop_level": LEVEL_NOTIFY},
+    }
+    _, error = _normalize_import_rules([{**raw, "levels": swapped}])
+    assert error == "import_invalid_rule"
+    for level, cfg in (
+        ("warn", {"threshold": 3.5, "duration_seconds": 1, "stop_level": "normal"}),
+        ("Derate!", {"threshold": 3.5, "duration_seconds": 1, "stop_level": "limit"}),
+    ):
+        _, error = _normalize_import_rules([{**raw, "levels": {**LEVELS, level: cfg}}])
+        assert error == "import_invalid_rule"
+
+    context = _seed_rule_context(normalized[0])
+    assert context["shutdown_threshold"] == 3.7
+    context["shutdown_threshold"] = 3.8
+    rule = _build_rule_config(context, {}, [])
+    assert set(rule["levels"]) == {"warn", "derate_25", "derate_50", LEVEL_SHUTDOWN}
+    assert rule["levels"][LEVEL_SHUTDOWN]["threshold"] == 3.8
+    assert rule["levels"]["derate_50"] == normalized[0]["levels"]["derate_50"]
@@ -0,0 +1,251 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+from custom_components.emergency_stop.const import LEVEL_NORMAL, LEVEL_SHUTDOWN
+from custom_components.emergency_stop.engine import RuleEngine
+from custom_components.emergency_stop.engine.freshness import FreshnessIndex
+from custom_components.emergency_stop.engine.replay import StateChange, replay
+
+from helpers import DictStates, FakeClock, START, rule_config
+
+
+def _state(value, updated_at=None):
+    if updated_at is None:
+        return SimpleNamespace(state=value, attributes={})
+    return SimpleNamespace(
+        state=value,
+        attributes={},
+        last_updated=START + timedelta(seconds=updated_at),
+    )
+
+
+def _rule(stale_seconds=30, **overrides):
+    values = dict(
+        rule_id="pressure",
+        name="Pressure",
+        entities=["sensor.pressure"],
+        thresholds=[10],
+        duration_seconds=1,
+        interval_seconds=5,
+        unknown_handling="treat_violation",
+        stale_seconds=stale_seconds,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def test_index_fires_only_for_latest_update():
+    index = FreshnessIndex()
+    index.watch({"sensor.a": {10}, "sensor.b": {10, 60}})
+    index.touch("sensor.a", 0)
+    index.touch("sensor.b", 1)
+    index.touch("sensor.a", 5)
+    index.touch("sensor.unwatched", 5)
+
+    assert index.entity_ids == {"sensor.a", "sensor.b"}
+    assert index.next_deadline() == 11
+    assert index.pop_expired(10.5) == set()
+    assert index.pop_expired(11) == {"sensor.b"}
+    assert index.next_deadline() == 15
+    assert index.pop_expired(15) == {"sensor.a"}
+    assert index.next_deadline() == 61
+
+
+def test_stale_input_is_invalid_and_uses_unknown_handling():
+    clock = FakeClock()
+    states = DictStates({"sensor.pressure": _state("4", updated_at=0)})
+    engine = RuleEngine([_rule()], clock=clock)
+    state = engine.states["pressure"]
+
+    clock.now = 20
+    engine.evaluate(states)
+    assert state.last_match is False
+
+    clock.now = 30
+    engine.evaluate(states)
+    assert state.last_invalid_reason == "no_valid_values"
+    assert state.last_match is True
+
+    states["sensor.pressure"] = _state("4", updated_at=34)
+    clock.now = 35
+    engine.evaluate(states)
+    assert state.last_match is False
+
+
+def test_stale_entity_is_dropped_from_aggregate():
+    clock = FakeClock()
+    states = DictStates(
+        {
+            "sensor.pressure": _state("50", updated_at=0),
+            "sensor.pressure_2": _state("4", updated_at=40),
+        }
+    )
+    engine = RuleEngine(
+        [_rule(entities=["sensor.pressure", "sensor.pressure_2"])], clock=clock
+    )
+    clock.now = 40
+    engine.evaluate(states)
+    assert engine.states["pressure"].last_aggregate == 4
+    assert engine.states["pressure"].last_entity == "sensor.pressure_2"
+
+
+def test_expiry_forces_evaluation_between_intervals():
+    clock = FakeClock()
+    states = DictStates({"sensor.pressure": _state("4")})
+    engine = RuleEngine([_rule(stale_seconds=7, interval_seconds=60)], clock=clock)
+    clock.now = 100
+    engine.freshness.touch("sensor.pressure", 100)
+    engine.evaluate(states)
+    assert engine.freshness.next_deadline() == 107
+
+    clock.now = 107
+    engine.evaluate(states)
+    assert engine.states["pressure"].last_eval_monotonic == 100
+    assert engine.expire_stale() is True
+    engine.evaluate(states)
+    assert engine.states["pressure"].last_eval_monotonic == 107
+    assert engine.states["pressure"].last_match is True
+    assert engine.expire_stale() is False
+
+
+def test_replay_activates_at_stale_deadline():
+    changes = [
+        StateChange(START, "sensor.pressure", "4"),
+        StateChange(START + timedelta(seconds=20), "sensor.pressure", "4"),
+    ]
+    transitions = list(
+        replay([_rule(duration_seconds=5)], changes, START + timedelta(seconds=120))
+    )
+
+    assert [t.kind for t in transitions] == ["activated"]
+    assert transitions[0].when == START + timedelta(seconds=55)
+
+
+def test_import_keeps_stale_seconds():
+    raw = {
+        "rule_id": "pressure",
+        "rule_name": "Pressure",
+        "data_type": "numeric",
+        "entities": ["sensor.pressure"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [10],
+        "duration_seconds": 5,
+        "interval_seconds": 5,
+        "stale_seconds": 300,
+    }
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["stale_seconds"] == 300
+
+    normalized, error = _normalize_import_rules([{**raw, "stale_seconds": 0}])
+    assert "stale_seconds" not in normalized[0]
+
+    _, error = _normalize_import_rules([{**raw, "stale_seconds": -1}])
+    assert error == "import_invalid_rule"
+
+
+def test_coordinator_tracks_reports_of_watched_entities_only(monkeypatch):
+    from custom_components.emergency_stop import coordinator as coordinator_module
+
+    clock = SimpleNamespace(now=100.0)
+    listened = {}
+    timers = []
+    monkeypatch.setattr(coordinator_module, "_TRACK_STATE_REPORT", None)
+    monkeypatch.setattr(coordinator_module.time, "monotonic", lambda: clock.now)
+    monkeypatch.setattr(
+        coordinator_module,
+        "async_track_state_change_event",
+        lambda hass, entity_ids, action: lambda: None,
+    )
+    monkeypatch.setattr(
+        coordinator_module,
+        "async_call_later",
+        lambda hass, delay, action: timers.append(clock.now + delay)
+        or (lambda: None),
+    )
+    coordinator = coordinator_module.EmergencyStopCoordinator.__new__(
+        coordinator_module.EmergencyStopCoordinator
+    )
+    coordinator.hass = SimpleNamespace(
+        bus=SimpleNamespace(
+            async_listen=lambda event_type, action, **kwargs: listened.update(
+                kwargs, event_type=event_type
+            )
+            or (lambda: None)
+        )
+    )
+    coordinator._rule_engine = coordinator_module.RuleEngine([_rule(stale_seconds=7)])
+    coordinator._freshness_unsubs = []
+    coordinator._stale_cancel = None
+    coordinator._stale_deadline = None
+
+    coordinator._rule_engine.freshness.touch("sensor.pressure", 100)
+    coordinator._async_track_freshness()
+    assert listened["event_type"] == "state_reported"
+    is_watched = listened["event_filter"]
+    assert is_watched({"entity_id": "sensor.pressure"}) is True
+    assert is_watched(SimpleNamespace(data={"entity_id": "sensor.other"})) is False
+    assert timers == [107]
+
+    # A report pushes the deadline back and re-arms the timer.
+    clock.now = 104.0
+    coordinator._handle_entity_update(
+        SimpleNamespace(data={"entity_id": "sensor.pressure"})
+    )
+    assert timers == [107, 111]
+
+
+def test_coordinator_trips_stale_rule_at_the_deadline(monkeypatch):
+    from custom_components.emergency_stop import coordinator as coordinator_module
+
+    clock = FakeClock(100.0)
+    timers = []
+    refreshes = []
+    monkeypatch.setattr(coordinator_module.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(
+        coordinator_module,
+        "async_call_later",
+        lambda hass, delay, action: timers.append((clock.now + delay, action))
+        or (lambda: None),
+    )
+    monkeypatch.setattr(
+        coordinator_module.EmergencyStopCoordinator,
+        "async_update_listeners",
+        lambda self: None,
+    )
+    coordinator = coordinator_module.EmergencyStopCoordinator.__new__(
+        coordinator_module.EmergencyStopCoordinator
+    )
+    states = DictStates({"sensor.pressure": "4"})
+    coordinator.hass = SimpleNamespace(
+        states=states,
+        async_create_task=lambda coro: refreshes.append(coro.close()),
+    )
+    coordinator._rule_engine = coordinator_module.RuleEngine(
+        [_rule(stale_seconds=7, duration_seconds=0, interval_seconds=60)]
+    )
+    coordinator._simulation = None
+    coordinator._acknowledged = False
+    coordinator._lane_over_budget = False
+    coordinator._stop_state = coordinator_module.EmergencyStopState(level=LEVEL_NORMAL)
+    coordinator._input_batch = None
+    coordinator._batch_cancel = None
+    coordinator._shutdown_batch = None
+    coordinator._shutdown_batch_cancel = None
+    coordinator._eval_slice = None
+    coordinator._watchdog_events = []
+    coordinator._stale_cancel = None
+    coordinator._stale_deadline = None
+
+    coordinator._rule_engine.freshness.touch("sensor.pressure", 100)
+    coordinator._schedule_stale_check()
+    deadline, action = timers.pop()
+    assert deadline == 107
+
+    clock.now = deadline
+    action(None)
+    assert coordinator.stop_state.level == LEVEL_SHUTDOWN
+    assert coordinator._rule_engine.states["pressure"].last_eval_monotonic == 107
+    assert len(refreshes) == 1
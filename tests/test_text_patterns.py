@@ -0,0 +1,166 @@
+import pytest
+
+from custom_components.emergency_stop.config_flow import (
+    _build_rule_config,
+    _normalize_import_rules,
+)
+from custom_components.emergency_stop.const import (
+    COND_CONTAINS,
+    COND_EQUALS,
+    DATA_TYPE_TEXT,
+)
+from custom_components.emergency_stop.engine import RuleEngine, load_rules
+from custom_components.emergency_stop.engine.textmatch import compile_needles
+
+from helpers import DictStates, FakeClock, rule_config
+
+FAULTS = ("Grid lost", "/E0[0-9]{2}/", "Overtemp")
+
+
+def _rule(**overrides):
+    values = dict(
+        rule_id="faults",
+        name="Inverter faults",
+        data_type=DATA_TYPE_TEXT,
+        entities=["sensor.inverter_1_fault", "sensor.inverter_2_fault"],
+        aggregate="any",
+        condition=COND_CONTAINS,
+        text_patterns=FAULTS,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def test_compiled_needles_report_the_matching_one():
+    matcher = compile_needles(FAULTS, False, False, True)
+    assert matcher.match("state: GRID LOST at 10:02") == "Grid lost"
+    assert matcher.match("fault e042") == "/E0[0-9]{2}/"
+    assert matcher.match("E142") is None
+    assert compile_needles(FAULTS, False, False, True) is matcher
+
+    whole = compile_needles((" Idle ", "/run.*/"), True, True, True)
+    assert whole.match("  Idle ") == "Idle"
+    assert whole.match("Idle mode") is None
+    assert whole.match("idle") is None
+    assert whole.match("running") == "/run.*/"
+    with pytest.raises(ValueError):
+        compile_needles(("/E0[/",), False, False, True)
+
+
+def test_backreferences_keep_their_group_numbers():
+    matcher = compile_needles(
+        ("/(e)rr\\1/", "/(?P<code>F\\d)-(?P=code)/", "Idle"), False, False, True
+    )
+    assert matcher.match("ERRE 12") == "/(e)rr\\1/"
+    assert matcher.match("ERRX") is None
+    assert matcher.match("fault F1-F1") == "/(?P<code>F\\d)-(?P=code)/"
+    assert matcher.match("fault F1-F2") is None
+    assert matcher.match("idle") == "Idle"
+
+    whole = compile_needles(("/(a)b\\1/",), True, True, True)
+    assert whole.match(" aba ") == "/(a)b\\1/"
+    assert whole.match("abb") is None
+
+
+def test_needles_are_tried_in_configured_order():
+    matcher = compile_needles(
+        ("Grid", "/(e)rr\\1/", "Overtemp", "/(?P<c>F\\d)-(?P=c)/"),
+        False,
+        False,
+        True,
+    )
+    assert matcher.match("erre overtemp") == "/(e)rr\\1/"
+    assert matcher.match("F1-F1 overtemp") == "Overtemp"
+    assert matcher.match("F1-F1 grid erre") == "Grid"
+    assert matcher.match("F1-F1") == "/(?P<c>F\\d)-(?P=c)/"
+
+
+def test_inline_flags_apply_to_their_needle_only():
+    matcher = compile_needles(("/(?i)grid/", "Overtemp", "/(?s)a.b/"), False, True, True)
+    assert matcher.match("GRID lost") == "/(?i)grid/"
+    assert matcher.match("OVERTEMP") is None
+    assert matcher.match("Overtemp") == "Overtemp"
+    assert matcher.match("a\nb") == "/(?s)a.b/"
+
+    whole = compile_needles(("/(?i)idle/",), True, True, True)
+    assert whole.match(" IDLE ") == "/(?i)idle/"
+
+
+def test_engine_matches_any_pattern_and_reports_it():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    engine = RuleEngine([_rule(thresholds=["isolation"])], clock=clock)
+    states.set("sensor.inverter_1_fault", "OK")
+    states.set("sensor.inverter_2_fault", " Fault E017: overcurrent ")
+    engine.evaluate(states)
+    state = engine.states["faults"]
+    assert state.active is True
+    assert state.last_aggregate == "/E0[0-9]{2}/"
+    assert state.last_entity == "sensor.inverter_2_fault"
+    assert state.last_detail == "Inverter faults: contains '/E0[0-9]{2}/'"
+
+    states.set("sensor.inverter_2_fault", "Isolation fault")
+    clock.now = 11
+    engine.evaluate(states)
+    assert state.last_aggregate == "isolation"
+
+    states.set("sensor.inverter_2_fault", "OK")
+    clock.now = 12
+    engine.evaluate(states)
+    assert state.active is False
+    assert state.last_aggregate is None
+
+
+def test_equals_with_patterns_and_all_aggregate():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    rule = _rule(
+        condition=COND_EQUALS, aggregate="all", text_patterns=("fault", "/err.*/")
+    )
+    engine = RuleEngine([rule], clock=clock)
+    states.set("sensor.inverter_1_fault", "FAULT")
+    states.set("sensor.inverter_2_fault", "error 3")
+    engine.evaluate(states)
+    assert engine.states["faults"].active is True
+
+
+def test_load_import_and_build_patterns():
+    raw = {
+        "rule_id": "faults",
+        "rule_name": "Inverter faults",
+        "data_type": "text",
+        "entities": ["sensor.inverter_1_fault"],
+        "aggregate": "any",
+        "condition": "contains",
+        "thresholds": [],
+        "text_patterns": list(FAULTS),
+    }
+    rules = load_rules(
+        {"rules": [raw, {**raw, "rule_id": "bad", "text_patterns": ["/E0[/"]}]}
+    )
+    assert [rule.rule_id for rule in rules] == ["faults"]
+    assert rules[0].text_patterns == FAULTS
+
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["thresholds"] == []
+    assert normalized[0]["text_patterns"] == list(FAULTS)
+    _, error = _normalize_import_rules([{**raw, "text_patterns": []}])
+    assert error == "import_invalid_rule"
+    _, error = _normalize_import_rules([{**raw, "text_patterns": ["/E0[/"]}])
+    assert error == "import_invalid_rule"
+
+    rule = _build_rule_config(
+        {"rule_name": "Inverter faults", "data_type": "text"},
+        {
+            "entities": ["sensor.inverter_1_fault"],
+            "aggregate": "any",
+            "condition": "contains",
+            "text_match": None,
+            "text_patterns": " Grid lost \n\n/E0[0-9]{2}/",
+            "severity_mode": "simple",
+        },
+        [],
+    )
+    assert rule["thresholds"] == []
+    assert rule["text_patterns"] == ["Grid lost", "/E0[0-9]{2}/"]
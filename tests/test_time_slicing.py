@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from custom_components.emergency_stop.config_flow import _validate_globals
+from custom_components.emergency_stop.const import LEVEL_LIMIT, LEVEL_NOTIFY
+from custom_components.emergency_stop.engine import RuleEngine
+
+from helpers import DictStates, FakeClock, START, rule_config
+
+
+def _rule(rule_id, level=LEVEL_NOTIFY, **overrides):
+    values = dict(
+        rule_id=rule_id,
+        thresholds=[50],
+        duration_seconds=1,
+        interval_seconds=60,
+        level=level,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def _due_now(engine):
+    # Offsets spread the first evaluations; make every rule due at once.
+    for state in engine.states.values():
+        state.last_eval_monotonic = None
+
+
+def test_budgeted_pass_resumes_at_cursor_in_lane_order():
+    clock = FakeClock(10.0, tick=1.0)
+    states = DictStates()
+    rules = [_rule(f"r{index}") for index in range(5)]
+    rules.append(_rule("cabinet", LEVEL_LIMIT))
+    engine = RuleEngine(rules, clock=clock)
+    for rule in rules:
+        states.set(rule.entities[0], 10)
+    _due_now(engine)
+
+    slices = []
+    while True:
+        done = engine.evaluate(states, budget=1.5)
+        slices.append(
+            sorted(
+                rule_id
+                for rule_id, state in engine.states.items()
+                if state.last_aggregate is not None
+            )
+        )
+        if done:
+            break
+    assert len(slices) == 3
+    assert slices[0] == ["cabinet", "r0"]
+    assert slices[-1] == sorted(state for state in engine.states)
+
+    # A complete pass starts over from the first lane.
+    _due_now(engine)
+    states.set("sensor.cabinet", 80)
+    assert engine.evaluate(states, budget=1.5) is False
+    assert engine.states["cabinet"].last_aggregate == 80
+
+
+def test_expired_timer_runs_before_the_cursor_reaches_it():
+    clock = FakeClock(10.0)
+    states = DictStates()
+    rules = [_rule(f"r{index}") for index in range(4)]
+    rules.append(_rule("fan", LEVEL_LIMIT))
+    engine = RuleEngine(rules, clock=clock)
+    for rule in rules:
+        states.set(rule.entities[0], 10)
+    states.set("sensor.r3", 80)
+    _due_now(engine)
+    assert engine.evaluate(states) is True
+    r3 = engine.states["r3"]
+    assert r3.violation_started_at == 10
+    assert r3.active is False
+
+    # The next pass stops after its first rule, long before r3, whose
+    # interval is not up yet either.
+    clock.now = 12.0
+    clock.tick = 1.0
+    _due_now(engine)
+    r3.last_eval_monotonic = clock.now
+    assert engine.evaluate(states, budget=0.5) is False
+    assert r3.active is True
+    assert r3.active_since == (START + timedelta(seconds=12)).isoformat()
+    assert engine.states["r1"].last_eval_monotonic is None
+
+
+def test_woken_rule_behind_cursor_runs_next_slice():
+    clock = FakeClock(10.0, tick=1.0)
+    states = DictStates()
+    rules = [_rule("cabinet", LEVEL_LIMIT)]
+    rules.extend(_rule(f"r{index}") for index in range(3))
+    engine = RuleEngine(rules, clock=clock)
+    for rule in rules:
+        states.set(rule.entities[0], 10)
+    _due_now(engine)
+    assert engine.evaluate(states, budget=1.5) is False
+    assert engine.states["cabinet"].last_aggregate == 10
+
+    states.set("sensor.cabinet", 80)
+    assert engine.wake("sensor.cabinet", LEVEL_LIMIT) is True
+    while not engine.evaluate(states, budget=1.5):
+        pass
+    assert engine.states["cabinet"].last_aggregate == 80
+
+
+def test_input_pass_during_tick_keeps_the_tick_cursor():
+    clock = FakeClock(10.0, tick=1.0)
+    states = DictStates()
+    rules = [_rule("cabinet", LEVEL_LIMIT)]
+    rules.extend(_rule(f"r{index}") for index in range(4))
+    engine = RuleEngine(rules, clock=clock)
+    for rule in rules:
+        states.set(rule.entities[0], 10)
+    _due_now(engine)
+    stepped = []
+    step = engine._step
+    engine._step = lambda rule, *args: stepped.append(rule.rule_id) or step(
+        rule, *args
+    )
+
+    assert engine.evaluate(states, budget=1.5) is False
+    assert stepped == ["cabinet", "r0"]
+
+    # An input flush runs while the tick yields, and completes.
+    states.set("sensor.cabinet", 80)
+    engine.wake("sensor.cabinet", LEVEL_LIMIT)
+    stepped.clear()
+    while not engine.evaluate(states, budget=1.5, pass_name="inputs"):
+        pass
+    assert engine.states["cabinet"].last_aggregate == 80
+
+    # The tick resumes at its own cursor instead of starting over.
+    stepped.clear()
+    while not engine.evaluate(states, budget=1.5):
+        pass
+    assert stepped == ["r1", "r2", "r3"]
+
+
+def test_eval_slice_setting_is_validated():
+    assert _validate_globals({"eval_slice_ms": 20}) == {}
+    assert _validate_globals({"eval_slice_ms": 0}) == {}
+    assert _validate_globals({"eval_slice_ms": -1}) == {"eval_slice_ms": "min_0"}
+    assert _validate_globals({"eval_slice_ms": "fast"}) == {
+        "eval_slice_ms": "invalid_number"
+    }
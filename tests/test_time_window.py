@@ -0,0 +1,194 @@
+from dataclasses import asdict
+import hashlib
+import json
+
+import pytest
+
+from custom_components.emergency_stop.config_flow import _normalize_import_rules
+from custom_components.emergency_stop.const import (
+    LEVEL_LIMIT,
+    LEVEL_NOTIFY,
+    WINDOW_AVG,
+    WINDOW_INTEGRAL,
+    WINDOW_MAX,
+    WINDOW_MIN,
+)
+from custom_components.emergency_stop.engine import RuleEngine, rule_fingerprint
+from custom_components.emergency_stop.engine.window import TimeWindow
+
+from helpers import DictStates, FakeClock, rule_config
+
+
+LEGACY_FINGERPRINT_FIELDS = {
+    "rule_id",
+    "name",
+    "data_type",
+    "entities",
+    "aggregate",
+    "condition",
+    "thresholds",
+    "duration_seconds",
+    "interval_seconds",
+    "level",
+    "latched",
+    "unknown_handling",
+    "severity_mode",
+    "direction",
+    "levels",
+    "text_case_sensitive",
+    "text_trim",
+    "notify_email",
+    "notify_mobile",
+}
+
+
+def _rule(window_function="none", window_seconds=60, **overrides):
+    values = dict(
+        rule_id="current",
+        name="Current",
+        entities=["sensor.current"],
+        thresholds=[100],
+        duration_seconds=1,
+        level=LEVEL_LIMIT,
+        window_function=window_function,
+        window_seconds=window_seconds,
+    )
+    values.update(overrides)
+    return rule_config(**values)
+
+
+def test_window_avg_evicts_old_samples():
+    window = TimeWindow(WINDOW_AVG, 10)
+    for now, value in ((0, 10), (5, 20), (10, 30), (15, 40)):
+        window.add(now, value)
+    assert window.value() == (30, None)
+    assert len(window) == 3
+
+
+@pytest.mark.parametrize(
+    ("function", "expected"),
+    [(WINDOW_MIN, (2, "sensor.b")), (WINDOW_MAX, (7, "sensor.d"))],
+)
+def test_window_min_max_track_extreme_entity(function, expected):
+    window = TimeWindow(function, 3)
+    for now, value, entity_id in (
+        (0, 9, "sensor.a"),
+        (1, 2, "sensor.b"),
+        (2, 5, "sensor.c"),
+        (3, 7, "sensor.d"),
+        (4, 4, "sensor.e"),
+    ):
+        window.add(now, value, entity_id)
+    assert window.value() == expected
+
+
+def test_window_avg_is_time_weighted_from_window_start():
+    window = TimeWindow(WINDOW_AVG, 10)
+    # 1 s at 100, then 9 s at 0: an unweighted mean would say 50.
+    window.add(0, 100)
+    window.add(1, 100)
+    window.add(1.001, 0)
+    window.add(10, 0)
+    assert window.value()[0] == pytest.approx(10.005)
+
+    # The sample from before the window start is cut at the start (t=2).
+    window = TimeWindow(WINDOW_AVG, 10)
+    window.add(0, 0)
+    window.add(8, 80)
+    window.add(12, 80)
+    assert window.value()[0] == pytest.approx(((20 + 80) / 2 * 6 + 4 * 80) / 10)
+
+
+def test_window_integral_is_trapezoidal():
+    window = TimeWindow(WINDOW_INTEGRAL, 10)
+    window.add(0, 0)
+    window.add(2, 10)
+    window.add(4, 10)
+    assert window.value() == (30, None)
+    window.add(14, 10)
+    assert window.value() == (100, None)
+    # The segment from t=4 to t=14 is cut at the window start (t=10).
+    window.add(20, 40)
+    assert window.value()[0] == pytest.approx(10 * 4 + (10 + 40) / 2 * 6)
+
+
+def test_rule_with_avg_window_ignores_short_spike():
+    clock = FakeClock()
+    states = DictStates({"sensor.current": "50"})
+    engine = RuleEngine(
+        [_rule(window_function=WINDOW_AVG, window_seconds=10)], clock=clock
+    )
+    state = engine.states["current"]
+
+    for second in range(1, 11):
+        clock.now = second
+        states["sensor.current"] = "500" if second == 10 else "50"
+        engine.evaluate(states)
+        assert state.active is False
+    # Time-weighted: the spike only covers the last half second on average.
+    assert state.last_aggregate == pytest.approx(75)
+    assert state.last_detail == "Current: avg_10s(max)=75.000 gt 100"
+
+    states["sensor.current"] = "150"
+    for second in range(11, 22):
+        clock.now = second
+        engine.evaluate(states)
+    assert state.active is True
+
+
+def test_semafor_uses_window_value():
+    clock = FakeClock()
+    states = DictStates({"sensor.current": "120"})
+    rule = _rule(
+        window_function=WINDOW_MIN,
+        window_seconds=5,
+        severity_mode="semafor",
+        direction="higher_is_worse",
+        levels={LEVEL_NOTIFY: {"threshold": 100, "duration_seconds": 1}},
+    )
+    engine = RuleEngine([rule], clock=clock)
+    for second, value in ((1, "120"), (2, "80"), (3, "120"), (4, "120")):
+        clock.now = second
+        states["sensor.current"] = value
+        engine.evaluate(states)
+    assert engine.states["current"].last_aggregate == 80
+    assert engine.states["current"].current_level is None
+
+
+def test_fingerprint_unchanged_for_rules_without_window():
+    rule = _rule()
+    # Fields the fingerprint covered before optional rule fields existed.
+    legacy = {
+        name: value
+        for name, value in asdict(rule).items()
+        if name in LEGACY_FINGERPRINT_FIELDS
+    }
+    expected = hashlib.sha1(
+        json.dumps(legacy, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+    assert rule_fingerprint(rule) == expected
+    assert rule_fingerprint(_rule(window_function=WINDOW_AVG)) != expected
+
+
+def test_import_keeps_window_settings():
+    raw = {
+        "rule_id": "current",
+        "rule_name": "Current",
+        "data_type": "numeric",
+        "entities": ["sensor.current"],
+        "aggregate": "max",
+        "condition": "gt",
+        "thresholds": [100],
+        "duration_seconds": 5,
+        "interval_seconds": 1,
+        "window_function": "integral",
+        "window_seconds": 300,
+    }
+    normalized, error = _normalize_import_rules([raw])
+    assert error is None
+    assert normalized[0]["window_function"] == "integral"
+    assert normalized[0]["window_seconds"] == 300
+
+    _, error = _normalize_import_rules([{**raw, "window_function": "median"}])
+    assert error == "import_invalid_rule"